@@ -0,0 +1,247 @@
+"""
+Moteur d'activité des drivers Bolt : temps en ligne, en course, en attente, pauses, courses
+et revenus par heure en ligne, par driver et par jour local (ANALYTICS_TIMEZONE).
+
+Calcul vectorisé (numpy) sur tous les drivers d'une org à la fois, à partir des intervalles
+d'état compactés (bolt_state_intervals) et des commandes (bolt_orders), avec les règles de la
+page de performance du frontend :
+- en ligne = waiting_orders + has_order + busy, en course = has_order + busy ;
+- un état dure jusqu'au log suivant (le temps après le dernier log n'est pas compté) ;
+- revenus brut = ride_price + tip + cancellation_fee, net = (net_earnings ou, à défaut,
+  cancellation_fee) + tip, sur les commandes avec revenus, au jour de fin (ou de création).
+
+Les résultats sont stockés dans bolt_driver_activity_daily et recalculés, pour les drivers et
+les jours touchés, après chaque sync des state logs et des commandes (refresh_driver_activity).
+Les recalculs d'une org sont sérialisés (bail "driver_activity") : les fenêtres et companies
+synchronisées en parallèle ne s'écrasent pas mutuellement.
+"""
+from datetime import date, datetime, time, timedelta
+from typing import Iterable, Optional
+from zoneinfo import ZoneInfo
+
+import numpy as np
+
+from app.core.config import get_settings
+from app.core import logging as app_logging
+from app.core.supabase_db import SupabaseDB
+from app.jobs.leases import serialized
+from app.models.bolt_driver_activity import BoltDriverActivityDaily
+from app.models.bolt_order import BoltOrder
+from app.models.bolt_state_interval import BoltStateInterval
+
+settings = get_settings()
+logger = app_logging.get_logger(__name__)
+
+BUSY_STATES = ("has_order", "busy")
+WAITING_STATES = ("waiting_orders",)
+OFFLINE, WAITING, BUSY = 0, 1, 2
+
+# Nombre de jours recalculés par passe (borne la mémoire lors des backfills)
+REFRESH_CHUNK_DAYS = 31
+# Les commandes sont lues par date de création ; marge pour celles terminées le lendemain
+ORDER_LOOKBACK_SECONDS = 24 * 3600
+# Drivers par requête filtrée sur driver_uuid (longueur de l'URL PostgREST)
+DRIVER_CHUNK_SIZE = 100
+
+
+def analytics_tz() -> ZoneInfo:
+    return ZoneInfo(settings.analytics_timezone)
+
+
+def local_day(ts: int, tz: ZoneInfo) -> date:
+    return datetime.fromtimestamp(ts, tz).date()
+
+
+def day_bounds(first_day: date, last_day: date, tz: ZoneInfo) -> np.ndarray:
+    """Début de chaque jour local de first_day à last_day, suivi de la fin du dernier jour (changements d'heure inclus)."""
+    days = (last_day - first_day).days + 2
+    return np.array(
+        [int(datetime.combine(first_day + timedelta(days=d), time.min, tzinfo=tz).timestamp()) for d in range(days)],
+        dtype=np.int64,
+    )
+
+
+def _column(rows: list[dict], key: str, dtype=np.float64) -> np.ndarray:
+    return np.array([row.get(key) or 0 for row in rows], dtype=dtype)
+
+
+def compute_driver_activity(
+    org_id: str,
+    intervals: list[dict],
+    orders: list[dict],
+    first_day: date,
+    last_day: date,
+    tz: Optional[ZoneInfo] = None,
+) -> list[dict]:
+    """
+    Calcule les lignes bolt_driver_activity_daily de first_day à last_day (inclus).
+
+    Args:
+        intervals: lignes bolt_state_intervals chevauchant la période
+        orders: lignes bolt_order de la période (les commandes hors période sont ignorées)
+
+    Returns:
+        Une ligne par (driver, jour) avec du temps en ligne, des courses ou des revenus
+    """
+    tz = tz or analytics_tz()
+    bounds = day_bounds(first_day, last_day, tz)
+    n_days = len(bounds) - 1
+    drivers = sorted({row["driver_uuid"] for row in intervals} | {row["driver_uuid"] for row in orders if row.get("driver_uuid")})
+    if not drivers:
+        return []
+    driver_index = {driver_uuid: i for i, driver_uuid in enumerate(drivers)}
+    size = len(drivers) * n_days
+
+    def per_key(keys: np.ndarray, weights: np.ndarray) -> np.ndarray:
+        return np.bincount(keys, weights=weights, minlength=size)
+
+    totals = {name: np.zeros(size) for name in (
+        "online_seconds", "busy_seconds", "waiting_seconds", "idle_gap_seconds", "idle_gaps",
+        "trips", "on_trip_seconds", "gross_earnings", "net_earnings", "distance_km",
+    )}
+
+    if intervals:
+        start = np.clip(_column(intervals, "start_ts", np.int64), bounds[0], bounds[-1])
+        end = np.clip(_column(intervals, "end_ts", np.int64), bounds[0], bounds[-1])
+        drv = np.array([driver_index[row["driver_uuid"]] for row in intervals], dtype=np.int64)
+        state = np.array([(row.get("state") or "").lower() for row in intervals])
+        category = np.where(np.isin(state, BUSY_STATES), BUSY, np.where(np.isin(state, WAITING_STATES), WAITING, OFFLINE))
+
+        # Intervalles de durée non nulle dans la période, triés par driver puis début
+        keep = end > start
+        start, end, drv, category = start[keep], end[keep], drv[keep], category[keep]
+        order = np.lexsort((start, drv))
+        start, end, drv, category = start[order], end[order], drv[order], category[order]
+
+        # Découpage aux frontières de jours : un morceau par (intervalle, jour couvert)
+        first = np.searchsorted(bounds, start, side="right") - 1
+        last = np.searchsorted(bounds, end, side="left") - 1
+        counts = last - first + 1
+        piece = np.repeat(np.arange(len(start)), counts)
+        day = first[piece] + np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        seconds = (np.minimum(end[piece], bounds[day + 1]) - np.maximum(start[piece], bounds[day])).astype(np.float64)
+        keys = drv[piece] * n_days + day
+        piece_category = category[piece]
+
+        totals["busy_seconds"] = per_key(keys, seconds * (piece_category == BUSY))
+        totals["waiting_seconds"] = per_key(keys, seconds * (piece_category == WAITING))
+        totals["online_seconds"] = totals["busy_seconds"] + totals["waiting_seconds"]
+        # Pause : morceau hors ligne précédé et suivi d'autres morceaux du même driver le même jour
+        same_prev = np.r_[False, keys[1:] == keys[:-1]]
+        same_next = np.r_[keys[1:] == keys[:-1], False]
+        gap = (piece_category == OFFLINE) & same_prev & same_next
+        totals["idle_gap_seconds"] = per_key(keys, seconds * gap)
+        totals["idle_gaps"] = per_key(keys, gap.astype(np.float64))
+
+    rows_with_driver = [row for row in orders if row.get("driver_uuid") in driver_index]
+    if rows_with_driver:
+        finished_ts = _column(rows_with_driver, "order_finished_timestamp", np.int64)
+        ts = np.where(finished_ts > 0, finished_ts, _column(rows_with_driver, "order_created_timestamp", np.int64))
+        in_range = (ts >= bounds[0]) & (ts < bounds[-1])
+        keys = np.array([driver_index[row["driver_uuid"]] for row in rows_with_driver], dtype=np.int64) * n_days
+        keys = (keys + np.searchsorted(bounds, ts, side="right") - 1)[in_range]
+
+        ride_price = _column(rows_with_driver, "ride_price")[in_range]
+        tip = _column(rows_with_driver, "tip")[in_range]
+        cancellation_fee = _column(rows_with_driver, "cancellation_fee")[in_range]
+        net_earnings = _column(rows_with_driver, "net_earnings")[in_range]
+        status = np.array([(row.get("order_status") or "").lower() for row in rows_with_driver])[in_range]
+        pickup = _column(rows_with_driver, "order_pickup_timestamp", np.int64)[in_range]
+        drop_off = _column(rows_with_driver, "order_drop_off_timestamp", np.int64)[in_range]
+
+        with_earnings = (net_earnings > 0) | (cancellation_fee > 0) | (ride_price > 0)
+        finished = with_earnings & (np.char.find(status, "finished") >= 0) & (finished_ts[in_range] > 0)
+        on_trip = np.where((pickup > 0) & (drop_off > pickup), drop_off - pickup, 0).astype(np.float64)
+
+        totals["trips"] = per_key(keys, finished.astype(np.float64))
+        totals["on_trip_seconds"] = per_key(keys, on_trip)
+        totals["gross_earnings"] = per_key(keys, (ride_price + tip + cancellation_fee) * with_earnings)
+        totals["net_earnings"] = per_key(keys, (np.where(net_earnings > 0, net_earnings, cancellation_fee) + tip) * with_earnings)
+        totals["distance_km"] = per_key(keys, _column(rows_with_driver, "ride_distance")[in_range] / 1000 * finished)
+
+    online_hours = totals["online_seconds"] / 3600
+    with np.errstate(divide="ignore", invalid="ignore"):
+        utilisation = np.where(online_hours > 0, totals["busy_seconds"] / totals["online_seconds"] * 100, 0)
+        trips_per_hour = np.where(online_hours > 0, totals["trips"] / online_hours, 0)
+        earnings_per_hour = np.where(online_hours > 0, totals["net_earnings"] / online_hours, 0)
+
+    active = np.flatnonzero((totals["online_seconds"] > 0) | (totals["trips"] > 0) | (totals["gross_earnings"] > 0) | (totals["on_trip_seconds"] > 0))
+    rows = []
+    for key in active:
+        driver_uuid = drivers[key // n_days]
+        day = (first_day + timedelta(days=int(key % n_days))).isoformat()
+        rows.append({
+            "id": f"{driver_uuid}_{day}",
+            "org_id": org_id,
+            "driver_uuid": driver_uuid,
+            "day": day,
+            **{name: int(totals[name][key]) for name in (
+                "online_seconds", "busy_seconds", "waiting_seconds", "idle_gap_seconds", "idle_gaps", "trips", "on_trip_seconds",
+            )},
+            "gross_earnings": round(float(totals["gross_earnings"][key]), 2),
+            "net_earnings": round(float(totals["net_earnings"][key]), 2),
+            "distance_km": round(float(totals["distance_km"][key]), 3),
+            "utilisation": round(float(utilisation[key]), 2),
+            "trips_per_online_hour": round(float(trips_per_hour[key]), 3),
+            "earnings_per_online_hour": round(float(earnings_per_hour[key]), 2),
+        })
+    return rows
+
+
+def _fetch_for_drivers(db: SupabaseDB, model, filters: dict, ranges: dict, drivers: Optional[list[str]]) -> list[dict]:
+    """Lignes de toute l'org (drivers None) ou des seuls drivers donnés, par paquets de DRIVER_CHUNK_SIZE."""
+    if drivers is None:
+        return db.fetch_rows(model, filters, ranges=ranges)
+    rows: list[dict] = []
+    for start in range(0, len(drivers), DRIVER_CHUNK_SIZE):
+        rows += db.fetch_rows(model, filters, ranges=ranges, in_filters={"driver_uuid": drivers[start:start + DRIVER_CHUNK_SIZE]})
+    return rows
+
+
+def refresh_driver_activity(
+    db: SupabaseDB,
+    org_id: str,
+    start_ts: int,
+    end_ts: int,
+    driver_uuids: Optional[Iterable[str]] = None,
+) -> dict:
+    """
+    Recalcule l'activité des drivers pour les jours locaux couvrant [start_ts, end_ts], par passes
+    de REFRESH_CHUNK_DAYS jours. Les lignes des (driver, jour) sans activité sont supprimées.
+
+    Args:
+        driver_uuids: drivers à recalculer (ceux de la fenêtre synchronisée) ; tous ceux de l'org si None
+
+    Returns:
+        dict avec drivers, days (jours recalculés) et rows (lignes écrites)
+    """
+    drivers = sorted(set(driver_uuids)) if driver_uuids is not None else None
+    tz = analytics_tz()
+    first_day, last_day = local_day(start_ts, tz), local_day(end_ts, tz)
+    days = written = 0
+    if drivers == []:
+        return {"drivers": 0, "days": days, "rows": written, "from": first_day.isoformat(), "to": last_day.isoformat()}
+
+    with serialized(org_id, "driver_activity"):
+        chunk_start = first_day
+        while chunk_start <= last_day:
+            chunk_end = min(chunk_start + timedelta(days=REFRESH_CHUNK_DAYS - 1), last_day)
+            bounds = day_bounds(chunk_start, chunk_end, tz)
+            low, high = int(bounds[0]), int(bounds[-1])
+
+            filters = {"org_id": org_id}
+            intervals = _fetch_for_drivers(db, BoltStateInterval, filters, {"start_ts": (None, high), "end_ts": (low, None)}, drivers)
+            orders = _fetch_for_drivers(db, BoltOrder, filters, {"order_created_timestamp": (low - ORDER_LOOKBACK_SECONDS, high)}, drivers)
+            rows = compute_driver_activity(org_id, intervals, orders, chunk_start, chunk_end, tz)
+
+            day_range = (chunk_start.isoformat(), (chunk_end + timedelta(days=1)).isoformat())
+            new_ids = {row["id"] for row in rows}
+            existing = _fetch_for_drivers(db, BoltDriverActivityDaily, filters, {"day": day_range}, drivers)
+            db.delete_rows(BoltDriverActivityDaily, [row["id"] for row in existing if row["id"] not in new_ids])
+            written += db.bulk_upsert(BoltDriverActivityDaily, rows)
+            days += (chunk_end - chunk_start).days + 1
+            chunk_start = chunk_end + timedelta(days=1)
+
+    scope = f"{len(drivers)} driver(s)" if drivers is not None else "tous les drivers"
+    logger.info(f"[DRIVER ACTIVITY] org_id={org_id}: {days} jour(s) recalculé(s) ({first_day} -> {last_day}, {scope}), {written} ligne(s)")
+    return {"drivers": len(drivers) if drivers is not None else None, "days": days, "rows": written, "from": first_day.isoformat(), "to": last_day.isoformat()}
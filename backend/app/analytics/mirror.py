@@ -0,0 +1,295 @@
+"""
+Miroir analytique local (optionnel) de bolt_orders, bolt_state_logs et heetch_earnings.
+
+Les lignes écrites par les syncs sont recopiées dans des fichiers Parquet partitionnés par org et
+par jour UTC (ANALYTICS_MIRROR_DIR/<table>/<org_id>/<YYYY-MM-DD>/<séquence>.parquet), puis requêtées
+avec DuckDB embarqué : les agrégats de flotte sur plusieurs mois tournent en local, sans scan PostgREST.
+
+Chaque ajout (une page de sync) écrit un nouveau fichier dans les partitions touchées, sans relire
+les lignes déjà présentes : le coût d'une page ne dépend pas de la taille de la partition. À clé
+primaire égale, la lecture garde la ligne du fichier le plus récent. Passé COMPACT_PARTS fichiers,
+une partition est fusionnée en un seul (écrit dans un fichier temporaire renommé atomiquement avant
+la suppression des anciens).
+
+Dépendance optionnelle : sans duckdb installé ou sans ANALYTICS_MIRROR_DIR, le miroir est
+désactivé et les syncs n'y écrivent rien.
+"""
+import json
+import os
+import re
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta, timezone
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Iterable, Optional
+
+from sqlalchemy import BigInteger, Boolean, Date, DateTime, Float, Integer, Numeric
+
+from app.analytics.scoring import FINISHED_ORDER_SQL
+from app.core.config import get_settings
+from app.core import logging as app_logging
+from app.core.supabase_db import SupabaseDB
+from app.models.bolt_order import BoltOrder
+from app.models.bolt_state_log import BoltStateLog
+from app.models.heetch_earning import HeetchEarning
+
+try:
+    import duckdb
+except ImportError:  # dépendance optionnelle (pip install duckdb)
+    duckdb = None
+
+logger = app_logging.get_logger(__name__)
+
+# Fichiers d'une partition journalière au-delà desquels elle est fusionnée en un seul
+COMPACT_PARTS = 16
+
+
+@dataclass(frozen=True)
+class MirroredTable:
+    model: type
+    # Colonne déterminant la partition : timestamp Unix (jour UTC) ou date
+    partition_column: str
+    is_timestamp: bool
+
+    @property
+    def name(self) -> str:
+        return self.model.__tablename__
+
+    def day(self, row: dict) -> Optional[date]:
+        value = row.get(self.partition_column)
+        if value is None:
+            return None
+        if self.is_timestamp:
+            return datetime.fromtimestamp(int(value), timezone.utc).date()
+        return value if isinstance(value, date) else date.fromisoformat(str(value)[:10])
+
+
+MIRRORED_TABLES = {
+    table.name: table
+    for table in (
+        MirroredTable(BoltOrder, "order_created_timestamp", True),
+        MirroredTable(BoltStateLog, "created", True),
+        MirroredTable(HeetchEarning, "date", False),
+    )
+}
+
+
+def _duckdb_type(column) -> str:
+    column_type = column.type
+    if isinstance(column_type, BigInteger):
+        return "BIGINT"
+    if isinstance(column_type, Boolean):
+        return "BOOLEAN"
+    if isinstance(column_type, Integer):
+        return "INTEGER"
+    if isinstance(column_type, (Float, Numeric)):
+        return "DOUBLE"
+    if isinstance(column_type, DateTime):
+        return "TIMESTAMP"
+    if isinstance(column_type, Date):
+        return "DATE"
+    # Texte et JSONB (stocké en texte JSON)
+    return "VARCHAR"
+
+
+def _schema(model: type) -> str:
+    return ", ".join(f'"{column.name}" {_duckdb_type(column)}' for column in model.__table__.columns)
+
+
+def _value(value: Any) -> Any:
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False)
+    return value
+
+
+def _as_dict(row: Any, names: list[str]) -> dict:
+    # Lignes brutes (bulk_upsert) ou instances de modèle (merge)
+    return row if isinstance(row, dict) else {name: getattr(row, name, None) for name in names}
+
+
+def _safe_segment(value: str) -> str:
+    return re.sub(r"[^A-Za-z0-9_.@-]", "_", value)
+
+
+def _primary_key(model: type) -> str:
+    return next(column.name for column in model.__table__.columns if column.primary_key)
+
+
+def _latest_rows(files: str, primary_key: str) -> str:
+    """
+    Lignes de files (expression read_parquet) dédupliquées sur la clé primaire, la version du fichier
+    le plus récent l'emportant : les noms de fichiers d'une partition sont des séquences croissantes
+    de même longueur.
+    """
+    return (
+        f"SELECT * EXCLUDE (filename) FROM read_parquet({files}, union_by_name = true, filename = true)"
+        f' QUALIFY row_number() OVER (PARTITION BY "{primary_key}" ORDER BY filename DESC) = 1'
+    )
+
+
+class AnalyticsMirror:
+    """Store Parquet local + moteur DuckDB embarqué."""
+
+    def __init__(self, root: str):
+        self.root = Path(root)
+        # Un seul écrivain par process : deux ajouts concurrents sur une même partition se perdraient
+        self._lock = threading.Lock()
+        self._sequence = 0
+
+    def partition_path(self, table: str, org_id: str, day: date) -> Path:
+        return self.root / table / _safe_segment(org_id) / day.isoformat()
+
+    def _next_part(self, partition: Path) -> Path:
+        # Séquence croissante et de longueur fixe (ordre lexicographique = ordre d'écriture)
+        self._sequence = max(time.time_ns(), self._sequence + 1)
+        return partition / f"{self._sequence:020d}.parquet"
+
+    def append(self, model: type, org_id: str, rows: Iterable[Any]) -> dict:
+        """
+        Ajoute (ou remplace, à clé primaire égale) des lignes dans leurs partitions journalières.
+
+        Returns:
+            dict avec rows (lignes écrites), partitions (partitions touchées) et skipped (sans date de partition)
+        """
+        table = MIRRORED_TABLES[model.__tablename__]
+        columns = [column.name for column in model.__table__.columns]
+        primary_key = _primary_key(model)
+
+        by_day: dict[date, dict] = defaultdict(dict)
+        skipped = 0
+        for row in rows:
+            row = _as_dict(row, columns)
+            day = table.day(row)
+            if day is None:
+                skipped += 1
+                continue
+            by_day[day][row[primary_key]] = tuple(_value(row.get(column)) for column in columns)
+        if not by_day:
+            return {"rows": 0, "partitions": 0, "skipped": skipped}
+
+        placeholders = ", ".join("?" for _ in columns)
+        written = 0
+        with self._lock, duckdb.connect() as con:
+            con.execute(f"CREATE TEMP TABLE incoming ({_schema(model)})")
+            for day, values in sorted(by_day.items()):
+                con.execute("DELETE FROM incoming")
+                con.executemany(f"INSERT INTO incoming VALUES ({placeholders})", list(values.values()))
+                partition = self.partition_path(table.name, org_id, day)
+                partition.mkdir(parents=True, exist_ok=True)
+                self._write(con, "SELECT * FROM incoming", self._next_part(partition))
+                written += len(values)
+                self._compact(con, partition, primary_key)
+        return {"rows": written, "partitions": len(by_day), "skipped": skipped}
+
+    def _write(self, con, select: str, path: Path) -> None:
+        tmp = path.with_suffix(".parquet.tmp")
+        con.execute(f"COPY ({select}) TO '{tmp}' (FORMAT PARQUET)")
+        os.replace(tmp, path)
+
+    def _compact(self, con, partition: Path, primary_key: str) -> None:
+        """Fusionne les fichiers d'une partition passé COMPACT_PARTS."""
+        parts = sorted(partition.glob("*.parquet"))
+        if len(parts) < COMPACT_PARTS:
+            return
+        files = "[" + ", ".join(f"'{part}'" for part in parts) + "]"
+        # Le fichier fusionné est visible avant la suppression des anciens : un lecteur voit au pire des doublons, dédupliqués
+        self._write(con, _latest_rows(files, primary_key), self._next_part(partition))
+        for part in parts:
+            part.unlink()
+
+    def connect(self):
+        """Connexion DuckDB avec une vue par table miroir (table vide tant que rien n'est écrit)."""
+        con = duckdb.connect()
+        for name, table in MIRRORED_TABLES.items():
+            if any((self.root / name).glob("*/*/*.parquet")):
+                pattern = (self.root / name / "*" / "*" / "*.parquet").as_posix()
+                files = f"'{pattern}'"
+                con.execute(f"CREATE VIEW {name} AS {_latest_rows(files, _primary_key(table.model))}")
+            else:
+                con.execute(f"CREATE TABLE {name} ({_schema(table.model)})")
+        return con
+
+    def query(self, sql: str, params: Optional[list] = None) -> list[dict]:
+        """Exécute une requête SQL sur le miroir ; lignes en dicts."""
+        for attempt in range(2):
+            try:
+                with self.connect() as con:
+                    cursor = con.execute(sql, params or [])
+                    names = [description[0] for description in cursor.description]
+                    return [dict(zip(names, row)) for row in cursor.fetchall()]
+            except duckdb.IOException:
+                # Fichier supprimé par une fusion de partition pendant la lecture : la relecture voit le fichier fusionné
+                if attempt:
+                    raise
+
+
+@lru_cache
+def _mirror_for(root: str) -> AnalyticsMirror:
+    return AnalyticsMirror(root)
+
+
+def get_mirror() -> Optional[AnalyticsMirror]:
+    """Miroir configuré, ou None (ANALYTICS_MIRROR_DIR vide ou duckdb absent)."""
+    root = get_settings().analytics_mirror_dir
+    if not root or duckdb is None:
+        return None
+    return _mirror_for(root)
+
+
+def mirror_rows(model: type, org_id: str, rows: Iterable[Any]) -> Optional[dict]:
+    """
+    Recopie dans le miroir des lignes venant d'être écrites par une sync (no-op si désactivé).
+    Le miroir est secondaire : une erreur est journalisée sans faire échouer la sync,
+    le job analytics_mirror permet de reconstruire la période.
+    """
+    mirror = get_mirror()
+    if mirror is None:
+        return None
+    try:
+        return mirror.append(model, org_id, rows)
+    except Exception as e:
+        logger.error(f"[ANALYTICS MIRROR] Échec de l'écriture de {model.__tablename__} (org {org_id}): {e}", exc_info=True)
+        return None
+
+
+def rebuild_mirror(db: SupabaseDB, mirror: AnalyticsMirror, org_id: str, first: date, last: date) -> dict:
+    """Recopie depuis Supabase les lignes des trois tables sur [first, last] (jours UTC), jour par jour."""
+    counts = {name: 0 for name in MIRRORED_TABLES}
+    day = first
+    while day <= last:
+        start = datetime.combine(day, datetime.min.time(), tzinfo=timezone.utc)
+        for name, table in MIRRORED_TABLES.items():
+            if table.is_timestamp:
+                bounds = (int(start.timestamp()), int((start + timedelta(days=1)).timestamp()))
+            else:
+                bounds = (day.isoformat(), (day + timedelta(days=1)).isoformat())
+            rows = db.fetch_rows(table.model, {"org_id": org_id}, ranges={table.partition_column: bounds})
+            counts[name] += mirror.append(table.model, org_id, rows)["rows"]
+        day += timedelta(days=1)
+    logger.info(f"[ANALYTICS MIRROR] Org {org_id}: miroir reconstruit du {first} au {last} ({counts})")
+    return counts
+
+
+def fleet_order_totals(mirror: AnalyticsMirror, org_id: str, start_ts: int, end_ts: int) -> list[dict]:
+    """Totaux des commandes Bolt par driver sur [start_ts, end_ts), calculés par DuckDB sur le miroir."""
+    return mirror.query(
+        f"""
+        SELECT
+            driver_uuid,
+            count(*) AS total_orders,
+            count(*) FILTER (WHERE {FINISHED_ORDER_SQL}) AS completed_orders,
+            count(*) FILTER (WHERE lower(order_status) LIKE '%cancel%') AS cancelled_orders,
+            round(coalesce(sum(ride_price), 0), 2) AS gross_earnings,
+            round(coalesce(sum(net_earnings), 0), 2) AS net_earnings,
+            round(coalesce(sum(commission), 0), 2) AS commission,
+            round(coalesce(sum(ride_distance), 0) / 1000, 3) AS distance_km
+        FROM bolt_orders
+        WHERE org_id = ? AND order_created_timestamp >= ? AND order_created_timestamp < ? AND driver_uuid IS NOT NULL
+        GROUP BY driver_uuid
+        ORDER BY net_earnings DESC, driver_uuid
+        """,
+        [org_id, start_ts, end_ts],
+    )
@@ -0,0 +1,295 @@
+"""
+Rollups incrémentaux des tables daily_analytics et user_analytics (supabase/analytics_and_users.sql).
+
+Après chaque sync, les cellules (plateforme, driver, jour) touchées par les lignes reçues sont
+recalculées en masse depuis les données sources, puis les lignes daily_analytics des jours
+concernés sont réagrégées depuis user_analytics. Les pages analytics lisent ainsi quelques
+centaines de lignes pré-agrégées au lieu de parcourir des mois de commandes.
+
+Mêmes règles que les fonctions SQL compute_user_analytics / compute_daily_analytics, avec :
+- des jours locaux (ANALYTICS_TIMEZONE) pour les commandes Bolt, par date de création ;
+- une distance en km (ride_distance est en mètres) ;
+- Heetch (earnings hebdomadaires par driver) rattaché au premier jour de la période, driver_uuid = email.
+
+Toutes les cellules des jours touchés sont recalculées (par plateforme) : celles qui n'ont plus
+de données sources (commandes supprimées ou réattribuées) sont supprimées de user_analytics.
+Les rollups d'une org sont sérialisés (bail "analytics_rollups") : les syncs de plusieurs
+companies en parallèle ne réécrivent pas daily_analytics à partir de lectures périmées.
+
+Les scores de performance (*_score) d'une cellule portent sur les SCORE_WINDOW_DAYS jours qui
+se terminent à son jour : une cellule touchée fait aussi recalculer les scores des cellules
+suivantes du même driver dans cette fenêtre.
+"""
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import Iterable, Optional
+
+from app.analytics.driver_activity import analytics_tz, day_bounds, local_day
+from app.analytics.scoring import SCORE_FIELDS, SCORE_WINDOW_DAYS, cell_features, is_finished_order, score_drivers
+from app.core import logging as app_logging
+from app.core.supabase_db import SupabaseDB
+from app.jobs.leases import serialized
+from app.models.analytics import DailyAnalytics, UserAnalytics
+from app.models.bolt_driver import BoltDriver
+from app.models.bolt_order import BoltOrder
+from app.models.bolt_vehicle import BoltVehicle
+from app.models.heetch_driver import HeetchDriver
+from app.models.heetch_earning import HeetchEarning
+
+logger = app_logging.get_logger(__name__)
+
+# (plateforme, driver_uuid, jour)
+Cell = tuple[str, str, date]
+
+# Fenêtre des drivers "connectés" (au moins une commande sur les N derniers jours)
+CONNECTED_WINDOW_DAYS = 30
+REBUILD_CHUNK_DAYS = 31
+USER_CONFLICT = ["org_id", "driver_uuid", "date"]
+DAILY_CONFLICT = ["org_id", "date"]
+
+
+def _cents(amount: float) -> int:
+    return int(round((amount or 0) * 100))
+
+
+def _day_runs(days: list[date]) -> list[tuple[date, date]]:
+    """Regroupe des jours triés en plages de jours consécutifs."""
+    runs: list[tuple[date, date]] = []
+    for day in days:
+        if runs and day == runs[-1][1] + timedelta(days=1):
+            runs[-1] = (runs[-1][0], day)
+        else:
+            runs.append((day, day))
+    return runs
+
+
+def bolt_order_cells(orders: Iterable[dict], cells: Optional[set[Cell]] = None) -> set[Cell]:
+    """Cellules touchées par des commandes Bolt (étend cells s'il est fourni)."""
+    cells = set() if cells is None else cells
+    tz = analytics_tz()
+    for order in orders:
+        if order.get("driver_uuid") and order.get("order_created_timestamp"):
+            cells.add(("bolt", order["driver_uuid"], local_day(int(order["order_created_timestamp"]), tz)))
+    return cells
+
+
+def _bolt_user_row(org_id: str, driver_uuid: str, day: date, orders: list[dict]) -> dict:
+    statuses = [(order.get("order_status") or "").lower() for order in orders]
+    time_hours = sum(
+        (order["order_drop_off_timestamp"] - order["order_pickup_timestamp"]) / 3600
+        for order in orders
+        if order.get("order_pickup_timestamp") and order.get("order_drop_off_timestamp")
+    )
+    net = _cents(sum(order.get("net_earnings") or 0 for order in orders))
+    return {
+        "org_id": org_id,
+        "driver_uuid": driver_uuid,
+        "date": day.isoformat(),
+        "platform": "bolt",
+        "total_orders": len(orders),
+        "completed_orders": sum(is_finished_order(status) for status in statuses),
+        "cancelled_orders": sum("cancel" in status for status in statuses),
+        "gross_earnings": _cents(sum(order.get("ride_price") or 0 for order in orders)),
+        "net_earnings": net,
+        "commission": _cents(sum(order.get("commission") or 0 for order in orders)),
+        "tips": _cents(sum(order.get("tip") or 0 for order in orders)),
+        "distance_km": round(sum(order.get("ride_distance") or 0 for order in orders) / 1000, 3),
+        "time_hours": round(time_hours, 4),
+        "trips_per_hour": round(len(orders) / time_hours, 4) if time_hours > 0 else 0,
+        "hourly_earning": int(net / time_hours) if time_hours > 0 else 0,
+    }
+
+
+def _heetch_user_row(org_id: str, driver_id: str, day: date, earning: dict) -> dict:
+    terminated = earning.get("terminated_rides") or 0
+    cancelled = earning.get("cancelled_rides") or 0
+    return {
+        "org_id": org_id,
+        "driver_uuid": driver_id,
+        "date": day.isoformat(),
+        "platform": "heetch",
+        "total_orders": terminated + cancelled,
+        "completed_orders": terminated,
+        "cancelled_orders": cancelled,
+        "gross_earnings": _cents(earning.get("gross_earnings")),
+        "net_earnings": _cents(earning.get("net_earnings")),
+        "commission": _cents((earning.get("cash_commission_fees") or 0) + (earning.get("card_commission_fees") or 0)),
+        "tips": 0,
+        "distance_km": 0,
+        "time_hours": 0,
+        "trips_per_hour": 0,
+        "hourly_earning": 0,
+    }
+
+
+def _daily_row(org_id: str, day: date, user_rows: list[dict], connected: set[str], plates: set[str], fleet: dict) -> dict:
+    breakdown: dict[str, dict] = {}
+    for row in user_rows:
+        platform = breakdown.setdefault(row.get("platform") or "bolt", {"orders": 0, "earnings": 0})
+        platform["orders"] += row["total_orders"] or 0
+        platform["earnings"] += row["net_earnings"] or 0
+
+    def total(key: str):
+        return sum(row[key] or 0 for row in user_rows)
+
+    return {
+        "org_id": org_id,
+        "date": day.isoformat(),
+        "total_drivers": fleet["drivers"],
+        "connected_drivers": len(connected),
+        "working_drivers": len({row["driver_uuid"] for row in user_rows if row["total_orders"]}),
+        "total_vehicles": fleet["vehicles"],
+        "active_vehicles": len(plates),
+        "total_orders": total("total_orders"),
+        "completed_orders": total("completed_orders"),
+        "cancelled_orders": total("cancelled_orders"),
+        "total_gross_earnings": total("gross_earnings"),
+        "total_net_earnings": total("net_earnings"),
+        "total_commission": total("commission"),
+        "total_tips": total("tips"),
+        "total_distance_km": round(total("distance_km"), 3),
+        "total_time_hours": round(total("time_hours"), 4),
+        "platform_breakdown": breakdown,
+    }
+
+
+def _rescore_cells(cells: set[Cell], by_day: dict[date, list[dict]]) -> list[dict]:
+    """
+    Scores des cellules dont la fenêtre glissante contient une cellule touchée, calculés jour
+    par jour pour tous les drivers concernés en une passe (score_drivers).
+    """
+    rescore: dict[date, set[tuple[str, str]]] = defaultdict(set)
+    for platform, driver_uuid, day in cells:
+        for offset in range(SCORE_WINDOW_DAYS):
+            rescore[day + timedelta(days=offset)].add((driver_uuid, platform))
+
+    scored = []
+    for day, keys in sorted(rescore.items()):
+        targets = [row for row in by_day.get(day, []) if (row["driver_uuid"], row.get("platform") or "bolt") in keys]
+        if not targets:
+            continue
+        window = [
+            row
+            for offset in range(SCORE_WINDOW_DAYS)
+            for row in by_day.get(day - timedelta(days=offset), [])
+            if (row["driver_uuid"], row.get("platform") or "bolt") in keys
+        ]
+        window_keys, features = cell_features(window)
+        scores = score_drivers(**features)
+        position = {key: i for i, key in enumerate(window_keys)}
+        for row in targets:
+            i = position[(row["driver_uuid"], row.get("platform") or "bolt")]
+            row.update({field: int(scores[field][i]) for field in SCORE_FIELDS})
+            scored.append(row)
+    return scored
+
+
+def refresh_analytics_rollups(db: SupabaseDB, org_id: str, cells: Iterable[Cell]) -> dict:
+    """
+    Recalcule les cellules user_analytics des jours touchés, puis les lignes daily_analytics de ces jours.
+
+    Returns:
+        dict avec cells (cellules recalculées), user_rows, deleted, scores et days (lignes écrites)
+    """
+    cells = set(cells)
+    if not cells:
+        return {"cells": 0, "user_rows": 0, "deleted": 0, "scores": 0, "days": 0}
+    with serialized(org_id, "analytics_rollups"):
+        return _refresh_rollups(db, org_id, cells)
+
+
+def _refresh_rollups(db: SupabaseDB, org_id: str, cells: set[Cell]) -> dict:
+    tz = analytics_tz()
+    filters = {"org_id": org_id}
+    days = sorted({day for _, _, day in cells})
+    computed_at = datetime.utcnow().isoformat()
+
+    # Commandes Bolt des jours touchés (tous drivers : véhicules actifs du jour), par plages de jours consécutifs
+    orders_by_cell: dict[Cell, list[dict]] = defaultdict(list)
+    plates_by_day: dict[date, set[str]] = defaultdict(set)
+    for first, last in _day_runs(days):
+        bounds = day_bounds(first, last, tz)
+        for order in db.fetch_rows(BoltOrder, filters, ranges={"order_created_timestamp": (int(bounds[0]), int(bounds[-1]))}):
+            day = local_day(int(order["order_created_timestamp"]), tz)
+            if order.get("vehicle_license_plate"):
+                plates_by_day[day].add(order["vehicle_license_plate"])
+            if order.get("driver_uuid"):
+                orders_by_cell[("bolt", order["driver_uuid"], day)].append(order)
+    cells |= set(orders_by_cell)
+
+    heetch_by_cell: dict[Cell, dict] = {}
+    heetch_days = {day for platform, _, day in cells if platform == "heetch"}
+    if heetch_days:
+        day_range = (min(heetch_days).isoformat(), (max(heetch_days) + timedelta(days=1)).isoformat())
+        for earning in db.fetch_rows(HeetchEarning, {**filters, "period": "weekly"}, ranges={"date": day_range}):
+            day = date.fromisoformat(str(earning["date"])[:10])
+            if day in heetch_days:
+                heetch_by_cell[("heetch", earning["driver_id"], day)] = earning
+        cells |= set(heetch_by_cell)
+
+    user_rows = []
+    for cell in cells:
+        platform, driver_uuid, day = cell
+        if platform == "bolt" and orders_by_cell.get(cell):
+            user_rows.append(_bolt_user_row(org_id, driver_uuid, day, orders_by_cell[cell]))
+        elif platform == "heetch" and cell in heetch_by_cell:
+            user_rows.append(_heetch_user_row(org_id, driver_uuid, day, heetch_by_cell[cell]))
+    written = db.bulk_upsert(UserAnalytics, [{**row, "computed_at": computed_at} for row in user_rows], on_conflict=USER_CONFLICT)
+
+    # Historique user_analytics autour des jours touchés : drivers connectés et fenêtres des scores
+    lookback = days[0] - timedelta(days=max(CONNECTED_WINDOW_DAYS, SCORE_WINDOW_DAYS) - 1)
+    lookahead = days[-1] + timedelta(days=SCORE_WINDOW_DAYS)
+    history = db.fetch_rows(UserAnalytics, filters, ranges={"date": (lookback.isoformat(), lookahead.isoformat())})
+    by_day: dict[date, list[dict]] = defaultdict(list)
+    stale_ids = []
+    for row in history:
+        day = date.fromisoformat(str(row["date"])[:10])
+        platform = row.get("platform") or "bolt"
+        recomputed_day = day in heetch_days if platform == "heetch" else day in days
+        if recomputed_day and (platform, row["driver_uuid"], day) not in orders_by_cell and (platform, row["driver_uuid"], day) not in heetch_by_cell:
+            # Plus aucune donnée source pour cette cellule d'un jour recalculé
+            stale_ids.append(row["id"])
+            cells.add((platform, row["driver_uuid"], day))
+            continue
+        by_day[day].append(row)
+    deleted = db.delete_rows(UserAnalytics, stale_ids)
+    scored = _rescore_cells(cells, by_day)
+    db.bulk_upsert(UserAnalytics, scored, on_conflict=USER_CONFLICT)
+    fleet = {
+        "drivers": db.count_rows(BoltDriver, filters) + db.count_rows(HeetchDriver, filters),
+        "vehicles": db.count_rows(BoltVehicle, filters),
+    }
+
+    daily_rows = []
+    for day in days:
+        connected = {
+            row["driver_uuid"]
+            for offset in range(CONNECTED_WINDOW_DAYS)
+            for row in by_day.get(day - timedelta(days=offset), [])
+            if row["total_orders"]
+        }
+        daily_rows.append({**_daily_row(org_id, day, by_day.get(day, []), connected, plates_by_day.get(day, set()), fleet), "computed_at": computed_at})
+    db.bulk_upsert(DailyAnalytics, daily_rows, on_conflict=DAILY_CONFLICT)
+
+    logger.info(f"[ANALYTICS ROLLUPS] org_id={org_id}: {len(cells)} cellule(s) recalculée(s), {written} ligne(s) user_analytics, {deleted} supprimée(s), {len(scored)} score(s), {len(daily_rows)} jour(s) daily_analytics")
+    return {"cells": len(cells), "user_rows": written, "deleted": deleted, "scores": len(scored), "days": len(daily_rows)}
+
+
+def rebuild_analytics_rollups(db: SupabaseDB, org_id: str, first_day: date, last_day: date) -> dict:
+    """Recalcule toutes les cellules d'une période (historique antérieur aux rollups), par passes de REBUILD_CHUNK_DAYS jours."""
+    tz = analytics_tz()
+    filters = {"org_id": org_id}
+    totals = {"cells": 0, "user_rows": 0, "deleted": 0, "scores": 0, "days": 0}
+    chunk_start = first_day
+    while chunk_start <= last_day:
+        chunk_end = min(chunk_start + timedelta(days=REBUILD_CHUNK_DAYS - 1), last_day)
+        bounds = day_bounds(chunk_start, chunk_end, tz)
+        orders = db.fetch_rows(BoltOrder, filters, ranges={"order_created_timestamp": (int(bounds[0]), int(bounds[-1]))})
+        cells = bolt_order_cells(orders)
+        day_range = (chunk_start.isoformat(), (chunk_end + timedelta(days=1)).isoformat())
+        for earning in db.fetch_rows(HeetchEarning, {**filters, "period": "weekly"}, ranges={"date": day_range}):
+            cells.add(("heetch", earning["driver_id"], date.fromisoformat(str(earning["date"])[:10])))
+        for key, value in refresh_analytics_rollups(db, org_id, cells).items():
+            totals[key] += value
+        chunk_start = chunk_end + timedelta(days=1)
+    return totals
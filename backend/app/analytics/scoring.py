@@ -0,0 +1,158 @@
+"""
+Scores de performance des drivers (revenu, efficacité, durabilité, global, 0-100), calculés
+pour toute la flotte en une passe vectorisée (numpy).
+
+Portage de frontend/src/utils/performanceCalculator.ts :
+- revenu : net moyen par course rapporté à TARGET_EARNINGS_PER_TRIP ;
+- efficacité : 60 % courses par heure de course (cible TARGET_TRIPS_PER_HOUR) + 40 % taux de complétion ;
+- durabilité : 70 % pénalité d'annulation (100 - 2 x taux d'annulation) + 30 % jours actifs (cible TARGET_ACTIVE_DAYS) ;
+- global : 40 % revenu + 30 % efficacité + 30 % durabilité.
+
+Les entrées sont des agrégats par driver, obtenus en groupant une seule fois soit les commandes
+(order_features), soit les cellules pré-agrégées de user_analytics (cell_features).
+"""
+from datetime import datetime
+from typing import Iterable, Optional
+from zoneinfo import ZoneInfo
+
+import numpy as np
+
+from app.analytics.driver_activity import analytics_tz
+
+TARGET_EARNINGS_PER_TRIP = 15.0
+TARGET_TRIPS_PER_HOUR = 2.0
+TARGET_ACTIVE_DAYS = 20
+# Fenêtre glissante des scores persistés dans user_analytics (jour de la cellule inclus)
+SCORE_WINDOW_DAYS = 30
+SCORE_FIELDS = ("income_score", "efficiency_score", "sustainability_score", "overall_score")
+# Commande terminée : statut contenant "finished" (même règle que performanceCalculator.ts)
+FINISHED_ORDER_SQL = "lower(order_status) LIKE '%finished%'"
+
+
+def is_finished_order(status: Optional[str]) -> bool:
+    """Commande terminée, même règle que FINISHED_ORDER_SQL (cellules, scores et miroir DuckDB)."""
+    return "finished" in (status or "").lower()
+
+
+def _js_round(values: np.ndarray) -> np.ndarray:
+    """Math.round de JavaScript (demi vers +inf), np.round arrondissant au pair."""
+    return np.floor(values + 0.5).astype(np.int64)
+
+
+def score_drivers(
+    net_earnings: np.ndarray,
+    trips: np.ndarray,
+    time_hours: np.ndarray,
+    completed: np.ndarray,
+    active_days: np.ndarray,
+) -> dict[str, np.ndarray]:
+    """
+    Scores de tous les drivers en une passe (un élément par driver).
+
+    Args:
+        net_earnings: revenus nets totaux (euros)
+        trips: nombre de commandes (toutes, annulées comprises)
+        time_hours: heures de course (somme drop_off - pickup)
+        completed: commandes terminées
+        active_days: jours distincts avec au moins une commande
+    """
+    trips = np.asarray(trips, dtype=np.float64)
+    has_trips = trips > 0
+    safe_trips = np.where(has_trips, trips, 1)
+    time_hours = np.asarray(time_hours, dtype=np.float64)
+
+    income = np.clip(np.asarray(net_earnings) / safe_trips / TARGET_EARNINGS_PER_TRIP * 100, 0, 100)
+
+    trips_per_hour = np.where(time_hours > 0, trips / np.where(time_hours > 0, time_hours, 1), 0)
+    completion_rate = np.asarray(completed) / safe_trips * 100
+    efficiency = np.minimum(100, trips_per_hour / TARGET_TRIPS_PER_HOUR * 100) * 0.6 + completion_rate * 0.4
+
+    cancellation_rate = (trips - np.asarray(completed)) / safe_trips * 100
+    sustainability = (
+        np.maximum(0, 100 - cancellation_rate * 2) * 0.7
+        + np.minimum(100, np.asarray(active_days) / TARGET_ACTIVE_DAYS * 100) * 0.3
+    )
+
+    overall = income * 0.4 + efficiency * 0.3 + sustainability * 0.3
+    # Driver sans commande : tous les scores à 0
+    return {
+        field: np.where(has_trips, _js_round(values), 0)
+        for field, values in zip(SCORE_FIELDS, (income, efficiency, sustainability, overall))
+    }
+
+
+def order_features(orders: list[dict], tz: Optional[ZoneInfo] = None) -> tuple[list[str], dict[str, np.ndarray]]:
+    """Groupe les commandes Bolt une seule fois par driver ; retourne (drivers, agrégats)."""
+    tz = tz or analytics_tz()
+    orders = [order for order in orders if order.get("driver_uuid")]
+    if not orders:
+        return [], {}
+    drivers, index = np.unique(np.array([order["driver_uuid"] for order in orders]), return_inverse=True)
+    size = len(drivers)
+
+    def column(key: str) -> np.ndarray:
+        return np.array([order.get(key) or 0 for order in orders], dtype=np.float64)
+
+    pickup, drop_off = column("order_pickup_timestamp"), column("order_drop_off_timestamp")
+    on_trip = np.where((pickup > 0) & (drop_off > 0), drop_off - pickup, 0) / 3600
+    completed = np.array([is_finished_order(order.get("order_status")) for order in orders], dtype=np.float64)
+
+    # Jours actifs : couples (driver, jour de création) distincts
+    days = [
+        (i, datetime.fromtimestamp(order["order_created_timestamp"], tz).date())
+        for i, order in zip(index, orders)
+        if order.get("order_created_timestamp")
+    ]
+    active_days = np.bincount(np.array([i for i, _ in set(days)], dtype=np.int64), minlength=size)
+
+    return list(drivers), {
+        "net_earnings": np.bincount(index, weights=column("net_earnings"), minlength=size),
+        "trips": np.bincount(index, minlength=size).astype(np.float64),
+        "time_hours": np.bincount(index, weights=on_trip, minlength=size),
+        "completed": np.bincount(index, weights=completed, minlength=size),
+        "active_days": active_days,
+    }
+
+
+def cell_features(rows: Iterable[dict]) -> tuple[list[tuple[str, str]], dict[str, np.ndarray]]:
+    """
+    Groupe des cellules user_analytics (montants en centimes) par (driver, plateforme) ;
+    retourne (clés, agrégats) au format de score_drivers.
+    """
+    rows = list(rows)
+    if not rows:
+        return [], {}
+    keys = [(row["driver_uuid"], row.get("platform") or "bolt") for row in rows]
+    unique_keys = sorted(set(keys))
+    position = {key: i for i, key in enumerate(unique_keys)}
+    index = np.array([position[key] for key in keys], dtype=np.int64)
+    size = len(unique_keys)
+
+    def total(field: str) -> np.ndarray:
+        return np.bincount(index, weights=np.array([row.get(field) or 0 for row in rows], dtype=np.float64), minlength=size)
+
+    trips = total("total_orders")
+    active = np.array([(row.get("total_orders") or 0) > 0 for row in rows], dtype=np.float64)
+    return unique_keys, {
+        "net_earnings": total("net_earnings") / 100,
+        "trips": trips,
+        "time_hours": total("time_hours"),
+        "completed": total("completed_orders"),
+        "active_days": np.bincount(index, weights=active, minlength=size),
+    }
+
+
+def percentile_ranks(scores: np.ndarray) -> np.ndarray:
+    """Percentile de chaque score : part des drivers ayant un score inférieur ou égal, en %."""
+    scores = np.asarray(scores)
+    if not len(scores):
+        return np.zeros(0)
+    ordered = np.sort(scores)
+    return np.searchsorted(ordered, scores, side="right") / len(scores) * 100
+
+
+def competition_ranks(scores: np.ndarray) -> np.ndarray:
+    """Rang 1 = meilleur score ; ex aequo au même rang (1, 2, 2, 4)."""
+    scores = np.asarray(scores)
+    ordered = np.sort(scores)
+    return len(scores) - np.searchsorted(ordered, scores, side="right") + 1
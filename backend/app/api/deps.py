@@ -1,6 +1,7 @@
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 
+from app.core.auth_cache import token_cache
 from app.core.config import get_settings
 from app.core.security import decode_token
 
@@ -17,12 +18,17 @@ def get_current_user(token: str | None = Depends(oauth2_scheme)) -> dict:
             detail="Not authenticated",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    payload = decode_token(token)
-    user = {
-        "email": payload.get("sub"),
-        "org_id": payload.get("org_id") or settings.uber_default_org_id or "default_org",
-    }
-    if not user["email"]:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
-    return user
+    # Token déjà vérifié et non expiré : ni décodage ni vérification de signature
+    user = token_cache.get(token)
+    if user is None:
+        payload = decode_token(token)
+        user = {
+            "email": payload.get("sub"),
+            "org_id": payload.get("org_id") or settings.uber_default_org_id or "default_org",
+        }
+        if not user["email"]:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
+        token_cache.put(token, user, payload.get("exp"))
+    # Copie : l'entrée en cache est partagée entre les requêtes
+    return dict(user)
 
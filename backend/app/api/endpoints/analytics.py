@@ -0,0 +1,212 @@
+from datetime import date, timedelta
+from typing import Literal
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+
+from app.analytics.mirror import fleet_order_totals, get_mirror
+from app.analytics.scoring import cell_features, competition_ranks, percentile_ranks, score_drivers
+from app.api.deps import get_current_user
+from app.core.db import get_db
+from app.core.exports import utc_day_range
+from app.core.supabase_db import SupabaseDB
+from app.jobs.job_queue import enqueue_job
+from app.models.analytics import DailyAnalytics, UserAnalytics
+from app.schemas.analytics import DailyAnalyticsSchema, LeaderboardSchema, UserAnalyticsSchema, UserAnalyticsSummarySchema
+
+router = APIRouter(prefix="/analytics", tags=["analytics"])
+
+SUMMED_FIELDS = ("total_orders", "completed_orders", "cancelled_orders", "gross_earnings", "net_earnings", "commission", "tips", "distance_km", "time_hours")
+
+
+def summarize_user_analytics(rows: list) -> list[dict]:
+    """Agrège les lignes user_analytics par (driver, plateforme) ; les ratios sont recalculés sur les totaux."""
+    by_driver: dict[tuple, dict] = {}
+    for row in rows:
+        totals = by_driver.setdefault((row.driver_uuid, row.platform), {"days": 0, **{field: 0 for field in SUMMED_FIELDS}})
+        totals["days"] += 1
+        for field in SUMMED_FIELDS:
+            totals[field] += getattr(row, field) or 0
+
+    summaries = []
+    for (driver_uuid, platform), totals in by_driver.items():
+        time_hours = totals["time_hours"]
+        summaries.append({
+            "driver_uuid": driver_uuid,
+            "platform": platform,
+            **totals,
+            "distance_km": round(totals["distance_km"], 3),
+            "time_hours": round(time_hours, 4),
+            "trips_per_hour": round(totals["total_orders"] / time_hours, 4) if time_hours > 0 else 0,
+            "hourly_earning": int(totals["net_earnings"] / time_hours) if time_hours > 0 else 0,
+        })
+    return sorted(summaries, key=lambda summary: summary["net_earnings"], reverse=True)
+
+
+@router.get("/daily", response_model=list[DailyAnalyticsSchema])
+def list_daily_analytics(
+    current_user: dict = Depends(get_current_user),
+    db: SupabaseDB = Depends(get_db),
+    start: date = Query(..., alias="from"),
+    end: date = Query(..., alias="to"),
+):
+    """Agrégats quotidiens de l'org (rollups daily_analytics, montants en centimes), du plus ancien au plus récent."""
+    return (
+        db.query(DailyAnalytics)
+        .filter(DailyAnalytics.org_id == current_user["org_id"])
+        .filter(DailyAnalytics.date >= start.isoformat())
+        .filter(DailyAnalytics.date <= end.isoformat())
+        .order_by(DailyAnalytics.date)
+        .all()
+    )
+
+
+def _user_analytics_query(db: SupabaseDB, org_id: str, start: date, end: date, driver_uuid: str | None, platform: str | None):
+    query = (
+        db.query(UserAnalytics)
+        .filter(UserAnalytics.org_id == org_id)
+        .filter(UserAnalytics.date >= start.isoformat())
+        .filter(UserAnalytics.date <= end.isoformat())
+    )
+    if driver_uuid:
+        query = query.filter(UserAnalytics.driver_uuid == driver_uuid)
+    if platform:
+        query = query.filter(UserAnalytics.platform == platform)
+    return query
+
+
+@router.get("/drivers", response_model=list[UserAnalyticsSchema])
+def list_user_analytics(
+    current_user: dict = Depends(get_current_user),
+    db: SupabaseDB = Depends(get_db),
+    start: date = Query(..., alias="from"),
+    end: date = Query(..., alias="to"),
+    driver_uuid: str | None = Query(None, description="Filtrer par driver (UUID Bolt ou email Heetch)"),
+    platform: str | None = Query(None, description="Filtrer par plateforme (bolt, heetch)"),
+):
+    """Agrégats quotidiens par driver (rollups user_analytics, montants en centimes)."""
+    query = _user_analytics_query(db, current_user["org_id"], start, end, driver_uuid, platform)
+    return query.order_by(UserAnalytics.date).all()
+
+
+@router.get("/drivers/summary", response_model=list[UserAnalyticsSummarySchema])
+def summarize_drivers(
+    current_user: dict = Depends(get_current_user),
+    db: SupabaseDB = Depends(get_db),
+    start: date = Query(..., alias="from"),
+    end: date = Query(..., alias="to"),
+    platform: str | None = Query(None, description="Filtrer par plateforme (bolt, heetch)"),
+):
+    """Totaux par driver et plateforme sur la période, triés par revenus nets décroissants."""
+    return summarize_user_analytics(_user_analytics_query(db, current_user["org_id"], start, end, None, platform).all())
+
+
+def build_leaderboard(rows: list[dict], sort: str, offset: int, limit: int) -> dict:
+    """Scores de tous les drivers en une passe depuis les cellules user_analytics, puis classement par sort."""
+    keys, features = cell_features(rows)
+    if not keys:
+        return {"total": 0, "offset": offset, "limit": limit, "sort": sort, "items": []}
+    scores = score_drivers(**features)
+    ranks = competition_ranks(scores[sort])
+    percentiles = percentile_ranks(scores[sort])
+    # Score décroissant, puis score global, puis driver pour un ordre stable entre les pages
+    order = sorted(range(len(keys)), key=lambda i: (-scores[sort][i], -scores["overall_score"][i], keys[i]))
+    items = [
+        {
+            "rank": int(ranks[i]),
+            "percentile": round(float(percentiles[i]), 1),
+            "driver_uuid": keys[i][0],
+            "platform": keys[i][1],
+            **{field: int(values[i]) for field, values in scores.items()},
+            "trips": int(features["trips"][i]),
+            "net_earnings": round(float(features["net_earnings"][i]), 2),
+            "active_days": int(features["active_days"][i]),
+        }
+        for i in order[offset:offset + limit]
+    ]
+    return {"total": len(keys), "offset": offset, "limit": limit, "sort": sort, "items": items}
+
+
+@router.get("/leaderboard", response_model=LeaderboardSchema)
+def get_leaderboard(
+    current_user: dict = Depends(get_current_user),
+    db: SupabaseDB = Depends(get_db),
+    start: date = Query(..., alias="from"),
+    end: date = Query(..., alias="to"),
+    platform: str | None = Query("bolt", description="Plateforme (bolt, heetch) ; vide pour toutes"),
+    sort: Literal["overall_score", "income_score", "efficiency_score", "sustainability_score"] = Query("overall_score"),
+    limit: int = Query(20, ge=1, le=500, description="Taille de page (top-k pour offset=0)"),
+    offset: int = Query(0, ge=0),
+):
+    """
+    Classement des drivers sur la période : scores de performance (règles de performanceCalculator),
+    rang et percentile, calculés pour toute la flotte depuis les rollups user_analytics.
+    """
+    filters = {"org_id": current_user["org_id"]}
+    if platform:
+        filters["platform"] = platform
+    rows = db.fetch_rows(UserAnalytics, filters, ranges={"date": (start.isoformat(), (end + timedelta(days=1)).isoformat())})
+    return build_leaderboard(rows, sort, offset, limit)
+
+
+@router.post("/rebuild")
+def rebuild_analytics(
+    current_user: dict = Depends(get_current_user),
+    start: date = Query(..., alias="from"),
+    end: date = Query(..., alias="to"),
+):
+    """
+    Recalcule en arrière-plan les rollups de la période depuis les commandes Bolt et les earnings Heetch
+    (le recalcul est sinon automatique pour les cellules touchées par chaque sync).
+    """
+    if end < start:
+        raise HTTPException(status_code=400, detail="La date de fin doit être postérieure à la date de début")
+    job, created = enqueue_job("analytics_rollups", current_user["org_id"], {"from": start.isoformat(), "to": end.isoformat()})
+    return {
+        "status": "queued",
+        "job_id": job.id,
+        "job_status": job.status,
+        "created": created,
+        "job_url": f"/sync/jobs/{job.id}",
+    }
+
+
+def _require_mirror():
+    mirror = get_mirror()
+    if mirror is None:
+        raise HTTPException(status_code=503, detail="Miroir analytique désactivé (ANALYTICS_MIRROR_DIR vide ou duckdb non installé)")
+    return mirror
+
+
+@router.get("/mirror/orders")
+def mirror_order_totals(
+    current_user: dict = Depends(get_current_user),
+    start: date = Query(..., alias="from"),
+    end: date = Query(..., alias="to"),
+):
+    """
+    Totaux des commandes Bolt par driver sur la période (jours UTC), calculés localement par DuckDB
+    sur le miroir Parquet, sans requête Supabase.
+    """
+    mirror = _require_mirror()
+    start_ts, end_ts = utc_day_range(start, end)
+    return fleet_order_totals(mirror, current_user["org_id"], start_ts, end_ts)
+
+
+@router.post("/mirror/rebuild")
+def rebuild_mirror(
+    current_user: dict = Depends(get_current_user),
+    start: date = Query(..., alias="from"),
+    end: date = Query(..., alias="to"),
+):
+    """Recopie en arrière-plan la période depuis Supabase dans le miroir (historique antérieur au miroir)."""
+    _require_mirror()
+    if end < start:
+        raise HTTPException(status_code=400, detail="La date de fin doit être postérieure à la date de début")
+    job, created = enqueue_job("analytics_mirror", current_user["org_id"], {"from": start.isoformat(), "to": end.isoformat()})
+    return {
+        "status": "queued",
+        "job_id": job.id,
+        "job_status": job.status,
+        "created": created,
+        "job_url": f"/sync/jobs/{job.id}",
+    }
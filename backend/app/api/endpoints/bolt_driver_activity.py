@@ -0,0 +1,113 @@
+from datetime import date, timedelta
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+
+from app.analytics.driver_activity import analytics_tz, day_bounds
+from app.api.deps import get_current_user
+from app.core.db import get_db
+from app.core.supabase_db import SupabaseDB
+from app.jobs.job_queue import enqueue_job
+from app.models.bolt_driver_activity import BoltDriverActivityDaily
+from app.schemas.bolt_driver_activity import BoltDriverActivityDailySchema, BoltDriverActivitySummarySchema
+
+router = APIRouter(prefix="/bolt", tags=["bolt"])
+
+
+def _activity_query(db: SupabaseDB, org_id: str, start: date, end: date, driver_uuid: str | None):
+    query = (
+        db.query(BoltDriverActivityDaily)
+        .filter(BoltDriverActivityDaily.org_id == org_id)
+        .filter(BoltDriverActivityDaily.day >= start.isoformat())
+        .filter(BoltDriverActivityDaily.day <= end.isoformat())
+    )
+    if driver_uuid:
+        query = query.filter(BoltDriverActivityDaily.driver_uuid == driver_uuid)
+    return query
+
+
+def summarize_activity(days: list) -> list[dict]:
+    """Agrège les jours d'activité par driver ; les ratios sont recalculés sur les totaux."""
+    by_driver: dict[str, dict] = {}
+    for day in days:
+        totals = by_driver.setdefault(day.driver_uuid, {
+            "days": 0, "online_seconds": 0, "busy_seconds": 0, "waiting_seconds": 0, "idle_gap_seconds": 0,
+            "on_trip_seconds": 0, "trips": 0, "gross_earnings": 0.0, "net_earnings": 0.0, "distance_km": 0.0,
+        })
+        totals["days"] += 1
+        for key in ("online_seconds", "busy_seconds", "waiting_seconds", "idle_gap_seconds", "on_trip_seconds", "trips",
+                    "gross_earnings", "net_earnings", "distance_km"):
+            totals[key] += getattr(day, key) or 0
+
+    summaries = []
+    for driver_uuid, totals in by_driver.items():
+        online_hours = totals["online_seconds"] / 3600
+        summaries.append({
+            "driver_uuid": driver_uuid,
+            "days": totals["days"],
+            "online_hours": round(online_hours, 2),
+            "busy_hours": round(totals["busy_seconds"] / 3600, 2),
+            "waiting_hours": round(totals["waiting_seconds"] / 3600, 2),
+            "idle_gap_hours": round(totals["idle_gap_seconds"] / 3600, 2),
+            "on_trip_hours": round(totals["on_trip_seconds"] / 3600, 2),
+            "trips": totals["trips"],
+            "gross_earnings": round(totals["gross_earnings"], 2),
+            "net_earnings": round(totals["net_earnings"], 2),
+            "distance_km": round(totals["distance_km"], 3),
+            "utilisation": round(totals["busy_seconds"] / totals["online_seconds"] * 100, 2) if online_hours else 0.0,
+            "trips_per_online_hour": round(totals["trips"] / online_hours, 3) if online_hours else 0.0,
+            "earnings_per_online_hour": round(totals["net_earnings"] / online_hours, 2) if online_hours else 0.0,
+        })
+    return sorted(summaries, key=lambda summary: summary["online_hours"], reverse=True)
+
+
+@router.get("/driver-activity", response_model=list[BoltDriverActivityDailySchema])
+def list_driver_activity(
+    current_user: dict = Depends(get_current_user),
+    db: SupabaseDB = Depends(get_db),
+    start: date = Query(..., alias="from"),
+    end: date = Query(..., alias="to"),
+    driver_uuid: str | None = Query(None, description="Filtrer par driver UUID"),
+):
+    """
+    Activité quotidienne précalculée des drivers Bolt (jours locaux, ANALYTICS_TIMEZONE) :
+    temps en ligne / en course / en attente, pauses, courses, revenus et ratios par heure en ligne.
+    """
+    query = _activity_query(db, current_user["org_id"], start, end, driver_uuid)
+    return query.order_by(BoltDriverActivityDaily.day).all()
+
+
+@router.get("/driver-activity/summary", response_model=list[BoltDriverActivitySummarySchema])
+def summarize_driver_activity(
+    current_user: dict = Depends(get_current_user),
+    db: SupabaseDB = Depends(get_db),
+    start: date = Query(..., alias="from"),
+    end: date = Query(..., alias="to"),
+    driver_uuid: str | None = Query(None, description="Filtrer par driver UUID"),
+):
+    """Activité agrégée par driver sur la période, triée par heures en ligne décroissantes."""
+    return summarize_activity(_activity_query(db, current_user["org_id"], start, end, driver_uuid).all())
+
+
+@router.post("/driver-activity/rebuild")
+def rebuild_driver_activity(
+    current_user: dict = Depends(get_current_user),
+    start: date = Query(..., alias="from"),
+    end: date = Query(..., alias="to"),
+):
+    """
+    Recalcule en arrière-plan l'activité de la période depuis les intervalles d'état et les commandes
+    (le recalcul est sinon automatique pour les jours touchés par chaque sync).
+    """
+    if end < start:
+        raise HTTPException(status_code=400, detail="La date de fin doit être postérieure à la date de début")
+    bounds = day_bounds(start, end, analytics_tz())
+    params = {"start_ts": int(bounds[0]), "end_ts": int(bounds[-1]) - 1}
+    job, created = enqueue_job("bolt_driver_activity", current_user["org_id"], params)
+    return {
+        "status": "queued",
+        "job_id": job.id,
+        "job_status": job.status,
+        "created": created,
+        "job_url": f"/sync/jobs/{job.id}",
+        "days": (end - start + timedelta(days=1)).days,
+    }
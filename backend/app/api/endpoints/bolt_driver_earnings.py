@@ -1,7 +1,7 @@
-from datetime import datetime
-from typing import Optional
+from datetime import datetime, timedelta
+from typing import Iterable, Optional
 
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, HTTPException, Query
 
 from app.api.deps import get_current_user
 from app.core.db import get_db
@@ -13,6 +13,81 @@ from app.schemas.bolt_driver_earnings import BoltDriverEarningsSchema
 router = APIRouter(prefix="/bolt", tags=["bolt"])
 
 
+# Colonnes de bolt_orders sommées par driver -> champ de BoltDriverEarningsSchema
+EARNINGS_SUMS = {
+    "net_earnings": "total_net_earnings",
+    "ride_price": "total_ride_price",
+    "booking_fee": "total_booking_fee",
+    "toll_fee": "total_toll_fee",
+    "tip": "total_tip",
+    "cancellation_fee": "total_cancellation_fee",
+    "commission": "total_commission",
+    "cash_discount": "total_cash_discount",
+    "in_app_discount": "total_in_app_discount",
+    "ride_distance": "total_distance",
+}
+EARNINGS_COLUMNS = ["driver_uuid", "driver_name", "order_status", *EARNINGS_SUMS]
+
+
+def _period(start: Optional[datetime], end: Optional[datetime]) -> tuple[datetime, datetime]:
+    # Par défaut, les 30 derniers jours
+    end = end or datetime.utcnow()
+    return start or end - timedelta(days=30), end
+
+
+def accumulate_driver_earnings(orders: Iterable[dict]) -> dict[str, dict]:
+    """Un seul passage sur les commandes : compteurs et sommes de tous les drivers à la fois."""
+    totals: dict[str, dict] = {}
+    for order in orders:
+        driver_uuid = order.get("driver_uuid")
+        if not driver_uuid:
+            continue
+        acc = totals.get(driver_uuid)
+        if acc is None:
+            acc = totals[driver_uuid] = {
+                "driver_name": None, "total_orders": 0, "completed_orders": 0, "cancelled_orders": 0,
+                **{field: 0.0 for field in EARNINGS_SUMS.values()},
+            }
+        acc["total_orders"] += 1
+        status = (order.get("order_status") or "").lower()
+        if "finished" in status:
+            acc["completed_orders"] += 1
+        if "cancel" in status:
+            acc["cancelled_orders"] += 1
+        for column, field in EARNINGS_SUMS.items():
+            acc[field] += order.get(column) or 0
+        if not acc["driver_name"]:
+            acc["driver_name"] = order.get("driver_name")
+    return totals
+
+
+def build_earnings(driver_uuid: str, org_id: str, acc: Optional[dict], driver_name: Optional[str],
+                   start: datetime, end: datetime) -> BoltDriverEarningsSchema:
+    """BoltDriverEarningsSchema depuis les totaux accumulés (None : aucune commande sur la période)."""
+    acc = acc or {}
+    total_orders = acc.get("total_orders", 0)
+    return BoltDriverEarningsSchema(
+        driver_uuid=driver_uuid,
+        # Nom du driver depuis les orders (ou depuis la table drivers)
+        driver_name=acc.get("driver_name") or driver_name,
+        org_id=org_id,
+        total_orders=total_orders,
+        completed_orders=acc.get("completed_orders", 0),
+        cancelled_orders=acc.get("cancelled_orders", 0),
+        **{field: round(acc.get(field, 0.0), 2) for field in EARNINGS_SUMS.values()},
+        average_order_value=round(acc["total_ride_price"] / total_orders, 2) if total_orders else 0.0,
+        average_net_earnings_per_order=round(acc["total_net_earnings"] / total_orders, 2) if total_orders else 0.0,
+        period_start=start,
+        period_end=end,
+        currency="EUR",
+    )
+
+
+def _full_name(driver) -> Optional[str]:
+    first_name, last_name = (driver.get("first_name"), driver.get("last_name")) if isinstance(driver, dict) else (driver.first_name, driver.last_name)
+    return f"{first_name or ''} {last_name or ''}".strip() or None
+
+
 @router.get("/drivers/{driver_id}/earnings", response_model=BoltDriverEarningsSchema)
 def get_bolt_driver_earnings(
     driver_id: str,
@@ -32,80 +107,47 @@ def get_bolt_driver_earnings(
     ).first()
     
     if not driver:
-        from fastapi import HTTPException
         raise HTTPException(status_code=404, detail="Driver not found")
     
-    # Par défaut, les 30 derniers jours
-    if not end:
-        end = datetime.utcnow()
-    if not start:
-        from datetime import timedelta
-        start = end - timedelta(days=30)
-    
-    start_ts = int(start.timestamp())
-    end_ts = int(end.timestamp())
-    
-    # Récupérer tous les orders du driver pour cette période
-    orders = db.query(BoltOrder).filter(
-        BoltOrder.org_id == current_user["org_id"],
-        BoltOrder.driver_uuid == driver_id,
-        BoltOrder.order_created_timestamp >= start_ts,
-        BoltOrder.order_created_timestamp <= end_ts
-    ).all()
-    
-    # Calculer les statistiques
-    total_orders = len(orders)
-    completed_orders = sum(1 for o in orders if o.order_status and "finished" in o.order_status.lower())
-    cancelled_orders = sum(1 for o in orders if o.order_status and "cancel" in o.order_status.lower())
-    
-    # Revenus
-    total_net_earnings = sum(o.net_earnings or 0 for o in orders)
-    total_ride_price = sum(o.ride_price or 0 for o in orders)
-    total_booking_fee = sum(o.booking_fee or 0 for o in orders)
-    total_toll_fee = sum(o.toll_fee or 0 for o in orders)
-    total_tip = sum(o.tip or 0 for o in orders)
-    total_cancellation_fee = sum(o.cancellation_fee or 0 for o in orders)
-    
-    # Dépenses/déductions
-    total_commission = sum(o.commission or 0 for o in orders)
-    total_cash_discount = sum(o.cash_discount or 0 for o in orders)
-    total_in_app_discount = sum(o.in_app_discount or 0 for o in orders)
-    
-    # Métriques
-    total_distance = sum(o.ride_distance or 0 for o in orders)
-    average_order_value = total_ride_price / total_orders if total_orders > 0 else 0.0
-    average_net_earnings_per_order = total_net_earnings / total_orders if total_orders > 0 else 0.0
-    
-    # Nom du driver depuis les orders (ou depuis la table drivers)
-    driver_name = None
-    if orders:
-        driver_name = orders[0].driver_name
-    if not driver_name:
-        driver_name = f"{driver.first_name} {driver.last_name}".strip() if driver.first_name or driver.last_name else None
-    
-    return BoltDriverEarningsSchema(
-        driver_uuid=driver_id,
-        driver_name=driver_name,
-        org_id=current_user["org_id"],
-        total_orders=total_orders,
-        completed_orders=completed_orders,
-        cancelled_orders=cancelled_orders,
-        total_net_earnings=round(total_net_earnings, 2),
-        total_ride_price=round(total_ride_price, 2),
-        total_booking_fee=round(total_booking_fee, 2),
-        total_toll_fee=round(total_toll_fee, 2),
-        total_tip=round(total_tip, 2),
-        total_cancellation_fee=round(total_cancellation_fee, 2),
-        total_commission=round(total_commission, 2),
-        total_cash_discount=round(total_cash_discount, 2),
-        total_in_app_discount=round(total_in_app_discount, 2),
-        total_distance=round(total_distance, 2),
-        average_order_value=round(average_order_value, 2),
-        average_net_earnings_per_order=round(average_net_earnings_per_order, 2),
-        period_start=start,
-        period_end=end,
-        currency="EUR",
+    start, end = _period(start, end)
+    orders = db.fetch_rows(
+        BoltOrder,
+        {"org_id": current_user["org_id"], "driver_uuid": driver_id},
+        ranges={"order_created_timestamp": (int(start.timestamp()), int(end.timestamp()) + 1)},
+        columns=EARNINGS_COLUMNS,
     )
+    totals = accumulate_driver_earnings(orders)
+    return build_earnings(driver_id, current_user["org_id"], totals.get(driver_id), _full_name(driver), start, end)
+
+
+@router.get("/earnings/summary", response_model=list[BoltDriverEarningsSchema])
+def get_bolt_earnings_summary(
+    current_user: dict = Depends(get_current_user),
+    db: SupabaseDB = Depends(get_db),
+    start: Optional[datetime] = Query(None, alias="from", description="Date de début (ISO 8601)"),
+    end: Optional[datetime] = Query(None, alias="to", description="Date de fin (ISO 8601)"),
+):
+    """
+    Revenus agrégés de tous les drivers de l'org en une requête (tableau de flotte) :
+    une lecture paginée des commandes de la période, accumulée en un seul passage.
+    Les drivers sans commande sont inclus à zéro ; tri par revenus nets décroissants.
+    """
+    org_id = current_user["org_id"]
+    start, end = _period(start, end)
+    orders = db.fetch_rows(
+        BoltOrder,
+        {"org_id": org_id},
+        ranges={"order_created_timestamp": (int(start.timestamp()), int(end.timestamp()) + 1)},
+        columns=EARNINGS_COLUMNS,
+    )
+    totals = accumulate_driver_earnings(orders)
+    names = {driver["id"]: _full_name(driver) for driver in db.fetch_rows(BoltDriver, {"org_id": org_id}, columns=["id", "first_name", "last_name"])}
+
+    summaries = [
+        build_earnings(driver_uuid, org_id, totals.get(driver_uuid), names.get(driver_uuid), start, end)
+        for driver_uuid in names.keys() | totals.keys()
+    ]
+    return sorted(summaries, key=lambda summary: (-summary.total_net_earnings, summary.driver_uuid))
 
 
 @router.get("/drivers/{driver_id}/orders/stats")
@@ -120,13 +162,7 @@ def get_bolt_driver_orders_stats(
     Retourne des statistiques détaillées sur les orders d'un driver.
     Version simplifiée avec juste les compteurs.
     """
-    # Par défaut, les 30 derniers jours
-    if not end:
-        end = datetime.utcnow()
-    if not start:
-        from datetime import timedelta
-        start = end - timedelta(days=30)
-    
+    start, end = _period(start, end)
     start_ts = int(start.timestamp())
     end_ts = int(end.timestamp())
     
@@ -1,6 +1,7 @@
 from fastapi import APIRouter, Depends, Query
 
 from app.api.deps import get_current_user
+from app.api.http_cache import conditional_get
 from app.core.db import get_db
 from app.core.supabase_db import SupabaseDB
 from app.models.bolt_driver import BoltDriver
@@ -9,7 +10,7 @@ from app.schemas.bolt_driver import BoltDriverSchema
 router = APIRouter(prefix="/bolt", tags=["bolt"])
 
 
-@router.get("/drivers", response_model=list[BoltDriverSchema])
+@router.get("/drivers", response_model=list[BoltDriverSchema], dependencies=[Depends(conditional_get("bolt_drivers"))])
 def list_bolt_drivers(
     current_user: dict = Depends(get_current_user),
     db: SupabaseDB = Depends(get_db),
@@ -25,7 +26,7 @@ def list_bolt_drivers(
     )
 
 
-@router.get("/drivers/{driver_id}", response_model=BoltDriverSchema | None)
+@router.get("/drivers/{driver_id}", response_model=BoltDriverSchema | None, dependencies=[Depends(conditional_get("bolt_drivers"))])
 def get_bolt_driver(driver_id: str, current_user: dict = Depends(get_current_user), db: SupabaseDB = Depends(get_db)):
     return (
         db.query(BoltDriver)
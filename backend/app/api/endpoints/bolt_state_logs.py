@@ -1,11 +1,16 @@
-from datetime import datetime
+from datetime import date, datetime
+from typing import Literal
 
 from fastapi import APIRouter, Depends, Query
 
 from app.api.deps import get_current_user
+from app.api.responses import trusted_response
 from app.core.db import get_db
+from app.core.exports import export_columns, export_response, utc_day_range
 from app.core.supabase_db import SupabaseDB
+from app.models.bolt_state_interval import BoltStateInterval
 from app.models.bolt_state_log import BoltStateLog
+from app.schemas.bolt_state_interval import BoltStateIntervalSchema
 from app.schemas.bolt_state_log import BoltStateLogSchema
 
 router = APIRouter(prefix="/bolt", tags=["bolt"])
@@ -63,14 +68,14 @@ def list_bolt_state_logs(
         .order_by(BoltStateLog.created.desc())
     )
     
-    results = query.all()
+    results = query.rows()
     logger.info(f"Found {len(results)} state logs for driver {driver_id} in date range")
     
     # Additional safety check: filter results to ensure driver_uuid matches
     # (in case of any edge cases)
-    results = [log for log in results if log.driver_uuid == driver_id]
+    results = [log for log in results if log.get("driver_uuid") == driver_id]
     
-    return results
+    return trusted_response(results, BoltStateLogSchema)
 
 
 @router.get("/state-logs", response_model=list[BoltStateLogSchema])
@@ -99,5 +104,65 @@ def list_all_bolt_state_logs(
     if state:
         query = query.filter(BoltStateLog.state == state)
     
-    return query.order_by(BoltStateLog.created.desc()).all()
+    return trusted_response(query.order_by(BoltStateLog.created.desc()).rows(), BoltStateLogSchema)
 
+
+@router.get("/state-logs/export")
+def export_bolt_state_logs(
+    current_user: dict = Depends(get_current_user),
+    db: SupabaseDB = Depends(get_db),
+    start: date = Query(..., alias="from"),
+    end: date = Query(..., alias="to"),
+    driver_uuid: str | None = Query(None, description="Filtrer par driver UUID"),
+    state: str | None = Query(None, description="Filtrer par état (active, inactive, etc.)"),
+    fmt: Literal["ndjson", "csv"] = Query("ndjson", alias="format"),
+    columns: str | None = Query(None, description="Colonnes séparées par des virgules (toutes par défaut)"),
+    gzip: bool = Query(False, description="Fichier compressé (.gz)"),
+):
+    """Export en flux des logs d'état Bolt de la période (jours UTC), par ordre chronologique."""
+    selected = export_columns(BoltStateLog, columns)
+    filters = {"org_id": current_user["org_id"]}
+    if driver_uuid:
+        filters["driver_uuid"] = driver_uuid
+    if state:
+        filters["state"] = state
+    rows = db.iter_rows(BoltStateLog, filters, ranges={"created": utc_day_range(start, end)}, columns=selected, order_column="created")
+    return export_response(rows, fmt, selected, f"bolt_state_logs_{start.isoformat()}_{end.isoformat()}", gzip)
+
+
+@router.get("/state-intervals", response_model=list[BoltStateIntervalSchema])
+def list_bolt_state_intervals(
+    current_user: dict = Depends(get_current_user),
+    db: SupabaseDB = Depends(get_db),
+    start: datetime = Query(..., alias="from"),
+    end: datetime = Query(..., alias="to"),
+    driver_uuid: str | None = Query(None, description="Filtrer par driver UUID"),
+    state: str | None = Query(None, description="Filtrer par état (waiting_orders, has_order, busy, inactive...)"),
+    clip: bool = Query(False, description="Tronquer start_ts/end_ts aux bornes de la période"),
+):
+    """
+    Liste les intervalles d'état Bolt (logs consécutifs de même état compactés à l'ingestion)
+    qui chevauchent la période, triés par début.
+    """
+    start_ts = int(start.timestamp())
+    end_ts = int(end.timestamp())
+    
+    query = (
+        db.query(BoltStateInterval)
+        .filter(BoltStateInterval.org_id == current_user["org_id"])
+        .filter(BoltStateInterval.start_ts <= end_ts)
+        .filter(BoltStateInterval.end_ts >= start_ts)
+    )
+    
+    if driver_uuid:
+        query = query.filter(BoltStateInterval.driver_uuid == driver_uuid)
+    
+    if state:
+        query = query.filter(BoltStateInterval.state == state)
+    
+    intervals = [BoltStateIntervalSchema.model_validate(row) for row in query.order_by(BoltStateInterval.start_ts).all()]
+    if clip:
+        for interval in intervals:
+            interval.start_ts = max(interval.start_ts, start_ts)
+            interval.end_ts = min(interval.end_ts, end_ts)
+    return intervals
@@ -1,20 +1,49 @@
 from datetime import date, datetime, timedelta
 
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, HTTPException, Query
 
 from app.api.deps import get_current_user
 from app.core.db import get_db
 from app.bolt_integration.bolt_client import BoltClient
 from app.bolt_integration.services_drivers import sync_drivers
 from app.bolt_integration.services_orgs import sync_orgs
-from app.bolt_integration.services_trips import sync_trips
 from app.bolt_integration.services_vehicles import sync_vehicles
-from app.bolt_integration.services_state_logs import sync_state_logs
-from app.jobs.background_tasks import sync_bolt_heavy_data_async, sync_orders_in_batches, sync_state_logs_in_batches
+from app.jobs.leases import LeaseBusy, run_exclusive
+from app.jobs.background_tasks import (
+    is_backfill_running,
+    run_backfill_async,
+    sync_bolt_heavy_data_async,
+)
+from app.jobs.job_queue import enqueue_job
 
 router = APIRouter(prefix="/bolt", tags=["bolt"])
 
 
+def _enqueue_range_sync(kind: str, org_id: str, company_id: str | None, from_date: datetime | None, to_date: datetime | None):
+    """Empile la sync d'une plage (30 derniers jours par défaut, arrondis à la minute pour dédupliquer les doubles clics)."""
+    now = datetime.utcnow().replace(second=0, microsecond=0)
+    params = {
+        "company_id": company_id,
+        "start": (from_date or now - timedelta(days=30)).isoformat(),
+        "end": (to_date or now).isoformat(),
+    }
+    job, _ = enqueue_job(kind, org_id, params)
+    return job
+
+
+def _async_job_response(job, created: bool, message: str) -> dict:
+    """Réponse des syncs asynchrones : identifiant du job (existant si la même sync est déjà demandée)."""
+    return {
+        "status": "success",
+        "message": message if created else "Same synchronization already queued or running",
+        "job_id": job.id,
+        "job_status": job.status,
+        "created": created,
+        "job_url": f"/sync/jobs/{job.id}",
+        "events_url": f"/sync/jobs/{job.id}/events",
+    }
+
+
 @router.post("/sync/orgs")
 def sync_bolt_orgs(
     current_user: dict = Depends(get_current_user),
@@ -22,7 +51,8 @@ def sync_bolt_orgs(
 ):
     """Synchronise les organizations Bolt (company_ids) depuis l'API Bolt vers la base de données locale."""
     try:
-        sync_orgs(db, BoltClient(), org_id=current_user["org_id"])
+        # Une demande en double rejoint la synchronisation déjà en cours pour l'org
+        run_exclusive(current_user["org_id"], "bolt_orgs", lambda: sync_orgs(db, BoltClient(), org_id=current_user["org_id"]))
         from app.models.bolt_org import BoltOrganization
         orgs = db.query(BoltOrganization).filter(BoltOrganization.org_id == current_user["org_id"]).all()
         return {
@@ -34,6 +64,8 @@ def sync_bolt_orgs(
             ],
             "company_ids": [org.id for org in orgs],
         }
+    except LeaseBusy as e:
+        return e.to_dict()
     except Exception as e:
         return {"status": "error", "message": str(e)}
 
@@ -51,8 +83,12 @@ def sync_bolt_drivers(
         # Compter AVANT la sync
         count_before = db.query(BoltDriver).filter(BoltDriver.org_id == current_user["org_id"]).count()
         
-        # Synchroniser
-        sync_drivers(db, BoltClient(), company_id=company_id, org_id=current_user["org_id"])
+        # Synchroniser (par différence avec les drivers déjà stockés)
+        changes = run_exclusive(
+            current_user["org_id"],
+            "bolt_drivers",
+            lambda: sync_drivers(db, BoltClient(), company_id=company_id, org_id=current_user["org_id"]),
+        )
         
         # Compter APRÈS la sync
         count_after = db.query(BoltDriver).filter(BoltDriver.org_id == current_user["org_id"]).count()
@@ -67,8 +103,11 @@ def sync_bolt_drivers(
             "count_after": count_after,
             "total_drivers_in_db": count_after,
             "total_all_drivers": total_all,  # Total sans filtre org_id pour debug
+            "changes": changes,
             "org_id_used": current_user["org_id"],
         }
+    except LeaseBusy as e:
+        return e.to_dict()
     except Exception as e:
         import traceback
         return {
@@ -86,7 +125,11 @@ def sync_bolt_vehicles(
 ):
     """Synchronise les véhicules Bolt depuis l'API Bolt vers la base de données locale."""
     try:
-        sync_vehicles(db, BoltClient(), company_id=company_id, org_id=current_user["org_id"])
+        changes = run_exclusive(
+            current_user["org_id"],
+            "bolt_vehicles",
+            lambda: sync_vehicles(db, BoltClient(), company_id=company_id, org_id=current_user["org_id"]),
+        )
         from app.models.bolt_vehicle import BoltVehicle
         total = db.query(BoltVehicle).filter(BoltVehicle.org_id == current_user["org_id"]).count()
         return {
@@ -94,7 +137,10 @@ def sync_bolt_vehicles(
             "message": "Vehicles synchronized",
             "total_vehicles_in_db": total,
             "org_id_used": current_user["org_id"],
+            "changes": changes,
         }
+    except LeaseBusy as e:
+        return e.to_dict()
     except Exception as e:
         return {"status": "error", "message": str(e)}
 
@@ -102,26 +148,21 @@ def sync_bolt_vehicles(
 @router.post("/sync/orders")
 def sync_bolt_orders(
     current_user: dict = Depends(get_current_user),
-    db=Depends(get_db),
     company_id: str | None = Query(None, description="Company ID Bolt (optionnel)"),
     from_date: datetime | None = Query(None, alias="from", description="Date de début (ISO 8601)"),
     to_date: datetime | None = Query(None, alias="to", description="Date de fin (ISO 8601)"),
 ):
-    """Synchronise les commandes (orders) Bolt depuis l'API Bolt vers la base de données locale."""
+    """
+    Synchronise les commandes (orders) Bolt depuis l'API Bolt vers la base de données locale.
+    La synchronisation est empilée pour le worker ; la réponse contient l'identifiant du job.
+    """
     try:
-        # Par défaut, sync les 30 derniers jours
-        if not from_date:
-            from_date = datetime.utcnow() - timedelta(days=30)
-        if not to_date:
-            to_date = datetime.utcnow()
-        
-        sync_trips(db, BoltClient(), company_id=company_id, start=from_date, end=to_date, org_id=current_user["org_id"])
-        from app.models.bolt_order import BoltOrder
-        total = db.query(BoltOrder).filter(BoltOrder.org_id == current_user["org_id"]).count()
+        job = _enqueue_range_sync("bolt_orders", current_user["org_id"], company_id, from_date, to_date)
         return {
-            "status": "success",
-            "message": "Orders synchronized",
-            "total_orders_in_db": total,
+            "status": "queued",
+            "message": "Orders synchronization queued",
+            "job_id": job.id,
+            "job_status": job.status,
             "org_id_used": current_user["org_id"],
         }
     except Exception as e:
@@ -131,39 +172,36 @@ def sync_bolt_orders(
 @router.post("/sync/state-logs")
 def sync_bolt_state_logs(
     current_user: dict = Depends(get_current_user),
-    db=Depends(get_db),
     company_id: str | None = Query(None, description="Company ID Bolt (optionnel)"),
     from_date: datetime | None = Query(None, alias="from", description="Date de début (ISO 8601)"),
     to_date: datetime | None = Query(None, alias="to", description="Date de fin (ISO 8601)"),
     async_mode: bool = Query(False, description="Lancer en mode asynchrone (par lots)"),
+    days_back: int = Query(30, ge=1, le=480, description="Mode asynchrone : nombre de jours en arrière à synchroniser"),
 ):
     """
     Synchronise les logs d'état Bolt depuis l'API Bolt vers la base de données locale.
-    Si async_mode=True, lance la synchronisation en arrière-plan par lots.
+    Si async_mode=True, lance la synchronisation en arrière-plan par lots sur days_back jours ;
+    l'avancement se suit via /sync/jobs/{job_id}.
     """
     try:
         if async_mode:
             # Mode asynchrone : lance en arrière-plan par lots
-            sync_bolt_heavy_data_async(org_id=current_user["org_id"], company_id=company_id)
+            job, created = sync_bolt_heavy_data_async(
+                org_id=current_user["org_id"], company_id=company_id, days_back=days_back, streams=("state_logs",)
+            )
             return {
-                "status": "success",
-                "message": "State logs synchronization started in background (batched)",
+                **_async_job_response(job, created, "State logs synchronization started in background (batched)"),
                 "mode": "async",
+                "days_back": days_back,
             }
         else:
-            # Mode synchrone : synchronise immédiatement
-            if not from_date:
-                from_date = datetime.utcnow() - timedelta(days=30)
-            if not to_date:
-                to_date = datetime.utcnow()
-            
-            sync_state_logs(db, BoltClient(), company_id=company_id, start=from_date, end=to_date, org_id=current_user["org_id"])
-            from app.models.bolt_state_log import BoltStateLog
-            total = db.query(BoltStateLog).filter(BoltStateLog.org_id == current_user["org_id"]).count()
+            # Plage explicite (30 derniers jours par défaut), empilée pour le worker
+            job = _enqueue_range_sync("bolt_state_logs", current_user["org_id"], company_id, from_date, to_date)
             return {
-                "status": "success",
-                "message": "State logs synchronized",
-                "total_state_logs_in_db": total,
+                "status": "queued",
+                "message": "State logs synchronization queued",
+                "job_id": job.id,
+                "job_status": job.status,
                 "org_id_used": current_user["org_id"],
                 "mode": "sync",
             }
@@ -175,19 +213,122 @@ def sync_bolt_state_logs(
 def sync_bolt_orders_async(
     current_user: dict = Depends(get_current_user),
     company_id: str | None = Query(None, description="Company ID Bolt (optionnel)"),
-    days_back: int = Query(30, description="Nombre de jours en arrière à synchroniser"),
+    days_back: int = Query(30, ge=1, le=480, description="Nombre de jours en arrière à synchroniser"),
 ):
     """
     Lance la synchronisation des orders en mode asynchrone par lots.
-    Ne bloque pas le serveur.
+    Ne bloque pas le serveur ; l'avancement se suit via /sync/jobs/{job_id}.
     """
     try:
-        sync_bolt_heavy_data_async(org_id=current_user["org_id"], company_id=company_id)
+        job, created = sync_bolt_heavy_data_async(
+            org_id=current_user["org_id"], company_id=company_id, days_back=days_back, streams=("orders",)
+        )
         return {
-            "status": "success",
-            "message": "Orders synchronization started in background (batched)",
+            **_async_job_response(job, created, "Orders synchronization started in background (batched)"),
             "days_back": days_back,
         }
     except Exception as e:
         return {"status": "error", "message": str(e)}
 
+
+def _load_org_backfill(manifest_id: str, org_id: str):
+    from app.bolt_integration.backfill import BackfillManifest
+    try:
+        manifest = BackfillManifest.load(manifest_id)
+    except LookupError:
+        manifest = None
+    if manifest is None or manifest.org_id != org_id:
+        raise HTTPException(status_code=404, detail=f"Backfill {manifest_id} introuvable")
+    return manifest
+
+
+@router.post("/sync/backfill")
+def start_bolt_backfill(
+    current_user: dict = Depends(get_current_user),
+    db=Depends(get_db),
+    company_id: str | None = Query(None, description="Company ID Bolt (optionnel, sinon toutes les companies de l'org)"),
+    days_back: int = Query(180, ge=1, le=480, description="Nombre de jours d'historique (16 mois max)"),
+    streams: list[str] = Query(["orders", "state_logs"], description="Streams à backfiller"),
+    max_workers: int = Query(4, ge=1, le=16, description="Nombre de fenêtres traitées en parallèle"),
+    target_pages: int | None = Query(None, ge=1, description="Pages visées par fenêtre (BOLT_WINDOW_TARGET_PAGES par défaut)"),
+    manifest_id: str | None = Query(None, description="Reprendre un backfill existant au lieu d'en créer un"),
+    retry_failed: bool = Query(True, description="Rejouer les cellules en échec lors d'une reprise"),
+):
+    """
+    Lance un backfill historique parallèle et reprenable (orders, state logs) en arrière-plan.
+    Avec manifest_id, reprend le backfill : seules les cellules non terminées sont rejouées.
+    """
+    from app.bolt_integration.backfill import create_backfill
+    from app.bolt_integration.services_orgs import get_company_ids
+    
+    org_id = current_user["org_id"]
+    if manifest_id:
+        manifest = _load_org_backfill(manifest_id, org_id)
+    else:
+        company_ids = get_company_ids(db, org_id, company_id)
+        if not company_ids:
+            return {"status": "error", "message": "Aucun company_id Bolt trouvé (ni en DB, ni BOLT_DEFAULT_FLEET_ID)"}
+        end = datetime.utcnow()
+        try:
+            manifest = create_backfill(
+                org_id, company_ids, end - timedelta(days=days_back), end,
+                streams=tuple(streams), target_pages=target_pages,
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    
+    started = run_backfill_async(manifest, max_workers=max_workers, retry_failed=retry_failed)
+    return {
+        "status": "success",
+        "message": "Backfill started in background" if started else "Backfill already running",
+        "progress": manifest.progress(workers=max_workers),
+    }
+
+
+@router.get("/sync/backfill")
+def list_bolt_backfills(current_user: dict = Depends(get_current_user)):
+    """Liste les backfills de l'org (du plus récent au plus ancien) avec leur avancement."""
+    from app.bolt_integration.backfill import BackfillManifest
+    return [
+        {**manifest.progress(), "active": is_backfill_running(manifest.id)}
+        for manifest in BackfillManifest.list_for_org(current_user["org_id"])
+    ]
+
+
+@router.get("/sync/backfill/{manifest_id}")
+def get_bolt_backfill(manifest_id: str, current_user: dict = Depends(get_current_user)):
+    """Avancement détaillé d'un backfill, avec les cellules en échec."""
+    manifest = _load_org_backfill(manifest_id, current_user["org_id"])
+    return {
+        **manifest.progress(),
+        "active": is_backfill_running(manifest.id),
+        "failed_cells": [
+            {"label": cell.label, "attempts": cell.attempts, "error": cell.error}
+            for cell in manifest.cells
+            if cell.status == "failed"
+        ],
+    }
+
+
+@router.get("/sync/runs")
+def list_sync_runs(
+    provider: str | None = Query(None, description="bolt, heetch ou uber"),
+    stream: str | None = Query(None, description="orders, state_logs, drivers, vehicles, orgs, earnings..."),
+    status: str | None = Query(None, description="running, success ou error"),
+    limit: int = Query(50, ge=1, le=500),
+    current_user: dict = Depends(get_current_user),
+    db=Depends(get_db),
+):
+    """Derniers runs de synchronisation de l'org (journal sync_runs), du plus récent au plus ancien."""
+    from app.models.sync_run import SyncRun
+
+    query = db.query(SyncRun).filter(SyncRun.org_id == current_user["org_id"])
+    if provider:
+        query = query.filter(SyncRun.provider == provider)
+    if stream:
+        query = query.filter(SyncRun.stream == stream)
+    if status:
+        query = query.filter(SyncRun.status == status)
+    runs = query.order_by(SyncRun.started_at.desc()).limit(limit).all()
+    columns = [column.name for column in SyncRun.__table__.columns]
+    return [{name: getattr(run, name) for name in columns} for run in runs]
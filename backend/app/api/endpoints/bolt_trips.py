@@ -1,9 +1,13 @@
-from datetime import datetime
+from datetime import date, datetime
+from typing import Literal
 
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, Query, Response
 
 from app.api.deps import get_current_user
+from app.api.http_cache import conditional_get
+from app.api.responses import trusted_response
 from app.core.db import get_db
+from app.core.exports import export_columns, export_response, utc_day_range
 from app.core.supabase_db import SupabaseDB
 from app.models.bolt_order import BoltOrder
 from app.schemas.bolt_order import BoltOrderSchema
@@ -11,9 +15,10 @@ from app.schemas.bolt_order import BoltOrderSchema
 router = APIRouter(prefix="/bolt", tags=["bolt"])
 
 
-@router.get("/drivers/{driver_id}/orders", response_model=list[BoltOrderSchema])
+@router.get("/drivers/{driver_id}/orders", response_model=list[BoltOrderSchema], dependencies=[Depends(conditional_get("bolt_orders"))])
 def list_bolt_orders(
     driver_id: str,
+    response: Response,
     current_user: dict = Depends(get_current_user),
     db: SupabaseDB = Depends(get_db),
     start: datetime = Query(..., alias="from"),
@@ -43,17 +48,18 @@ def list_bolt_orders(
         .filter(BoltOrder.order_created_timestamp >= start_ts)
         .filter(BoltOrder.order_created_timestamp <= end_ts)
         .order_by(BoltOrder.order_created_timestamp.desc())
-        .all()
+        .rows()
     )
     
     # Additional safety check
-    results = [order for order in results if order.driver_uuid == driver_id]
+    results = [order for order in results if order.get("driver_uuid") == driver_id]
     
-    return results
+    return trusted_response(results, BoltOrderSchema, response)
 
 
-@router.get("/orders", response_model=list[BoltOrderSchema])
+@router.get("/orders", response_model=list[BoltOrderSchema], dependencies=[Depends(conditional_get("bolt_orders"))])
 def list_all_bolt_orders(
+    response: Response,
     current_user: dict = Depends(get_current_user),
     db: SupabaseDB = Depends(get_db),
     start: datetime = Query(..., alias="from"),
@@ -88,12 +94,40 @@ def list_all_bolt_orders(
     if driver_uuid:
         query = query.filter(BoltOrder.driver_uuid == driver_uuid)
     
-    results = query.order_by(BoltOrder.order_created_timestamp.desc()).all()
+    results = query.order_by(BoltOrder.order_created_timestamp.desc()).rows()
     
     # Additional safety check: filter results again by driver_uuid if provided
     # This ensures no orders from other drivers leak through
     if driver_uuid:
-        results = [order for order in results if order.driver_uuid == driver_uuid]
+        results = [order for order in results if order.get("driver_uuid") == driver_uuid]
     
-    return results
+    return trusted_response(results, BoltOrderSchema, response)
 
+
+@router.get("/orders/export")
+def export_bolt_orders(
+    current_user: dict = Depends(get_current_user),
+    db: SupabaseDB = Depends(get_db),
+    start: date = Query(..., alias="from"),
+    end: date = Query(..., alias="to"),
+    driver_uuid: str | None = Query(None, description="Filtrer par driver UUID"),
+    fmt: Literal["ndjson", "csv"] = Query("ndjson", alias="format"),
+    columns: str | None = Query(None, description="Colonnes séparées par des virgules (toutes par défaut)"),
+    gzip: bool = Query(False, description="Fichier compressé (.gz)"),
+):
+    """
+    Export en flux des commandes Bolt de la période (jours UTC), par ordre chronologique de création :
+    pages lues par curseur keyset et encodées au fil de l'eau, sans limite de lignes.
+    """
+    selected = export_columns(BoltOrder, columns)
+    filters = {"org_id": current_user["org_id"]}
+    if driver_uuid:
+        filters["driver_uuid"] = driver_uuid
+    rows = db.iter_rows(
+        BoltOrder,
+        filters,
+        ranges={"order_created_timestamp": utc_day_range(start, end)},
+        columns=selected,
+        order_column="order_created_timestamp",
+    )
+    return export_response(rows, fmt, selected, f"bolt_orders_{start.isoformat()}_{end.isoformat()}", gzip)
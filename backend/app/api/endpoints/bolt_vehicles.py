@@ -1,6 +1,7 @@
 from fastapi import APIRouter, Depends
 
 from app.api.deps import get_current_user
+from app.api.http_cache import conditional_get
 from app.core.db import get_db
 from app.core.supabase_db import SupabaseDB
 from app.models.bolt_vehicle import BoltVehicle
@@ -9,7 +10,7 @@ from app.schemas.bolt_vehicle import BoltVehicleSchema
 router = APIRouter(prefix="/bolt", tags=["bolt"])
 
 
-@router.get("/vehicles", response_model=list[BoltVehicleSchema])
+@router.get("/vehicles", response_model=list[BoltVehicleSchema], dependencies=[Depends(conditional_get("bolt_vehicles"))])
 def list_bolt_vehicles(current_user: dict = Depends(get_current_user), db: SupabaseDB = Depends(get_db)):
     return db.query(BoltVehicle).filter(BoltVehicle.org_id == current_user["org_id"]).all()
 
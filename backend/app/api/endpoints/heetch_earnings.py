@@ -1,9 +1,12 @@
-from datetime import date
+from datetime import date, timedelta
+from typing import Literal
 
 from fastapi import APIRouter, Depends, Query
 
 from app.api.deps import get_current_user
+from app.api.http_cache import conditional_get
 from app.core.db import get_db
+from app.core.exports import export_columns, export_response
 from app.core.supabase_db import SupabaseDB
 from app.models.heetch_earning import HeetchEarning
 from app.schemas.heetch_earning import HeetchEarningSchema
@@ -11,7 +14,7 @@ from app.schemas.heetch_earning import HeetchEarningSchema
 router = APIRouter(prefix="/heetch", tags=["heetch"])
 
 
-@router.get("/drivers/{driver_id}/earnings", response_model=list[HeetchEarningSchema])
+@router.get("/drivers/{driver_id}/earnings", response_model=list[HeetchEarningSchema], dependencies=[Depends(conditional_get("heetch_earnings"))])
 def list_heetch_earnings(
     driver_id: str,
     current_user: dict = Depends(get_current_user),
@@ -32,7 +35,7 @@ def list_heetch_earnings(
     )
 
 
-@router.get("/earnings", response_model=list[HeetchEarningSchema])
+@router.get("/earnings", response_model=list[HeetchEarningSchema], dependencies=[Depends(conditional_get("heetch_earnings"))])
 def list_all_heetch_earnings(
     current_user: dict = Depends(get_current_user),
     db: SupabaseDB = Depends(get_db),
@@ -62,3 +65,25 @@ def list_all_heetch_earnings(
         .all()
     )
 
+
+@router.get("/earnings/export")
+def export_heetch_earnings(
+    current_user: dict = Depends(get_current_user),
+    db: SupabaseDB = Depends(get_db),
+    start: date = Query(..., alias="from", description="Date de début de période (YYYY-MM-DD)"),
+    end: date = Query(..., alias="to", description="Date de fin (YYYY-MM-DD)"),
+    period: str = Query("weekly", description="Période: weekly, monthly"),
+    fmt: Literal["ndjson", "csv"] = Query("ndjson", alias="format"),
+    columns: str | None = Query(None, description="Colonnes séparées par des virgules (toutes par défaut)"),
+    gzip: bool = Query(False, description="Fichier compressé (.gz)"),
+):
+    """Export en flux des earnings Heetch dont la période commence entre from et to, par date croissante."""
+    selected = export_columns(HeetchEarning, columns)
+    rows = db.iter_rows(
+        HeetchEarning,
+        {"org_id": current_user["org_id"], "period": period},
+        ranges={"date": (start.isoformat(), (end + timedelta(days=1)).isoformat())},
+        columns=selected,
+        order_column="date",
+    )
+    return export_response(rows, fmt, selected, f"heetch_earnings_{period}_{start.isoformat()}_{end.isoformat()}", gzip)
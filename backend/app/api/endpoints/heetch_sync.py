@@ -11,6 +11,7 @@ from app.core import logging as app_logging
 from app.heetch_integration.client_manager import get_heetch_client
 from app.heetch_integration.services_drivers import sync_drivers_from_earnings
 from app.heetch_integration.services_earnings import sync_earnings
+from app.jobs.leases import LeaseBusy, run_exclusive
 
 logger = app_logging.get_logger(__name__)
 
@@ -80,7 +81,10 @@ def sync_heetch_drivers(
             logger.info("[HEETCH] Session déjà authentifiée avec cookies de la DB (pas de reconnexion nécessaire)")
         
         # Synchroniser les drivers
-        sync_drivers_from_earnings(db, client, org_id=current_user["org_id"])
+        # Un seul run Heetch à la fois par org (session partagée avec le job planifié)
+        run_exclusive(
+            current_user["org_id"], "heetch", lambda: sync_drivers_from_earnings(db, client, org_id=current_user["org_id"]), join=False
+        )
         
         # Compter APRÈS la sync
         count_after = db.query(HeetchDriver).filter(HeetchDriver.org_id == current_user["org_id"]).count()
@@ -93,6 +97,8 @@ def sync_heetch_drivers(
             "total_drivers_in_db": count_after,
             "org_id_used": current_user["org_id"],
         }
+    except LeaseBusy as e:
+        return e.to_dict()
     except Exception as e:
         import traceback
         return {
@@ -151,13 +157,18 @@ def sync_heetch_earnings(
             logger.info("[HEETCH] Session déjà authentifiée, utilisation des cookies sauvegardés (pas de reconnexion nécessaire)")
         
         # Synchroniser les earnings
-        sync_earnings(
-            db,
-            client,
-            org_id=current_user["org_id"],
-            start_date=start_date,
-            end_date=end_date,
-            period=period
+        run_exclusive(
+            current_user["org_id"],
+            "heetch",
+            lambda: sync_earnings(
+                db,
+                client,
+                org_id=current_user["org_id"],
+                start_date=start_date,
+                end_date=end_date,
+                period=period,
+            ),
+            join=False,
         )
         
         # Compter APRÈS la sync
@@ -171,6 +182,8 @@ def sync_heetch_earnings(
             "total_earnings_in_db": count_after,
             "org_id_used": current_user["org_id"],
         }
+    except LeaseBusy as e:
+        return e.to_dict()
     except Exception as e:
         import traceback
         return {
@@ -262,13 +275,18 @@ def sync_heetch_earnings_last_2_months(
         logger.info(f"[HEETCH SYNC LAST 2 MONTHS] Synchronisation de {start_date} à {end_date} (environ 8 semaines)")
         
         # Synchroniser semaine par semaine
-        sync_earnings(
-            db,
-            client,
-            org_id=current_user["org_id"],
-            start_date=start_date,
-            end_date=end_date,
-            period="weekly"
+        run_exclusive(
+            current_user["org_id"],
+            "heetch",
+            lambda: sync_earnings(
+                db,
+                client,
+                org_id=current_user["org_id"],
+                start_date=start_date,
+                end_date=end_date,
+                period="weekly",
+            ),
+            join=False,
         )
         
         # Compter APRÈS la sync
@@ -285,6 +303,8 @@ def sync_heetch_earnings_last_2_months(
             "total_earnings_in_db": count_after,
             "org_id_used": current_user["org_id"],
         }
+    except LeaseBusy as e:
+        return e.to_dict()
     except Exception as e:
         import traceback
         return {
@@ -0,0 +1,79 @@
+import asyncio
+import json
+import time
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+
+from app.api.deps import get_current_user
+from app.jobs.job_queue import ACTIVE_STATUSES, get_job_store
+
+router = APIRouter(prefix="/sync", tags=["sync"])
+
+# Intervalle de lecture de la file pour le flux SSE, et de commentaire keep-alive (proxys)
+EVENTS_POLL_SECONDS = 1.0
+EVENTS_KEEPALIVE_SECONDS = 15.0
+
+
+def _load_org_job(job_id: str, org_id: str):
+    job = get_job_store().get(job_id)
+    if job is None or job.org_id != org_id:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} introuvable")
+    return job
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+@router.get("/jobs")
+def list_sync_jobs(
+    limit: int = Query(50, ge=1, le=500),
+    current_user: dict = Depends(get_current_user),
+):
+    """Derniers jobs de synchronisation de l'org (file du worker), du plus récent au plus ancien."""
+    return [job.to_dict() for job in get_job_store().list_jobs(current_user["org_id"], limit)]
+
+
+@router.get("/jobs/{job_id}")
+def get_sync_job(job_id: str, current_user: dict = Depends(get_current_user)):
+    """
+    Statut d'un job de synchronisation : avancement (fenêtre i/N, pages, lignes/s, ETA)
+    tant qu'il tourne, puis résultat ou erreur.
+    """
+    return _load_org_job(job_id, current_user["org_id"]).to_dict()
+
+
+@router.get("/jobs/{job_id}/events")
+async def stream_sync_job(job_id: str, current_user: dict = Depends(get_current_user)):
+    """
+    Flux Server-Sent Events d'un job : un événement "progress" à chaque changement d'avancement
+    ou de statut, puis un événement "result" (job terminé, réussi ou en échec) qui clôt le flux.
+    """
+    job = await run_in_threadpool(_load_org_job, job_id, current_user["org_id"])
+
+    async def events():
+        nonlocal job
+        last_state = None
+        last_sent = time.monotonic()
+        while True:
+            state = (job.status, job.attempts, json.dumps(job.progress, sort_keys=True, default=str))
+            if state != last_state:
+                last_state = state
+                last_sent = time.monotonic()
+                if job.status not in ACTIVE_STATUSES:
+                    yield _sse("result", job.to_dict())
+                    return
+                yield _sse("progress", {"id": job.id, "status": job.status, "attempts": job.attempts, "progress": job.progress})
+            elif time.monotonic() - last_sent >= EVENTS_KEEPALIVE_SECONDS:
+                last_sent = time.monotonic()
+                yield ": keep-alive\n\n"
+            await asyncio.sleep(EVENTS_POLL_SECONDS)
+            job = await run_in_threadpool(get_job_store().get, job_id) or job
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,186 @@
+"""
+Réponses conditionnelles (ETag / Last-Modified / 304) des endpoints de lecture.
+
+Les tables lues ne changent que lorsqu'une sync écrit : le validateur d'une réponse est dérivé de
+(org, dernier run terminé des flux qui écrivent la table, chemin + paramètres de la requête).
+Les runs d'un même flux se chevauchent (un run par company, cellules de backfill en parallèle) :
+le dernier run terminé est celui de plus grande date de fin, quel que soit son début. Les runs en
+cours de l'org et le dernier run terminé de chaque flux suivi sont lus dans sync_runs au plus une
+fois par HTTP_CACHE_VERSIONS_TTL_SECONDS par org (un run terminé est donc visible au plus tard après
+ce délai) : une requête If-None-Match à jour reçoit un 304 sans aucune requête PostgREST.
+
+Pas de validateur (réponse toujours complète) tant qu'un run d'un des flux est en cours, quel qu'il
+soit, les pages étant commitées au fil de l'eau, ni si le journal des runs est désactivé.
+"""
+import hashlib
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Callable, Optional
+
+from fastapi import Depends, HTTPException, Request, Response
+
+from app.api.deps import get_current_user
+from app.core import logging as app_logging
+from app.core.config import get_settings
+
+settings = get_settings()
+logger = app_logging.get_logger(__name__)
+
+# Flux de sync (provider, stream, voir @tracked_sync) qui écrivent chaque table
+TABLE_STREAMS: dict[str, tuple[tuple[str, str], ...]] = {
+    "bolt_orders": (("bolt", "orders"),),
+    "bolt_drivers": (("bolt", "drivers"),),
+    "bolt_vehicles": (("bolt", "vehicles"),),
+    "heetch_earnings": (("heetch", "earnings"),),
+}
+# Flux dont le dernier run est lu pour chaque org
+TRACKED_STREAMS = tuple(sorted({stream for streams in TABLE_STREAMS.values() for stream in streams}))
+# Revalidation systématique par le navigateur (données par org : jamais en cache partagé)
+CACHE_CONTROL = "private, no-cache"
+# À incrémenter quand le format des réponses change (invalide les ETags déjà distribués)
+ETAG_FORMAT = "1"
+
+
+class SyncVersions:
+    """Runs en cours et dernier run terminé de chaque flux par org, lus dans sync_runs et gardés en mémoire TTL secondes."""
+
+    def __init__(self, loader: Optional[Callable[[str], list[dict]]] = None, ttl_seconds: Optional[float] = None):
+        self._loader = loader or _load_latest_runs
+        self.ttl_seconds = settings.http_cache_versions_ttl_seconds if ttl_seconds is None else ttl_seconds
+        self._runs: dict[str, tuple[float, dict[tuple[str, str], list[dict]]]] = {}
+        self._lock = threading.Lock()
+
+    def latest_runs(self, org_id: str) -> dict[tuple[str, str], list[dict]]:
+        with self._lock:
+            cached = self._runs.get(org_id)
+        if cached and time.monotonic() - cached[0] < self.ttl_seconds:
+            return cached[1]
+        latest: dict[tuple[str, str], list[dict]] = {}
+        for run in self._loader(org_id):
+            latest.setdefault((run["provider"], run["stream"]), []).append(run)
+        with self._lock:
+            self._runs[org_id] = (time.monotonic(), latest)
+        return latest
+
+    def version(self, org_id: str, tables: tuple[str, ...]) -> Optional[tuple[str, Optional[datetime]]]:
+        """
+        (jeton des derniers runs terminés, date de fin la plus récente) des flux des tables,
+        ou None si un run d'un de ces flux est en cours (données en train de changer).
+        """
+        runs = self.latest_runs(org_id)
+        stale_before = datetime.utcnow() - timedelta(seconds=settings.sync_job_stale_seconds)
+        tokens, last_modified = [], None
+        for stream in sorted({stream for table in tables for stream in TABLE_STREAMS[table]}):
+            last, last_finished = None, None
+            for run in runs.get(stream, []):
+                if run["status"] == "running":
+                    # Run interrompu sans ligne de fin (process tué) : ignoré passé le délai de péremption
+                    if _parse_datetime(run["started_at"]) > stale_before:
+                        return None
+                    continue
+                finished = _parse_datetime(run.get("finished_at") or run["started_at"])
+                if last_finished is None or finished > last_finished:
+                    last, last_finished = run, finished
+            if last is None:
+                tokens.append(f"{stream[0]}/{stream[1]}:-")
+                continue
+            tokens.append(f"{stream[0]}/{stream[1]}:{last['id']}:{last['status']}")
+            last_modified = last_finished if last_modified is None else max(last_modified, last_finished)
+        return "|".join(tokens), last_modified
+
+
+def _parse_datetime(value) -> datetime:
+    if isinstance(value, datetime):
+        return value.replace(tzinfo=None)
+    # Colonnes timestamp sans fuseau (UTC) renvoyées par PostgREST en ISO
+    return datetime.fromisoformat(str(value).replace("Z", "+00:00")).replace(tzinfo=None)
+
+
+def _load_latest_runs(org_id: str) -> list[dict]:
+    """Runs en cours de l'org, et dernier run terminé (par date de fin) de chaque flux suivi."""
+    from app.core.supabase_db import SupabaseDB
+    from app.models.sync_run import SyncRun
+
+    db = SupabaseDB()
+    columns = "id,provider,stream,status,started_at,finished_at"
+    runs = (
+        db.client.table(SyncRun.__tablename__)
+        .select(columns)
+        .eq("org_id", org_id)
+        .eq("status", "running")
+        .execute()
+        .data
+    )
+    for provider, stream in TRACKED_STREAMS:
+        runs.extend(
+            db.client.table(SyncRun.__tablename__)
+            .select(columns)
+            .eq("org_id", org_id)
+            .eq("provider", provider)
+            .eq("stream", stream)
+            .not_.is_("finished_at", "null")
+            .order("finished_at", desc=True)
+            .limit(1)
+            .execute()
+            .data
+        )
+    return runs
+
+
+sync_versions = SyncVersions()
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    # Comparaison faible (RFC 9110) : W/"x" et "x" sont équivalents
+    opaque = etag.removeprefix("W/")
+    return any(candidate.strip().removeprefix("W/") == opaque for candidate in if_none_match.split(","))
+
+
+def _not_modified_since(if_modified_since: str, last_modified: datetime) -> bool:
+    try:
+        since = parsedate_to_datetime(if_modified_since).replace(tzinfo=None)
+    except (TypeError, ValueError):
+        return False
+    return last_modified.replace(microsecond=0) <= since
+
+
+def conditional_get(*tables: str) -> Callable:
+    """
+    Dépendance FastAPI des endpoints de lecture des tables données : ajoute ETag, Last-Modified et
+    Cache-Control à la réponse, ou lève un 304 (sans corps) avant l'exécution de l'endpoint.
+    """
+
+    def dependency(request: Request, response: Response, current_user: dict = Depends(get_current_user)) -> None:
+        if not settings.sync_ledger_enabled:
+            return
+        org_id = current_user["org_id"]
+        try:
+            version = sync_versions.version(org_id, tables)
+        except Exception as e:
+            logger.warning(f"[HTTP CACHE] Versions des syncs indisponibles (org {org_id}): {e}")
+            return
+        if version is None:
+            return
+        token, last_modified = version
+        query = "&".join(sorted(f"{key}={value}" for key, value in request.query_params.multi_items()))
+        digest = hashlib.sha1(f"{ETAG_FORMAT}|{org_id}|{request.url.path}?{query}|{token}".encode()).hexdigest()
+        headers = {"ETag": f'W/"{digest}"', "Cache-Control": CACHE_CONTROL, "Vary": "Authorization"}
+        if last_modified is not None:
+            headers["Last-Modified"] = format_datetime(last_modified.replace(microsecond=0, tzinfo=timezone.utc), usegmt=True)
+
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match is not None:
+            not_modified = _etag_matches(if_none_match, headers["ETag"])
+        else:
+            # If-Modified-Since n'est consulté qu'en l'absence de If-None-Match (RFC 9110)
+            if_modified_since = request.headers.get("if-modified-since")
+            not_modified = bool(if_modified_since and last_modified and _not_modified_since(if_modified_since, last_modified))
+        if not_modified:
+            raise HTTPException(status_code=304, headers=headers)
+        response.headers.update(headers)
+
+    return dependency
@@ -0,0 +1,23 @@
+"""
+Réponses JSON des listes volumineuses lues en base.
+
+Les lignes PostgREST sont déjà typées par le schéma SQL : les revalider une à une avec le
+response_model (puis les resérialiser) coûte plus cher que leur encodage. trusted_response
+projette chaque ligne sur les champs du schéma (valeurs par défaut comprises) et l'encode
+directement avec orjson ; le response_model de l'endpoint reste la documentation OpenAPI.
+"""
+from typing import Iterable, Optional
+
+from fastapi import Response
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel
+
+
+def trusted_response(rows: Iterable[dict], schema: type[BaseModel], response: Optional[Response] = None) -> ORJSONResponse:
+    """
+    Liste JSON des lignes projetées sur schema, sans validation.
+    response : Response de la requête (en-têtes posés par les dépendances, ex. ETag), recopiés.
+    """
+    fields = [(name, field.get_default(call_default_factory=True)) for name, field in schema.model_fields.items()]
+    content = [{name: row.get(name, default) for name, default in fields} for row in rows]
+    return ORJSONResponse(content, headers=dict(response.headers) if response is not None else None)
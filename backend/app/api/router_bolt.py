@@ -1,6 +1,6 @@
 from fastapi import APIRouter
 
-from app.api.endpoints import bolt_debug, bolt_drivers, bolt_earnings, bolt_sync, bolt_trips, bolt_vehicles, bolt_state_logs, bolt_driver_earnings
+from app.api.endpoints import bolt_debug, bolt_drivers, bolt_earnings, bolt_sync, bolt_trips, bolt_vehicles, bolt_state_logs, bolt_driver_earnings, bolt_driver_activity
 
 router = APIRouter()
 
@@ -9,6 +9,7 @@ router.include_router(bolt_vehicles.router)
 router.include_router(bolt_trips.router)  # Contient maintenant /orders
 router.include_router(bolt_state_logs.router)
 router.include_router(bolt_driver_earnings.router)  # Revenus des drivers
+router.include_router(bolt_driver_activity.router)  # Activité quotidienne précalculée
 router.include_router(bolt_earnings.router)
 router.include_router(bolt_sync.router)
 router.include_router(bolt_debug.router)
@@ -0,0 +1,337 @@
+"""
+Moteur de backfill Bolt parallèle et reprenable.
+
+Un backfill est décrit par un manifeste persistant en base (bolt_backfills, créé par l'API
+et exécuté par le worker) : une cellule par (stream, company, fenêtre) avec son statut
+(bolt_backfill_cells). Les cellules sont exécutées par un pool borné de workers (chacun avec
+son BoltClient, débit Bolt partagé) ; chaque cellule est enregistrée dès qu'elle se termine,
+ce qui permet de reprendre après un crash et de ne rejouer que les cellules en échec.
+
+Les cellules d'un stream tournent sous le bail du flux (bolt_orders / bolt_state_logs), partagé
+avec la sync lourde, la sync incrémentale et les jobs de plage : un flux déjà en cours pour l'org
+n'est pas backfillé en parallèle, ses cellules restent en attente et LeaseBusy est levée pour
+que le job soit relancé plus tard.
+"""
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Callable, Optional
+
+from app.core.config import get_settings
+from app.core import logging as app_logging
+from app.core.supabase_db import SupabaseDB
+from app.jobs.leases import LeaseBusy, run_exclusive
+from app.models.bolt_backfill import BoltBackfill
+from app.models.bolt_backfill_cell import BoltBackfillCell
+from app.bolt_integration.bolt_client import BoltClient
+from app.bolt_integration.services_state_logs import sync_state_logs
+from app.bolt_integration.services_trips import sync_trips
+from app.bolt_integration.window_planner import density_store, plan_stream_windows
+
+settings = get_settings()
+logger = app_logging.get_logger(__name__)
+
+BACKFILL_STREAMS = {
+    "orders": sync_trips,
+    "state_logs": sync_state_logs,
+}
+
+# Bail de chaque stream (voir app.jobs.leases), le même que celui des autres syncs du flux
+BACKFILL_LEASES = {
+    "orders": "bolt_orders",
+    "state_logs": "bolt_state_logs",
+}
+
+PENDING, RUNNING, DONE, FAILED = "pending", "running", "done", "failed"
+
+
+@dataclass
+class BackfillCell:
+    stream: str
+    company_id: str
+    start_ts: int
+    end_ts: int
+    position: int = 0
+    status: str = PENDING
+    attempts: int = 0
+    pages: int = 0
+    rows: int = 0
+    duration_seconds: float = 0.0
+    error: Optional[str] = None
+
+    @property
+    def label(self) -> str:
+        start = datetime.utcfromtimestamp(self.start_ts)
+        end = datetime.utcfromtimestamp(self.end_ts)
+        return f"{self.stream} company_id={self.company_id} {start} -> {end}"
+
+
+@dataclass
+class BackfillManifest:
+    id: str
+    org_id: str
+    start_ts: int
+    end_ts: int
+    created_at: float = field(default_factory=time.time)
+    updated_at: float = field(default_factory=time.time)
+    cells: list[BackfillCell] = field(default_factory=list)
+
+    def __post_init__(self):
+        self._lock = threading.Lock()
+
+    # ------------------------------------------------------------ persistance
+
+    def save(self) -> None:
+        """Enregistre le manifeste et toutes ses cellules."""
+        backfill_store.save(self, self.cells)
+
+    def save_cell(self, cell: BackfillCell) -> None:
+        """Enregistre une seule cellule (et la date de mise à jour du manifeste)."""
+        backfill_store.save(self, [cell])
+
+    @classmethod
+    def load(cls, manifest_id: str) -> "BackfillManifest":
+        manifest = backfill_store.load(manifest_id)
+        if manifest is None:
+            raise LookupError(f"Manifeste de backfill introuvable: {manifest_id}")
+        return manifest
+
+    @classmethod
+    def list_for_org(cls, org_id: str) -> list["BackfillManifest"]:
+        return backfill_store.list_for_org(org_id)
+
+    # --------------------------------------------------------------- progrès
+
+    def progress(self, started_at: Optional[float] = None, workers: int = 1) -> dict:
+        """
+        Résumé de l'avancement. L'ETA est estimée à partir de la durée moyenne
+        des cellules déjà terminées, répartie sur le nombre de workers.
+        """
+        with self._lock:
+            counts = {status: 0 for status in (PENDING, RUNNING, DONE, FAILED)}
+            for cell in self.cells:
+                counts[cell.status] += 1
+            finished = [cell for cell in self.cells if cell.status == DONE]
+            rows = sum(cell.rows for cell in finished)
+            pages = sum(cell.pages for cell in finished)
+            avg_duration = sum(cell.duration_seconds for cell in finished) / len(finished) if finished else None
+
+        total = len(self.cells)
+        remaining = counts[PENDING] + counts[RUNNING]
+        eta = avg_duration * remaining / max(1, workers) if avg_duration is not None else None
+        return {
+            "manifest_id": self.id,
+            "org_id": self.org_id,
+            "total": total,
+            "done": counts[DONE],
+            "failed": counts[FAILED],
+            "pending": counts[PENDING],
+            "running": counts[RUNNING],
+            "percent": round(100.0 * counts[DONE] / total, 1) if total else 100.0,
+            "rows": rows,
+            "pages": pages,
+            "elapsed_seconds": round(time.time() - started_at, 1) if started_at else None,
+            "eta_seconds": round(eta, 1) if eta is not None else None,
+            "updated_at": datetime.utcfromtimestamp(self.updated_at).isoformat(),
+        }
+
+
+class BackfillStore:
+    """Manifestes dans bolt_backfills / bolt_backfill_cells, lus et écrits par l'API et le worker."""
+
+    def __init__(self, db_factory=SupabaseDB):
+        self._db_factory = db_factory
+
+    def save(self, manifest: BackfillManifest, cells: list[BackfillCell]) -> None:
+        manifest.updated_at = time.time()
+        db = self._db_factory()
+        db.bulk_upsert(BoltBackfill, [{
+            "id": manifest.id,
+            "org_id": manifest.org_id,
+            "start_ts": manifest.start_ts,
+            "end_ts": manifest.end_ts,
+            "created_at": manifest.created_at,
+            "updated_at": manifest.updated_at,
+        }])
+        db.bulk_upsert(BoltBackfillCell, [{
+            "id": f"{manifest.id}:{cell.position}",
+            "backfill_id": manifest.id,
+            "org_id": manifest.org_id,
+            "position": cell.position,
+            "stream": cell.stream,
+            "company_id": cell.company_id,
+            "start_ts": cell.start_ts,
+            "end_ts": cell.end_ts,
+            "status": cell.status,
+            "attempts": cell.attempts,
+            "pages": cell.pages,
+            "rows": cell.rows,
+            "duration_seconds": cell.duration_seconds,
+            "error": cell.error,
+        } for cell in cells])
+        db.commit()
+
+    def load(self, manifest_id: str) -> Optional[BackfillManifest]:
+        db = self._db_factory()
+        rows = db.fetch_rows(BoltBackfill, {"id": manifest_id})
+        if not rows:
+            return None
+        return self._manifest(rows[0], db.fetch_rows(BoltBackfillCell, {"backfill_id": manifest_id}))
+
+    def list_for_org(self, org_id: str) -> list[BackfillManifest]:
+        db = self._db_factory()
+        cells_by_backfill: dict[str, list[dict]] = {}
+        # Une requête pour les cellules de tous les backfills de l'org plutôt qu'une par manifeste
+        for row in db.fetch_rows(BoltBackfillCell, {"org_id": org_id}):
+            cells_by_backfill.setdefault(row["backfill_id"], []).append(row)
+        manifests = [self._manifest(row, cells_by_backfill.get(row["id"], [])) for row in db.fetch_rows(BoltBackfill, {"org_id": org_id})]
+        return sorted(manifests, key=lambda m: m.created_at, reverse=True)
+
+    @staticmethod
+    def _manifest(row: dict, cell_rows: list[dict]) -> BackfillManifest:
+        cells = [
+            BackfillCell(**{name: cell[name] for name in BackfillCell.__dataclass_fields__})
+            for cell in sorted(cell_rows, key=lambda cell: cell["position"])
+        ]
+        return BackfillManifest(
+            id=row["id"],
+            org_id=row["org_id"],
+            start_ts=row["start_ts"],
+            end_ts=row["end_ts"],
+            created_at=row["created_at"],
+            updated_at=row["updated_at"],
+            cells=cells,
+        )
+
+
+backfill_store = BackfillStore()
+
+
+def create_backfill(
+    org_id: str,
+    company_ids: list[str],
+    start: datetime,
+    end: datetime,
+    streams: tuple[str, ...] = ("orders", "state_logs"),
+    target_pages: Optional[int] = None,
+    default_window_days: int = 7,
+    probe_client: Optional[BoltClient] = None,
+) -> BackfillManifest:
+    """
+    Planifie les fenêtres de chaque (stream, company) et écrit un nouveau manifeste.
+    """
+    unknown = [stream for stream in streams if stream not in BACKFILL_STREAMS]
+    if unknown:
+        raise ValueError(f"Streams de backfill inconnus: {unknown}")
+
+    manifest = BackfillManifest(
+        id=f"{datetime.utcnow():%Y%m%d%H%M%S}-{uuid.uuid4().hex[:8]}",
+        org_id=org_id,
+        start_ts=int(start.timestamp()),
+        end_ts=int(end.timestamp()),
+    )
+    for stream in streams:
+        for company_id in company_ids:
+            windows = plan_stream_windows(
+                org_id, company_id, stream, start, end,
+                target_pages=target_pages,
+                default_window_days=default_window_days,
+                client=probe_client,
+            )
+            offset = len(manifest.cells)
+            manifest.cells.extend(
+                BackfillCell(stream=stream, company_id=company_id, start_ts=w.start_ts, end_ts=w.end_ts, position=offset + i)
+                for i, w in enumerate(windows)
+            )
+    manifest.save()
+    logger.info(f"[BACKFILL] Manifeste {manifest.id} créé: {len(manifest.cells)} cellule(s) pour org_id={org_id}")
+    return manifest
+
+
+def run_backfill(
+    manifest: BackfillManifest,
+    db: SupabaseDB,
+    max_workers: int = 4,
+    retry_failed: bool = True,
+    max_attempts: int = 3,
+    on_progress: Optional[Callable[[dict], None]] = None,
+) -> dict:
+    """
+    Exécute les cellules non terminées du manifeste avec un pool borné de workers.
+
+    - Les cellules restées "running" (crash précédent) sont reprises.
+    - Les cellules "failed" sont rejouées si retry_failed, tant que attempts < max_attempts.
+    - Les cellules "done" ne sont jamais rejouées.
+    - Les cellules d'un stream s'exécutent sous le bail du flux ; si un autre run le détient, elles
+      restent en attente et LeaseBusy est levée une fois les autres streams traités.
+
+    Returns:
+        Progression finale (voir BackfillManifest.progress)
+    """
+    for cell in manifest.cells:
+        if cell.status == RUNNING or (cell.status == FAILED and retry_failed and cell.attempts < max_attempts):
+            cell.status = PENDING
+    manifest.save()
+
+    todo = [cell for cell in manifest.cells if cell.status == PENDING]
+    workers = max(1, min(max_workers, len(todo) or 1))
+    started_at = time.time()
+    logger.info(f"[BACKFILL] {manifest.id}: {len(todo)} cellule(s) à traiter, {workers} worker(s)")
+
+    local = threading.local()
+
+    def run_cell(cell: BackfillCell) -> None:
+        if not hasattr(local, "client"):
+            local.client = BoltClient()
+        cell.status = RUNNING
+        cell.attempts += 1
+        cell_started = time.time()
+        try:
+            stats = BACKFILL_STREAMS[cell.stream](
+                db=db,
+                client=local.client,
+                company_id=cell.company_id,
+                start=datetime.utcfromtimestamp(cell.start_ts),
+                end=datetime.utcfromtimestamp(cell.end_ts),
+                org_id=manifest.org_id,
+                incremental=False,
+            )
+            density_store.record(manifest.org_id, cell.company_id, cell.stream, cell.start_ts, cell.end_ts, stats["fetched"])
+            cell.pages, cell.rows, cell.error = stats["pages"], stats["fetched"], None
+            cell.status = DONE
+        except Exception as e:
+            cell.status, cell.error = FAILED, str(e)
+            logger.error(f"[BACKFILL] ✗ {cell.label}: {str(e)}")
+        cell.duration_seconds = round(time.time() - cell_started, 2)
+        manifest.save_cell(cell)
+
+        progress = manifest.progress(started_at, workers)
+        eta = f"{progress['eta_seconds']:.0f}s" if progress["eta_seconds"] is not None else "?"
+        logger.info(
+            f"[BACKFILL] {progress['done']}/{progress['total']} ({progress['percent']}%) "
+            f"- {progress['failed']} échec(s) - {progress['rows']} lignes - ETA {eta}"
+        )
+        if on_progress:
+            on_progress(progress)
+
+    busy: list[LeaseBusy] = []
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bolt_backfill") as pool:
+        for stream, lease_stream in BACKFILL_LEASES.items():
+            cells = [cell for cell in todo if cell.stream == stream]
+            if not cells:
+                continue
+            try:
+                run_exclusive(manifest.org_id, lease_stream, lambda: list(pool.map(run_cell, cells)), join=False)
+            except LeaseBusy as e:
+                logger.info(f"[BACKFILL] {manifest.id}: {e}, {len(cells)} cellule(s) {stream} remise(s) à plus tard")
+                busy.append(e)
+
+    progress = manifest.progress(started_at, workers)
+    if busy:
+        # Propagée au worker : le job est relancé plus tard, seules les cellules en attente seront exécutées
+        raise busy[0]
+    logger.info(f"[BACKFILL] {manifest.id} terminé: {progress}")
+    return progress
@@ -1,3 +1,4 @@
+import threading
 import time
 from typing import Any, Dict, Optional
 
@@ -5,21 +6,34 @@ import httpx
 from httpx import ConnectError
 
 from app.core.config import get_settings
+from app.core.rate_limit import RateLimiter
+from app.core.sync_ledger import timed_api_call
 
 settings = get_settings()
 
 
+# Limiteur partagé : toutes les synchronisations (toutes companies confondues) passent par lui
+rate_limiter = RateLimiter(settings.bolt_rate_limit_per_second, settings.bolt_rate_limit_burst)
+
+
 class BoltClient:
+    # Le token OAuth est valable pour toutes les companies : on le partage entre les instances
+    _token_lock = threading.Lock()
+    _shared_access_token: Optional[str] = None
+    _shared_token_expires_at: float = 0.0
+
     def __init__(self):
-        self._access_token: Optional[str] = None
-        self._token_expires_at: float = 0.0
         # Convertir AnyUrl en str pour httpx et s'assurer qu'il n'y a pas de slash final
         base_url = str(settings.bolt_base_url).rstrip("/")
         self._client = httpx.Client(base_url=base_url, timeout=20)
 
     def _get_token(self) -> str:
-        if self._access_token and time.time() < self._token_expires_at - 30:
-            return self._access_token
+        with BoltClient._token_lock:
+            if BoltClient._shared_access_token and time.time() < BoltClient._shared_token_expires_at - 30:
+                return BoltClient._shared_access_token
+            return self._fetch_token()
+
+    def _fetch_token(self) -> str:
         # Bolt uses form-urlencoded with scope
         # Convertir AnyUrl en str pour httpx
         auth_url = str(settings.bolt_auth_url)
@@ -40,10 +54,10 @@ class BoltClient:
             )
             resp.raise_for_status()
             data = resp.json()
-            self._access_token = data["access_token"]
+            BoltClient._shared_access_token = data["access_token"]
             # Bolt tokens expire in 10 minutes (600 seconds)
-            self._token_expires_at = time.time() + data.get("expires_in", 600)
-            return self._access_token
+            BoltClient._shared_token_expires_at = time.time() + data.get("expires_in", 600)
+            return BoltClient._shared_access_token
         except ConnectError as e:
             raise ConnectionError(
                 f"Impossible de se connecter à {auth_url}. "
@@ -74,7 +88,10 @@ class BoltClient:
         print(f"[BOLT] HEADERS: { {k: (v[:20] + '...' if k.lower() == 'authorization' else v) for k, v in headers.items()} }")
         
         try:
-            resp = self._client.get(path, headers=headers, params=params)
+            rate_limiter.acquire()
+            with timed_api_call("bolt") as call:
+                resp = self._client.get(path, headers=headers, params=params)
+                call.error = resp.status_code >= 400
             
             # Logs de réponse
             print(f"[BOLT] STATUS: {resp.status_code}")
@@ -120,7 +137,10 @@ class BoltClient:
         print(f"[BOLT] HEADERS: { {k: (v[:20] + '...' if k.lower() == 'authorization' else v) for k, v in headers.items()} }")
         
         try:
-            resp = self._client.post(path, headers=headers, json=payload)
+            rate_limiter.acquire()
+            with timed_api_call("bolt") as call:
+                resp = self._client.post(path, headers=headers, json=payload)
+                call.error = resp.status_code >= 400
             
             # Logs de réponse (TOUJOURS afficher, même en cas d'erreur)
             print(f"[BOLT] STATUS: {resp.status_code}")
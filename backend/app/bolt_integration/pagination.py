@@ -0,0 +1,74 @@
+"""
+Pagination offset/limit partagée par les endpoints Bolt de type liste (getDrivers, getVehicles...).
+
+Dès que la première page est pleine, les pages suivantes sont préchargées par lots de
+BOLT_PAGE_PREFETCH requêtes concurrentes (le débit reste borné par le limiteur global du BoltClient).
+"""
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Optional
+
+from app.core.config import get_settings
+from app.core import logging as app_logging
+from app.core.sync_ledger import bind_context
+from app.bolt_integration.bolt_client import BoltClient
+
+settings = get_settings()
+logger = app_logging.get_logger(__name__)
+
+# Sécurité : éviter les boucles infinies
+MAX_PAGES = 1000
+
+
+def fetch_page(client: BoltClient, path: str, payload: dict[str, Any], items_key: str, offset: int, limit: int) -> list[dict]:
+    """Récupère une page ; lève RuntimeError si Bolt répond avec un code d'erreur."""
+    data = client.post(path, {**payload, "offset": offset, "limit": limit})
+    # La réponse Bolt a la structure: { "code": 0, "message": "...", "data": { <items_key>: [...] } }
+    if data.get("code") != 0:
+        raise RuntimeError(f"Bolt API error: {data.get('message', 'Unknown error')}")
+    return data.get("data", {}).get(items_key, [])
+
+
+def fetch_all_pages(
+    client: BoltClient,
+    path: str,
+    payload: dict[str, Any],
+    items_key: str,
+    page_size: int,
+    label: str = "PAGINATION",
+    prefetch: Optional[int] = None,
+) -> tuple[list[dict], int]:
+    """
+    Récupère tous les éléments d'un endpoint paginé par offset, jusqu'à une page incomplète.
+
+    Args:
+        prefetch: nombre de pages demandées en parallèle après une première page pleine
+                  (BOLT_PAGE_PREFETCH par défaut, 1 = séquentiel)
+
+    Returns:
+        (éléments, nombre de requêtes effectuées)
+    """
+    prefetch = max(1, settings.bolt_page_prefetch if prefetch is None else prefetch)
+
+    items = fetch_page(client, path, payload, items_key, 0, page_size)
+    requests = 1
+    logger.info(f"[{label}] Page 1: {len(items)} élément(s)")
+    if len(items) < page_size:
+        return items, requests
+
+    offset = page_size
+    with ThreadPoolExecutor(max_workers=prefetch, thread_name_prefix="bolt_prefetch") as pool:
+        while requests < MAX_PAGES:
+            offsets = [offset + i * page_size for i in range(min(prefetch, MAX_PAGES - requests))]
+            # map conserve l'ordre des pages ; bind_context attribue les appels au run courant
+            fetch = bind_context(lambda o: fetch_page(client, path, payload, items_key, o, page_size))
+            pages = list(pool.map(fetch, offsets))
+            requests += len(pages)
+            for page_offset, page in zip(offsets, pages):
+                items.extend(page)
+                if len(page) < page_size:
+                    logger.info(f"[{label}] Dernière page atteinte (offset={page_offset}), {len(items)} élément(s) en {requests} requête(s)")
+                    return items, requests
+            offset = offsets[-1] + page_size
+            logger.info(f"[{label}] {len(items)} élément(s) récupéré(s) ({requests} requête(s))")
+    logger.warning(f"[{label}] Limite de sécurité atteinte ({MAX_PAGES} pages), arrêt de la pagination")
+    return items, requests
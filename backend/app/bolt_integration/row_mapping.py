@@ -0,0 +1,201 @@
+"""
+Mapping déclaratif payload Bolt -> ligne de table, compilé en fonctions spécialisées.
+
+Chaque ressource Bolt (orders, state logs, drivers, véhicules) est décrite par une liste
+de FieldSpec (chemin source, défaut, coercition). compile_mapping() génère une fois pour
+toutes une fonction Python dédiée qui produit directement le dict prêt pour l'upsert
+Supabase, sans passer par une instance ORM puis _instance_to_dict.
+"""
+from dataclasses import dataclass
+from typing import Any, Callable, Optional, Sequence, Union
+
+# Quand appliquer le défaut : clé absente (dict.get), valeur None, ou valeur "falsy" (or)
+MISSING, NONE, FALSY = "missing", "none", "falsy"
+
+RowBuilder = Callable[[dict, dict], Optional[dict]]
+
+
+@dataclass(frozen=True)
+class FieldSpec:
+    """
+    Description d'une colonne cible.
+
+    source:
+        - "a.b.c"    : chemin dans le payload (les objets intermédiaires absents valent {})
+        - ("a", "b") : alternatives, la première valeur non vide l'emporte
+        - "$org_id"  : valeur du contexte (org_id, company_id, ...)
+        - callable   : fn(item) -> valeur, pour les champs dérivés
+    """
+    column: str
+    source: Union[str, tuple[str, ...], Callable[[dict], Any], None] = None
+    default: Any = None
+    default_when: str = NONE
+    coerce: Optional[Callable[[Any], Any]] = None
+    required: bool = False
+
+
+def compile_mapping(name: str, fields: Sequence[FieldSpec]) -> RowBuilder:
+    """
+    Compile une liste de FieldSpec en fonction build(item, ctx) -> dict | None.
+    Retourne None pour les items dont un champ required est vide.
+    """
+    namespace: dict[str, Any] = {}
+    lines = [f"def build_{name}(item, ctx):", "    _get = item.get"]
+    parents: dict[str, str] = {}
+
+    def parent_var(path: tuple[str, ...]) -> str:
+        # Hisse les objets imbriqués (order_price, category_info...) une seule fois par item
+        key = ".".join(path)
+        if key not in parents:
+            var = f"_n{len(parents)}"
+            getter = "_get" if len(path) == 1 else f"{parent_var(path[:-1])}.get"
+            lines.append(f"    {var} = {getter}({path[-1]!r}) or {{}}")
+            parents[key] = var
+        return parents[key]
+
+    def path_expr(path: str, default_var: Optional[str] = None) -> str:
+        parts = tuple(path.split("."))
+        getter = "_get" if len(parts) == 1 else f"{parent_var(parts[:-1])}.get"
+        if default_var is not None:
+            return f"{getter}({parts[-1]!r}, {default_var})"
+        return f"{getter}({parts[-1]!r})"
+
+    for i, spec in enumerate(fields):
+        var = f"f{i}"
+        source = spec.source if spec.source is not None else spec.column
+        default_var = None
+        if spec.default is not None:
+            default_var = f"_d{i}"
+            namespace[default_var] = spec.default
+
+        if callable(source):
+            namespace[f"_s{i}"] = source
+            expr = f"_s{i}(item)"
+        elif isinstance(source, tuple):
+            expr = " or ".join(path_expr(path) for path in source)
+        elif source.startswith("$"):
+            expr = f"ctx.get({source[1:]!r})"
+        elif default_var is not None and spec.default_when == MISSING:
+            expr = path_expr(source, default_var)
+        else:
+            expr = path_expr(source)
+        lines.append(f"    {var} = {expr}")
+
+        if default_var is not None and spec.default_when == NONE:
+            lines.append(f"    if {var} is None: {var} = {default_var}")
+        elif default_var is not None and spec.default_when == FALSY:
+            lines.append(f"    if not {var}: {var} = {default_var}")
+        if spec.coerce is not None:
+            namespace[f"_c{i}"] = spec.coerce
+            lines.append(f"    if {var} is not None: {var} = _c{i}({var})")
+        if spec.required:
+            lines.append(f"    if not {var}: return None")
+
+    items = ", ".join(f"{spec.column!r}: f{i}" for i, spec in enumerate(fields))
+    lines.append(f"    return {{{items}}}")
+
+    source_code = "\n".join(lines)
+    exec(compile(source_code, f"<row_mapping {name}>", "exec"), namespace)
+    builder = namespace[f"build_{name}"]
+    builder.source = source_code
+    return builder
+
+
+def build_rows(builder: RowBuilder, items: Sequence[dict], ctx: dict) -> list[dict]:
+    """Applique un builder à une page de payloads, en ignorant les items rejetés."""
+    rows = []
+    for item in items:
+        row = builder(item, ctx)
+        if row is not None:
+            rows.append(row)
+    return rows
+
+
+def _state_log_id(item: dict) -> str:
+    # ID unique : driver_uuid + created timestamp
+    return f"{item.get('driver_uuid')}_{item.get('created')}"
+
+
+def _driver_active(item: dict) -> bool:
+    state = item.get("state")
+    return state == "active" if state else True
+
+
+def _price(name: str) -> FieldSpec:
+    return FieldSpec(name, f"order_price.{name}", default=0)
+
+
+ORDER_FIELDS = (
+    FieldSpec("order_reference", required=True),
+    FieldSpec("org_id", "$org_id"),
+    FieldSpec("company_id", "$company_id", coerce=int),
+    FieldSpec("company_name", "$company_name"),
+    FieldSpec("driver_uuid"),
+    FieldSpec("partner_uuid"),
+    FieldSpec("driver_name"),
+    FieldSpec("driver_phone"),
+    FieldSpec("payment_method"),
+    FieldSpec("payment_confirmed_timestamp"),
+    FieldSpec("order_created_timestamp"),
+    FieldSpec("order_status"),
+    FieldSpec("driver_cancelled_reason"),
+    FieldSpec("vehicle_model"),
+    FieldSpec("vehicle_license_plate"),
+    FieldSpec("price_review_reason"),
+    FieldSpec("pickup_address"),
+    FieldSpec("ride_distance", default=0, default_when=FALSY),
+    FieldSpec("order_accepted_timestamp"),
+    FieldSpec("order_pickup_timestamp"),
+    FieldSpec("order_drop_off_timestamp"),
+    FieldSpec("order_finished_timestamp"),
+    _price("ride_price"),
+    _price("booking_fee"),
+    _price("toll_fee"),
+    _price("cancellation_fee"),
+    _price("tip"),
+    _price("net_earnings"),
+    _price("cash_discount"),
+    _price("in_app_discount"),
+    _price("commission"),
+    FieldSpec("currency", "order_price.currency", default="EUR", default_when=FALSY),
+    FieldSpec("is_scheduled", default=False, default_when=MISSING),
+    FieldSpec("category_name", "category_info.name"),
+    FieldSpec("category_seats", "category_info.seats"),
+    FieldSpec("category_vehicle_type", "category_info.vehicle_type"),
+    FieldSpec("order_stops", coerce=lambda stops: stops or None),
+)
+
+STATE_LOG_FIELDS = (
+    FieldSpec("id", _state_log_id),
+    FieldSpec("org_id", "$org_id"),
+    FieldSpec("driver_uuid"),
+    FieldSpec("vehicle_uuid"),
+    FieldSpec("created"),
+    FieldSpec("state"),
+    FieldSpec("lat"),
+    FieldSpec("lng"),
+    FieldSpec("active_categories", coerce=lambda categories: categories or None),
+)
+
+DRIVER_FIELDS = (
+    FieldSpec("id", ("driver_uuid", "id"), required=True),
+    FieldSpec("org_id", "$org_id"),
+    FieldSpec("first_name", default="", default_when=MISSING),
+    FieldSpec("last_name", default="", default_when=MISSING),
+    FieldSpec("email"),
+    FieldSpec("phone"),
+    FieldSpec("active", _driver_active),
+)
+
+VEHICLE_FIELDS = (
+    FieldSpec("id", ("uuid", "id"), required=True),
+    FieldSpec("org_id", "$org_id"),
+    FieldSpec("provider_vehicle_id", ("uuid", "id")),
+    FieldSpec("plate", "reg_number", default="", default_when=MISSING),  # Bolt utilise "reg_number"
+    FieldSpec("model"),
+)
+
+build_order_row = compile_mapping("order", ORDER_FIELDS)
+build_state_log_row = compile_mapping("state_log", STATE_LOG_FIELDS)
+build_driver_row = compile_mapping("driver", DRIVER_FIELDS)
+build_vehicle_row = compile_mapping("vehicle", VEHICLE_FIELDS)
@@ -1,6 +1,8 @@
 from app.core.config import get_settings
 from app.core import logging as app_logging
+from app.core.auth_cache import org_context_cache
 from app.core.supabase_db import SupabaseDB
+from app.core.sync_ledger import tracked_sync
 from app.models.bolt_org import BoltOrganization
 from app.bolt_integration.bolt_client import BoltClient
 
@@ -8,7 +10,8 @@ settings = get_settings()
 logger = app_logging.get_logger(__name__)
 
 
-def sync_orgs(db: SupabaseDB, client: BoltClient, org_id: str | None = None) -> None:
+@tracked_sync("bolt", "orgs")
+def sync_orgs(db: SupabaseDB, client: BoltClient, org_id: str | None = None) -> dict:
     """
     Synchronise les organizations Bolt depuis l'API.
     Appelle /fleetIntegration/v1/getCompanies pour obtenir les company_ids disponibles.
@@ -32,7 +35,7 @@ def sync_orgs(db: SupabaseDB, client: BoltClient, org_id: str | None = None) ->
         
         if not company_ids:
             logger.warning("Aucun company_id récupéré depuis Bolt")
-            return
+            return {"pages": 1, "fetched": 0, "saved": 0}
         
         # Sauvegarder chaque company_id dans la table bolt_organizations
         saved_count = 0
@@ -48,9 +51,33 @@ def sync_orgs(db: SupabaseDB, client: BoltClient, org_id: str | None = None) ->
             saved_count += 1
         
         db.commit()
+        org_context_cache.invalidate(org_id)
         logger.info(f"{saved_count} organization(s) Bolt sauvegardée(s) avec org_id={org_id}")
+        return {"pages": 1, "fetched": len(company_ids), "saved": saved_count}
         
     except Exception as e:
         logger.error(f"Erreur lors de la synchronisation des organizations Bolt: {str(e)}")
         raise
 
+
+def get_company_ids(db: SupabaseDB, org_id: str, company_id: str | None = None) -> list[str]:
+    """
+    Retourne la liste des company_ids Bolt à synchroniser pour une org.
+    Priorité : company_id explicite, puis toutes les companies stockées par sync_orgs,
+    puis BOLT_DEFAULT_FLEET_ID en dernier recours.
+    Les companies stockées sont relues au plus une fois par ORG_CONTEXT_TTL_SECONDS (org_context_cache).
+    """
+    if company_id:
+        return [str(company_id)]
+    
+    def load() -> list[str]:
+        bolt_orgs = db.query(BoltOrganization).filter(BoltOrganization.org_id == org_id).all()
+        return sorted({str(org.id) for org in bolt_orgs if org.id})
+
+    company_ids = list(org_context_cache.get_or_load(org_id, "bolt_company_ids", load))
+    if company_ids:
+        return company_ids
+    
+    if settings.bolt_default_fleet_id:
+        return [settings.bolt_default_fleet_id]
+    return []
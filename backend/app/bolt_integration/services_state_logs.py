@@ -3,14 +3,20 @@ from datetime import datetime
 
 from app.core.config import get_settings
 from app.core.supabase_db import SupabaseDB
+from app.core.sync_ledger import tracked_sync
 from app.models.bolt_state_log import BoltStateLog
 from app.models.bolt_org import BoltOrganization
 from app.bolt_integration.bolt_client import BoltClient
+from app.bolt_integration.row_mapping import build_state_log_row
+from app.bolt_integration.state_intervals import compact_state_logs, touched_ranges
+from app.analytics.driver_activity import refresh_driver_activity
+from app.analytics.mirror import mirror_rows
 
 settings = get_settings()
 
 
-def sync_state_logs(db: SupabaseDB, client: BoltClient, company_id: str | None = None, start: datetime | None = None, end: datetime | None = None, org_id: str | None = None, limit: int = 1000, offset: int = 0, incremental: bool = True) -> None:
+@tracked_sync("bolt", "state_logs")
+def sync_state_logs(db: SupabaseDB, client: BoltClient, company_id: str | None = None, start: datetime | None = None, end: datetime | None = None, org_id: str | None = None, limit: int = 1000, offset: int = 0, incremental: bool = True) -> dict:
     """
     Synchronise les logs d'état des drivers Bolt depuis l'API getFleetStateLogs.
     Utilise POST /fleetIntegration/v1/getFleetStateLogs selon la documentation Bolt.
@@ -18,6 +24,10 @@ def sync_state_logs(db: SupabaseDB, client: BoltClient, company_id: str | None =
     Args:
         incremental: Si True, récupère le dernier timestamp synchronisé et ne synchronise que les nouveaux logs.
                     Sinon, synchronise la période spécifiée.
+    
+    Returns:
+        dict avec pages, fetched (lignes reçues de Bolt), saved, skipped, la fenêtre start_ts/end_ts
+        intervals (résultat de la compaction en intervalles d'état) et activity (jours d'activité recalculés)
     """
     from app.core import logging as app_logging
     logger = app_logging.get_logger(__name__)
@@ -79,7 +89,11 @@ def sync_state_logs(db: SupabaseDB, client: BoltClient, company_id: str | None =
     current_offset = offset
     total_saved = 0
     total_skipped = 0
+    total_fetched = 0
     page = 1
+    # Plage de logs reçus par driver, y compris les déjà présents : une sync relancée après
+    # une compaction interrompue recalcule les mêmes intervalles (idempotent)
+    touched: dict[str, tuple[int, int]] = {}
     
     logger.info(f"[SYNC STATE LOGS] Début synchronisation complète des state logs (company_id={company_id}, org_id={org_id}, start_ts={start_ts}, end_ts={end_ts})")
     
@@ -115,6 +129,7 @@ def sync_state_logs(db: SupabaseDB, client: BoltClient, company_id: str | None =
         state_logs_data = data.get("data", {})
         state_logs = state_logs_data.get("state_logs", [])
         logger.info(f"[SYNC STATE LOGS] Page {page}: Récupéré {len(state_logs)} state logs depuis Bolt")
+        total_fetched += len(state_logs)
         
         if not state_logs:
             # Plus de state logs à récupérer
@@ -126,38 +141,28 @@ def sync_state_logs(db: SupabaseDB, client: BoltClient, company_id: str | None =
         skipped_count = 0
         
         try:
+            ctx = {"org_id": org_id}
+            rows = []
             for log in state_logs:
-                # Générer un ID unique: driver_uuid + created timestamp
-                log_id = f"{log.get('driver_uuid')}_{log.get('created')}"
+                # Ligne prête pour l'upsert, construite par le mapping compilé (voir row_mapping.STATE_LOG_FIELDS)
+                row = build_state_log_row(log, ctx)
+                touched_ranges([row], touched)
                 
-                # Skip si déjà présent
-                if log_id in existing_ids:
+                # Skip si déjà présent (ID = driver_uuid + created timestamp)
+                if row["id"] in existing_ids:
                     skipped_count += 1
                     continue
                 
                 # Ajouter à la liste des existants pour éviter les doublons dans les pages suivantes
-                existing_ids.add(log_id)
-                
-                # Extraire active_categories (structure complexe)
-                active_categories = log.get("active_categories")
-                
-                bolt_state_log = BoltStateLog(
-                    id=log_id,
-                    org_id=org_id,
-                    driver_uuid=log.get("driver_uuid"),
-                    vehicle_uuid=log.get("vehicle_uuid"),
-                    created=log.get("created"),
-                    state=log.get("state"),
-                    lat=log.get("lat"),
-                    lng=log.get("lng"),
-                    active_categories=active_categories if active_categories else None,
-                )
-                
-                db.merge(bolt_state_log)
-                saved_count += 1
+                existing_ids.add(row["id"])
+                rows.append(row)
+            
+            # Un upsert en masse par page au lieu d'une requête par log
+            saved_count = db.bulk_upsert(BoltStateLog, rows)
             
             # Commit après chaque page pour éviter de perdre les données en cas d'erreur
             db.commit()
+            mirror_rows(BoltStateLog, org_id, rows)
             total_saved += saved_count
             total_skipped += skipped_count
             logger.info(f"[SYNC STATE LOGS] Page {page}: {saved_count} state logs sauvegardés, {skipped_count} ignorés (total: {total_saved} sauvegardés, {total_skipped} ignorés)")
@@ -182,4 +187,27 @@ def sync_state_logs(db: SupabaseDB, client: BoltClient, company_id: str | None =
             break
     
     logger.info(f"[SYNC STATE LOGS] Synchronisation terminée: {total_saved} state logs sauvegardés, {total_skipped} déjà présents (ignorés) avec org_id={org_id}")
-
+    
+    # Compaction des logs reçus en intervalles d'état (bolt_state_intervals), puis recalcul
+    # de l'activité quotidienne des drivers touchés sur la période des intervalles réécrits
+    activity = None
+    try:
+        intervals = compact_state_logs(db, org_id, touched)
+        if intervals["start_ts"] is not None:
+            activity = refresh_driver_activity(db, org_id, intervals["start_ts"], intervals["end_ts"], touched)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.error(f"[SYNC STATE LOGS] Erreur lors de la compaction en intervalles: {e}", exc_info=True)
+        raise
+    
+    return {
+        "pages": page,
+        "fetched": total_fetched,
+        "saved": total_saved,
+        "skipped": total_skipped,
+        "start_ts": start_ts,
+        "end_ts": end_ts,
+        "intervals": intervals,
+        "activity": activity,
+    }
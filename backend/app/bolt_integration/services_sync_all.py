@@ -1,13 +1,18 @@
 """
 Service d'orchestration pour synchroniser toutes les données Bolt dans le bon ordre.
+Les companies Bolt d'une même org sont synchronisées en parallèle (pool borné),
+en partageant le limiteur de débit global du BoltClient.
 """
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta
+from typing import Any, Callable
 
 from app.core.config import get_settings
 from app.core import logging as app_logging
 from app.core.supabase_db import SupabaseDB
+from app.core.sync_ledger import bind_context
 from app.bolt_integration.bolt_client import BoltClient
-from app.bolt_integration.services_orgs import sync_orgs
+from app.bolt_integration.services_orgs import sync_orgs, get_company_ids
 from app.bolt_integration.services_drivers import sync_drivers
 from app.bolt_integration.services_vehicles import sync_vehicles
 from app.bolt_integration.services_trips import sync_trips
@@ -18,23 +23,109 @@ from app.models.bolt_order import BoltOrder
 settings = get_settings()
 logger = app_logging.get_logger(__name__)
 
+COMPANY_STREAMS = ("drivers", "vehicles", "orders", "state_logs")
+
+
+def run_for_companies(
+    company_ids: list[str],
+    fn: Callable[[str], Any],
+    max_workers: int | None = None,
+    label: str = "SYNC",
+) -> dict[str, dict]:
+    """
+    Exécute fn(company_id) pour chaque company en parallèle, avec au plus
+    max_workers companies simultanées (BOLT_MAX_CONCURRENT_COMPANIES par défaut).
+
+    Returns:
+        dict company_id -> {"status": "success"|"error", "result": ..., "error": ...}
+    """
+    results: dict[str, dict] = {}
+    if not company_ids:
+        return results
+
+    workers = max(1, min(len(company_ids), max_workers or settings.bolt_max_concurrent_companies))
+    logger.info(f"[{label}] {len(company_ids)} company(s) à synchroniser, {workers} en parallèle")
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bolt_company") as pool:
+        # Les appels API des companies restent attribués au run de l'appelant
+        task = bind_context(fn)
+        futures = {pool.submit(task, cid): cid for cid in company_ids}
+        for future in as_completed(futures):
+            cid = futures[future]
+            try:
+                results[cid] = {"status": "success", "result": future.result(), "error": None}
+            except Exception as e:
+                logger.error(f"[{label}] ✗ company_id={cid}: {str(e)}")
+                results[cid] = {"status": "error", "result": None, "error": str(e)}
+    return results
+
+
+def _aggregate_status(statuses: list[str]) -> str:
+    """success si tout a réussi, error si tout a échoué, partial sinon."""
+    if not statuses:
+        return "pending"
+    if all(s == "success" for s in statuses):
+        return "success"
+    if all(s == "error" for s in statuses):
+        return "error"
+    return "partial"
+
+
+def _sync_company(
+    db: SupabaseDB,
+    org_id: str,
+    company_id: str,
+    start_date: datetime,
+    end_date: datetime,
+    drivers_synced: bool = False,
+) -> dict:
+    """
+    Synchronise drivers, véhicules, orders et state logs d'une seule company, séquentiellement
+    (une seule requête Bolt en vol par company). drivers_synced : drivers déjà synchronisés
+    pour toute l'org, l'étape drivers est sautée.
+    """
+    client = BoltClient()
+    streams = {name: {"status": "pending", "error": None} for name in COMPANY_STREAMS}
+
+    steps = [
+        ("drivers", lambda: None if drivers_synced else sync_drivers(db, client, company_id=company_id, org_id=org_id)),
+        ("vehicles", lambda: sync_vehicles(db, client, company_id=company_id, org_id=org_id)),
+        # Mode incrémental activé par défaut
+        ("orders", lambda: sync_trips(db, client, company_id=company_id, start=start_date, end=end_date, org_id=org_id, incremental=True)),
+        ("state_logs", lambda: sync_state_logs(db, client, company_id=company_id, start=start_date, end=end_date, org_id=org_id, incremental=True)),
+    ]
+
+    for name, step in steps:
+        try:
+            step()
+            streams[name]["status"] = "success"
+            logger.info(f"[SYNC ALL] ✓ company_id={company_id}: {name} synchronisés")
+        except Exception as e:
+            logger.error(f"[SYNC ALL] ✗ company_id={company_id}: erreur sync {name}: {str(e)}")
+            streams[name]["status"] = "error"
+            streams[name]["error"] = str(e)
+            # Si on ne peut pas sync les drivers, on ne peut pas sync trips/earnings
+            if name == "drivers":
+                break
+    return streams
+
 
 def sync_all_bolt_data(db: SupabaseDB, org_id: str, company_id: str | None = None) -> dict:
     """
     Synchronise toutes les données Bolt dans l'ordre :
     1. Organizations (company_ids)
-    2. Drivers
-    3. Vehicles
-    4. Orders (commandes/trips depuis getFleetOrders)
-    5. State Logs (logs d'état depuis getFleetStateLogs)
-    
+    2. Drivers de toute l'org (sans company_id), avec détection des départs
+    3-5. Pour chaque company (en parallèle) : Vehicles, Orders (getFleetOrders),
+         State Logs (getFleetStateLogs) ; Drivers aussi si l'étape 2 a échoué ou
+         si company_id est fourni
+
     Args:
         db: Instance de SupabaseDB
         org_id: ID de l'organisation
-        company_id: Company ID Bolt (optionnel)
-    
+        company_id: Company ID Bolt (optionnel, sinon toutes les companies de l'org)
+
     Returns:
-        dict avec le statut de chaque synchronisation
+        dict avec le statut agrégé de chaque synchronisation et le détail par company
     """
     results = {
         "orgs": {"status": "pending", "error": None},
@@ -42,14 +133,15 @@ def sync_all_bolt_data(db: SupabaseDB, org_id: str, company_id: str | None = Non
         "vehicles": {"status": "pending", "error": None, "count": 0},
         "orders": {"status": "pending", "error": None, "count": 0},
         "state_logs": {"status": "pending", "error": None, "count": 0},
+        "companies": {},
     }
-    
+
     client = BoltClient()
-    
+
     try:
         # 1. Synchroniser les organizations
         logger.info(f"[SYNC ALL] Début synchronisation Bolt pour org_id={org_id}")
-        logger.info("[SYNC ALL] Étape 1/5: Synchronisation des organizations...")
+        logger.info("[SYNC ALL] Étape 1/2: Synchronisation des organizations...")
         try:
             sync_orgs(db, client, org_id=org_id)
             results["orgs"]["status"] = "success"
@@ -59,83 +151,62 @@ def sync_all_bolt_data(db: SupabaseDB, org_id: str, company_id: str | None = Non
             results["orgs"]["status"] = "error"
             results["orgs"]["error"] = str(e)
             # On continue quand même
-        
-        # 2. Synchroniser les drivers
-        logger.info("[SYNC ALL] Étape 2/5: Synchronisation des drivers...")
-        try:
-            sync_drivers(db, client, company_id=company_id, org_id=org_id)
-            # Compter les drivers synchronisés
-            driver_count = db.query(BoltDriver).filter(BoltDriver.org_id == org_id).count()
-            results["drivers"]["status"] = "success"
-            results["drivers"]["count"] = driver_count
-            logger.info(f"[SYNC ALL] ✓ Drivers synchronisés: {driver_count} drivers")
-        except Exception as e:
-            logger.error(f"[SYNC ALL] ✗ Erreur sync drivers: {str(e)}")
-            results["drivers"]["status"] = "error"
-            results["drivers"]["error"] = str(e)
-            # Si on ne peut pas sync les drivers, on ne peut pas sync trips/earnings
+
+        company_ids = get_company_ids(db, org_id, company_id)
+        if not company_ids:
+            error = "Aucun company_id Bolt trouvé (ni en DB, ni BOLT_DEFAULT_FLEET_ID)"
+            logger.error(f"[SYNC ALL] ✗ {error}")
+            for name in COMPANY_STREAMS:
+                results[name]["status"] = "error"
+                results[name]["error"] = error
             return results
-        
-        # 3. Synchroniser les véhicules
-        logger.info("[SYNC ALL] Étape 3/5: Synchronisation des véhicules...")
-        try:
-            from app.models.bolt_vehicle import BoltVehicle
-            sync_vehicles(db, client, company_id=company_id, org_id=org_id)
-            vehicle_count = db.query(BoltVehicle).filter(BoltVehicle.org_id == org_id).count()
-            results["vehicles"]["status"] = "success"
-            results["vehicles"]["count"] = vehicle_count
-            logger.info(f"[SYNC ALL] ✓ Véhicules synchronisés: {vehicle_count} véhicules")
-        except Exception as e:
-            logger.error(f"[SYNC ALL] ✗ Erreur sync véhicules: {str(e)}")
-            results["vehicles"]["status"] = "error"
-            results["vehicles"]["error"] = str(e)
-            # On continue pour sync trips/earnings
-        
-        # 4. Synchroniser les orders (commandes/trips)
-        logger.info("[SYNC ALL] Étape 4/5: Synchronisation des orders...")
-        try:
-            # Par défaut, sync les 30 derniers jours
-            end_date = datetime.utcnow()
-            start_date = end_date - timedelta(days=30)
-            
-            # Sync orders pour la company (mode incrémental activé par défaut)
-            sync_trips(db, client, company_id=company_id, start=start_date, end=end_date, org_id=org_id, incremental=True)
-            
-            # Compter les orders synchronisés
-            orders_count = db.query(BoltOrder).filter(BoltOrder.org_id == org_id).count()
-            results["orders"]["status"] = "success"
-            results["orders"]["count"] = orders_count
-            logger.info(f"[SYNC ALL] ✓ Orders synchronisés: {orders_count} orders")
-        except Exception as e:
-            logger.error(f"[SYNC ALL] ✗ Erreur sync orders: {str(e)}")
-            results["orders"]["status"] = "error"
-            results["orders"]["error"] = str(e)
-        
-        # 5. Synchroniser les state logs
-        logger.info("[SYNC ALL] Étape 5/5: Synchronisation des state logs...")
-        try:
-            # Par défaut, sync les 30 derniers jours
-            end_date = datetime.utcnow()
-            start_date = end_date - timedelta(days=30)
-            
-            # Sync state logs pour la company (mode incrémental activé par défaut)
-            sync_state_logs(db, client, company_id=company_id, start=start_date, end=end_date, org_id=org_id, incremental=True)
-            
-            from app.models.bolt_state_log import BoltStateLog
-            state_logs_count = db.query(BoltStateLog).filter(BoltStateLog.org_id == org_id).count()
-            results["state_logs"]["status"] = "success"
-            results["state_logs"]["count"] = state_logs_count
-            logger.info(f"[SYNC ALL] ✓ State logs synchronisés: {state_logs_count} logs")
-        except Exception as e:
-            logger.error(f"[SYNC ALL] ✗ Erreur sync state logs: {str(e)}")
-            results["state_logs"]["status"] = "error"
-            results["state_logs"]["error"] = str(e)
-        
-        logger.info(f"[SYNC ALL] Synchronisation complète pour org_id={org_id}")
+
+        # 2. Synchroniser chaque company en parallèle (par défaut, les 30 derniers jours)
+        logger.info(f"[SYNC ALL] Étape 2/2: Synchronisation de {len(company_ids)} company(s)...")
+        end_date = datetime.utcnow()
+        start_date = end_date - timedelta(days=30)
+
+        # Drivers de toute l'org en une passe : seul le référentiel complet permet de marquer
+        # inactifs les drivers partis ; en cas d'échec, repli sur la passe par company
+        drivers_synced = False
+        if company_id is None:
+            try:
+                sync_drivers(db, client, org_id=org_id)
+                drivers_synced = True
+            except Exception as e:
+                logger.warning(f"[SYNC ALL] Sync des drivers de l'org impossible ({e}), repli par company")
+
+        per_company = run_for_companies(
+            company_ids,
+            lambda cid: _sync_company(db, org_id, cid, start_date, end_date, drivers_synced=drivers_synced),
+            label="SYNC ALL",
+        )
+        for cid, outcome in per_company.items():
+            results["companies"][cid] = outcome["result"] or {
+                name: {"status": "error", "error": outcome["error"]} for name in COMPANY_STREAMS
+            }
+
+        # Agréger les statuts par stream
+        for name in COMPANY_STREAMS:
+            streams = [company[name] for company in results["companies"].values()]
+            results[name]["status"] = _aggregate_status([s["status"] for s in streams])
+            errors = [f"{cid}: {company[name]['error']}" for cid, company in results["companies"].items() if company[name]["error"]]
+            results[name]["error"] = "; ".join(errors) or None
+
+        # Compter les lignes synchronisées pour l'org (toutes companies confondues)
+        from app.models.bolt_vehicle import BoltVehicle
+        from app.models.bolt_state_log import BoltStateLog
+        for name, model in (("drivers", BoltDriver), ("vehicles", BoltVehicle), ("orders", BoltOrder), ("state_logs", BoltStateLog)):
+            if results[name]["status"] in ("success", "partial"):
+                results[name]["count"] = db.query(model).filter(model.org_id == org_id).count()
+
+        logger.info(
+            f"[SYNC ALL] Synchronisation complète pour org_id={org_id}: "
+            + ", ".join(f"{name}={results[name]['status']}" for name in COMPANY_STREAMS)
+        )
         return results
-        
+
     except Exception as e:
         logger.error(f"[SYNC ALL] Erreur générale: {str(e)}")
         results["error"] = str(e)
         return results
-
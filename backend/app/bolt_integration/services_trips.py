@@ -3,14 +3,20 @@ from datetime import datetime
 
 from app.core.config import get_settings
 from app.core.supabase_db import SupabaseDB
+from app.core.sync_ledger import tracked_sync
 from app.models.bolt_order import BoltOrder
 from app.models.bolt_org import BoltOrganization
 from app.bolt_integration.bolt_client import BoltClient
+from app.bolt_integration.row_mapping import build_order_row
+from app.analytics.driver_activity import refresh_driver_activity
+from app.analytics.mirror import mirror_rows
+from app.analytics.rollups import bolt_order_cells, refresh_analytics_rollups
 
 settings = get_settings()
 
 
-def sync_trips(db: SupabaseDB, client: BoltClient, company_id: str | None = None, start: datetime | None = None, end: datetime | None = None, org_id: str | None = None, limit: int = 1000, offset: int = 0, incremental: bool = True) -> None:
+@tracked_sync("bolt", "orders")
+def sync_trips(db: SupabaseDB, client: BoltClient, company_id: str | None = None, start: datetime | None = None, end: datetime | None = None, org_id: str | None = None, limit: int = 1000, offset: int = 0, incremental: bool = True) -> dict:
     """
     Synchronise les commandes Bolt (orders) depuis l'API getFleetOrders.
     Utilise POST /fleetIntegration/v1/getFleetOrders selon la documentation Bolt.
@@ -18,6 +24,10 @@ def sync_trips(db: SupabaseDB, client: BoltClient, company_id: str | None = None
     Args:
         incremental: Si True, récupère le dernier timestamp synchronisé et ne synchronise que les nouvelles commandes.
                     Sinon, synchronise la période spécifiée.
+    
+    Returns:
+        dict avec pages, fetched (lignes reçues de Bolt), saved, skipped, la fenêtre start_ts/end_ts
+        activity (jours d'activité des drivers recalculés) et rollups (cellules analytics recalculées)
     """
     from app.core import logging as app_logging
     logger = app_logging.get_logger(__name__)
@@ -79,7 +89,13 @@ def sync_trips(db: SupabaseDB, client: BoltClient, company_id: str | None = None
     current_offset = offset
     total_saved = 0
     total_skipped = 0
+    total_fetched = 0
     page = 1
+    # Horodatages (fin ou création) des commandes reçues, y compris les déjà présentes :
+    # une sync relancée recalcule les mêmes jours d'activité
+    touched_ts: list[int] = []
+    touched_drivers: set[str] = set()
+    rollup_cells: set = set()
     
     logger.info(f"[SYNC ORDERS] Début synchronisation complète des orders (company_id={company_id}, org_id={org_id}, start_ts={start_ts}, end_ts={end_ts})")
     
@@ -117,6 +133,7 @@ def sync_trips(db: SupabaseDB, client: BoltClient, company_id: str | None = None
         orders_data = data.get("data", {})
         orders = orders_data.get("orders", [])
         logger.info(f"[SYNC ORDERS] Page {page}: Récupéré {len(orders)} orders depuis Bolt")
+        total_fetched += len(orders)
         
         if not orders:
             # Plus d'orders à récupérer
@@ -128,8 +145,16 @@ def sync_trips(db: SupabaseDB, client: BoltClient, company_id: str | None = None
         skipped_count = 0
         
         try:
+            ctx = {"org_id": org_id, "company_id": company_id, "company_name": orders_data.get("company_name")}
+            rows = []
             for order in orders:
                 order_reference = order.get("order_reference")
+                order_ts = order.get("order_finished_timestamp") or order.get("order_created_timestamp")
+                if order_ts:
+                    touched_ts.append(int(order_ts))
+                if order.get("driver_uuid"):
+                    touched_drivers.add(order["driver_uuid"])
+                bolt_order_cells([order], rollup_cells)
                 
                 # Skip si déjà présent
                 if order_reference and order_reference in existing_order_refs:
@@ -140,60 +165,17 @@ def sync_trips(db: SupabaseDB, client: BoltClient, company_id: str | None = None
                 if order_reference:
                     existing_order_refs.add(order_reference)
                 
-                order_price = order.get("order_price", {})
-                
-                # Extraire les stops (peut être un array)
-                order_stops = order.get("order_stops", [])
-                
-                # Extraire category_info
-                category_info = order.get("category_info", {})
-                
-                bolt_order = BoltOrder(
-                    order_reference=order_reference,
-                    org_id=org_id,
-                    company_id=int(company_id),  # Utiliser le company_id qu'on a passé à l'API
-                    company_name=orders_data.get("company_name"),
-                    driver_uuid=order.get("driver_uuid"),
-                    partner_uuid=order.get("partner_uuid"),
-                    driver_name=order.get("driver_name"),
-                    driver_phone=order.get("driver_phone"),
-                    payment_method=order.get("payment_method"),
-                    payment_confirmed_timestamp=order.get("payment_confirmed_timestamp"),
-                    order_created_timestamp=order.get("order_created_timestamp"),
-                    order_status=order.get("order_status"),
-                    driver_cancelled_reason=order.get("driver_cancelled_reason"),
-                    vehicle_model=order.get("vehicle_model"),
-                    vehicle_license_plate=order.get("vehicle_license_plate"),
-                    price_review_reason=order.get("price_review_reason"),
-                    pickup_address=order.get("pickup_address"),
-                    ride_distance=order.get("ride_distance") or 0,
-                    order_accepted_timestamp=order.get("order_accepted_timestamp"),
-                    order_pickup_timestamp=order.get("order_pickup_timestamp"),
-                    order_drop_off_timestamp=order.get("order_drop_off_timestamp"),
-                    order_finished_timestamp=order.get("order_finished_timestamp"),
-                    # Prix détaillés (gérer None explicitement)
-                    ride_price=order_price.get("ride_price") if order_price.get("ride_price") is not None else 0,
-                    booking_fee=order_price.get("booking_fee") if order_price.get("booking_fee") is not None else 0,
-                    toll_fee=order_price.get("toll_fee") if order_price.get("toll_fee") is not None else 0,
-                    cancellation_fee=order_price.get("cancellation_fee") if order_price.get("cancellation_fee") is not None else 0,
-                    tip=order_price.get("tip") if order_price.get("tip") is not None else 0,
-                    net_earnings=order_price.get("net_earnings") if order_price.get("net_earnings") is not None else 0,
-                    cash_discount=order_price.get("cash_discount") if order_price.get("cash_discount") is not None else 0,
-                    in_app_discount=order_price.get("in_app_discount") if order_price.get("in_app_discount") is not None else 0,
-                    commission=order_price.get("commission") if order_price.get("commission") is not None else 0,
-                    currency=order_price.get("currency") or "EUR",
-                    is_scheduled=order.get("is_scheduled", False),
-                    category_name=category_info.get("name"),
-                    category_seats=category_info.get("seats"),
-                    category_vehicle_type=category_info.get("vehicle_type"),
-                    order_stops=order_stops if order_stops else None,
-                )
-                
-                db.merge(bolt_order)
-                saved_count += 1
+                # Ligne prête pour l'upsert, construite par le mapping compilé (voir row_mapping.ORDER_FIELDS)
+                row = build_order_row(order, ctx)
+                if row is not None:
+                    rows.append(row)
+            
+            # Un upsert en masse par page au lieu d'une requête par order
+            saved_count = db.bulk_upsert(BoltOrder, rows)
             
             # Commit après chaque page pour éviter de perdre les données en cas d'erreur
             db.commit()
+            mirror_rows(BoltOrder, org_id, rows)
             total_saved += saved_count
             total_skipped += skipped_count
             logger.info(f"[SYNC ORDERS] Page {page}: {saved_count} orders sauvegardés, {skipped_count} ignorés (total: {total_saved} sauvegardés, {total_skipped} ignorés)")
@@ -218,4 +200,26 @@ def sync_trips(db: SupabaseDB, client: BoltClient, company_id: str | None = None
             break
     
     logger.info(f"[SYNC ORDERS] Synchronisation terminée: {total_saved} orders sauvegardés, {total_skipped} déjà présents (ignorés) avec org_id={org_id}")
-
+    
+    # Recalcul de l'activité quotidienne et des rollups analytics des drivers et des jours des commandes reçues
+    activity = rollups = None
+    if touched_ts:
+        try:
+            activity = refresh_driver_activity(db, org_id, min(touched_ts), max(touched_ts), touched_drivers)
+            rollups = refresh_analytics_rollups(db, org_id, rollup_cells)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.error(f"[SYNC ORDERS] Erreur lors du recalcul de l'activité des drivers et des rollups: {e}", exc_info=True)
+            raise
+    
+    return {
+        "pages": page,
+        "fetched": total_fetched,
+        "saved": total_saved,
+        "skipped": total_skipped,
+        "start_ts": start_ts,
+        "end_ts": end_ts,
+        "activity": activity,
+        "rollups": rollups,
+    }
@@ -2,104 +2,110 @@ import time
 
 from app.core.config import get_settings
 from app.core.supabase_db import SupabaseDB
+from app.core.sync_ledger import tracked_sync
 from app.models.bolt_vehicle import BoltVehicle
-from app.models.bolt_org import BoltOrganization
 from app.bolt_integration.bolt_client import BoltClient
+from app.bolt_integration.pagination import fetch_all_pages
+from app.bolt_integration.services_orgs import get_company_ids
+from app.bolt_integration.row_mapping import build_vehicle_row
+from app.bolt_integration.snapshot_diff import diff_snapshot, snapshot_cache
 
 settings = get_settings()
 
 
-def sync_vehicles(db: SupabaseDB, client: BoltClient, company_id: str | None = None, org_id: str | None = None, limit: int = 100, offset: int = 0) -> None:
+@tracked_sync("bolt", "vehicles")
+def sync_vehicles(db: SupabaseDB, client: BoltClient, company_id: str | None = None, org_id: str | None = None, limit: int = 100, offset: int = 0) -> dict:
     """
-    Synchronise les véhicules Bolt depuis l'API.
+    Synchronise les véhicules Bolt depuis l'API, par différence.
     Utilise POST /fleetIntegration/v1/getVehicles selon la documentation Bolt.
+
+    Toutes les pages sont récupérées (préchargement concurrent dès que la première page est
+    pleine), pour company_id ou pour toutes les companies de l'org en parallèle. Les véhicules
+    inchangés par rapport au snapshot stocké ne sont pas réécrits ; le reste part en un upsert groupé.
+
+    Returns:
+        Résumé des changements (fetched, inserted, updated, unchanged, missing, requests)
     """
     from app.core.config import get_settings
     from app.core import logging as app_logging
-    
+    from app.bolt_integration.services_sync_all import run_for_companies
+
     logger = app_logging.get_logger(__name__)
     config = get_settings()
-    
+
     # Déterminer org_id si non fourni
     if not org_id:
         org_id = config.bolt_default_fleet_id or config.uber_default_org_id or "default_org"
-    
-    # Utiliser company_id depuis les paramètres, puis depuis la DB, puis depuis les settings
-    if not company_id:
-        # Essayer de récupérer depuis la DB
-        bolt_org = db.query(BoltOrganization).filter(BoltOrganization.org_id == org_id).first()
-        if bolt_org:
-            company_id = bolt_org.id
-            logger.info(f"Utilisation du company_id depuis la DB: {company_id}")
-        else:
-            # Fallback sur les settings
-            company_id = config.bolt_default_fleet_id
-    
+
+    # company_id explicite, sinon toutes les companies de l'org (DB), sinon les settings
+    company_ids = [company_id] if company_id else get_company_ids(db, org_id)
+
     # IMPORTANT: company_id est REQUIS par l'API Bolt
-    if not company_id or (company_id and not company_id.isdigit()):
+    if not company_ids or any(not str(cid).isdigit() for cid in company_ids):
         raise ValueError(
             "BOLT_DEFAULT_FLEET_ID (company_id) est requis pour synchroniser les véhicules Bolt. "
             "Ajoute-le dans backend/.env avec la valeur de ton company_id Bolt."
         )
-    
-    # Construire le payload selon la documentation Bolt
-    # Format exact de la doc: offset, limit, company_id, start_ts, end_ts, portal_status, search
+
     # Note: L'API exige start_ts et end_ts même si la doc dit qu'ils sont optionnels
     # La plage de dates doit être strictement inférieure à 31 jours (sinon erreur INVALID_DATE_RANGE)
-    # start_ts peut remonter jusqu'à 16 mois dans le passé, mais la plage max est 30 jours
     # On utilise 30 jours dans le passé pour start_ts et maintenant pour end_ts
     now = int(time.time())
-    # 30 jours = 30 * 24 * 60 * 60 secondes = 2,592,000 secondes
     thirty_days_ago = now - (30 * 24 * 60 * 60)
-    
-    payload = {
-        "offset": offset,
-        "limit": min(limit, 100) if limit > 0 else 100,  # Max 100 selon la doc, défaut à 100
-        "company_id": int(company_id),
-        "start_ts": thirty_days_ago,  # Timestamp de début (30 jours dans le passé, plage max autorisée)
-        "end_ts": now,  # Timestamp de fin (maintenant)
-        # portal_status omis car optionnel
-        # search omis car optionnel et pas de recherche à effectuer
-    }
-    
-    logger.info(f"Sync Bolt vehicles: company_id={company_id}, limit={limit}, offset={offset}")
-    logger.debug(f"Payload: {payload}")
-    
-    # Appel POST vers l'endpoint Bolt
-    data = client.post("/fleetIntegration/v1/getVehicles", payload)
-    
-    if data.get("code") != 0:
-        error_msg = data.get("message", "Unknown error")
-        raise RuntimeError(f"Bolt API error: {error_msg}")
-    
-    # La réponse Bolt a la structure: { "code": 0, "message": "...", "data": { "vehicles": [...] } }
-    vehicles = data.get("data", {}).get("vehicles", [])
-    logger.info(f"Récupéré {len(vehicles)} véhicules depuis Bolt")
-    
-    if not vehicles:
-        logger.warning("Aucun véhicule récupéré depuis Bolt. Vérifie que company_id est correct.")
-        return
-    
-    org_id = settings.bolt_default_fleet_id or settings.uber_default_org_id or "default_org"
-    saved_count = 0
-    
-    for v in vehicles:
-        vehicle_uuid = v.get("uuid") or v.get("id")
-        if not vehicle_uuid:
-            logger.warning(f"Véhicule sans UUID ignoré: {v}")
-            continue
-            
-        db.merge(
-            BoltVehicle(
-                id=vehicle_uuid,
-                org_id=org_id,
-                plate=v.get("reg_number", ""),  # Bolt utilise "reg_number"
-                model=v.get("model"),
-                provider_vehicle_id=vehicle_uuid,
-            )
+    page_size = min(limit, 100) if limit > 0 else 100  # Max 100 selon la doc
+
+    logger.info(f"[SYNC VEHICLES] Début synchronisation des véhicules (company_ids={company_ids}, org_id={org_id})")
+
+    def fetch_company(cid: str) -> tuple[list[dict], int]:
+        return fetch_all_pages(
+            client,
+            "/fleetIntegration/v1/getVehicles",
+            {"company_id": int(cid), "start_ts": thirty_days_ago, "end_ts": now},
+            "vehicles",
+            page_size,
+            label=f"SYNC VEHICLES company_id={cid}",
         )
-        saved_count += 1
-    
-    db.commit()
-    logger.info(f"{saved_count} véhicules sauvegardés avec org_id={org_id}")
 
+    per_company = run_for_companies(company_ids, fetch_company, label="SYNC VEHICLES")
+    errors = {cid: outcome["error"] for cid, outcome in per_company.items() if outcome["status"] == "error"}
+    if errors:
+        raise RuntimeError(f"Bolt API error (vehicles): {errors}")
+
+    fetched: list[dict] = []
+    requests = 0
+    for cid in company_ids:
+        vehicles, pages = per_company[cid]["result"]
+        requests += pages
+        for v in vehicles:
+            row = build_vehicle_row(v, {"org_id": org_id})
+            if row is None:
+                logger.warning(f"Véhicule sans UUID ignoré: {v}")
+                continue
+            fetched.append(row)
+
+    if not fetched:
+        logger.warning("Aucun véhicule récupéré depuis Bolt. Vérifie que company_id est correct.")
+
+    # Différence avec le snapshot des véhicules stockés, écriture groupée des seuls changements
+    stored = snapshot_cache.load(db, BoltVehicle, org_id)
+    diff = diff_snapshot(fetched, stored)
+    try:
+        db.bulk_upsert(BoltVehicle, diff.changes)
+        db.commit()
+    except Exception:
+        db.rollback()
+        snapshot_cache.invalidate(BoltVehicle, org_id)
+        raise
+    snapshot_cache.apply(BoltVehicle, org_id, diff.changes)
+
+    summary = {
+        "fetched": len(fetched),
+        "inserted": len(diff.inserts),
+        "updated": len(diff.updates),
+        "unchanged": diff.unchanged,
+        # Véhicules stockés absents de Bolt (table sans statut actif : signalés, pas modifiés)
+        "missing": len(diff.missing) if not company_id else 0,
+        "requests": requests,
+    }
+    logger.info(f"[SYNC VEHICLES] Synchronisation terminée pour org_id={org_id}: {summary}")
+    return summary
@@ -0,0 +1,93 @@
+"""
+Synchronisation par différence : le référentiel complet récupéré chez Bolt est comparé
+à un snapshot des lignes stockées (gardé en mémoire quelques minutes, rechargé depuis la DB
+ensuite), et seules les insertions / mises à jour sont écrites.
+"""
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Optional
+
+from app.core.config import get_settings
+from app.core.supabase_db import SupabaseDB
+
+
+@dataclass
+class SnapshotDiff:
+    inserts: list[dict] = field(default_factory=list)
+    updates: list[dict] = field(default_factory=list)
+    unchanged: int = 0
+    # Lignes stockées absentes du référentiel récupéré
+    missing: list[dict] = field(default_factory=list)
+
+    @property
+    def changes(self) -> list[dict]:
+        return self.inserts + self.updates
+
+
+def diff_snapshot(fetched: list[dict], stored: dict[str, dict], key: str = "id") -> SnapshotDiff:
+    """Compare les lignes récupérées (déjà au format table) au snapshot {clé: ligne}."""
+    diff = SnapshotDiff()
+    seen = set()
+    for row in fetched:
+        row_key = row[key]
+        if row_key in seen:
+            continue
+        seen.add(row_key)
+        previous = stored.get(row_key)
+        if previous is None:
+            diff.inserts.append(row)
+        elif any(previous.get(column) != value for column, value in row.items()):
+            diff.updates.append(row)
+        else:
+            diff.unchanged += 1
+    diff.missing = [row for row_key, row in stored.items() if row_key not in seen]
+    return diff
+
+
+class SnapshotCache:
+    """
+    Snapshot en mémoire des lignes stockées, par (table, org_id).
+    Rechargé depuis Supabase si absent (premier run, redémarrage), invalidé après une erreur
+    d'écriture, ou plus vieux que BOLT_SNAPSHOT_TTL_SECONDS : l'API et le worker écrivent les
+    mêmes tables, chacun ne garde donc le sien que le temps d'une série de syncs rapprochées
+    (une par company) pour ne pas ignorer une écriture nécessaire.
+    """
+
+    def __init__(self, max_age_seconds: Optional[float] = None):
+        self.max_age_seconds = get_settings().bolt_snapshot_ttl_seconds if max_age_seconds is None else max_age_seconds
+        self._snapshots: dict[tuple[str, str], dict[str, dict]] = {}
+        self._loaded_at: dict[tuple[str, str], float] = {}
+        self._lock = threading.Lock()
+
+    def load(self, db: SupabaseDB, model_class: type, org_id: str, key: str = "id") -> dict[str, dict]:
+        cache_key = (model_class.__tablename__, org_id)
+        with self._lock:
+            snapshot = self._snapshots.get(cache_key)
+            if snapshot is not None and time.time() - self._loaded_at[cache_key] > self.max_age_seconds:
+                snapshot = None
+        if snapshot is None:
+            rows = db.fetch_rows(model_class, {"org_id": org_id})
+            snapshot = {row[key]: row for row in rows}
+            with self._lock:
+                self._snapshots[cache_key] = snapshot
+                self._loaded_at[cache_key] = time.time()
+        return dict(snapshot)
+
+    def apply(self, model_class: type, org_id: str, rows: list[dict], key: str = "id") -> None:
+        """Reporte dans le snapshot des lignes qui viennent d'être écrites."""
+        with self._lock:
+            snapshot = self._snapshots.get((model_class.__tablename__, org_id))
+            if snapshot is None:
+                return
+            for row in rows:
+                snapshot[row[key]] = {**snapshot.get(row[key], {}), **row}
+
+    def invalidate(self, model_class: type, org_id: Optional[str] = None) -> None:
+        with self._lock:
+            for cache_key in list(self._snapshots):
+                if cache_key[0] == model_class.__tablename__ and (org_id is None or cache_key[1] == org_id):
+                    del self._snapshots[cache_key]
+
+
+snapshot_cache = SnapshotCache()
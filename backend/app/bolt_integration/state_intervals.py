@@ -0,0 +1,121 @@
+"""
+Compaction des state logs Bolt en intervalles d'état à l'ingestion.
+
+Un log Bolt donne l'état d'un driver à un instant ; cet état dure jusqu'au log suivant.
+Les logs consécutifs de même (état, véhicule) sont fusionnés en un intervalle
+[start_ts, end_ts], end_ts étant le début de l'intervalle suivant. Le dernier intervalle
+d'un driver est ouvert (is_open) : end_ts est alors le dernier log reçu.
+
+Les logs peuvent arriver en désordre (fenêtres de backfill, retards côté Bolt) : pour chaque
+driver touché, seule la portion de frise concernée est recalculée depuis les logs bruts,
+de l'intervalle contenant le plus ancien log reçu jusqu'à l'intervalle suivant le plus récent.
+Les syncs d'une org pouvant tourner en parallèle (fenêtres de backfill, runs par company, sync
+incrémentale), la compaction est sérialisée par org : deux fenêtres qui se chevauchent ne
+suppriment pas les intervalles que l'autre vient d'écrire.
+"""
+from typing import Iterable, Optional
+
+from app.core import logging as app_logging
+from app.core.supabase_db import SupabaseDB
+from app.jobs.leases import serialized
+from app.models.bolt_state_interval import BoltStateInterval
+from app.models.bolt_state_log import BoltStateLog
+
+logger = app_logging.get_logger(__name__)
+
+
+def interval_id(driver_uuid: str, start_ts: int) -> str:
+    return f"{driver_uuid}_{start_ts}"
+
+
+def fold_state_logs(org_id: str, driver_uuid: str, logs: Iterable[dict]) -> list[dict]:
+    """Fusionne les logs d'un driver (dicts created / state / vehicle_uuid) en lignes d'intervalles."""
+    intervals: list[dict] = []
+    for log in sorted(logs, key=lambda log: log["created"]):
+        current = intervals[-1] if intervals else None
+        if current and (current["state"], current["vehicle_uuid"]) == (log["state"], log.get("vehicle_uuid")):
+            current["end_ts"] = log["created"]
+            current["log_count"] += 1
+            continue
+        if current:
+            current["end_ts"] = log["created"]
+            current["is_open"] = False
+        intervals.append({
+            "id": interval_id(driver_uuid, log["created"]),
+            "org_id": org_id,
+            "driver_uuid": driver_uuid,
+            "vehicle_uuid": log.get("vehicle_uuid"),
+            "state": log["state"],
+            "start_ts": log["created"],
+            "end_ts": log["created"],
+            "log_count": 1,
+            "is_open": True,
+        })
+    return intervals
+
+
+def touched_ranges(rows: Iterable[dict], ranges: Optional[dict[str, tuple[int, int]]] = None) -> dict[str, tuple[int, int]]:
+    """Plus ancien et plus récent log reçu par driver (étend ranges s'il est fourni)."""
+    ranges = {} if ranges is None else ranges
+    for row in rows:
+        low, high = ranges.get(row["driver_uuid"], (row["created"], row["created"]))
+        ranges[row["driver_uuid"]] = (min(low, row["created"]), max(high, row["created"]))
+    return ranges
+
+
+def _compact_driver(db: SupabaseDB, org_id: str, driver_uuid: str, min_ts: int, max_ts: int) -> tuple[list[dict], int]:
+    base = (BoltStateInterval.org_id == org_id, BoltStateInterval.driver_uuid == driver_uuid)
+    # Intervalle contenant le plus ancien log reçu, et premier intervalle après le plus récent
+    anchor = db.query(BoltStateInterval).filter(*base, BoltStateInterval.start_ts <= min_ts).order_by(BoltStateInterval.start_ts.desc()).first()
+    following = db.query(BoltStateInterval).filter(*base, BoltStateInterval.start_ts > max_ts).order_by(BoltStateInterval.start_ts).first()
+    low = anchor.start_ts if anchor else min_ts
+    high = following.start_ts if following else None
+
+    filters = {"org_id": org_id, "driver_uuid": driver_uuid}
+    logs = db.fetch_rows(BoltStateLog, filters, ranges={"created": (low, high)})
+    intervals = fold_state_logs(org_id, driver_uuid, logs)
+    stale = [row["id"] for row in db.fetch_rows(BoltStateInterval, filters, ranges={"start_ts": (low, high)})]
+
+    if following and intervals:
+        last = intervals[-1]
+        if (last["state"], last["vehicle_uuid"]) == (following.state, following.vehicle_uuid):
+            # La portion recalculée se termine dans l'état de l'intervalle suivant : fusion
+            last.update(end_ts=following.end_ts, log_count=last["log_count"] + following.log_count, is_open=following.is_open)
+            stale.append(following.id)
+        else:
+            last.update(end_ts=following.start_ts, is_open=False)
+
+    new_ids = {row["id"] for row in intervals}
+    deleted = db.delete_rows(BoltStateInterval, [i for i in stale if i not in new_ids])
+    db.bulk_upsert(BoltStateInterval, intervals)
+    return intervals, deleted
+
+
+def compact_state_logs(db: SupabaseDB, org_id: str, ranges: dict[str, tuple[int, int]]) -> dict:
+    """
+    Recalcule les intervalles des drivers touchés par une synchronisation.
+
+    Args:
+        ranges: {driver_uuid: (plus ancien log reçu, plus récent)}, voir touched_ranges
+
+    Returns:
+        dict avec drivers, intervals (lignes écrites), deleted (intervalles remplacés)
+        et start_ts / end_ts, période couverte par les intervalles réécrits (None si aucun)
+    """
+    written = deleted = 0
+    span: list[int] = []
+    with serialized(org_id, "state_intervals"):
+        for driver_uuid, (min_ts, max_ts) in ranges.items():
+            intervals, driver_deleted = _compact_driver(db, org_id, driver_uuid, min_ts, max_ts)
+            written += len(intervals)
+            deleted += driver_deleted
+            if intervals:
+                span += [intervals[0]["start_ts"], intervals[-1]["end_ts"]]
+    logger.info(f"[STATE INTERVALS] org_id={org_id}: {len(ranges)} driver(s), {written} intervalle(s) écrit(s), {deleted} remplacé(s)")
+    return {
+        "drivers": len(ranges),
+        "intervals": written,
+        "deleted": deleted,
+        "start_ts": min(span) if span else None,
+        "end_ts": max(span) if span else None,
+    }
@@ -0,0 +1,286 @@
+"""
+Planificateur adaptatif de fenêtres temporelles pour les backfills Bolt (orders, state logs).
+
+Au lieu de découper l'historique en fenêtres fixes de 7 jours, on estime la densité
+(lignes par jour) à partir des runs précédents (DensityStore) ou d'une requête sonde,
+puis on fusionne les jours creux et on découpe les jours chargés pour que chaque fenêtre
+coûte environ target_pages pages d'offset. Les contraintes de l'API Bolt sont respectées :
+plage strictement inférieure à 31 jours et pas plus de 16 mois en arrière.
+"""
+import json
+import math
+import os
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Optional
+
+from app.core.config import get_settings
+from app.core import logging as app_logging
+
+settings = get_settings()
+logger = app_logging.get_logger(__name__)
+
+DAY_SECONDS = 24 * 60 * 60
+# Bolt rejette les plages >= 31 jours (INVALID_DATE_RANGE)
+MAX_WINDOW_SECONDS = 30 * DAY_SECONDS
+# Bolt n'accepte pas de start_ts plus ancien que ~16 mois
+MAX_LOOKBACK_SECONDS = 16 * 30 * DAY_SECONDS
+# Plus petite fenêtre produite en découpant un jour très chargé
+MIN_WINDOW_SECONDS = 60 * 60
+PAGE_SIZE = 1000
+
+STREAMS = {
+    "orders": {
+        "path": "/fleetIntegration/v1/getFleetOrders",
+        "items_key": "orders",
+        "company_payload": lambda company_id: {"company_ids": [int(company_id)]},
+    },
+    "state_logs": {
+        "path": "/fleetIntegration/v1/getFleetStateLogs",
+        "items_key": "state_logs",
+        "company_payload": lambda company_id: {"company_id": int(company_id)},
+    },
+}
+
+
+@dataclass(frozen=True)
+class PlannedWindow:
+    start_ts: int
+    end_ts: int
+    estimated_rows: float
+
+    @property
+    def estimated_pages(self) -> int:
+        return max(1, math.ceil(self.estimated_rows / PAGE_SIZE))
+
+    @property
+    def start(self) -> datetime:
+        return datetime.utcfromtimestamp(self.start_ts)
+
+    @property
+    def end(self) -> datetime:
+        return datetime.utcfromtimestamp(self.end_ts)
+
+
+class DensityStore:
+    """
+    Densités observées (lignes par jour UTC) par (org_id, company_id, stream),
+    persistées dans un fichier JSON sous SYNC_STATE_DIR pour servir aux runs suivants.
+    """
+
+    def __init__(self, path: Optional[Path] = None):
+        self.path = path or Path(settings.sync_state_dir) / "window_density.json"
+        self._lock = threading.Lock()
+        self._data: Optional[dict[str, dict[str, float]]] = None
+
+    @staticmethod
+    def _key(org_id: str, company_id: str, stream: str) -> str:
+        return f"{org_id}:{company_id}:{stream}"
+
+    def _load(self) -> dict[str, dict[str, float]]:
+        if self._data is None:
+            try:
+                self._data = json.loads(self.path.read_text())
+            except (OSError, ValueError):
+                self._data = {}
+        return self._data
+
+    def _save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(self._data))
+        os.replace(tmp_path, self.path)
+
+    def rows_per_day(self, org_id: str, company_id: str, stream: str) -> dict[int, float]:
+        """Retourne {jour (timestamp UTC minuit): lignes observées}."""
+        with self._lock:
+            days = self._load().get(self._key(org_id, company_id, stream), {})
+            return {int(day): rows for day, rows in days.items()}
+
+    def record(self, org_id: str, company_id: str, stream: str, start_ts: int, end_ts: int, rows: int) -> None:
+        """
+        Enregistre le nombre de lignes récupérées sur [start_ts, end_ts], supposées
+        uniformément réparties et ramenées à une densité par jour complet
+        (la dernière observation remplace l'ancienne).
+        """
+        if end_ts <= start_ts:
+            return
+        per_day = round(rows / (end_ts - start_ts) * DAY_SECONDS, 2)
+        with self._lock:
+            days = self._load().setdefault(self._key(org_id, company_id, stream), {})
+            for day_start, _ in _day_overlaps(start_ts, end_ts):
+                days[str(day_start)] = per_day
+            self._save()
+
+
+def _day_overlaps(start_ts: int, end_ts: int) -> list[tuple[int, int]]:
+    """Liste des (minuit UTC du jour, secondes de recouvrement) pour [start_ts, end_ts)."""
+    overlaps = []
+    day_start = start_ts - start_ts % DAY_SECONDS
+    while day_start < end_ts:
+        overlap = min(end_ts, day_start + DAY_SECONDS) - max(start_ts, day_start)
+        if overlap > 0:
+            overlaps.append((day_start, overlap))
+        day_start += DAY_SECONDS
+    return overlaps
+
+
+def clamp_to_lookback(start_ts: int, now: Optional[float] = None) -> int:
+    """Ne jamais demander plus de 16 mois d'historique à Bolt."""
+    earliest = int((now if now is not None else time.time()) - MAX_LOOKBACK_SECONDS)
+    return max(start_ts, earliest)
+
+
+def plan_windows(
+    start_ts: int,
+    end_ts: int,
+    rows_per_day: dict[int, float],
+    target_pages: int = 5,
+    default_rows_per_day: Optional[float] = None,
+    probe: Optional[Callable[[int, int], tuple[int, bool]]] = None,
+    now: Optional[float] = None,
+) -> list[PlannedWindow]:
+    """
+    Découpe [start_ts, end_ts) en fenêtres d'environ target_pages pages chacune.
+
+    Args:
+        rows_per_day: densités connues {minuit UTC: lignes/jour}
+        target_pages: coût cible d'une fenêtre, en pages de PAGE_SIZE lignes
+        default_rows_per_day: densité supposée des jours inconnus (sans sonde)
+        probe: fn(start_ts, end_ts) -> (lignes de la 1re page, page pleine ?) pour mesurer les jours inconnus
+    """
+    start_ts = clamp_to_lookback(start_ts, now)
+    if end_ts <= start_ts:
+        return []
+
+    target_rows = max(1, target_pages) * PAGE_SIZE
+    if default_rows_per_day is None:
+        default_rows_per_day = target_rows / 7  # Comportement historique : ~1 fenêtre par semaine
+
+    # 1. Densité de chaque segment journalier [seg_start, seg_end)
+    segments = [(max(day, start_ts), min(day + DAY_SECONDS, end_ts)) for day, _ in _day_overlaps(start_ts, end_ts)]
+    known = dict(rows_per_day)
+    if probe is not None:
+        unknown = [seg for seg in segments if (seg[0] - seg[0] % DAY_SECONDS) not in known]
+        known.update(_probe_unknown_days(unknown, probe))
+
+    densities = []
+    for seg_start, seg_end in segments:
+        per_day = known.get(seg_start - seg_start % DAY_SECONDS, default_rows_per_day)
+        densities.append((seg_start, seg_end, per_day * (seg_end - seg_start) / DAY_SECONDS))
+
+    # 2. Fusion gloutonne des jours creux, découpage des jours trop chargés
+    windows: list[PlannedWindow] = []
+    current_start: Optional[int] = None
+    current_rows = 0.0
+    current_end = start_ts
+
+    def flush():
+        nonlocal current_start, current_rows
+        if current_start is not None and current_end > current_start:
+            windows.append(PlannedWindow(current_start, current_end, current_rows))
+        current_start, current_rows = None, 0.0
+
+    for seg_start, seg_end, rows in densities:
+        if rows > target_rows:
+            flush()
+            parts = math.ceil(rows / target_rows)
+            step = max(MIN_WINDOW_SECONDS, math.ceil((seg_end - seg_start) / parts))
+            part_start = seg_start
+            while part_start < seg_end:
+                part_end = min(part_start + step, seg_end)
+                windows.append(PlannedWindow(part_start, part_end, rows * (part_end - part_start) / (seg_end - seg_start)))
+                part_start = part_end
+            current_end = seg_end
+            continue
+        if current_start is not None and (
+            current_rows + rows > target_rows or seg_end - current_start > MAX_WINDOW_SECONDS
+        ):
+            flush()
+        if current_start is None:
+            current_start = seg_start
+        current_rows += rows
+        current_end = seg_end
+    flush()
+    return windows
+
+
+def _probe_unknown_days(segments: list[tuple[int, int]], probe: Callable[[int, int], tuple[int, bool]]) -> dict[int, float]:
+    """
+    Mesure la densité des jours inconnus avec le moins de requêtes possible :
+    une sonde sur une plage contiguë ; si la première page est pleine, on coupe en deux.
+    """
+    found: dict[int, float] = {}
+    spans: list[list[tuple[int, int]]] = []
+    for seg in segments:
+        if spans and spans[-1][-1][1] == seg[0] and seg[1] - spans[-1][0][0] <= MAX_WINDOW_SECONDS:
+            spans[-1].append(seg)
+        else:
+            spans.append([seg])
+
+    while spans:
+        span = spans.pop()
+        span_start, span_end = span[0][0], span[-1][1]
+        rows, full = probe(span_start, span_end)
+        if full and len(span) > 1:
+            middle = len(span) // 2
+            spans.extend([span[:middle], span[middle:]])
+            continue
+        # Page non pleine : compte exact ; jour isolé plein : borne basse (affinée par record() après le run)
+        for seg_start, seg_end in span:
+            found[seg_start - seg_start % DAY_SECONDS] = rows / (span_end - span_start) * DAY_SECONDS
+    return found
+
+
+def make_probe(client, stream: str, company_id: str) -> Callable[[int, int], tuple[int, bool]]:
+    """Sonde Bolt : une requête limit=PAGE_SIZE sur la plage, retourne (lignes, page pleine ?)."""
+    spec = STREAMS[stream]
+
+    def probe(start_ts: int, end_ts: int) -> tuple[int, bool]:
+        payload = {**spec["company_payload"](company_id), "limit": PAGE_SIZE, "offset": 0, "start_ts": start_ts, "end_ts": end_ts}
+        data = client.post(spec["path"], payload)
+        if data.get("code") != 0:
+            raise RuntimeError(f"Bolt API error: {data.get('message', 'Unknown error')}")
+        items = data.get("data", {}).get(spec["items_key"], [])
+        return len(items), len(items) >= PAGE_SIZE
+
+    return probe
+
+
+density_store = DensityStore()
+
+
+def plan_stream_windows(
+    org_id: str,
+    company_id: str,
+    stream: str,
+    start: datetime,
+    end: datetime,
+    target_pages: Optional[int] = None,
+    default_window_days: int = 7,
+    client=None,
+    store: Optional[DensityStore] = None,
+) -> list[PlannedWindow]:
+    """
+    Planifie les fenêtres d'un stream pour une company à partir des densités observées.
+    Si un client est fourni, les jours jamais observés sont mesurés par sonde ; sinon on suppose
+    qu'une fenêtre de default_window_days jours coûte target_pages pages.
+    """
+    store = store or density_store
+    target_pages = target_pages or settings.bolt_window_target_pages
+    windows = plan_windows(
+        int(start.timestamp()),
+        int(end.timestamp()),
+        store.rows_per_day(org_id, company_id, stream),
+        target_pages=target_pages,
+        default_rows_per_day=target_pages * PAGE_SIZE / max(1, default_window_days),
+        probe=make_probe(client, stream, company_id) if client is not None else None,
+    )
+    logger.info(
+        f"[WINDOW PLANNER] {stream} company_id={company_id}: {len(windows)} fenêtre(s), "
+        f"~{sum(w.estimated_pages for w in windows)} page(s) estimée(s)"
+    )
+    return windows
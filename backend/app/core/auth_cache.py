@@ -0,0 +1,95 @@
+"""
+Caches de l'authentification des requêtes.
+
+- VerifiedTokenCache : token JWT déjà vérifié -> contexte utilisateur (email, org résolue), LRU borné
+  à AUTH_TOKEN_CACHE_SIZE entrées, chaque entrée expirant à l'exp du token. Un token en cache
+  n'est plus re-vérifié (HMAC python-jose) : l'authentification se réduit à une lecture de dict.
+- OrgContextCache : contexte par org (company_ids Bolt issus de bolt_organizations), relu au plus
+  une fois par ORG_CONTEXT_TTL_SECONDS et invalidé par sync_orgs.
+
+Hits / misses exposés sur /metrics (auth_token_cache_total, org_context_cache_total).
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Optional
+
+from prometheus_client import Counter, Gauge
+
+from app.core.config import get_settings
+
+settings = get_settings()
+
+TOKEN_CACHE_REQUESTS = Counter("auth_token_cache_total", "Résolutions de token par le cache (hit, miss, expired)", ["result"])
+TOKEN_CACHE_SIZE = Gauge("auth_token_cache_entries", "Tokens vérifiés en cache")
+ORG_CONTEXT_REQUESTS = Counter("org_context_cache_total", "Résolutions du contexte d'org par le cache (hit, miss)", ["result"])
+
+
+class VerifiedTokenCache:
+    def __init__(self, max_size: Optional[int] = None):
+        self.max_size = settings.auth_token_cache_size if max_size is None else max_size
+        self._entries: OrderedDict[str, tuple[float, dict]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, token: str, now: Optional[float] = None) -> Optional[dict]:
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                TOKEN_CACHE_REQUESTS.labels("miss").inc()
+                return None
+            expires_at, user = entry
+            if (now or time.time()) >= expires_at:
+                del self._entries[token]
+                TOKEN_CACHE_SIZE.set(len(self._entries))
+                TOKEN_CACHE_REQUESTS.labels("expired").inc()
+                return None
+            self._entries.move_to_end(token)
+        TOKEN_CACHE_REQUESTS.labels("hit").inc()
+        return user
+
+    def put(self, token: str, user: dict, expires_at: Any) -> None:
+        # Token sans exp numérique : jamais mis en cache (sa validité ne serait plus bornée)
+        if self.max_size <= 0 or not isinstance(expires_at, (int, float)):
+            return
+        with self._lock:
+            self._entries[token] = (float(expires_at), user)
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+            TOKEN_CACHE_SIZE.set(len(self._entries))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            TOKEN_CACHE_SIZE.set(0)
+
+
+class OrgContextCache:
+    def __init__(self, ttl_seconds: Optional[float] = None):
+        self.ttl_seconds = settings.org_context_ttl_seconds if ttl_seconds is None else ttl_seconds
+        self._entries: dict[tuple[str, str], tuple[float, Any]] = {}
+        self._lock = threading.Lock()
+
+    def get_or_load(self, org_id: str, key: str, loader: Callable[[], Any]) -> Any:
+        with self._lock:
+            entry = self._entries.get((org_id, key))
+        if entry is not None and time.monotonic() - entry[0] < self.ttl_seconds:
+            ORG_CONTEXT_REQUESTS.labels("hit").inc()
+            return entry[1]
+        ORG_CONTEXT_REQUESTS.labels("miss").inc()
+        value = loader()
+        with self._lock:
+            self._entries[(org_id, key)] = (time.monotonic(), value)
+        return value
+
+    def invalidate(self, org_id: Optional[str] = None) -> None:
+        with self._lock:
+            if org_id is None:
+                self._entries.clear()
+            else:
+                for cached in [cached for cached in self._entries if cached[0] == org_id]:
+                    del self._entries[cached]
+
+
+token_cache = VerifiedTokenCache()
+org_context_cache = OrgContextCache()
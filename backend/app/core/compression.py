@@ -0,0 +1,129 @@
+"""
+Compression des réponses HTTP (brotli si installé et accepté par le client, sinon gzip).
+
+Contrairement à GZipMiddleware de Starlette, chaque morceau d'une réponse en flux est vidé
+(flush) immédiatement : les événements SSE et les exports en flux arrivent au fil de l'eau.
+Ne sont pas compressés : les réponses sous le seuil, celles qui portent déjà un Content-Encoding,
+les flux SSE et les contenus déjà compressés (exports .gz).
+"""
+import zlib
+from typing import Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # dépendance optionnelle (pip install brotli)
+    brotli = None
+
+UNCOMPRESSED_MEDIA_TYPES = {"text/event-stream", "application/gzip", "application/zip"}
+
+
+class _GzipCompressor:
+    def __init__(self, level: int):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        body = self._compressor.compress(data)
+        return body + (self._compressor.flush() if final else self._compressor.flush(zlib.Z_SYNC_FLUSH))
+
+
+class _BrotliCompressor:
+    def __init__(self, quality: int):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        body = self._compressor.process(data)
+        return body + (self._compressor.finish() if final else self._compressor.flush())
+
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """Encodage retenu d'après Accept-Encoding (q=0 exclut) : br, puis gzip, sinon None."""
+    accepted = set()
+    for item in accept_encoding.lower().split(","):
+        name, _, params = item.strip().partition(";")
+        if params.replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        accepted.add(name.strip())
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted or "*" in accepted:
+        return "gzip"
+    return None
+
+
+class CompressionMiddleware:
+    def __init__(self, app: ASGIApp, minimum_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 4) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        await _CompressionResponder(self, encoding, send)(scope, receive)
+
+
+class _CompressionResponder:
+    def __init__(self, middleware: CompressionMiddleware, encoding: str, send: Send):
+        self.middleware = middleware
+        self.encoding = encoding
+        self.send = send
+        self.start: Optional[Message] = None
+        self.passthrough = False
+        self.compressor = None
+
+    async def __call__(self, scope: Scope, receive: Receive) -> None:
+        await self.middleware.app(scope, receive, self.send_compressed)
+
+    def _new_compressor(self):
+        if self.encoding == "br":
+            return _BrotliCompressor(self.middleware.brotli_quality)
+        return _GzipCompressor(self.middleware.gzip_level)
+
+    async def _flush_start(self) -> None:
+        if self.start is not None:
+            await self.send(self.start)
+            self.start = None
+
+    async def send_compressed(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            # Envoi différé : les en-têtes dépendent de la taille du premier morceau
+            self.start = message
+            headers = Headers(raw=message["headers"])
+            media_type = headers.get("content-type", "").split(";")[0].strip().lower()
+            self.passthrough = "content-encoding" in headers or media_type in UNCOMPRESSED_MEDIA_TYPES
+            return
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self._flush_start()
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self.compressor is None:
+            if not more_body and len(body) < self.middleware.minimum_size:
+                self.passthrough = True
+                await self._flush_start()
+                await self.send(message)
+                return
+            self.compressor = self._new_compressor()
+            headers = MutableHeaders(raw=self.start["headers"])
+            headers["Content-Encoding"] = self.encoding
+            headers.add_vary_header("Accept-Encoding")
+            data = self.compressor.compress(body, final=not more_body)
+            if more_body:
+                del headers["Content-Length"]
+            else:
+                headers["Content-Length"] = str(len(data))
+            await self._flush_start()
+        else:
+            data = self.compressor.compress(body, final=not more_body)
+        await self.send({"type": "http.response.body", "body": data, "more_body": more_body})
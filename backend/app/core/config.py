@@ -53,6 +53,10 @@ class Settings(BaseSettings):
     jwt_secret: str = Field(default="changeme", alias="JWT_SECRET")
     jwt_algorithm: str = Field(default="HS256", alias="JWT_ALGORITHM")
     jwt_access_token_expire_minutes: int = Field(default=60, alias="JWT_ACCESS_TOKEN_EXPIRE_MINUTES")
+    # Cache des tokens déjà vérifiés (LRU, entrées expirées à l'exp du token ; 0 = désactivé)
+    auth_token_cache_size: int = Field(default=1024, alias="AUTH_TOKEN_CACHE_SIZE")
+    # Contexte par org (company_ids Bolt) : délai de relecture de bolt_organizations
+    org_context_ttl_seconds: float = Field(default=300.0, alias="ORG_CONTEXT_TTL_SECONDS")
 
     supabase_url: Optional[str] = Field(default=None, alias="SUPABASE_URL")
     supabase_anon_key: Optional[str] = Field(default=None, alias="SUPABASE_ANON_KEY")
@@ -78,11 +82,74 @@ class Settings(BaseSettings):
     bolt_base_url: AnyUrl = Field(default="https://node.bolt.eu/fleet-integration-gateway", alias="BOLT_BASE_URL")
     bolt_auth_url: AnyUrl = Field(default="https://oidc.bolt.eu/token", alias="BOLT_AUTH_URL")
     bolt_default_fleet_id: Optional[str] = Field(default=None, alias="BOLT_DEFAULT_FLEET_ID")
+    # Nombre de companies Bolt synchronisées en parallèle pour une même org
+    bolt_max_concurrent_companies: int = Field(default=4, alias="BOLT_MAX_CONCURRENT_COMPANIES")
+    # Débit global vers l'API Bolt (partagé entre toutes les companies), 0 = illimité
+    bolt_rate_limit_per_second: float = Field(default=5.0, alias="BOLT_RATE_LIMIT_PER_SECOND")
+    bolt_rate_limit_burst: int = Field(default=5, alias="BOLT_RATE_LIMIT_BURST")
+    # Pages préchargées en parallèle par les listes paginées (drivers, véhicules), 1 = séquentiel
+    bolt_page_prefetch: int = Field(default=4, alias="BOLT_PAGE_PREFETCH")
+    # Durée de vie du snapshot en mémoire des drivers / véhicules stockés (syncs par différence) :
+    # au-delà, relu en base pour voir les écritures des autres process (API, worker)
+    bolt_snapshot_ttl_seconds: float = Field(default=300.0, alias="BOLT_SNAPSHOT_TTL_SECONDS")
+    # Backfills : coût cible d'une fenêtre temporelle (pages de 1000 lignes) pour le planificateur adaptatif
+    bolt_window_target_pages: int = Field(default=5, alias="BOLT_WINDOW_TARGET_PAGES")
+    # Répertoire local de l'état de synchronisation (densités observées, manifestes de backfill)
+    sync_state_dir: str = Field(default=".sync_state", alias="SYNC_STATE_DIR")
+    # Journal des runs de synchronisation (table sync_runs) ; les métriques Prometheus restent actives sinon
+    sync_ledger_enabled: bool = Field(default=True, alias="SYNC_LEDGER_ENABLED")
+
+    # Scheduler multi-tenant : plafond global de jobs simultanés (par process worker), étalement des départs et priorités par org
+    scheduler_max_concurrent_jobs: int = Field(default=2, alias="SCHEDULER_MAX_CONCURRENT_JOBS")
+    scheduler_stagger_window_seconds: float = Field(default=300.0, alias="SCHEDULER_STAGGER_WINDOW_SECONDS")
+    scheduler_jitter_seconds: float = Field(default=30.0, alias="SCHEDULER_JITTER_SECONDS")
+    scheduler_org_priorities: Optional[str] = Field(default=None, alias="SCHEDULER_ORG_PRIORITIES", description="Ex: orgA=2,orgB=1")
+    # Un seul scheduler actif par déploiement (élu via un bail en base), même avec plusieurs workers
+    scheduler_leader_election: bool = Field(default=True, alias="SCHEDULER_LEADER_ELECTION")
+    scheduler_leader_ttl_seconds: int = Field(default=60, alias="SCHEDULER_LEADER_TTL_SECONDS")
+    # Baux par (org, flux) : "supabase" (table sync_leases, partagée entre workers) ou "local" (process seul)
+    sync_lease_backend: str = Field(default="supabase", alias="SYNC_LEASE_BACKEND")
+    sync_lease_ttl_seconds: int = Field(default=300, alias="SYNC_LEASE_TTL_SECONDS")
+    # File de jobs durable consommée par le worker (python -m app.worker) : "sqlite" (SYNC_STATE_DIR/jobs.sqlite,
+    # API et worker sur le même volume) ou "supabase" (table sync_jobs, plusieurs hôtes)
+    sync_job_store: str = Field(default="sqlite", alias="SYNC_JOB_STORE")
+    sync_job_max_attempts: int = Field(default=3, alias="SYNC_JOB_MAX_ATTEMPTS")
+    sync_job_retry_base_seconds: float = Field(default=60.0, alias="SYNC_JOB_RETRY_BASE_SECONDS")
+    # Partage équitable entre orgs : jobs démarrés par org sur cette fenêtre, pondérés par 1 + priorité
+    sync_job_fair_window_seconds: float = Field(default=3600.0, alias="SYNC_JOB_FAIR_WINDOW_SECONDS")
+    # Job running sans heartbeat depuis ce délai : worker considéré mort, job remis en file
+    sync_job_stale_seconds: int = Field(default=600, alias="SYNC_JOB_STALE_SECONDS")
+    sync_worker_poll_seconds: float = Field(default=2.0, alias="SYNC_WORKER_POLL_SECONDS")
+    sync_worker_metrics_port: int = Field(default=9101, alias="SYNC_WORKER_METRICS_PORT")
+    # true : l'API exécute aussi le worker et le scheduler (dev sans process worker séparé)
+    sync_worker_embedded: bool = Field(default=False, alias="SYNC_WORKER_EMBEDDED")
+    # État APScheduler persistant : les déclenchements manqués pendant un arrêt sont rattrapés au redémarrage
+    scheduler_jobstore_url: Optional[str] = Field(default=None, alias="SCHEDULER_JOBSTORE_URL")
+    scheduler_misfire_grace_seconds: int = Field(default=3600, alias="SCHEDULER_MISFIRE_GRACE_SECONDS")
+    # Compression des réponses HTTP : taille minimale (octets) et niveau gzip (1-9)
+    response_compression_min_bytes: int = Field(default=1024, alias="RESPONSE_COMPRESSION_MIN_BYTES")
+    response_gzip_level: int = Field(default=6, alias="RESPONSE_GZIP_LEVEL")
+    # Réponses conditionnelles (ETag / 304) : délai de relecture des derniers runs de sync par org
+    http_cache_versions_ttl_seconds: float = Field(default=10.0, alias="HTTP_CACHE_VERSIONS_TTL_SECONDS")
+    # Fuseau des jours de l'activité précalculée des drivers (bolt_driver_activity_daily)
+    analytics_timezone: str = Field(default="Europe/Paris", alias="ANALYTICS_TIMEZONE")
+    # Miroir analytique local optionnel (Parquet partitionné par org et par jour, requêté avec DuckDB) :
+    # désactivé si vide ou si duckdb n'est pas installé
+    analytics_mirror_dir: Optional[str] = Field(default=None, alias="ANALYTICS_MIRROR_DIR")
 
     heetch_login: Optional[str] = Field(default=None, alias="HEETCH_LOGIN", description="Numéro de téléphone pour la connexion Heetch")
     heetch_password: Optional[str] = Field(default=None, alias="HEETCH_PASSWORD")
     heetch_2fa_code: Optional[str] = Field(default=None, alias="HEETCH_2FA_CODE")
     heetch_headless: bool = Field(default=False, alias="HEETCH_HEADLESS", description="Mode headless pour Playwright (False = fenêtre visible)")
+    # Pool de navigateurs Heetch : contextes (org + téléphone) gardés ouverts, fermés après inactivité
+    heetch_browser_pool_size: int = Field(default=4, alias="HEETCH_BROWSER_POOL_SIZE")
+    heetch_browser_idle_seconds: float = Field(default=900.0, alias="HEETCH_BROWSER_IDLE_SECONDS")
+    # Sync des earnings Heetch : périodes récupérées en parallèle et débit global vers driver.heetch.com
+    heetch_max_concurrent_periods: int = Field(default=4, alias="HEETCH_MAX_CONCURRENT_PERIODS")
+    heetch_rate_limit_per_second: float = Field(default=2.0, alias="HEETCH_RATE_LIMIT_PER_SECOND")
+    heetch_rate_limit_burst: int = Field(default=2, alias="HEETCH_RATE_LIMIT_BURST")
+    # Cookies de session Heetch en cache process : délai avant de relire une session absente ou invalide
+    heetch_cookie_cache_ttl_seconds: float = Field(default=300.0, alias="HEETCH_COOKIE_CACHE_TTL_SECONDS")
 
     @property
     def database_url(self) -> str:
@@ -0,0 +1,87 @@
+"""
+Exports en flux (NDJSON ou CSV, gzip optionnel) : les lignes sont lues page par page (curseur keyset,
+SupabaseDB.iter_rows) et encodées au fil de l'eau, sans jamais charger la période entière en mémoire.
+"""
+import csv
+import io
+import json
+import zlib
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Iterable, Iterator, Optional
+
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+
+EXPORT_FORMATS = {"ndjson": "application/x-ndjson", "csv": "text/csv; charset=utf-8"}
+# Lignes encodées par morceau émis (un morceau = une écriture sur la socket)
+EXPORT_BATCH_ROWS = 500
+
+
+def utc_day_range(start: date, end: date) -> tuple[int, int]:
+    """Timestamps [début du jour start, début du lendemain de end) en UTC, comme les listes Bolt."""
+    def midnight(day: date) -> int:
+        return int(datetime.combine(day, time.min, tzinfo=timezone.utc).timestamp())
+    return midnight(start), midnight(end + timedelta(days=1))
+
+
+def export_columns(model_class: type, columns: Optional[str]) -> list[str]:
+    """Colonnes demandées (?columns=a,b), validées contre le modèle ; toutes par défaut."""
+    available = list(model_class.__table__.columns.keys())
+    if not columns:
+        return available
+    selected = [column.strip() for column in columns.split(",") if column.strip()]
+    unknown = [column for column in selected if column not in available]
+    if unknown or not selected:
+        raise HTTPException(status_code=400, detail=f"Colonnes inconnues: {', '.join(unknown) or columns} (disponibles: {', '.join(available)})")
+    return selected
+
+
+def _csv_value(value):
+    # JSONB (listes, objets) sérialisé en JSON dans la cellule
+    return json.dumps(value, ensure_ascii=False) if isinstance(value, (dict, list)) else value
+
+
+def encode_rows(rows: Iterable[dict], fmt: str, columns: list[str]) -> Iterator[bytes]:
+    """Encode les lignes par morceaux de EXPORT_BATCH_ROWS (en-tête CSV en premier)."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer) if fmt == "csv" else None
+    if writer:
+        writer.writerow(columns)
+    count = 0
+    for row in rows:
+        if writer:
+            writer.writerow([_csv_value(row.get(column)) for column in columns])
+        else:
+            buffer.write(json.dumps({column: row.get(column) for column in columns}, ensure_ascii=False, default=str))
+            buffer.write("\n")
+        count += 1
+        if count % EXPORT_BATCH_ROWS == 0:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+def gzip_chunks(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    """Compression gzip en flux (un seul membre gzip, vidé à chaque morceau)."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_response(rows: Iterable[dict], fmt: str, columns: list[str], filename: str, gzip: bool = False) -> StreamingResponse:
+    """Réponse en flux d'un export, téléchargée comme fichier (filename sans extension)."""
+    chunks = encode_rows(rows, fmt, columns)
+    media_type = EXPORT_FORMATS[fmt]
+    filename = f"{filename}.{fmt}"
+    if gzip:
+        chunks, media_type, filename = gzip_chunks(chunks), "application/gzip", f"{filename}.gz"
+    return StreamingResponse(
+        chunks,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"', "X-Accel-Buffering": "no"},
+    )
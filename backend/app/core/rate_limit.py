@@ -0,0 +1,35 @@
+"""
+Limiteur de débit (token bucket) partagé par les clients des APIs externes.
+
+Chaque client (Bolt, Heetch) crée une instance au niveau module, partagée par toutes ses
+instances et tous les threads du process : les synchronisations parallèles (plusieurs companies,
+plusieurs périodes) restent sous le débit global autorisé par l'API.
+"""
+import threading
+import time
+
+
+class RateLimiter:
+    """Token bucket thread-safe : rate_per_second jetons par seconde, au plus burst d'avance."""
+
+    def __init__(self, rate_per_second: float, burst: int):
+        self.rate_per_second = rate_per_second
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """Bloque jusqu'à ce qu'un jeton soit disponible (no-op si rate <= 0)."""
+        if self.rate_per_second <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated_at) * self.rate_per_second)
+                self._updated_at = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate_per_second
+            time.sleep(wait)
@@ -2,8 +2,9 @@
 Adaptateur Supabase pour remplacer SQLAlchemy.
 Fournit une interface similaire à SQLAlchemy mais utilise l'API REST Supabase.
 """
+import json
 from datetime import datetime
-from typing import Any, Dict, List, Optional, TypeVar, Generic
+from typing import Any, Dict, Iterator, List, Optional, TypeVar, Generic
 from supabase import Client
 
 from app.core.supabase_client import get_supabase_client
@@ -11,6 +12,14 @@ from app.core.supabase_client import get_supabase_client
 T = TypeVar('T')
 
 
+def _postgrest_value(value: Any) -> str:
+    """Valeur littérale d'un filtre or=(...) de PostgREST : les chaînes sont entre guillemets (virgules, points)."""
+    if isinstance(value, str):
+        escaped = value.replace("\\", "\\\\").replace('"', '\\"')
+        return f'"{escaped}"'
+    return str(value)
+
+
 class SupabaseDB:
     """
     Adaptateur de base de données utilisant Supabase API.
@@ -43,6 +52,152 @@ class SupabaseDB:
             # Upsert (insert ou update basé sur la clé primaire)
             self.client.table(table_name).upsert(data).execute()
     
+    def bulk_upsert(
+        self,
+        model_class: type,
+        rows: List[Dict[str, Any]],
+        chunk_size: int = 500,
+        on_conflict: Optional[List[str]] = None,
+    ) -> int:
+        """
+        Upsert en masse de lignes déjà sérialisées (dicts prêts pour JSON), par paquets
+        de chunk_size lignes : une requête HTTP par paquet au lieu d'une par ligne.
+        Les doublons de clé (primaire, ou on_conflict) sont dédupliqués (la dernière occurrence l'emporte),
+        PostgreSQL refusant de mettre à jour deux fois la même ligne dans un même upsert.
+        on_conflict : colonnes d'une contrainte d'unicité à utiliser à la place de la clé primaire
+        (tables dont l'id est généré par la base).
+        
+        Returns:
+            Nombre de lignes envoyées
+        """
+        if not rows:
+            return 0
+        key_columns = on_conflict or [self._get_primary_key(model_class)]
+        unique_rows = list({tuple(row[column] for column in key_columns): row for row in rows}.values())
+        table = self.client.table(model_class.__tablename__)
+        for start in range(0, len(unique_rows), chunk_size):
+            chunk = unique_rows[start:start + chunk_size]
+            if on_conflict:
+                table.upsert(chunk, on_conflict=",".join(on_conflict)).execute()
+            else:
+                table.upsert(chunk).execute()
+        return len(unique_rows)
+    
+    def fetch_rows(
+        self,
+        model_class: type,
+        filters: Dict[str, Any],
+        page_size: int = 1000,
+        ranges: Optional[Dict[str, tuple]] = None,
+        columns: Optional[List[str]] = None,
+        in_filters: Optional[Dict[str, List[Any]]] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Récupère toutes les lignes brutes (dicts tels que stockés) correspondant à des filtres d'égalité,
+        page par page pour ne pas être tronqué par la limite de lignes de PostgREST.
+        ranges : {colonne: (min inclus, max exclu)}, une borne None n'est pas appliquée.
+        columns : colonnes à lire (toutes par défaut), pour alléger les gros volumes.
+        in_filters : {colonne: valeurs acceptées} (IN), à garder courts (URL de la requête).
+        """
+        primary_key = self._get_primary_key(model_class)
+        rows: List[Dict[str, Any]] = []
+        start = 0
+        while True:
+            query = self.client.table(model_class.__tablename__).select(",".join(columns) if columns else "*")
+            for column, value in filters.items():
+                query = query.eq(column, value)
+            for column, values in (in_filters or {}).items():
+                query = query.in_(column, values)
+            for column, (lower, upper) in (ranges or {}).items():
+                if lower is not None:
+                    query = query.gte(column, lower)
+                if upper is not None:
+                    query = query.lt(column, upper)
+            # Ordre stable sur la clé primaire pour que les pages ne se chevauchent pas
+            page = query.order(primary_key).range(start, start + page_size - 1).execute().data
+            rows.extend(page)
+            if len(page) < page_size:
+                return rows
+            start += page_size
+    
+    def count_rows(self, model_class: type, filters: Dict[str, Any]) -> int:
+        """Nombre de lignes correspondant à des filtres d'égalité (COUNT côté base, aucune ligne transférée)."""
+        query = self.client.table(model_class.__tablename__).select(self._get_primary_key(model_class), count="exact", head=True)
+        for column, value in filters.items():
+            query = query.eq(column, value)
+        return query.execute().count or 0
+
+    def iter_rows(
+        self,
+        model_class: type,
+        filters: Dict[str, Any],
+        ranges: Optional[Dict[str, tuple]] = None,
+        columns: Optional[List[str]] = None,
+        order_column: Optional[str] = None,
+        page_size: int = 1000,
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Itère sur les lignes brutes page par page avec un curseur keyset (order_column, clé primaire)
+        plutôt qu'un offset : coût constant par page et mémoire bornée à une page, quel que soit le volume.
+        order_column : colonne de tri croissant (NOT NULL) ; clé primaire seule par défaut.
+        """
+        primary_key = self._get_primary_key(model_class)
+        selected = None
+        if columns:
+            # Colonnes du curseur lues même si non demandées, retirées des lignes émises
+            selected = list(dict.fromkeys([*columns, *(c for c in (order_column, primary_key) if c)]))
+        cursor: Optional[Dict[str, Any]] = None
+        while True:
+            query = self.client.table(model_class.__tablename__).select(",".join(selected) if selected else "*")
+            for column, value in filters.items():
+                query = query.eq(column, value)
+            for column, (lower, upper) in (ranges or {}).items():
+                if lower is not None:
+                    query = query.gte(column, lower)
+                if upper is not None:
+                    query = query.lt(column, upper)
+            if cursor is not None:
+                if order_column:
+                    value, key = _postgrest_value(cursor[order_column]), _postgrest_value(cursor[primary_key])
+                    query = query.or_(f"{order_column}.gt.{value},and({order_column}.eq.{value},{primary_key}.gt.{key})")
+                else:
+                    query = query.gt(primary_key, cursor[primary_key])
+            if order_column:
+                query = query.order(order_column)
+            page = query.order(primary_key).limit(page_size).execute().data
+            for row in page:
+                yield {column: row.get(column) for column in columns} if columns else row
+            if len(page) < page_size:
+                return
+            cursor = page[-1]
+
+    def update_rows(self, model_class: type, values: Dict[str, Any], filters: Dict[str, Any]) -> int:
+        """
+        Met à jour les seules colonnes de values sur les lignes correspondant aux filtres d'égalité
+        (None = IS NULL, dict / liste = égalité JSONB) : une écriture conditionnelle, sans réécrire
+        la ligne entière. Renvoie le nombre de lignes modifiées (0 si les filtres ne correspondent plus).
+        """
+        data = {column: value.isoformat() if isinstance(value, datetime) else value for column, value in values.items()}
+        query = self.client.table(model_class.__tablename__).update(data)
+        for column, value in filters.items():
+            if value is None:
+                query = query.is_(column, "null")
+            elif isinstance(value, (dict, list)):
+                query = query.eq(column, json.dumps(value))
+            else:
+                query = query.eq(column, value)
+        return len(query.execute().data or [])
+
+    def delete_rows(self, model_class: type, ids: List[Any], chunk_size: int = 200) -> int:
+        """Supprime des lignes par clé primaire, par paquets (une requête par paquet)."""
+        if not ids:
+            return 0
+        primary_key = self._get_primary_key(model_class)
+        table = self.client.table(model_class.__tablename__)
+        for start in range(0, len(ids), chunk_size):
+            table.delete().in_(primary_key, ids[start:start + chunk_size]).execute()
+        return len(ids)
+    
     def delete(self, instance: Any) -> None:
         """Supprime une instance."""
         table_name = instance.__class__.__tablename__
@@ -176,7 +331,8 @@ class SupabaseQuery:
                             value = int(value)
                         # Sinon, garder tel quel (int reste int, float reste float)
                     
-                    # Appliquer l'opérateur
+                    # Appliquer l'opérateur (SQLAlchemy fournit les fonctions du module operator : operator.le...)
+                    op = getattr(op, '__name__', op)
                     if op == 'eq' or str(op) == '==' or str(op).endswith('.eq'):
                         self.query = self.query.eq(column_name, value)
                     elif op == 'ne' or str(op) == '!=' or str(op).endswith('.ne'):
@@ -255,6 +411,10 @@ class SupabaseQuery:
     
     def all(self) -> List[Any]:
         """Retourne tous les résultats."""
+        return [self._dict_to_instance(row) for row in self.rows()]
+    
+    def rows(self) -> List[Dict[str, Any]]:
+        """Retourne tous les résultats en dicts bruts (tels que renvoyés par PostgREST, sans instance de modèle)."""
         query = self.query
         
         # Appliquer limit et offset avec range pour Supabase
@@ -265,8 +425,7 @@ class SupabaseQuery:
         elif self._limit_value:
             query = query.limit(self._limit_value)
         
-        response = query.execute()
-        return [self._dict_to_instance(row) for row in response.data]
+        return query.execute().data
     
     def first(self) -> Optional[Any]:
         """Retourne le premier résultat."""
@@ -0,0 +1,300 @@
+"""
+Journal des runs de synchronisation et métriques Prometheus associées.
+
+Chaque fonction de sync décorée par @tracked_sync(provider, stream) :
+- écrit une ligne sync_runs au démarrage (status=running) puis à la fin (success / error),
+  avec pages, lignes récupérées / écrites / ignorées, latence API cumulée et erreur ;
+- alimente les mêmes chiffres dans les métriques sync_* exposées sur /metrics,
+  dont sync_freshness_lag_seconds (retard des données par flux et par org).
+
+Les appels API sont attribués au run courant via une ContextVar (timed_api_call dans les
+clients Bolt / Heetch / Uber) ; bind_context propage ce run aux threads des pools.
+"""
+import contextvars
+import functools
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Callable, Optional
+
+from prometheus_client import REGISTRY, Counter, Gauge, Histogram
+from prometheus_client.core import GaugeMetricFamily
+
+from app.core.config import get_settings
+from app.core import logging as app_logging
+
+settings = get_settings()
+logger = app_logging.get_logger(__name__)
+
+SYNC_RUNS = Counter("sync_runs_total", "Runs de synchronisation terminés", ["provider", "stream", "status"])
+SYNC_DURATION = Histogram(
+    "sync_run_duration_seconds",
+    "Durée des runs de synchronisation",
+    ["provider", "stream"],
+    buckets=(1, 5, 15, 30, 60, 120, 300, 600, 1200, 1800, 3600, 7200),
+)
+SYNC_IN_PROGRESS = Gauge("sync_runs_in_progress", "Runs de synchronisation en cours", ["provider", "stream"])
+SYNC_PAGES = Counter("sync_pages_total", "Pages récupérées depuis les API", ["provider", "stream"])
+SYNC_ROWS = Counter("sync_rows_total", "Lignes traitées (fetched, written, skipped)", ["provider", "stream", "kind"])
+SYNC_API_LATENCY = Histogram(
+    "sync_api_request_seconds",
+    "Latence des appels aux API Bolt / Heetch / Uber",
+    ["provider"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 20, 30),
+)
+SYNC_API_ERRORS = Counter("sync_api_errors_total", "Appels API en erreur", ["provider"])
+SYNC_LAST_SUCCESS = Gauge(
+    "sync_last_success_timestamp_seconds", "Fin du dernier run réussi", ["provider", "stream", "org_id"]
+)
+
+
+class _FreshnessCollector:
+    """
+    Expose sync_freshness_lag_seconds = maintenant - watermark, calculé à chaque scrape
+    (une jauge figée au moment du run ne verrait pas un flux qui a cessé de se synchroniser).
+    """
+
+    def __init__(self):
+        self._watermarks: dict[tuple[str, str, str], float] = {}
+        self._lock = threading.Lock()
+
+    def update(self, provider: str, stream: str, org_id: str, watermark_ts: float) -> None:
+        key = (provider, stream, org_id)
+        with self._lock:
+            # Un backfill de fenêtres anciennes ne doit pas faire reculer le watermark
+            self._watermarks[key] = max(watermark_ts, self._watermarks.get(key, 0.0))
+
+    def lag(self, provider: str, stream: str, org_id: str, now: Optional[float] = None) -> Optional[float]:
+        with self._lock:
+            watermark = self._watermarks.get((provider, stream, org_id))
+        return None if watermark is None else max(0.0, (now or time.time()) - watermark)
+
+    def collect(self):
+        family = GaugeMetricFamily(
+            "sync_freshness_lag_seconds",
+            "Retard des données synchronisées par rapport à maintenant",
+            labels=["provider", "stream", "org_id"],
+        )
+        now = time.time()
+        with self._lock:
+            watermarks = dict(self._watermarks)
+        for (provider, stream, org_id), watermark in watermarks.items():
+            family.add_metric([provider, stream, org_id], max(0.0, now - watermark))
+        yield family
+
+
+freshness = _FreshnessCollector()
+REGISTRY.register(freshness)
+
+_current_run: contextvars.ContextVar[Optional["SyncRunRecorder"]] = contextvars.ContextVar("sync_run", default=None)
+
+
+class SyncRunRecorder:
+    """Compteurs d'un run en cours (thread-safe : les pages peuvent arriver de plusieurs threads)."""
+
+    def __init__(self, provider: str, stream: str, org_id: str, company_id: Optional[str] = None):
+        self.id = str(uuid.uuid4())
+        self.provider = provider
+        self.stream = stream
+        self.org_id = org_id
+        self.company_id = company_id
+        self.status = "running"
+        self.started_at = datetime.utcnow()
+        self.finished_at: Optional[datetime] = None
+        self.pages = 0
+        self.rows_fetched = 0
+        self.rows_written = 0
+        self.rows_skipped = 0
+        self.api_calls = 0
+        self.api_errors = 0
+        self.api_seconds = 0.0
+        self.watermark_ts: Optional[int] = None
+        self.error: Optional[str] = None
+        self._started = time.monotonic()
+        self._lock = threading.Lock()
+
+    @property
+    def duration_seconds(self) -> float:
+        return time.monotonic() - self._started
+
+    def record_api_call(self, seconds: float, error: bool = False) -> None:
+        with self._lock:
+            self.api_calls += 1
+            self.api_seconds += seconds
+            self.api_errors += int(error)
+
+    def record_result(self, result: Any) -> None:
+        """Reprend les compteurs du résumé renvoyé par le service (clés absentes ignorées)."""
+        if not isinstance(result, dict):
+            return
+        with self._lock:
+            self.pages = int(result.get("pages", result.get("requests", self.pages)) or 0)
+            self.rows_fetched = int(result.get("fetched", self.rows_fetched) or 0)
+            self.rows_written = sum(int(result.get(k) or 0) for k in ("saved", "inserted", "updated", "deactivated"))
+            self.rows_skipped = sum(int(result.get(k) or 0) for k in ("skipped", "unchanged"))
+            if result.get("end_ts"):
+                self.watermark_ts = int(result["end_ts"])
+
+    def to_row(self) -> dict[str, Any]:
+        return {
+            "id": self.id,
+            "org_id": self.org_id,
+            "provider": self.provider,
+            "stream": self.stream,
+            "company_id": self.company_id,
+            "status": self.status,
+            "started_at": self.started_at.isoformat(),
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+            "duration_seconds": round(self.duration_seconds, 3) if self.finished_at else None,
+            "pages": self.pages,
+            "rows_fetched": self.rows_fetched,
+            "rows_written": self.rows_written,
+            "rows_skipped": self.rows_skipped,
+            "api_calls": self.api_calls,
+            "api_errors": self.api_errors,
+            "api_seconds": round(self.api_seconds, 3),
+            "watermark_ts": self.watermark_ts,
+            "error": self.error,
+        }
+
+
+class _LedgerWriter:
+    """
+    Écrit les lignes sync_runs via sa propre connexion Supabase (indépendante de la session
+    du service synchronisé). Désactivé si Supabase n'est pas configuré ; une erreur d'écriture
+    n'interrompt jamais la synchronisation.
+    """
+
+    def __init__(self):
+        self._db = None
+        self._disabled = False
+        self._lock = threading.Lock()
+
+    def _get_db(self):
+        with self._lock:
+            if self._db is None and not self._disabled:
+                try:
+                    from app.core.supabase_db import SupabaseDB
+                    self._db = SupabaseDB()
+                except Exception as e:
+                    self._disabled = True
+                    logger.warning(f"[SYNC LEDGER] Journal des runs désactivé: {e}")
+            return self._db
+
+    def write(self, run: SyncRunRecorder) -> None:
+        if not settings.sync_ledger_enabled:
+            return
+        db = self._get_db()
+        if db is None:
+            return
+        try:
+            from app.models.sync_run import SyncRun
+            db.bulk_upsert(SyncRun, [run.to_row()])
+        except Exception as e:
+            logger.warning(f"[SYNC LEDGER] Écriture du run {run.id} ({run.provider}/{run.stream}) impossible: {e}")
+
+
+ledger_writer = _LedgerWriter()
+
+
+def current_run() -> Optional[SyncRunRecorder]:
+    return _current_run.get()
+
+
+def observe_api_call(provider: str, seconds: float, error: bool = False) -> None:
+    SYNC_API_LATENCY.labels(provider).observe(seconds)
+    if error:
+        SYNC_API_ERRORS.labels(provider).inc()
+    run = _current_run.get()
+    if run is not None:
+        run.record_api_call(seconds, error)
+
+
+class _ApiCall:
+    error = False
+
+
+@contextmanager
+def timed_api_call(provider: str):
+    """
+    Mesure un appel HTTP vers une API partenaire et l'attribue au run courant.
+    Une exception compte comme erreur ; l'appelant peut aussi positionner call.error
+    (ex: call.error = resp.status_code >= 400).
+    """
+    call = _ApiCall()
+    started = time.perf_counter()
+    try:
+        yield call
+    except Exception:
+        call.error = True
+        raise
+    finally:
+        observe_api_call(provider, time.perf_counter() - started, call.error)
+
+
+def bind_context(fn: Callable) -> Callable:
+    """
+    Rattache fn au contexte de l'appelant (run courant) pour une exécution dans un autre thread.
+    Chaque appel s'exécute dans sa propre copie : utilisable par plusieurs threads à la fois.
+    """
+    context = contextvars.copy_context()
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        return context.copy().run(fn, *args, **kwargs)
+
+    return wrapper
+
+
+def _finish(run: SyncRunRecorder, status: str, error: Optional[str] = None) -> None:
+    run.status = status
+    run.error = error
+    run.finished_at = datetime.utcnow()
+    labels = (run.provider, run.stream)
+    SYNC_RUNS.labels(*labels, status).inc()
+    SYNC_DURATION.labels(*labels).observe(run.duration_seconds)
+    SYNC_PAGES.labels(*labels).inc(run.pages)
+    SYNC_ROWS.labels(*labels, "fetched").inc(run.rows_fetched)
+    SYNC_ROWS.labels(*labels, "written").inc(run.rows_written)
+    SYNC_ROWS.labels(*labels, "skipped").inc(run.rows_skipped)
+    if status == "success":
+        SYNC_LAST_SUCCESS.labels(*labels, run.org_id).set(time.time())
+        # Flux datés (orders, state logs) : fin de la fenêtre ; référentiels : fin du run
+        freshness.update(*labels, run.org_id, run.watermark_ts or time.time())
+    ledger_writer.write(run)
+
+
+def tracked_sync(provider: str, stream: str) -> Callable:
+    """
+    Décorateur des fonctions de sync : journalise le run et alimente les métriques.
+    org_id / company_id sont lus dans les arguments nommés ; le résumé renvoyé (dict) fournit
+    pages / requests, fetched, saved / inserted / updated / deactivated, skipped / unchanged, end_ts.
+    """
+
+    def decorator(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            org_id = kwargs.get("org_id") or settings.uber_default_org_id or "default_org"
+            company_id = kwargs.get("company_id")
+            run = SyncRunRecorder(provider, stream, org_id, str(company_id) if company_id else None)
+            token = _current_run.set(run)
+            SYNC_IN_PROGRESS.labels(provider, stream).inc()
+            ledger_writer.write(run)
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                _finish(run, "error", str(e)[:2000])
+                raise
+            else:
+                run.record_result(result)
+                _finish(run, "success")
+                return result
+            finally:
+                SYNC_IN_PROGRESS.labels(provider, stream).dec()
+                _current_run.reset(token)
+
+        return wrapper
+
+    return decorator
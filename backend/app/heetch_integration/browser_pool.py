@@ -0,0 +1,255 @@
+"""
+Pool de navigateurs Playwright pour les connexions Heetch.
+
+Un seul Chromium, lancé à la première connexion puis gardé chaud, tourne sur une boucle asyncio
+dédiée (thread heetch_browser_pool) : les connexions de plusieurs orgs s'exécutent en parallèle
+sur cette boucle au lieu d'attendre chacune le lancement de leur propre navigateur.
+
+Chaque session (org + numéro) a son propre BrowserContext (cookies isolés), réutilisé d'une
+connexion à l'autre. Images, polices, médias et traceurs analytics ne sont pas chargés, sauf
+ceux des captchas. Au-delà de HEETCH_BROWSER_POOL_SIZE contextes, le moins récemment utilisé
+est fermé ; un contexte inutilisé depuis HEETCH_BROWSER_IDLE_SECONDS l'est aussi, puis le
+navigateur quand plus aucun contexte n'est ouvert.
+
+Un contexte est en cours d'utilisation d'acquire_context jusqu'à release (une connexion reste
+ouverte entre start_login et complete_login) : il n'est jamais fermé par l'éviction, quitte à
+dépasser temporairement HEETCH_BROWSER_POOL_SIZE.
+"""
+import asyncio
+import contextlib
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Optional
+from urllib.parse import urlsplit
+
+from playwright.async_api import BrowserContext, Route, async_playwright
+
+from app.core.config import get_settings
+from app.core import logging as app_logging
+
+settings = get_settings()
+logger = app_logging.get_logger(__name__)
+
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/143.0.0.0 Safari/537.36"
+BLOCKED_RESOURCE_TYPES = {"image", "font", "media"}
+ANALYTICS_HOSTS = (
+    "google-analytics.com",
+    "googletagmanager.com",
+    "doubleclick.net",
+    "facebook.net",
+    "facebook.com",
+    "segment.io",
+    "segment.com",
+    "hotjar.com",
+    "amplitude.com",
+    "mixpanel.com",
+    "clarity.ms",
+)
+
+
+def should_block(url: str, resource_type: str) -> bool:
+    """Requête à ne pas charger : traceur analytics, ou image / police / média hors captcha."""
+    host = urlsplit(url).hostname or ""
+    if any(host == domain or host.endswith(f".{domain}") for domain in ANALYTICS_HOSTS):
+        return True
+    # Les défis reCAPTCHA / hCaptcha sont des images : ils doivent rester visibles
+    return resource_type in BLOCKED_RESOURCE_TYPES and "captcha" not in url.lower()
+
+
+async def _route_request(route: Route) -> None:
+    request = route.request
+    if should_block(request.url, request.resource_type):
+        await route.abort()
+    else:
+        await route.continue_()
+
+
+@dataclass
+class _PooledContext:
+    context: BrowserContext
+    last_used: float
+    in_use: bool = False
+
+
+class BrowserPool:
+    def __init__(
+        self,
+        max_contexts: Optional[int] = None,
+        idle_seconds: Optional[float] = None,
+        launcher: Optional[Callable[[], Awaitable[Any]]] = None,
+    ):
+        self.max_contexts = settings.heetch_browser_pool_size if max_contexts is None else max_contexts
+        self.idle_seconds = settings.heetch_browser_idle_seconds if idle_seconds is None else idle_seconds
+        # launcher : coroutine renvoyant un navigateur (Chromium Playwright par défaut)
+        self._launcher = launcher or self._launch_chromium
+        self._playwright = None
+        self._browser = None
+        self._browser_last_used = 0.0
+        self._contexts: OrderedDict[str, _PooledContext] = OrderedDict()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._lock: Optional[asyncio.Lock] = None
+        self._evictor: Optional[asyncio.Task] = None
+
+    # --- Boucle dédiée -------------------------------------------------------------------------
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._start_lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                ready = threading.Event()
+
+                def run_loop():
+                    asyncio.set_event_loop(loop)
+                    self._lock = asyncio.Lock()
+                    self._evictor = loop.create_task(self._evict_periodically())
+                    ready.set()
+                    loop.run_forever()
+
+                self._thread = threading.Thread(target=run_loop, name="heetch_browser_pool", daemon=True)
+                self._thread.start()
+                ready.wait()
+                self._loop = loop
+            return self._loop
+
+    def run(self, async_func: Callable[..., Awaitable[Any]], *args, timeout: float = 120, **kwargs) -> Any:
+        """Exécute async_func(*args, **kwargs) sur la boucle du pool et attend son résultat."""
+        future = asyncio.run_coroutine_threadsafe(async_func(*args, **kwargs), self._ensure_loop())
+        try:
+            return future.result(timeout=timeout)
+        except TimeoutError:
+            future.cancel()
+            raise
+
+    def shutdown(self) -> None:
+        """Ferme contextes, navigateur et boucle (arrêt de l'application)."""
+        if self._loop is None:
+            return
+        try:
+            self.run(self._close_all, timeout=30)
+        except Exception as e:
+            logger.warning(f"[HEETCH POOL] Erreur lors de la fermeture du pool: {e}")
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
+        if not self._loop.is_running():
+            self._loop.close()
+        self._loop = None
+
+    # --- Navigateur et contextes (à appeler sur la boucle du pool) ------------------------------
+
+    async def _launch_chromium(self):
+        if self._playwright is None:
+            self._playwright = await async_playwright().start()
+        # Mode headless contrôlé par HEETCH_HEADLESS ; actions ralenties de 500ms pour voir ce qui se passe
+        return await self._playwright.chromium.launch(headless=settings.heetch_headless, slow_mo=500)
+
+    async def _get_browser(self):
+        if self._browser is None or not self._browser.is_connected():
+            started = time.perf_counter()
+            self._browser = await self._launcher()
+            # Les contextes d'un navigateur fermé ne sont plus utilisables
+            self._contexts.clear()
+            logger.info(f"[HEETCH POOL] Chromium lancé en {time.perf_counter() - started:.2f}s (headless={settings.heetch_headless})")
+        self._browser_last_used = time.monotonic()
+        return self._browser
+
+    async def acquire_context(self, key: str, cookies: Optional[list[dict]] = None) -> BrowserContext:
+        """
+        Contexte isolé de la session key (org_id:téléphone), réutilisé s'il est encore ouvert.
+        Les pages restées ouvertes d'une connexion précédente sont fermées ; cookies (format
+        Playwright) est ajouté au contexte.
+        """
+        async with self._lock:
+            started = time.perf_counter()
+            browser = await self._get_browser()
+            entry = self._contexts.get(key)
+            if entry is not None:
+                self._contexts.move_to_end(key)
+                for page in list(entry.context.pages):
+                    await page.close()
+                origin = "chaud"
+            else:
+                context = await browser.new_context(user_agent=USER_AGENT)
+                await context.route("**/*", _route_request)
+                entry = self._contexts[key] = _PooledContext(context, time.monotonic(), in_use=True)
+                origin = "nouveau"
+                # Plus ancien d'abord ; les contextes en cours d'utilisation (dont le nouveau) ne sont jamais fermés
+                while len(self._contexts) > self.max_contexts:
+                    evicted_key = next((k for k, e in self._contexts.items() if not e.in_use), None)
+                    if evicted_key is None:
+                        logger.warning(f"[HEETCH POOL] {len(self._contexts)} contextes en cours d'utilisation, limite de {self.max_contexts} dépassée")
+                        break
+                    await self._close_context(evicted_key, self._contexts.pop(evicted_key), "pool plein")
+            entry.in_use = True
+            entry.last_used = time.monotonic()
+            if cookies:
+                await entry.context.add_cookies(cookies)
+            logger.info(f"[HEETCH POOL] Contexte {origin} pour {key} en {(time.perf_counter() - started) * 1000:.0f} ms ({len(self._contexts)} ouvert(s))")
+            return entry.context
+
+    async def release(self, key: str) -> None:
+        """Fin d'utilisation du contexte : il redevient évictable, le délai d'inactivité repart de maintenant."""
+        entry = self._contexts.get(key)
+        if entry is not None:
+            entry.in_use = False
+            entry.last_used = time.monotonic()
+
+    async def evict_idle(self, now: Optional[float] = None) -> int:
+        """
+        Ferme les contextes inactifs (hors contextes en cours d'utilisation), puis le navigateur s'il
+        n'en reste aucun. Renvoie le nombre de contextes fermés.
+        """
+        now = time.monotonic() if now is None else now
+        async with self._lock:
+            idle = [
+                key for key, entry in self._contexts.items()
+                if not entry.in_use and now - entry.last_used >= self.idle_seconds
+            ]
+            for key in idle:
+                await self._close_context(key, self._contexts.pop(key), "inactif")
+            if not self._contexts and self._browser is not None and now - self._browser_last_used >= self.idle_seconds:
+                await self._close_browser()
+        return len(idle)
+
+    async def _evict_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(min(60.0, max(self.idle_seconds, 1.0)))
+            try:
+                await self.evict_idle()
+            except Exception as e:
+                logger.warning(f"[HEETCH POOL] Erreur lors de l'éviction des contextes inactifs: {e}")
+
+    async def _close_context(self, key: str, entry: _PooledContext, reason: str) -> None:
+        try:
+            await entry.context.close()
+        except Exception as e:
+            logger.debug(f"[HEETCH POOL] Erreur lors de la fermeture du contexte {key}: {e}")
+        logger.info(f"[HEETCH POOL] Contexte {key} fermé ({reason})")
+
+    async def _close_browser(self) -> None:
+        try:
+            await self._browser.close()
+            if self._playwright is not None:
+                await self._playwright.stop()
+        except Exception as e:
+            logger.debug(f"[HEETCH POOL] Erreur lors de la fermeture de Chromium: {e}")
+        self._browser = None
+        self._playwright = None
+        logger.info("[HEETCH POOL] Chromium fermé")
+
+    async def _close_all(self) -> None:
+        self._evictor.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await self._evictor
+        async with self._lock:
+            while self._contexts:
+                key, entry = self._contexts.popitem(last=False)
+                await self._close_context(key, entry, "arrêt")
+            if self._browser is not None:
+                await self._close_browser()
+
+
+browser_pool = BrowserPool()
@@ -0,0 +1,175 @@
+"""
+Cache process des cookies de session Heetch par (org_id, téléphone), adossé à heetch_session_cookies.
+
+- lecture : la table n'est lue qu'au premier accès ; une absence (ou des cookies invalides) est
+  gardée HEETCH_COOKIE_CACHE_TTL_SECONDS avant d'être relue, pour voir une connexion faite par
+  un autre process (API / worker) ;
+- écriture : seulement si les cookies changent (ou si leur expiration est repoussée de plus d'une heure) ;
+- invalidation (HTTP 307, cookies refusés) : l'entrée est marquée invalide en mémoire et en base,
+  les requêtes suivantes échouent sans aller-retour Supabase jusqu'à la prochaine connexion.
+
+Les écritures ne portent que sur les colonnes modifiées : invalid_at n'est posé que si la base
+contient encore les cookies lus par ce process, pour qu'un process resté sur d'anciens cookies
+n'écrase ni n'invalide ceux d'une connexion plus récente faite ailleurs (API / worker).
+"""
+import json
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Optional
+
+from app.core.config import get_settings
+from app.core import logging as app_logging
+from app.core.supabase_db import SupabaseDB
+from app.models.heetch_session_cookies import HeetchSessionCookies
+
+settings = get_settings()
+logger = app_logging.get_logger(__name__)
+
+# Repousser l'expiration de cookies inchangés ne justifie une écriture qu'au-delà de ce délai
+EXPIRY_REFRESH_SECONDS = 3600
+
+
+@dataclass
+class SessionCookies:
+    cookies: Optional[list[dict]]
+    expires_at: float
+    # Valeur de la colonne cookies telle que lue ou écrite par ce process (None si rien de valide en base)
+    stored: Any
+    loaded_at: float
+
+    @property
+    def valid(self) -> bool:
+        return bool(self.cookies) and time.time() < self.expires_at
+
+
+def _cookie_list(raw: Any) -> Optional[list[dict]]:
+    """Cookies tels que désérialisés du JSONB (liste, chaîne JSON, dict {"cookies": [...]} ou cookie unique)."""
+    if isinstance(raw, str):
+        try:
+            raw = json.loads(raw)
+        except Exception as e:
+            logger.error(f"[HEETCH] Erreur lors de la désérialisation JSON des cookies: {e}")
+            return None
+    if isinstance(raw, list):
+        return raw
+    if isinstance(raw, dict):
+        return raw["cookies"] if "cookies" in raw else [raw]
+    logger.error(f"[HEETCH] Format de cookies inattendu et non convertible: {type(raw)}")
+    return None
+
+
+class HeetchCookieStore:
+    def __init__(self, db_factory=SupabaseDB, ttl_seconds: Optional[float] = None):
+        self._db_factory = db_factory
+        self.ttl_seconds = settings.heetch_cookie_cache_ttl_seconds if ttl_seconds is None else ttl_seconds
+        self._entries: dict[tuple[str, str], SessionCookies] = {}
+        self._lock = threading.Lock()
+
+    def get(self, org_id: str, phone: str) -> Optional[SessionCookies]:
+        """Cookies valides de la session, lus en base au plus une fois (None si absents, expirés ou invalides)."""
+        key = (org_id, phone)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or (not entry.cookies and time.monotonic() - entry.loaded_at >= self.ttl_seconds):
+                entry = self._entries[key] = self._load(org_id, phone)
+            if entry.cookies and not entry.valid:
+                logger.info(f"[HEETCH] Cookies expirés pour {phone} (org {org_id})")
+                self._mark_invalid(entry, org_id, phone)
+            return entry if entry.valid else None
+
+    def save(self, org_id: str, phone: str, cookies: list[dict], expires_at: float) -> bool:
+        """Enregistre les cookies d'une connexion ; écrit en base seulement s'ils ont changé. Renvoie True si écrit."""
+        key = (org_id, phone)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._entries[key] = self._load(org_id, phone)
+            if entry.valid and entry.cookies == cookies and expires_at - entry.expires_at < EXPIRY_REFRESH_SECONDS:
+                return False
+            db = self._db_factory()
+            # Upsert sur (org_id, phone_number) limité aux colonnes de la session : la ligne est
+            # créée au besoin, sans réécrire une copie en mémoire des autres colonnes
+            db.bulk_upsert(
+                HeetchSessionCookies,
+                [{
+                    "org_id": org_id,
+                    "phone_number": phone,
+                    "cookies": cookies,
+                    "expires_at": datetime.fromtimestamp(expires_at).isoformat(),
+                    "invalid_at": None,  # Nouveaux cookies valides
+                }],
+                on_conflict=["org_id", "phone_number"],
+            )
+            db.commit()
+            entry.cookies = cookies
+            entry.stored = cookies
+            entry.expires_at = expires_at
+            entry.loaded_at = time.monotonic()
+            return True
+
+    def invalidate(self, org_id: str, phone: str) -> None:
+        """Marque les cookies de la session invalides (HTTP 307 ou cookies refusés), en mémoire et en base."""
+        with self._lock:
+            entry = self._entries.get((org_id, phone))
+            if entry is None:
+                entry = self._entries[(org_id, phone)] = self._load(org_id, phone)
+            if entry.cookies:
+                self._mark_invalid(entry, org_id, phone)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def _load(self, org_id: str, phone: str) -> SessionCookies:
+        """Cookies valides (non marqués invalides) de la session en base."""
+        entry = SessionCookies(cookies=None, expires_at=0.0, stored=None, loaded_at=time.monotonic())
+        try:
+            row = self._db_factory().query(HeetchSessionCookies).filter(
+                HeetchSessionCookies.org_id == org_id,
+                HeetchSessionCookies.phone_number == phone,
+                # Ne prendre que les cookies non marqués comme invalides
+                HeetchSessionCookies.invalid_at.is_(None),
+            ).first()
+        except Exception as e:
+            logger.debug(f"[HEETCH] Erreur lors du chargement des cookies depuis la DB: {e}")
+            return entry
+        if row is None:
+            return entry
+        entry.stored = row.cookies
+        entry.cookies = _cookie_list(row.cookies)
+        entry.expires_at = row.expires_at.timestamp()
+        logger.info(f"[HEETCH] {len(entry.cookies or [])} cookies chargés depuis la DB pour {phone} (expire: {row.expires_at})")
+        return entry
+
+    def _mark_invalid(self, entry: SessionCookies, org_id: str, phone: str) -> None:
+        stored = entry.stored
+        entry.cookies = None
+        entry.stored = None
+        entry.expires_at = 0.0
+        entry.loaded_at = time.monotonic()
+        if stored is None:
+            return
+        try:
+            # Marquer comme invalides au lieu de supprimer (pour garder l'historique), seulement si
+            # la base contient toujours les cookies de ce process (pas ceux d'une connexion plus récente)
+            updated = self._db_factory().update_rows(
+                HeetchSessionCookies,
+                {"invalid_at": datetime.utcnow()},
+                {
+                    "org_id": org_id,
+                    "phone_number": phone,
+                    "invalid_at": None,
+                    "cookies": stored if isinstance(stored, (dict, list)) else json.dumps(stored),
+                },
+            )
+            if updated:
+                logger.info(f"[HEETCH] Cookies marqués comme invalides dans la DB pour {phone} (org {org_id})")
+            else:
+                logger.info(f"[HEETCH] Cookies de {phone} (org {org_id}) déjà remplacés ou invalidés en base, rien à marquer")
+        except Exception as e:
+            logger.debug(f"[HEETCH] Erreur lors du marquage des cookies comme invalides: {e}")
+
+
+cookie_store = HeetchCookieStore()
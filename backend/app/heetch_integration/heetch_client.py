@@ -1,37 +1,52 @@
 import time
-import asyncio
 import random
 from typing import Any, Dict, Optional
 from datetime import datetime, date
-from concurrent.futures import ThreadPoolExecutor
-import threading
+from urllib.parse import urlsplit
 from threading import Lock
 
 _cache_lock = Lock()
 
 import httpx
-from playwright.async_api import async_playwright, Browser, Page, BrowserContext
+from playwright.async_api import Page
 
 from app.core.config import get_settings
 from app.core import logging as app_logging
+from app.core.rate_limit import RateLimiter
+from app.core.sync_ledger import timed_api_call
+from app.heetch_integration.browser_pool import browser_pool
+from app.heetch_integration.cookie_store import cookie_store
 from app.heetch_integration.heetch_auth_api import HeetchAuthAPI
 
 settings = get_settings()
 logger = app_logging.get_logger(__name__)
 
-# ThreadPoolExecutor pour exécuter Playwright dans un thread séparé
-# Utiliser un seul worker pour s'assurer que les sessions sont réutilisées
-_playwright_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="heetch_playwright")
-
 # Cache global pour les clients Heetch (un par org_id)
 _client_cache: Dict[str, 'HeetchClient'] = {}
 
-# Stockage global pour les sessions Playwright par client_id
-# Format: {client_id: {"playwright": ..., "browser": ..., "context": ..., "page": ..., "loop": ...}}
+# Sessions de connexion en cours (entre start_login et complete_login) par org_id:téléphone
+# Format: {session_key: {"context": ..., "page": ...}} ; les contextes appartiennent au browser_pool
 _playwright_sessions: Dict[str, Dict[str, Any]] = {}
 _session_lock = Lock()
 
 
+async def _release_playwright_session(session_key: str) -> None:
+    """Ferme la page de la connexion en cours et rend son contexte au pool (sur la boucle du pool)."""
+    with _session_lock:
+        session = _playwright_sessions.pop(session_key, None)
+    page = session.get("page") if session else None
+    if page is not None:
+        try:
+            await page.close()
+        except Exception as e:
+            logger.debug(f"[HEETCH] Erreur lors de la fermeture de la page: {e}")
+    await browser_pool.release(session_key)
+
+
+# Limiteur partagé par tous les clients Heetch : les périodes récupérées en parallèle restent polies
+rate_limiter = RateLimiter(settings.heetch_rate_limit_per_second, settings.heetch_rate_limit_burst)
+
+
 class HeetchClient:
     """
     Client pour scraper les données Heetch via le site driver.heetch.com.
@@ -50,6 +65,10 @@ class HeetchClient:
         self._phone_number: Optional[str] = None
         self._auth_api = HeetchAuthAPI()
         self._token: Optional[str] = None
+        # Client HTTP de la session (keep-alive, cookie jar), reconstruit quand les cookies changent
+        self._http: Optional[httpx.Client] = None
+        self._http_cookies: Optional[list] = None
+        self._http_lock = Lock()
     
     def _get_session_key(self, phone: Optional[str] = None) -> str:
         """Génère une clé de session basée sur org_id + phone_number."""
@@ -116,120 +135,29 @@ class HeetchClient:
     
     def _load_cookies_from_db(self, phone_number: str) -> bool:
         """
-        Charge les cookies depuis la base de données pour un numéro de téléphone donné.
+        Charge les cookies de session pour un numéro de téléphone donné (cache process cookie_store,
+        la base n'est lue qu'au premier accès).
         
         Returns:
             True si des cookies valides ont été trouvés et chargés
         """
-        try:
-            from app.core.supabase_db import SupabaseDB
-            from app.models.heetch_session_cookies import HeetchSessionCookies
-            from datetime import datetime
-            
-            db = SupabaseDB()
-            # Rechercher par org_id + phone_number, en excluant les cookies marqués comme invalides
-            session_cookies = db.query(HeetchSessionCookies).filter(
-                HeetchSessionCookies.org_id == self.org_id,
-                HeetchSessionCookies.phone_number == phone_number,
-                HeetchSessionCookies.invalid_at.is_(None)  # Ne prendre que les cookies non marqués comme invalides
-            ).first()
-            
-            if session_cookies and session_cookies.expires_at > datetime.utcnow():
-                cookies_raw = session_cookies.cookies
-                logger.debug(f"[HEETCH] Cookies bruts chargés de la DB, type: {type(cookies_raw)}")
-                
-                # Gérer différents formats de désérialisation JSONB
-                if isinstance(cookies_raw, str):
-                    # Si c'est une chaîne JSON, la désérialiser
-                    try:
-                        import json
-                        cookies_raw = json.loads(cookies_raw)
-                        logger.debug("[HEETCH] Cookies désérialisés depuis chaîne JSON")
-                    except Exception as e:
-                        logger.error(f"[HEETCH] Erreur lors de la désérialisation JSON: {e}")
-                        return False
-                
-                self._cookies = cookies_raw
-                
-                # Vérifier le type des cookies (devrait être une liste)
-                if not isinstance(self._cookies, list):
-                    logger.warning(f"[HEETCH] Les cookies chargés ne sont pas une liste, type: {type(self._cookies)}, tentative de conversion...")
-                    # Si c'est un dict avec une clé 'cookies', extraire la liste
-                    if isinstance(self._cookies, dict) and 'cookies' in self._cookies:
-                        self._cookies = self._cookies['cookies']
-                        logger.info("[HEETCH] Cookies extraits depuis dict avec clé 'cookies'")
-                    elif isinstance(self._cookies, dict):
-                        # Si c'est directement un dict, convertir en liste
-                        self._cookies = [self._cookies] if self._cookies else []
-                        logger.info("[HEETCH] Cookie unique converti en liste")
-                    else:
-                        logger.error(f"[HEETCH] Format de cookies inattendu et non convertible: {type(self._cookies)}")
-                        return False
-                
-                # Convertir expires_at en timestamp
-                expires_timestamp = session_cookies.expires_at.timestamp()
-                self._cookies_expires_at = expires_timestamp
-                logger.info(f"[HEETCH] {len(self._cookies) if self._cookies else 0} cookies chargés depuis la DB pour {phone_number} (expire: {session_cookies.expires_at})")
-                # Log du premier cookie pour vérifier le format
-                if self._cookies and len(self._cookies) > 0:
-                    first_cookie = self._cookies[0]
-                    logger.debug(f"[HEETCH] Exemple de cookie chargé: name={first_cookie.get('name')}, domain={first_cookie.get('domain')}, keys={list(first_cookie.keys())}")
-                return True
-            elif session_cookies:
-                logger.info(f"[HEETCH] Cookies expirés dans la DB pour {phone_number} (expiré le: {session_cookies.expires_at})")
-                # Marquer comme invalides au lieu de supprimer (pour garder l'historique)
-                session_cookies.invalid_at = datetime.utcnow()
-                db.merge(session_cookies)
-                db.commit()
-            
-            return False
-        except Exception as e:
-            logger.debug(f"[HEETCH] Erreur lors du chargement des cookies depuis la DB: {e}")
+        session = cookie_store.get(self.org_id, phone_number)
+        if session is None:
             return False
+        self._cookies = session.cookies
+        self._cookies_expires_at = session.expires_at
+        return True
     
     def _save_cookies_to_db(self, phone_number: str) -> None:
         """
-        Sauvegarde les cookies dans la base de données pour un numéro de téléphone donné.
+        Sauvegarde les cookies pour un numéro de téléphone donné (écrits en base seulement s'ils ont changé).
         """
+        if not self._cookies:
+            return
         try:
-            from app.core.supabase_db import SupabaseDB
-            from app.models.heetch_session_cookies import HeetchSessionCookies
-            from datetime import datetime, timedelta
-            import uuid
-            
-            if not self._cookies:
+            if not cookie_store.save(self.org_id, phone_number, self._cookies, self._cookies_expires_at):
+                logger.info(f"[HEETCH] Cookies inchangés pour {phone_number}, pas d'écriture en base")
                 return
-            
-            db = SupabaseDB()
-            
-            # Vérifier si une entrée existe déjà pour cet org_id + phone_number (même si marquée comme invalide)
-            existing = db.query(HeetchSessionCookies).filter(
-                HeetchSessionCookies.org_id == self.org_id,
-                HeetchSessionCookies.phone_number == phone_number
-            ).first()
-            
-            # Calculer expires_at depuis le timestamp
-            expires_at = datetime.fromtimestamp(self._cookies_expires_at)
-            
-            if existing:
-                # Mettre à jour l'entrée existante avec de nouveaux cookies valides
-                existing.cookies = self._cookies
-                existing.expires_at = expires_at
-                existing.invalid_at = None  # Réinitialiser invalid_at car les nouveaux cookies sont valides
-                db.merge(existing)
-            else:
-                # Créer une nouvelle entrée avec un UUID généré
-                session_cookies = HeetchSessionCookies(
-                    id=uuid.uuid4(),
-                    org_id=self.org_id,
-                    phone_number=phone_number,
-                    cookies=self._cookies,
-                    expires_at=expires_at,
-                    invalid_at=None  # Nouveaux cookies sont valides
-                )
-                db.merge(session_cookies)
-            
-            db.commit()
             # Log des domaines de cookies sauvegardés pour debugging
             cookie_domains = {}
             for cookie in self._cookies:
@@ -243,6 +171,13 @@ class HeetchClient:
             logger.error(f"[HEETCH] Erreur lors de la sauvegarde des cookies dans la DB: {e}", exc_info=True)
             # Ne pas lever d'exception, la sauvegarde des cookies n'est pas critique
     
+    def _invalidate_cookies(self, phone: Optional[str]) -> None:
+        """Oublie les cookies de session et les marque invalides (cache process et base)."""
+        self._cookies = None
+        self._cookies_expires_at = 0.0
+        if phone:
+            cookie_store.invalidate(self.org_id, phone)
+    
     def _get_cookies(self, phone: Optional[str] = None) -> list[Dict[str, Any]]:
         """
         Récupère les cookies de session. Essaie de les charger depuis la DB si non présents en mémoire.
@@ -270,6 +205,37 @@ class HeetchClient:
             "ou laissez le système se connecter automatiquement."
         )
     
+    def _session_http(self, phone: Optional[str] = None) -> tuple[httpx.Client, list[Dict[str, Any]]]:
+        """
+        Client HTTP de la session courante, partagé par les requêtes (y compris concurrentes).
+        Reconstruit seulement quand la liste de cookies change (nouvelle connexion, rechargement DB).
+        """
+        with self._http_lock:
+            cookies = self._get_cookies(phone)
+            if self._http is None or self._http_cookies is not cookies:
+                if self._http is not None:
+                    self._http.close()
+                jar = httpx.Cookies()
+                host = urlsplit(self.base_url).hostname
+                for cookie in cookies:
+                    # Tous les cookies de session sont envoyés à driver.heetch.com, quel que soit leur domaine d'origine
+                    jar.set(cookie['name'], cookie['value'], domain=host)
+                self._http = httpx.Client(
+                    base_url=self.base_url,
+                    timeout=30.0,
+                    follow_redirects=False,
+                    cookies=jar,
+                    headers={
+                        "accept": "application/json, text/plain, */*",
+                        "accept-language": "fr-FR,fr;q=0.9,en-US;q=0.8,en;q=0.7",
+                        "referer": f"{self.base_url}/earnings",
+                        "user-agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/143.0.0.0 Safari/537.36",
+                    },
+                    limits=httpx.Limits(max_connections=max(1, settings.heetch_max_concurrent_periods)),
+                )
+                self._http_cookies = cookies
+            return self._http, cookies
+    
     def ensure_authenticated(self, phone: Optional[str] = None) -> bool:
         """
         S'assure que la session est authentifiée, sans faire le flux complet si les cookies sont valides.
@@ -286,7 +252,13 @@ class HeetchClient:
         
         if not phone:
             return False
-        
+
+        # Les cookies en mémoire sont ceux du numéro précédent : get_earnings doit utiliser la session de phone
+        if phone != self._phone_number:
+            self._cookies = None
+            self._cookies_expires_at = 0.0
+            self._phone_number = phone
+
         # Essayer de charger les cookies depuis la DB si non présents en mémoire
         if not self._cookies or time.time() >= self._cookies_expires_at:
             cookies_loaded = self._load_cookies_from_db(phone)
@@ -363,63 +335,14 @@ class HeetchClient:
         logger.info("[HEETCH] Finalisation de la connexion avec code SMS et mot de passe")
         return self.complete_login(sms_code, password)
     
-    def _run_async_in_thread(self, async_func, *args, session_key: Optional[str] = None, **kwargs):
+    def _run_async_in_thread(self, async_func, *args, **kwargs):
         """
-        Exécute une fonction async Playwright dans un thread séparé.
-        Si session_key est fourni et qu'une session existe, réutilise le même event loop.
+        Exécute une fonction async Playwright sur la boucle du pool de navigateurs (thread dédié).
+        Les sessions de plusieurs orgs s'y exécutent en parallèle.
         """
-        def run_with_loop():
-            import sys
-            import threading
-            
-            # Si on a une session_key, essayer de réutiliser le même event loop
-            loop_to_use = None
-            if session_key:
-                with _session_lock:
-                    if session_key in _playwright_sessions:
-                        session = _playwright_sessions[session_key]
-                        stored_loop = session.get("event_loop")
-                        stored_thread_id = session.get("thread_id")
-                        current_thread_id = threading.current_thread().ident
-                        
-                        # Si c'est le même thread, on peut réutiliser le loop
-                        if stored_thread_id == current_thread_id and stored_loop and not stored_loop.is_closed():
-                            try:
-                                # Vérifier que le loop est toujours actif
-                                asyncio.set_event_loop(stored_loop)
-                                loop_to_use = stored_loop
-                                logger.info(f"[HEETCH] Réutilisation du même event loop pour la session {session_key}")
-                            except Exception as e:
-                                logger.debug(f"[HEETCH] Impossible de réutiliser le loop: {e}")
-            
-            # Si pas de loop réutilisable, en créer un nouveau
-            if not loop_to_use:
-                # Configurer la politique d'event loop pour Windows
-                if sys.platform == 'win32':
-                    policy = asyncio.WindowsProactorEventLoopPolicy()
-                    asyncio.set_event_loop_policy(policy)
-                    loop_to_use = asyncio.new_event_loop()
-                else:
-                    loop_to_use = asyncio.new_event_loop()
-                asyncio.set_event_loop(loop_to_use)
-                logger.info(f"[HEETCH] Nouvel event loop créé (platform: {sys.platform})")
-            
-            try:
-                result = loop_to_use.run_until_complete(async_func(*args, **kwargs))
-                logger.info("[HEETCH] Exécution async terminée avec succès")
-                return result
-            except Exception as e:
-                logger.error(f"[HEETCH] Erreur dans l'exécution async: {e}", exc_info=True)
-                raise
-            finally:
-                # Ne pas fermer le loop si on a une session active
-                # Le loop sera réutilisé pour complete_login
-                pass
-        
-        logger.info("[HEETCH] Soumission de la tâche au thread pool")
-        future = _playwright_executor.submit(run_with_loop)
+        logger.info("[HEETCH] Soumission de la tâche au pool de navigateurs")
         try:
-            result = future.result(timeout=120)  # Augmenter le timeout à 120 secondes
+            result = browser_pool.run(async_func, *args, timeout=120, **kwargs)
             logger.info("[HEETCH] Tâche terminée avec succès")
             return result
         except TimeoutError:
@@ -612,7 +535,19 @@ class HeetchClient:
             raise ValueError("HEETCH_LOGIN doit être défini dans les variables d'environnement")
         
         async def _do_start_login_async():
-            """Version async de start_login."""
+            """Version async de start_login ; le contexte n'est gardé que si complete_login doit suivre."""
+            session_key = self._get_session_key(phone)
+            try:
+                result = await _start_login_steps()
+            except BaseException:
+                # Échec (ou timeout) : ne pas laisser le contexte réservé dans le pool
+                await _release_playwright_session(session_key)
+                raise
+            if result.get("status") == "already_logged_in":
+                await _release_playwright_session(session_key)
+            return result
+
+        async def _start_login_steps():
             logger.info("[HEETCH] Démarrage de l'initialisation Playwright")
             
             # Stocker le numéro de téléphone pour pouvoir réutiliser la session
@@ -628,33 +563,19 @@ class HeetchClient:
                     logger.info("[HEETCH] Aucun cookie trouvé en DB, connexion complète nécessaire")
             
             try:
-                # Créer une nouvelle session Playwright (sera réutilisée dans complete_login via le cache)
-                logger.info("[HEETCH] Démarrage de async_playwright()...")
-                playwright = await async_playwright().start()
-                logger.info("[HEETCH] Playwright démarré, lancement de Chromium...")
-                # Mode headless contrôlé par variable d'environnement (par défaut False pour voir le navigateur)
-                headless_mode = getattr(settings, 'heetch_headless', False)
-                browser = await playwright.chromium.launch(
-                    headless=headless_mode,
-                    slow_mo=500  # Ralentir les actions de 500ms pour voir ce qui se passe
-                )
-                logger.info(f"[HEETCH] Chromium lancé (headless={headless_mode}), création du contexte...")
-                
-                # Préparer les options du contexte
-                context_options = {
-                    "user_agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/143.0.0.0 Safari/537.36"
-                }
-                
+                # Contexte chaud du pool (un par org + téléphone), réutilisé entre les connexions
+                session_key = self._get_session_key(phone)
+                cookies = None
                 # Restaurer les cookies depuis la DB (chargés plus haut) pour éviter de redemander le numéro
                 if self._cookies:
                     logger.info(f"[HEETCH] Injection de {len(self._cookies)} cookies dans le contexte Playwright")
                     # Normaliser les cookies pour Playwright
-                    normalized_cookies = self._normalize_cookies_for_playwright(self._cookies)
-                    logger.info(f"[HEETCH] {len(normalized_cookies)} cookies normalisés pour injection")
+                    cookies = self._normalize_cookies_for_playwright(self._cookies)
+                    logger.info(f"[HEETCH] {len(cookies)} cookies normalisés pour injection")
                     
                     # Log des domaines de cookies injectés pour debugging
                     cookie_domains = {}
-                    for cookie in normalized_cookies:
+                    for cookie in cookies:
                         domain = cookie.get('domain', 'N/A')
                         if domain not in cookie_domains:
                             cookie_domains[domain] = 0
@@ -662,32 +583,23 @@ class HeetchClient:
                     domains_summary = ", ".join([f"{domain}: {count}" for domain, count in cookie_domains.items()])
                     logger.info(f"[HEETCH] Cookies injectés par domaine: {domains_summary}")
                     # Log des cookies d'authentification pour debugging
-                    auth_cookies = [c for c in normalized_cookies if c.get('name') in ['heetch_auth_token', 'heetch_driver_session']]
+                    auth_cookies = [c for c in cookies if c.get('name') in ['heetch_auth_token', 'heetch_driver_session']]
                     if auth_cookies:
                         for cookie in auth_cookies:
                             logger.info(f"[HEETCH] Cookie d'auth injecté: {cookie.get('name')} (domaine: {cookie.get('domain', 'N/A')})")
-                    context_options["storage_state"] = {
-                        "cookies": normalized_cookies
-                    }
                 
-                context = await browser.new_context(**context_options)
-                logger.info("[HEETCH] Contexte créé, création de la page...")
+                context = await browser_pool.acquire_context(session_key, cookies)
+                logger.info("[HEETCH] Contexte prêt, création de la page...")
                 page = await context.new_page()
                 logger.info("[HEETCH] Page créée avec succès")
                 
                 # Stocker la session pour complete_login (utiliser org_id + phone comme clé)
-                session_key = self._get_session_key(phone)
-                current_loop = asyncio.get_event_loop()
                 with _session_lock:
                     _playwright_sessions[session_key] = {
-                        "playwright": playwright,
-                        "browser": browser,
                         "context": context,
                         "page": page,
-                        "event_loop": current_loop,
-                        "thread_id": threading.current_thread().ident
                     }
-                logger.info(f"[HEETCH] Session stockée dans le cache avec la clé: {session_key} (thread_id: {threading.current_thread().ident})")
+                logger.info(f"[HEETCH] Session stockée dans le cache avec la clé: {session_key}")
             except Exception as e:
                 logger.error(f"[HEETCH] Erreur lors de l'initialisation Playwright: {e}", exc_info=True)
                 raise RuntimeError(f"Erreur lors de l'initialisation de Playwright: {e}. Vérifiez que Playwright est installé avec 'playwright install chromium'")
@@ -782,27 +694,8 @@ class HeetchClient:
                         # Champ téléphone présent = même la mémorisation ne fonctionne plus, connexion complète nécessaire
                         logger.warning("[HEETCH] Champ téléphone détecté, les cookies de mémorisation sont également invalides")
                         if self._cookies:
-                            # Marquer les cookies comme invalides dans la DB car même la mémorisation ne fonctionne plus
-                            try:
-                                from app.core.supabase_db import SupabaseDB
-                                from app.models.heetch_session_cookies import HeetchSessionCookies
-                                from datetime import datetime
-                                db = SupabaseDB()
-                                session_cookies = db.query(HeetchSessionCookies).filter(
-                                    HeetchSessionCookies.org_id == self.org_id,
-                                    HeetchSessionCookies.phone_number == phone,
-                                    HeetchSessionCookies.invalid_at.is_(None)
-                                ).first()
-                                if session_cookies:
-                                    session_cookies.invalid_at = datetime.utcnow()
-                                    db.merge(session_cookies)
-                                    db.commit()
-                                    logger.info(f"[HEETCH] Cookies marqués comme invalides dans la DB pour {phone} (même la mémorisation ne fonctionne plus)")
-                            except Exception as e:
-                                logger.debug(f"[HEETCH] Erreur lors du marquage des cookies invalides: {e}")
-                            # Réinitialiser les cookies en mémoire
-                            self._cookies = None
-                            self._cookies_expires_at = 0.0
+                            # Marquer les cookies comme invalides (cache et DB) car même la mémorisation ne fonctionne plus
+                            self._invalidate_cookies(phone)
                         # Continuer avec le processus de connexion complet (phone + SMS + password)
                 except Exception as e:
                     logger.debug(f"[HEETCH] Erreur lors de la vérification du type de formulaire: {e}, continuation avec le processus normal")
@@ -840,25 +733,7 @@ class HeetchClient:
                     # Marquer les cookies comme invalides si on en avait chargés depuis la DB
                     if self._cookies:
                         logger.warning("[HEETCH] Les cookies chargés depuis la DB ne sont pas valides (pas de token après navigation)")
-                        try:
-                            from app.core.supabase_db import SupabaseDB
-                            from app.models.heetch_session_cookies import HeetchSessionCookies
-                            from datetime import datetime
-                            db = SupabaseDB()
-                            session_cookies = db.query(HeetchSessionCookies).filter(
-                                HeetchSessionCookies.org_id == self.org_id,
-                                HeetchSessionCookies.phone_number == phone,
-                                HeetchSessionCookies.invalid_at.is_(None)
-                            ).first()
-                            if session_cookies:
-                                session_cookies.invalid_at = datetime.utcnow()
-                                db.merge(session_cookies)
-                                db.commit()
-                                logger.info(f"[HEETCH] Cookies marqués comme invalides dans la DB pour {phone}")
-                        except Exception as e:
-                            logger.debug(f"[HEETCH] Erreur lors du marquage des cookies invalides: {e}")
-                        self._cookies = None
-                        self._cookies_expires_at = 0.0
+                        self._invalidate_cookies(phone)
                     # Continuer avec le processus de connexion normal
             
             # Attendre que le formulaire soit chargé avec un timeout plus long
@@ -1385,8 +1260,7 @@ class HeetchClient:
             return {"status": "sms_sent", "message": "SMS envoyé avec succès"}
         
         try:
-            session_key = self._get_session_key(phone)
-            return self._run_async_in_thread(_do_start_login_async, session_key=session_key)
+            return self._run_async_in_thread(_do_start_login_async)
         except Exception as e:
             logger.error(f"[HEETCH] Erreur lors de l'envoi du SMS: {e}", exc_info=True)
             raise
@@ -1421,8 +1295,6 @@ class HeetchClient:
                     raise RuntimeError(f"Session Playwright introuvable avec la clé {session_key}. Veuillez d'abord appeler start_login()")
                 
                 session = _playwright_sessions[session_key]
-                playwright = session.get("playwright")
-                browser = session.get("browser")
                 context = session.get("context")
                 page = session.get("page")
                 
@@ -1636,33 +1508,21 @@ class HeetchClient:
             if self._phone_number:
                 self._save_cookies_to_db(self._phone_number)
             
-            # Fermer les ressources maintenant qu'on a les cookies
+            # Fermer la page ; le contexte reste chaud dans le pool pour la prochaine connexion
             session_key = self._get_session_key(self._phone_number)
             try:
                 await page.close()
-                await context.close()
-                await browser.close()
-                await playwright.stop()
-                # Nettoyer la session
-                with _session_lock:
-                    if session_key in _playwright_sessions:
-                        del _playwright_sessions[session_key]
-                        logger.info(f"[HEETCH] Session {session_key} nettoyée")
             except Exception as e:
-                logger.debug(f"[HEETCH] Erreur lors de la fermeture: {e}")
-                # Nettoyer quand même la session
-                with _session_lock:
-                    if session_key in _playwright_sessions:
-                        del _playwright_sessions[session_key]
-                        logger.info(f"[HEETCH] Session {session_key} nettoyée après erreur")
+                logger.debug(f"[HEETCH] Erreur lors de la fermeture de la page: {e}")
+            await _release_playwright_session(session_key)
+            logger.info(f"[HEETCH] Session {session_key} nettoyée")
             
             return True
         
         try:
             if not self._phone_number:
                 raise RuntimeError("start_login() doit être appelé avant complete_login()")
-            session_key = self._get_session_key(self._phone_number)
-            return self._run_async_in_thread(_do_complete_login_async, session_key=session_key)
+            return self._run_async_in_thread(_do_complete_login_async)
         except Exception as e:
             logger.error(f"[HEETCH] Erreur lors de la finalisation de la connexion: {e}", exc_info=True)
             raise
@@ -1708,39 +1568,15 @@ class HeetchClient:
         """
         # S'assurer d'avoir les cookies de session (essayer de charger depuis DB si nécessaire)
         phone = self._phone_number or getattr(settings, 'heetch_login', None)
-        cookies = self._get_cookies(phone)  # _get_cookies charge déjà depuis la DB si nécessaire
-        
-        # Convertir les cookies Playwright en format httpx
-        cookie_dict = {}
-        for cookie in cookies:
-            cookie_dict[cookie['name']] = cookie['value']
-        
-        # Construire le header Cookie
-        cookie_header = "; ".join([f"{k}={v}" for k, v in cookie_dict.items()])
+        client, cookies = self._session_http(phone)
         
         # Format de date: YYYY-MM-DD
         date_str = date_param.strftime("%Y-%m-%d")
-        
-        url = f"{self.base_url}/api/earnings"
         params = {
             "date": date_str,
             "period": period
         }
         
-        headers = {
-            "accept": "application/json, text/plain, */*",
-            "accept-language": "fr-FR,fr;q=0.9,en-US;q=0.8,en;q=0.7",
-            "cookie": cookie_header,
-            "referer": f"{self.base_url}/earnings",
-            "user-agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/143.0.0.0 Safari/537.36"
-        }
-        
-        # Si on a un token d'authentification (depuis l'API auth-gw), l'utiliser aussi
-        # Note: Le token peut être dans les cookies (heetch_auth_token) ou on peut l'extraire
-        if "heetch_auth_token" in cookie_dict:
-            # Le token est déjà dans les cookies, c'est bon
-            pass
-        
         logger.info(f"[HEETCH] Récupération des earnings: date={date_str}, period={period}, cookies_count={len(cookies)}")
         
         # Log des noms de cookies pour debug
@@ -1748,55 +1584,38 @@ class HeetchClient:
         logger.debug(f"[HEETCH] Cookies envoyés: {', '.join(cookie_names)}")
         
         try:
-            with httpx.Client(timeout=30.0, follow_redirects=False) as client:
-                resp = client.get(url, params=params, headers=headers)
-                
-                # Si 307 (redirect vers auth), les cookies ne sont plus valides
-                if resp.status_code == 307:
-                    redirect_location = resp.headers.get('location', '')
-                    logger.warning(f"[HEETCH] Session expirée (307 redirect vers auth): {redirect_location}")
-                    # Marquer les cookies comme invalides et expirés
-                    self._cookies = None
-                    self._cookies_expires_at = 0.0
-                    # Marquer les cookies comme invalides dans la DB (au lieu de les supprimer pour garder l'historique)
-                    if phone:
-                        try:
-                            from app.core.supabase_db import SupabaseDB
-                            from app.models.heetch_session_cookies import HeetchSessionCookies
-                            from datetime import datetime
-                            db = SupabaseDB()
-                            session_cookies = db.query(HeetchSessionCookies).filter(
-                                HeetchSessionCookies.org_id == self.org_id,
-                                HeetchSessionCookies.phone_number == phone,
-                                HeetchSessionCookies.invalid_at.is_(None)  # Seulement si pas déjà marqué invalide
-                            ).first()
-                            if session_cookies:
-                                session_cookies.invalid_at = datetime.utcnow()
-                                db.merge(session_cookies)
-                                db.commit()
-                                logger.info(f"[HEETCH] Cookies marqués comme invalides dans la DB pour {phone} (invalid_at={session_cookies.invalid_at})")
-                        except Exception as e:
-                            logger.debug(f"[HEETCH] Erreur lors du marquage des cookies comme invalides: {e}")
-                    raise RuntimeError(
-                        f"Session expirée (HTTP 307). Les cookies sauvegardés ne sont plus valides côté serveur Heetch. "
-                        f"Veuillez vous reconnecter via /heetch/auth/start puis /heetch/auth/complete."
-                    )
-                
-                # Si 401 ou 403, la session a expiré
-                if resp.status_code in [401, 403]:
-                    logger.warning(f"[HEETCH] Session expirée (HTTP {resp.status_code})")
-                    self._cookies = None
-                    self._cookies_expires_at = 0.0
-                    raise RuntimeError(
-                        f"Session expirée (HTTP {resp.status_code}). Veuillez vous reconnecter via /heetch/auth/start puis /heetch/auth/complete."
-                    )
-                
-                resp.raise_for_status()
-                data = resp.json()
-                
-                logger.info(f"[HEETCH] Earnings récupérés avec succès: {len(data.get('drivers', []))} drivers")
-                return data
-                
+            rate_limiter.acquire()
+            with timed_api_call("heetch") as call:
+                resp = client.get("/api/earnings", params=params)
+                # 307 = redirection vers l'auth (session expirée)
+                call.error = resp.status_code >= 300
+            
+            # Si 307 (redirect vers auth), les cookies ne sont plus valides
+            if resp.status_code == 307:
+                redirect_location = resp.headers.get('location', '')
+                logger.warning(f"[HEETCH] Session expirée (307 redirect vers auth): {redirect_location}")
+                # Marquer les cookies comme invalides et expirés (cache process et DB, pour garder l'historique)
+                self._invalidate_cookies(phone)
+                raise RuntimeError(
+                    f"Session expirée (HTTP 307). Les cookies sauvegardés ne sont plus valides côté serveur Heetch. "
+                    f"Veuillez vous reconnecter via /heetch/auth/start puis /heetch/auth/complete."
+                )
+            
+            # Si 401 ou 403, la session a expiré
+            if resp.status_code in [401, 403]:
+                logger.warning(f"[HEETCH] Session expirée (HTTP {resp.status_code})")
+                self._cookies = None
+                self._cookies_expires_at = 0.0
+                raise RuntimeError(
+                    f"Session expirée (HTTP {resp.status_code}). Veuillez vous reconnecter via /heetch/auth/start puis /heetch/auth/complete."
+                )
+            
+            resp.raise_for_status()
+            data = resp.json()
+            
+            logger.info(f"[HEETCH] Earnings récupérés avec succès: {len(data.get('drivers', []))} drivers")
+            return data
+            
         except httpx.HTTPStatusError as e:
             if e.response.status_code == 307:
                 # Déjà géré plus haut, mais au cas où
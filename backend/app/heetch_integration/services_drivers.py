@@ -1,70 +1,73 @@
+from datetime import date, timedelta
+
 from app.core.config import get_settings
+from app.core import logging as app_logging
 from app.core.supabase_db import SupabaseDB
+from app.core.sync_ledger import tracked_sync
 from app.models.heetch_driver import HeetchDriver
 from app.heetch_integration.heetch_client import HeetchClient
 
 settings = get_settings()
+logger = app_logging.get_logger(__name__)
+
+
+def build_driver_rows(earnings_data: dict, org_id: str) -> list[dict]:
+    """Lignes heetch_drivers (prêtes pour bulk_upsert) extraites d'une réponse earnings ; les drivers sans email sont ignorés."""
+    rows = []
+    for driver_data in earnings_data.get("drivers", []):
+        email = driver_data.get("email")
+        if not email:
+            logger.warning(f"[SYNC HEETCH DRIVERS] Driver sans email ignoré: {driver_data}")
+            continue
+        rows.append({
+            "id": email,  # Utiliser email comme ID
+            "org_id": org_id,
+            "first_name": driver_data.get("first_name", ""),
+            "last_name": driver_data.get("last_name", ""),
+            "email": email,
+            "image_url": driver_data.get("image_url"),
+            "active": True,  # Par défaut actif
+        })
+    return rows
 
 
-def sync_drivers_from_earnings(db: SupabaseDB, client: HeetchClient, org_id: str | None = None) -> None:
+@tracked_sync("heetch", "drivers")
+def sync_drivers_from_earnings(db: SupabaseDB, client: HeetchClient, org_id: str | None = None) -> dict:
     """
     Synchronise les drivers Heetch depuis les données earnings.
-    Les drivers sont extraits de la réponse de l'API earnings.
-    
+    Les drivers sont extraits de la réponse de l'API earnings de la semaine en cours
+    (réponse partagée avec sync_earnings quand client est un MemoizedEarnings).
+
     Args:
         db: Instance de la base de données
         client: Client Heetch
         org_id: ID de l'organisation (utilise la config si non fourni)
+
+    Returns:
+        Compteurs du run (fetched, saved, skipped)
     """
-    from app.core import logging as app_logging
-    from datetime import date, timedelta
-    
-    logger = app_logging.get_logger(__name__)
-    
     # Déterminer org_id si non fourni
     if not org_id:
         org_id = settings.uber_default_org_id or "default_org"
-    
+
     logger.info(f"[SYNC HEETCH DRIVERS] Début synchronisation depuis earnings (org_id={org_id})")
-    
+
     try:
-        # Récupérer les earnings de la semaine en cours pour extraire les drivers
+        # Récupérer les earnings de la semaine en cours (depuis le lundi) pour extraire les drivers
         today = date.today()
-        # Trouver le lundi de la semaine en cours
-        days_since_monday = today.weekday()
-        monday = today - timedelta(days=days_since_monday)
-        
-        # Récupérer les earnings de cette semaine
+        monday = today - timedelta(days=today.weekday())
         earnings_data = client.get_earnings(monday, period="weekly")
-        
+
         drivers_data = earnings_data.get("drivers", [])
         logger.info(f"[SYNC HEETCH DRIVERS] {len(drivers_data)} drivers trouvés dans les earnings")
-        
-        saved_count = 0
-        for driver_data in drivers_data:
-            email = driver_data.get("email")
-            if not email:
-                logger.warning(f"[SYNC HEETCH DRIVERS] Driver sans email ignoré: {driver_data}")
-                continue
-            
-            driver = HeetchDriver(
-                id=email,  # Utiliser email comme ID
-                org_id=org_id,
-                first_name=driver_data.get("first_name", ""),
-                last_name=driver_data.get("last_name", ""),
-                email=email,
-                image_url=driver_data.get("image_url"),
-                active=True,  # Par défaut actif
-            )
-            
-            db.merge(driver)
-            saved_count += 1
-        
+
+        # Un upsert en masse au lieu d'une requête par driver
+        saved_count = db.bulk_upsert(HeetchDriver, build_driver_rows(earnings_data, org_id))
         db.commit()
         logger.info(f"[SYNC HEETCH DRIVERS] {saved_count} drivers sauvegardés")
-        
+        return {"pages": 1, "fetched": len(drivers_data), "saved": saved_count, "skipped": len(drivers_data) - saved_count}
+
     except Exception as e:
         db.rollback()
         logger.error(f"[SYNC HEETCH DRIVERS] Erreur lors de la synchronisation: {e}", exc_info=True)
         raise
-
@@ -1,14 +1,160 @@
-from datetime import date, timedelta
-from typing import Optional
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date, datetime, timedelta
+from threading import Lock
+from typing import Any, Iterator, Optional
 
 from app.core.config import get_settings
+from app.core import logging as app_logging
 from app.core.supabase_db import SupabaseDB
+from app.core.sync_ledger import bind_context, tracked_sync
 from app.models.heetch_earning import HeetchEarning
+from app.analytics.mirror import mirror_rows
+from app.analytics.rollups import refresh_analytics_rollups
 from app.heetch_integration.heetch_client import HeetchClient
 
 settings = get_settings()
+logger = app_logging.get_logger(__name__)
 
+# Montants à 0 par défaut (absents ou null dans la réponse)
+EARNING_AMOUNTS = (
+    "gross_earnings",
+    "net_earnings",
+    "cash_collected",
+    "card_gross_earnings",
+    "cash_commission_fees",
+    "card_commission_fees",
+    "cancellation_fees",
+    "cancellation_fee_adjustments",
+    "bonuses",
+    "cash_discount",
+)
+EARNING_COUNTS = ("terminated_rides", "cancelled_rides")
+# Montants pouvant rester null
+EARNING_NULLABLE = ("unpaid_cash_rides_refunds", "debt", "money_transfer_amount")
 
+
+def period_dates(start_date: date, end_date: date, period: str) -> list[date]:
+    """Dates à demander à l'API pour couvrir [start_date, end_date] : mois par mois (monthly), sinon semaine par semaine."""
+    dates = []
+    current_date = start_date
+    while current_date <= end_date:
+        dates.append(current_date)
+        if period == "monthly":
+            # Passer au 1er du mois suivant
+            if current_date.month == 12:
+                current_date = date(current_date.year + 1, 1, 1)
+            else:
+                current_date = date(current_date.year, current_date.month + 1, 1)
+        else:
+            current_date += timedelta(days=7)
+    return dates
+
+
+def _summary_date(period_info: dict, key: str, default: date) -> date:
+    value = period_info.get(key)
+    if not isinstance(value, str):
+        return default
+    try:
+        # Format: "2025-12-22T00:00:00+01:00" ; seule la date est gardée
+        return datetime.fromisoformat(value.split("T")[0]).date()
+    except (ValueError, AttributeError) as e:
+        logger.warning(f"[SYNC HEETCH EARNINGS] Impossible de parser {key}: {value}, erreur: {e}")
+        return default
+
+
+def period_bounds(earnings_data: dict, period: str, requested: date) -> tuple[date, date]:
+    """Début et fin réels de la période d'après summary[period] (la date demandée à défaut)."""
+    period_info = earnings_data.get("summary", {}).get(period, {})
+    return _summary_date(period_info, "start_date", requested), _summary_date(period_info, "end_date", requested)
+
+
+def _float_or_none(value: Any, default: float = 0) -> Optional[float]:
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def build_earning_rows(earnings_data: dict, org_id: str, period: str, period_start: date, period_end: date) -> list[dict]:
+    """Lignes heetch_earnings (prêtes pour bulk_upsert) des drivers d'une période ; les drivers sans email sont ignorés."""
+    currency = earnings_data.get("currency", "EUR")
+    rows = []
+    for driver_data in earnings_data.get("drivers", []):
+        email = driver_data.get("email")
+        if not email:
+            continue
+        earnings = driver_data.get("earnings", {})
+        row = {
+            # ID composite: driver_id_date_period
+            "id": f"{email}_{period_start.isoformat()}_{period}",
+            "org_id": org_id,
+            "driver_id": email,
+            "date": period_start.isoformat(),  # Date de début réelle de la période
+            "period": period,
+            "start_date": period_start.isoformat(),
+            "end_date": period_end.isoformat(),
+            "currency": currency,
+        }
+        for field in EARNING_AMOUNTS:
+            row[field] = earnings.get(field, 0) or 0
+        for field in EARNING_COUNTS:
+            row[field] = int(earnings.get(field, 0) or 0)
+        for field in EARNING_NULLABLE:
+            row[field] = _float_or_none(earnings.get(field))
+        rows.append(row)
+    return rows
+
+
+class MemoizedEarnings:
+    """
+    Client Heetch dont les réponses /api/earnings sont gardées pour la durée d'un run : les syncs
+    drivers et earnings d'un même run partagent un seul téléchargement par (date, période).
+    Les erreurs ne sont pas mémorisées.
+    """
+
+    def __init__(self, client: HeetchClient):
+        self.client = client
+        self._responses: dict[tuple[date, str], dict] = {}
+        self._lock = Lock()
+
+    def get_earnings(self, date_param: date, period: str = "weekly") -> dict:
+        key = (date_param, period)
+        with self._lock:
+            if key in self._responses:
+                return self._responses[key]
+        earnings_data = self.client.get_earnings(date_param, period=period)
+        with self._lock:
+            return self._responses.setdefault(key, earnings_data)
+
+
+def fetch_periods(
+    client: HeetchClient,
+    dates: list[date],
+    period: str,
+    max_workers: int | None = None,
+) -> Iterator[tuple[date, Optional[dict], Optional[Exception]]]:
+    """
+    Récupère les earnings de plusieurs périodes en parallèle, avec au plus max_workers requêtes
+    simultanées (HEETCH_MAX_CONCURRENT_PERIODS par défaut) ; le débit global reste borné par le
+    limiteur du HeetchClient. Produit (date demandée, données, erreur) dans l'ordre d'arrivée.
+    """
+    if not dates:
+        return
+    workers = max(1, min(len(dates), max_workers or settings.heetch_max_concurrent_periods))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="heetch_period") as pool:
+        # Les appels API restent attribués au run de sync de l'appelant
+        fetch = bind_context(client.get_earnings)
+        futures = {pool.submit(fetch, period_date, period=period): period_date for period_date in dates}
+        for future in as_completed(futures):
+            try:
+                yield futures[future], future.result(), None
+            except Exception as e:
+                yield futures[future], None, e
+
+
+@tracked_sync("heetch", "earnings")
 def sync_earnings(
     db: SupabaseDB,
     client: HeetchClient,
@@ -16,10 +162,12 @@ def sync_earnings(
     start_date: Optional[date] = None,
     end_date: Optional[date] = None,
     period: str = "weekly"
-) -> None:
+) -> dict:
     """
     Synchronise les earnings Heetch depuis l'API.
-    
+    Les périodes sont récupérées en parallèle (fetch_periods) ; chaque période reçue est écrite
+    en un seul upsert en masse puis commitée.
+
     Args:
         db: Instance de la base de données
         client: Client Heetch
@@ -27,149 +175,58 @@ def sync_earnings(
         start_date: Date de début (par défaut: lundi de la semaine en cours)
         end_date: Date de fin (par défaut: aujourd'hui)
         period: Période (weekly, monthly)
+
+    Returns:
+        Compteurs du run (pages = périodes récupérées, fetched, saved, skipped) et rollups (cellules analytics recalculées)
     """
-    from app.core import logging as app_logging
-    
-    logger = app_logging.get_logger(__name__)
-    
     # Déterminer org_id si non fourni
     if not org_id:
         org_id = settings.uber_default_org_id or "default_org"
-    
+
     # Déterminer les dates si non fournies
     if not end_date:
         end_date = date.today()
-    
+
     if not start_date:
         # Par défaut, commencer au lundi de la semaine en cours
         days_since_monday = end_date.weekday()
         start_date = end_date - timedelta(days=days_since_monday)
-    
-    logger.info(f"[SYNC HEETCH EARNINGS] Début synchronisation (org_id={org_id}, start={start_date}, end={end_date}, period={period})")
-    
+
+    dates = period_dates(start_date, end_date, period)
+    logger.info(f"[SYNC HEETCH EARNINGS] Début synchronisation (org_id={org_id}, start={start_date}, end={end_date}, period={period}, {len(dates)} période(s))")
+
     try:
-        # Pour weekly, on récupère les earnings semaine par semaine
-        # Pour monthly, on récupère mois par mois
-        current_date = start_date
-        
         total_saved = 0
-        
-        while current_date <= end_date:
-            try:
-                # Récupérer les earnings pour cette période
-                earnings_data = client.get_earnings(current_date, period=period)
-                
-                # Extraire start_date et end_date depuis summary
-                period_start_date = current_date
-                period_end_date = current_date
-                summary = earnings_data.get("summary", {})
-                if period in summary:
-                    period_info = summary[period]
-                    if "start_date" in period_info:
-                        from datetime import datetime
-                        start_date_str = period_info["start_date"]
-                        # Parser la date ISO avec timezone (format: "2025-12-22T00:00:00+01:00")
-                        if isinstance(start_date_str, str):
-                            try:
-                                # Enlever le timezone pour parser juste la date
-                                start_date_str_clean = start_date_str.split("T")[0]
-                                period_start_date = datetime.fromisoformat(start_date_str_clean).date()
-                            except (ValueError, AttributeError) as e:
-                                logger.warning(f"[SYNC HEETCH EARNINGS] Impossible de parser start_date: {start_date_str}, erreur: {e}")
-                                period_start_date = current_date
-                    if "end_date" in period_info:
-                        from datetime import datetime
-                        end_date_str = period_info["end_date"]
-                        if isinstance(end_date_str, str):
-                            try:
-                                # Enlever le timezone pour parser juste la date
-                                end_date_str_clean = end_date_str.split("T")[0]
-                                period_end_date = datetime.fromisoformat(end_date_str_clean).date()
-                            except (ValueError, AttributeError) as e:
-                                logger.warning(f"[SYNC HEETCH EARNINGS] Impossible de parser end_date: {end_date_str}, erreur: {e}")
-                                period_end_date = current_date
-                
-                drivers_data = earnings_data.get("drivers", [])
-                logger.info(f"[SYNC HEETCH EARNINGS] {len(drivers_data)} drivers pour la période {period_start_date} - {period_end_date}")
-                
-                for driver_data in drivers_data:
-                    email = driver_data.get("email")
-                    if not email:
-                        continue
-                    
-                    earnings = driver_data.get("earnings", {})
-                    
-                    # Créer l'ID composite: driver_id_date_period
-                    earning_id = f"{email}_{period_start_date.isoformat()}_{period}"
-                    
-                    # Fonction helper pour convertir None en 0 ou None selon le champ
-                    def get_float_or_none(value, default=0):
-                        if value is None:
-                            return None
-                        try:
-                            return float(value)
-                        except (TypeError, ValueError):
-                            return default
-                    
-                    earning = HeetchEarning(
-                        id=earning_id,
-                        org_id=org_id,
-                        driver_id=email,
-                        date=period_start_date,  # Utiliser la date de début réelle
-                        period=period,
-                        start_date=period_start_date,
-                        end_date=period_end_date,
-                        gross_earnings=earnings.get("gross_earnings", 0) or 0,
-                        net_earnings=earnings.get("net_earnings", 0) or 0,
-                        cash_collected=earnings.get("cash_collected", 0) or 0,
-                        card_gross_earnings=earnings.get("card_gross_earnings", 0) or 0,
-                        cash_commission_fees=earnings.get("cash_commission_fees", 0) or 0,
-                        card_commission_fees=earnings.get("card_commission_fees", 0) or 0,
-                        cancellation_fees=earnings.get("cancellation_fees", 0) or 0,
-                        cancellation_fee_adjustments=earnings.get("cancellation_fee_adjustments", 0) or 0,
-                        bonuses=earnings.get("bonuses", 0) or 0,
-                        terminated_rides=int(earnings.get("terminated_rides", 0) or 0),
-                        cancelled_rides=int(earnings.get("cancelled_rides", 0) or 0),
-                        cash_discount=earnings.get("cash_discount", 0) or 0,
-                        unpaid_cash_rides_refunds=get_float_or_none(earnings.get("unpaid_cash_rides_refunds")),
-                        debt=get_float_or_none(earnings.get("debt")),
-                        money_transfer_amount=get_float_or_none(earnings.get("money_transfer_amount")),
-                        currency=earnings_data.get("currency", "EUR"),
-                    )
-                    
-                    db.merge(earning)
-                    total_saved += 1
-                
-                # Passer à la période suivante
-                if period == "weekly":
-                    current_date += timedelta(days=7)  # Semaine suivante
-                elif period == "monthly":
-                    # Passer au mois suivant
-                    if current_date.month == 12:
-                        current_date = date(current_date.year + 1, 1, 1)
-                    else:
-                        current_date = date(current_date.year, current_date.month + 1, 1)
-                else:
-                    # Par défaut, semaine suivante
-                    current_date += timedelta(days=7)
-                
-            except Exception as e:
-                logger.error(f"[SYNC HEETCH EARNINGS] Erreur pour la période {current_date}: {e}", exc_info=True)
-                # Continuer avec la période suivante
-                if period == "weekly":
-                    current_date += timedelta(days=7)
-                else:
-                    if current_date.month == 12:
-                        current_date = date(current_date.year + 1, 1, 1)
-                    else:
-                        current_date = date(current_date.year, current_date.month + 1, 1)
+        total_fetched = 0
+        pages = 0
+        # Cellules analytics (plateforme, driver, jour) touchées ; seules les périodes hebdomadaires sont agrégées
+        rollup_cells = set()
+
+        for requested, earnings_data, error in fetch_periods(client, dates, period):
+            if error is not None:
+                # Continuer avec les autres périodes
+                logger.error(f"[SYNC HEETCH EARNINGS] Erreur pour la période {requested}: {error}")
                 continue
-        
+            pages += 1
+            period_start_date, period_end_date = period_bounds(earnings_data, period, requested)
+            drivers_data = earnings_data.get("drivers", [])
+            total_fetched += len(drivers_data)
+
+            rows = build_earning_rows(earnings_data, org_id, period, period_start_date, period_end_date)
+            saved_count = db.bulk_upsert(HeetchEarning, rows)
+            db.commit()
+            mirror_rows(HeetchEarning, org_id, rows)
+            total_saved += saved_count
+            if period == "weekly":
+                rollup_cells.update(("heetch", row["driver_id"], period_start_date) for row in rows)
+            logger.info(f"[SYNC HEETCH EARNINGS] Période {period_start_date} - {period_end_date}: {len(drivers_data)} drivers, {saved_count} earnings sauvegardés")
+
+        logger.info(f"[SYNC HEETCH EARNINGS] {total_saved} earnings sauvegardés sur {pages}/{len(dates)} période(s)")
+        rollups = refresh_analytics_rollups(db, org_id, rollup_cells)
         db.commit()
-        logger.info(f"[SYNC HEETCH EARNINGS] {total_saved} earnings sauvegardés")
-        
+        return {"pages": pages, "fetched": total_fetched, "saved": total_saved, "skipped": total_fetched - total_saved, "rollups": rollups}
+
     except Exception as e:
         db.rollback()
         logger.error(f"[SYNC HEETCH EARNINGS] Erreur lors de la synchronisation: {e}", exc_info=True)
         raise
-
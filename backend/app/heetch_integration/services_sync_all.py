@@ -0,0 +1,39 @@
+"""
+Sync Heetch combinée (drivers + earnings) : un seul téléchargement /api/earnings par période.
+"""
+from datetime import date, timedelta
+from typing import Optional
+
+from app.core import logging as app_logging
+from app.core.supabase_db import SupabaseDB
+from app.heetch_integration.heetch_client import HeetchClient
+from app.heetch_integration.services_drivers import sync_drivers_from_earnings
+from app.heetch_integration.services_earnings import MemoizedEarnings, sync_earnings
+
+logger = app_logging.get_logger(__name__)
+
+
+def sync_drivers_and_earnings(
+    db: SupabaseDB,
+    client: HeetchClient,
+    org_id: str,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    period: str = "weekly",
+) -> dict:
+    """
+    Synchronise les drivers à partir de la réponse de la semaine en cours, puis les earnings de
+    [start_date, end_date] (semaine en cours par défaut) en réutilisant cette réponse. Les drivers
+    passent en premier : les rollups analytics recalculés à la fin de la sync earnings comptent
+    ainsi les nouveaux drivers. Chaque flux garde son propre run dans sync_runs.
+
+    Returns:
+        dict avec les résumés des runs earnings et drivers
+    """
+    memo = MemoizedEarnings(client)
+    end_date = end_date or date.today()
+    start_date = start_date or end_date - timedelta(days=end_date.weekday())
+    drivers = sync_drivers_from_earnings(db, memo, org_id=org_id)
+    earnings = sync_earnings(db, memo, org_id=org_id, start_date=start_date, end_date=end_date, period=period)
+    logger.info(f"[SYNC HEETCH] Org {org_id}: {earnings['saved']} earnings, {drivers['saved']} drivers")
+    return {"earnings": earnings, "drivers": drivers}
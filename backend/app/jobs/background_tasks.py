@@ -1,11 +1,11 @@
 """
-Système de tâches en arrière-plan pour synchronisations lourdes par lots.
-Utilise threading pour éviter de bloquer le serveur.
+Synchronisations lourdes par lots (orders, state logs) exécutées par le worker,
+et fonctions d'empilement utilisées par l'API (le process uvicorn n'exécute plus ces syncs).
 """
-import asyncio
+import threading
+import time
 from datetime import datetime, timedelta
-from concurrent.futures import ThreadPoolExecutor
-from typing import Optional
+from typing import Callable, Optional
 
 from app.core.config import get_settings
 from app.core.supabase_db import SupabaseDB
@@ -13,12 +13,166 @@ from app.core.supabase_client import get_supabase_client
 from app.bolt_integration.services_trips import sync_trips
 from app.bolt_integration.services_state_logs import sync_state_logs
 from app.core import logging as app_logging
+from app.jobs.job_queue import SyncJob, enqueue_job, get_job_store
+from app.jobs.leases import LeaseBusy, run_exclusive
 
 logger = app_logging.get_logger(__name__)
 settings = get_settings()
 
-# ThreadPoolExecutor pour les tâches en arrière-plan
-executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="bolt_sync")
+
+class BatchProgress:
+    """
+    Avancement d'une sync par lots, agrégé sur toutes les companies (thread-safe) :
+    fenêtres traitées / planifiées, pages, lignes, débit et ETA.
+    """
+
+    def __init__(self, stream: str, on_progress: Optional[Callable[[dict], None]] = None):
+        self.stream = stream
+        self.on_progress = on_progress
+        self.windows_total = 0
+        self.windows_done = 0
+        self.pages = 0
+        self.rows = 0
+        self.current_window: Optional[str] = None
+        self._started = time.monotonic()
+        self._lock = threading.Lock()
+
+    def add_windows(self, count: int) -> None:
+        with self._lock:
+            self.windows_total += count
+        self._publish()
+
+    def window_done(self, label: str, pages: int, rows: int) -> None:
+        with self._lock:
+            self.windows_done += 1
+            self.pages += pages
+            self.rows += rows
+            self.current_window = label
+        self._publish()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            elapsed = time.monotonic() - self._started
+            remaining = self.windows_total - self.windows_done
+            eta = elapsed / self.windows_done * remaining if self.windows_done else None
+            return {
+                "stream": self.stream,
+                "windows_done": self.windows_done,
+                "windows_total": self.windows_total,
+                "current_window": self.current_window,
+                "pages": self.pages,
+                "rows": self.rows,
+                "rows_per_second": round(self.rows / elapsed, 1) if elapsed > 0 else 0.0,
+                "elapsed_seconds": round(elapsed, 1),
+                "eta_seconds": round(eta, 1) if eta is not None else None,
+            }
+
+    def _publish(self) -> None:
+        if self.on_progress:
+            self.on_progress(self.snapshot())
+
+
+def _sync_batches_for_companies(
+    label: str,
+    stream: str,
+    sync_fn,
+    db: SupabaseDB,
+    org_id: str,
+    company_id: Optional[str],
+    days_back: int,
+    batch_size_days: int,
+    max_workers: Optional[int],
+    target_pages: Optional[int] = None,
+    probe: bool = False,
+    on_progress: Optional[Callable[[dict], None]] = None,
+) -> dict:
+    """
+    Exécute sync_fn sur chaque fenêtre pour toutes les companies de l'org.
+    Les fenêtres sont planifiées par company à partir des densités observées aux runs
+    précédents (window_planner) : jours creux fusionnés, jours chargés découpés.
+    batch_size_days sert de densité supposée pour les jours jamais observés (sauf si probe=True).
+    Les companies sont traitées en parallèle (pool borné, débit Bolt partagé),
+    les fenêtres d'une même company restent séquentielles.
+    on_progress reçoit l'avancement agrégé (BatchProgress.snapshot) après chaque fenêtre.
+    """
+    from app.bolt_integration.bolt_client import BoltClient
+    from app.bolt_integration.services_orgs import get_company_ids
+    from app.bolt_integration.services_sync_all import run_for_companies
+    from app.bolt_integration.window_planner import density_store, plan_stream_windows
+    
+    end_date = datetime.utcnow()
+    start_date = end_date - timedelta(days=days_back)
+    
+    company_ids = get_company_ids(db, org_id, company_id)
+    if not company_ids:
+        error_msg = "Aucun company_id Bolt trouvé (ni en DB, ni BOLT_DEFAULT_FLEET_ID)"
+        logger.error(f"[{label}] ✗ {error_msg}")
+        return {"status": "error", "batches_processed": 0, "errors": [error_msg], "companies": {}}
+    
+    progress = BatchProgress(stream, on_progress)
+    
+    def run_company(cid: str) -> dict:
+        client = BoltClient()
+        errors = []
+        windows = plan_stream_windows(
+            org_id, cid, stream, start_date, end_date,
+            target_pages=target_pages,
+            default_window_days=batch_size_days,
+            client=client if probe else None,
+        )
+        progress.add_windows(len(windows))
+        pages = 0
+        for i, window in enumerate(windows, 1):
+            try:
+                logger.info(
+                    f"[{label}] company_id={cid} Batch {i}/{len(windows)}: {window.start} -> {window.end} "
+                    f"(~{window.estimated_pages} page(s) estimée(s))"
+                )
+                stats = sync_fn(
+                    db=db,
+                    client=client,
+                    company_id=cid,
+                    start=window.start,
+                    end=window.end,
+                    org_id=org_id,
+                    limit=1000,
+                    offset=0,
+                    incremental=False  # En batch, on synchronise la période spécifiée
+                )
+                pages += stats["pages"]
+                density_store.record(org_id, cid, stream, window.start_ts, window.end_ts, stats["fetched"])
+                logger.info(f"[{label}] ✓ company_id={cid} Batch {i}/{len(windows)} terminé ({stats['pages']} page(s))")
+                progress.window_done(f"{cid} {window.start} -> {window.end}", stats["pages"], stats["fetched"])
+            except Exception as e:
+                error_msg = f"Erreur batch {i} (company_id={cid}): {str(e)}"
+                logger.error(f"[{label}] ✗ {error_msg}")
+                errors.append(error_msg)
+                progress.window_done(f"{cid} {window.start} -> {window.end}", 0, 0)
+        return {"errors": errors, "batches": len(windows), "pages": pages}
+    
+    per_company = run_for_companies(company_ids, run_company, max_workers=max_workers, label=label)
+    
+    errors = []
+    companies = {}
+    batches_processed = 0
+    for cid, outcome in per_company.items():
+        result = outcome["result"] or {"errors": [outcome["error"]], "batches": 0, "pages": 0}
+        errors.extend(result["errors"])
+        batches_processed += result["batches"]
+        companies[cid] = {
+            "status": "error" if outcome["status"] == "error" else ("success" if not result["errors"] else "partial"),
+            "errors": result["errors"],
+            "batches": result["batches"],
+            "pages": result["pages"],
+        }
+    
+    return {
+        "status": "success" if not errors else "partial",
+        "batches_processed": batches_processed,
+        "errors": errors,
+        "companies": companies,
+        "progress": progress.snapshot(),
+    }
 
 
 def sync_orders_in_batches(
@@ -26,75 +180,47 @@ def sync_orders_in_batches(
     company_id: Optional[str] = None,
     days_back: int = 30,
     batch_size_days: int = 7,
-    max_workers: int = 1
+    max_workers: Optional[int] = None,
+    probe: bool = False,
+    on_progress: Optional[Callable[[dict], None]] = None,
 ) -> dict:
     """
     Synchronise les orders par lots pour éviter de bloquer le serveur.
     
     Args:
         org_id: ID de l'organisation
-        company_id: Company ID Bolt
+        company_id: Company ID Bolt (optionnel, sinon toutes les companies de l'org)
         days_back: Nombre de jours en arrière à synchroniser
-        batch_size_days: Nombre de jours par batch
-        max_workers: Nombre de workers parallèles (1 = séquentiel pour éviter surcharge API)
+        batch_size_days: Taille de fenêtre supposée pour les jours sans densité observée
+        max_workers: Nombre de companies synchronisées en parallèle (BOLT_MAX_CONCURRENT_COMPANIES par défaut)
+        probe: Mesurer les jours jamais observés par une requête sonde avant de planifier les fenêtres
+        on_progress: Reçoit l'avancement (fenêtre i/N, pages, lignes/s, ETA) après chaque fenêtre
     
     Returns:
         dict avec le statut de la synchronisation
     """
     logger.info(f"[BATCH SYNC ORDERS] Début synchronisation par lots pour org_id={org_id}")
     
-    end_date = datetime.utcnow()
-    start_date = end_date - timedelta(days=days_back)
-    
-    # Diviser en batches de batch_size_days jours
-    batches = []
-    current_date = start_date
-    while current_date < end_date:
-        batch_end = min(current_date + timedelta(days=batch_size_days), end_date)
-        batches.append((current_date, batch_end))
-        current_date = batch_end
-    
-    logger.info(f"[BATCH SYNC ORDERS] {len(batches)} batches à traiter ({batch_size_days} jours par batch)")
-    
-    from app.bolt_integration.bolt_client import BoltClient
     supabase_client = get_supabase_client()
     db = SupabaseDB(supabase_client)
-    client = BoltClient()
-    
-    total_saved = 0
-    total_skipped = 0
-    errors = []
-    
-    for i, (batch_start, batch_end) in enumerate(batches, 1):
-        try:
-            logger.info(f"[BATCH SYNC ORDERS] Batch {i}/{len(batches)}: {batch_start.date()} -> {batch_end.date()}")
-            sync_trips(
-                db=db,
-                client=client,
-                company_id=company_id,
-                start=batch_start,
-                end=batch_end,
-                org_id=org_id,
-                limit=1000,
-                offset=0,
-                incremental=False  # En batch, on synchronise la période spécifiée
-            )
-            logger.info(f"[BATCH SYNC ORDERS] ✓ Batch {i}/{len(batches)} terminé")
-        except Exception as e:
-            error_msg = f"Erreur batch {i}: {str(e)}"
-            logger.error(f"[BATCH SYNC ORDERS] ✗ {error_msg}")
-            errors.append(error_msg)
+    try:
+        # Un seul run par (org, flux) : les déclenchements concurrents sont court-circuités
+        result = run_exclusive(
+            org_id,
+            "bolt_orders",
+            lambda: _sync_batches_for_companies(
+                "BATCH SYNC ORDERS", "orders", sync_trips, db, org_id, company_id, days_back, batch_size_days, max_workers,
+                probe=probe, on_progress=on_progress,
+            ),
+            join=False,
+        )
+    except LeaseBusy as e:
+        logger.info(f"[BATCH SYNC ORDERS] {e}, ignoré")
+        return e.to_dict()
     
     # Compter le total final
     from app.models.bolt_order import BoltOrder
-    total_in_db = db.query(BoltOrder).filter(BoltOrder.org_id == org_id).count()
-    
-    result = {
-        "status": "success" if not errors else "partial",
-        "batches_processed": len(batches),
-        "errors": errors,
-        "total_orders_in_db": total_in_db,
-    }
+    result["total_orders_in_db"] = db.query(BoltOrder).filter(BoltOrder.org_id == org_id).count()
     
     logger.info(f"[BATCH SYNC ORDERS] Synchronisation terminée: {result}")
     return result
@@ -105,108 +231,93 @@ def sync_state_logs_in_batches(
     company_id: Optional[str] = None,
     days_back: int = 30,
     batch_size_days: int = 7,
+    max_workers: Optional[int] = None,
+    probe: bool = False,
+    on_progress: Optional[Callable[[dict], None]] = None,
 ) -> dict:
     """
     Synchronise les state logs par lots pour éviter de bloquer le serveur.
     
     Args:
         org_id: ID de l'organisation
-        company_id: Company ID Bolt
+        company_id: Company ID Bolt (optionnel, sinon toutes les companies de l'org)
         days_back: Nombre de jours en arrière à synchroniser
-        batch_size_days: Nombre de jours par batch
+        batch_size_days: Taille de fenêtre supposée pour les jours sans densité observée
+        max_workers: Nombre de companies synchronisées en parallèle (BOLT_MAX_CONCURRENT_COMPANIES par défaut)
+        probe: Mesurer les jours jamais observés par une requête sonde avant de planifier les fenêtres
+        on_progress: Reçoit l'avancement (fenêtre i/N, pages, lignes/s, ETA) après chaque fenêtre
     
     Returns:
         dict avec le statut de la synchronisation
     """
     logger.info(f"[BATCH SYNC STATE LOGS] Début synchronisation par lots pour org_id={org_id}")
     
-    end_date = datetime.utcnow()
-    start_date = end_date - timedelta(days=days_back)
-    
-    # Diviser en batches de batch_size_days jours
-    batches = []
-    current_date = start_date
-    while current_date < end_date:
-        batch_end = min(current_date + timedelta(days=batch_size_days), end_date)
-        batches.append((current_date, batch_end))
-        current_date = batch_end
-    
-    logger.info(f"[BATCH SYNC STATE LOGS] {len(batches)} batches à traiter ({batch_size_days} jours par batch)")
-    
-    from app.bolt_integration.bolt_client import BoltClient
     supabase_client = get_supabase_client()
     db = SupabaseDB(supabase_client)
-    client = BoltClient()
-    
-    total_saved = 0
-    total_skipped = 0
-    errors = []
-    
-    for i, (batch_start, batch_end) in enumerate(batches, 1):
-        try:
-            logger.info(f"[BATCH SYNC STATE LOGS] Batch {i}/{len(batches)}: {batch_start.date()} -> {batch_end.date()}")
-            sync_state_logs(
-                db=db,
-                client=client,
-                company_id=company_id,
-                start=batch_start,
-                end=batch_end,
-                org_id=org_id,
-                limit=1000,
-                offset=0,
-                incremental=False  # En batch, on synchronise la période spécifiée
-            )
-            logger.info(f"[BATCH SYNC STATE LOGS] ✓ Batch {i}/{len(batches)} terminé")
-        except Exception as e:
-            error_msg = f"Erreur batch {i}: {str(e)}"
-            logger.error(f"[BATCH SYNC STATE LOGS] ✗ {error_msg}")
-            errors.append(error_msg)
+    try:
+        # Un seul run par (org, flux) : les déclenchements concurrents sont court-circuités
+        result = run_exclusive(
+            org_id,
+            "bolt_state_logs",
+            lambda: _sync_batches_for_companies(
+                "BATCH SYNC STATE LOGS", "state_logs", sync_state_logs, db, org_id, company_id, days_back, batch_size_days, max_workers,
+                probe=probe, on_progress=on_progress,
+            ),
+            join=False,
+        )
+    except LeaseBusy as e:
+        logger.info(f"[BATCH SYNC STATE LOGS] {e}, ignoré")
+        return e.to_dict()
     
     # Compter le total final
     from app.models.bolt_state_log import BoltStateLog
-    total_in_db = db.query(BoltStateLog).filter(BoltStateLog.org_id == org_id).count()
-    
-    result = {
-        "status": "success" if not errors else "partial",
-        "batches_processed": len(batches),
-        "errors": errors,
-        "total_state_logs_in_db": total_in_db,
-    }
+    result["total_state_logs_in_db"] = db.query(BoltStateLog).filter(BoltStateLog.org_id == org_id).count()
     
     logger.info(f"[BATCH SYNC STATE LOGS] Synchronisation terminée: {result}")
     return result
 
 
-def sync_bolt_heavy_data_async(org_id: str, company_id: Optional[str] = None) -> None:
+def _backfill_dedupe_key(manifest_id: str) -> str:
+    return f"backfill:{manifest_id}"
+
+
+HEAVY_STREAMS = ("orders", "state_logs")
+
+
+def heavy_data_params(company_id: Optional[str] = None, days_back: int = 30, streams: tuple[str, ...] = HEAVY_STREAMS) -> dict:
+    """Paramètres normalisés d'un job bolt_heavy_data (mêmes paramètres = même job, dédupliqué)."""
+    return {"company_id": company_id, "days_back": days_back, "streams": [s for s in HEAVY_STREAMS if s in streams]}
+
+
+def sync_bolt_heavy_data_async(
+    org_id: str,
+    company_id: Optional[str] = None,
+    days_back: int = 30,
+    streams: tuple[str, ...] = HEAVY_STREAMS,
+) -> tuple[SyncJob, bool]:
+    """
+    Empile la synchronisation par lots des données lourdes (orders et/ou state_logs) pour le worker.
+    Ne bloque pas le serveur ; une demande identique déjà en attente ou en cours est réutilisée.
+
+    Returns:
+        (job, créé) : créé=False si le job existant a été renvoyé
     """
-    Lance la synchronisation des données lourdes (orders et state_logs) en arrière-plan.
-    Ne bloque pas le serveur.
+    return enqueue_job("bolt_heavy_data", org_id, heavy_data_params(company_id, days_back, streams))
+
+
+def run_backfill_async(manifest, max_workers: int = 4, retry_failed: bool = True) -> bool:
     """
-    logger.info(f"[ASYNC SYNC] Lancement synchronisation asynchrone pour org_id={org_id}")
-    
-    def run_sync():
-        try:
-            # Synchroniser orders par lots
-            sync_orders_in_batches(
-                org_id=org_id,
-                company_id=company_id,
-                days_back=30,
-                batch_size_days=7
-            )
-            
-            # Synchroniser state logs par lots
-            sync_state_logs_in_batches(
-                org_id=org_id,
-                company_id=company_id,
-                days_back=30,
-                batch_size_days=7
-            )
-            
-            logger.info(f"[ASYNC SYNC] Synchronisation asynchrone terminée pour org_id={org_id}")
-        except Exception as e:
-            logger.error(f"[ASYNC SYNC] Erreur lors de la synchronisation asynchrone: {str(e)}", exc_info=True)
-    
-    # Lancer dans le ThreadPoolExecutor
-    executor.submit(run_sync)
-    logger.info(f"[ASYNC SYNC] Tâche soumise au pool d'exécution pour org_id={org_id}")
+    Empile (ou reprend) un backfill pour le worker.
+    Retourne False si ce manifeste est déjà en attente ou en cours d'exécution.
+    """
+    _, created = enqueue_job(
+        "bolt_backfill",
+        manifest.org_id,
+        {"manifest_id": manifest.id, "max_workers": max_workers, "retry_failed": retry_failed},
+        dedupe_key=_backfill_dedupe_key(manifest.id),
+    )
+    return created
+
 
+def is_backfill_running(manifest_id: str) -> bool:
+    return get_job_store().find_active(_backfill_dedupe_key(manifest_id)) is not None
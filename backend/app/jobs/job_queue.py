@@ -0,0 +1,492 @@
+"""
+File de jobs de synchronisation durable, consommée par le worker (python -m app.worker).
+
+L'API et le scheduler ne font qu'empiler des jobs (kind + org_id + paramètres) ; le worker
+les réclame par partage équitable pondéré entre orgs, et les relance avec backoff en cas d'erreur.
+
+Le prochain job est celui de plus petit temps virtuel : jobs de son org démarrés sur la dernière
+SYNC_JOB_FAIR_WINDOW_SECONDS (en cours compris), divisés par 1 + priorité du job. Une org de
+priorité p reçoit ainsi jusqu'à 1 + p fois plus de créneaux qu'une org de priorité 0, sans
+jamais l'affamer ; à temps virtuel égal, priorité décroissante puis ancienneté.
+
+Deux stockages, même interface :
+- SqliteJobStore : fichier SQLite local (SYNC_STATE_DIR/jobs.sqlite), API et worker
+  partageant le même volume ;
+- SupabaseJobStore : table sync_jobs (supabase/sync_jobs.sql), réclamation atomique par
+  la fonction claim_sync_job (FOR UPDATE SKIP LOCKED), pour plusieurs workers / instances.
+
+Un job identique (même org, kind et paramètres) déjà en attente ou en cours n'est pas
+dupliqué : enqueue renvoie le job existant.
+
+heartbeat / complete / fail ne modifient le job que si le worker appelant en est encore
+propriétaire : un worker bloqué dont le job a été remis en file (requeue_stale) puis repris
+ne peut pas écraser le résultat du nouveau worker. Un job sans heartbeat qui a épuisé ses
+tentatives (un job qui tue son worker, par exemple) est marqué failed au lieu d'être remis en file.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from typing import Any, Iterator, Optional
+
+from app.core.config import get_settings
+from app.core import logging as app_logging
+
+settings = get_settings()
+logger = app_logging.get_logger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+ACTIVE_STATUSES = (QUEUED, RUNNING)
+STALE_ERROR = "Worker arrêté sans heartbeat, tentatives épuisées"
+
+_JSON_FIELDS = ("params", "progress", "result")
+
+
+def dedupe_key_for(org_id: str, kind: str, params: Optional[dict]) -> str:
+    digest = hashlib.sha1(json.dumps(params or {}, sort_keys=True, default=str).encode()).hexdigest()[:16]
+    return f"{org_id}:{kind}:{digest}"
+
+
+@dataclass
+class SyncJob:
+    id: str
+    kind: str
+    org_id: str
+    params: dict = field(default_factory=dict)
+    priority: int = 0
+    status: str = QUEUED
+    attempts: int = 0
+    max_attempts: int = 3
+    run_after: float = 0.0
+    dedupe_key: Optional[str] = None
+    created_at: float = 0.0
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    heartbeat_at: Optional[float] = None
+    worker_id: Optional[str] = None
+    progress: dict = field(default_factory=dict)
+    result: Optional[dict] = None
+    error: Optional[str] = None
+
+    @property
+    def active(self) -> bool:
+        return self.status in ACTIVE_STATUSES
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+    @classmethod
+    def from_row(cls, row: dict) -> "SyncJob":
+        data = {key: row.get(key) for key in cls.__dataclass_fields__ if key in row}
+        for key in _JSON_FIELDS:
+            if isinstance(data.get(key), str):
+                data[key] = json.loads(data[key])
+        data["params"] = data.get("params") or {}
+        data["progress"] = data.get("progress") or {}
+        return cls(**data)
+
+
+def _new_job(
+    kind: str,
+    org_id: str,
+    params: Optional[dict],
+    priority: int,
+    delay: float,
+    max_attempts: Optional[int],
+    dedupe: bool,
+    dedupe_key: Optional[str],
+) -> SyncJob:
+    now = time.time()
+    return SyncJob(
+        id=uuid.uuid4().hex,
+        kind=kind,
+        org_id=org_id,
+        params=params or {},
+        priority=priority,
+        max_attempts=max_attempts or settings.sync_job_max_attempts,
+        run_after=now + max(0.0, delay),
+        dedupe_key=(dedupe_key or dedupe_key_for(org_id, kind, params)) if dedupe else None,
+        created_at=now,
+    )
+
+
+def _owner_clause(worker_id: Optional[str]) -> tuple[str, tuple]:
+    """Condition SQL limitant une mise à jour au worker propriétaire du job (aucune si worker_id est None)."""
+    return (" AND worker_id = ?", (worker_id,)) if worker_id is not None else ("", ())
+
+
+def retry_delay(attempts: int) -> float:
+    """Backoff exponentiel : base, 2*base, 4*base... plafonné à une heure."""
+    return min(3600.0, settings.sync_job_retry_base_seconds * (2 ** max(0, attempts - 1)))
+
+
+class SqliteJobStore:
+    """File durable dans un fichier SQLite (un seul hôte, API et worker partageant le fichier)."""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.path.join(settings.sync_state_dir, "jobs.sqlite")
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS sync_jobs (
+                    id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    org_id TEXT NOT NULL,
+                    params TEXT NOT NULL DEFAULT '{}',
+                    priority INTEGER NOT NULL DEFAULT 0,
+                    status TEXT NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    max_attempts INTEGER NOT NULL DEFAULT 3,
+                    run_after REAL NOT NULL,
+                    dedupe_key TEXT,
+                    created_at REAL NOT NULL,
+                    started_at REAL,
+                    finished_at REAL,
+                    heartbeat_at REAL,
+                    worker_id TEXT,
+                    progress TEXT NOT NULL DEFAULT '{}',
+                    result TEXT,
+                    error TEXT
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_sync_jobs_ready ON sync_jobs(status, run_after)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_sync_jobs_org ON sync_jobs(org_id, created_at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_sync_jobs_org_started ON sync_jobs(org_id, started_at)")
+            # Un seul job actif par clé de déduplication
+            conn.execute(
+                "CREATE UNIQUE INDEX IF NOT EXISTS idx_sync_jobs_dedupe ON sync_jobs(dedupe_key) "
+                "WHERE status IN ('queued', 'running')"
+            )
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        # Mode autocommit : les transactions sont ouvertes explicitement (BEGIN IMMEDIATE)
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def _fetch_one(self, conn: sqlite3.Connection, sql: str, args: tuple) -> Optional[SyncJob]:
+        row = conn.execute(sql, args).fetchone()
+        return SyncJob.from_row(dict(row)) if row else None
+
+    def enqueue(
+        self,
+        kind: str,
+        org_id: str,
+        params: Optional[dict] = None,
+        priority: int = 0,
+        delay: float = 0.0,
+        max_attempts: Optional[int] = None,
+        dedupe: bool = True,
+        dedupe_key: Optional[str] = None,
+    ) -> tuple[SyncJob, bool]:
+        """Empile un job ; retourne (job, créé). Un job identique actif est renvoyé tel quel."""
+        job = _new_job(kind, org_id, params, priority, delay, max_attempts, dedupe, dedupe_key)
+        row = job.to_dict()
+        for key in _JSON_FIELDS:
+            row[key] = json.dumps(row[key], default=str) if row[key] is not None else None
+        with self._lock, self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                if job.dedupe_key:
+                    existing = self._fetch_one(
+                        conn, "SELECT * FROM sync_jobs WHERE dedupe_key = ? AND status IN ('queued', 'running')", (job.dedupe_key,)
+                    )
+                    if existing:
+                        conn.execute("COMMIT")
+                        return existing, False
+                columns = ", ".join(row)
+                conn.execute(f"INSERT INTO sync_jobs ({columns}) VALUES ({', '.join('?' for _ in row)})", tuple(row.values()))
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return job, True
+
+    def claim(self, worker_id: str) -> Optional[SyncJob]:
+        """Réclame le prochain job prêt (temps virtuel de son org, puis priorité, puis ancienneté)."""
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                job = self._fetch_one(
+                    conn,
+                    """
+                    SELECT * FROM sync_jobs AS c
+                    WHERE status = 'queued' AND run_after <= ?
+                    ORDER BY (SELECT COUNT(*) FROM sync_jobs AS s WHERE s.org_id = c.org_id AND s.started_at >= ?)
+                                 * 1.0 / (1 + MAX(priority, 0)),
+                             priority DESC, run_after, created_at
+                    LIMIT 1
+                    """,
+                    (now, now - settings.sync_job_fair_window_seconds),
+                )
+                if job:
+                    conn.execute(
+                        "UPDATE sync_jobs SET status = 'running', attempts = attempts + 1, worker_id = ?, "
+                        "started_at = ?, heartbeat_at = ?, error = NULL WHERE id = ?",
+                        (worker_id, now, now, job.id),
+                    )
+                    job.status, job.attempts, job.worker_id = RUNNING, job.attempts + 1, worker_id
+                    job.started_at = job.heartbeat_at = now
+                conn.execute("COMMIT")
+                return job
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    def heartbeat(self, job_id: str, progress: Optional[dict] = None, worker_id: Optional[str] = None) -> None:
+        owner, args = _owner_clause(worker_id)
+        with self._lock, self._connect() as conn:
+            if progress is None:
+                conn.execute(f"UPDATE sync_jobs SET heartbeat_at = ? WHERE id = ?{owner}", (time.time(), job_id, *args))
+            else:
+                conn.execute(
+                    f"UPDATE sync_jobs SET heartbeat_at = ?, progress = ? WHERE id = ?{owner}",
+                    (time.time(), json.dumps(progress, default=str), job_id, *args),
+                )
+
+    def complete(self, job_id: str, result: Any = None, worker_id: Optional[str] = None) -> bool:
+        """Marque le job succeeded ; False si worker_id n'en est plus propriétaire (job remis en file entre-temps)."""
+        owner, args = _owner_clause(worker_id)
+        with self._lock, self._connect() as conn:
+            cursor = conn.execute(
+                f"UPDATE sync_jobs SET status = 'succeeded', finished_at = ?, result = ? WHERE id = ?{owner}",
+                (time.time(), json.dumps(result, default=str), job_id, *args),
+            )
+            return cursor.rowcount > 0
+
+    def fail(self, job_id: str, error: str, worker_id: Optional[str] = None) -> Optional[SyncJob]:
+        """
+        Remet le job en file avec backoff s'il lui reste des tentatives, sinon le marque failed.
+        Renvoie None si le job n'existe pas ou si worker_id n'en est plus propriétaire.
+        """
+        now = time.time()
+        owner, args = _owner_clause(worker_id)
+        with self._lock, self._connect() as conn:
+            job = self._fetch_one(conn, f"SELECT * FROM sync_jobs WHERE id = ?{owner}", (job_id, *args))
+            if job is None:
+                return None
+            if job.attempts < job.max_attempts:
+                job.status, job.run_after = QUEUED, now + retry_delay(job.attempts)
+                cursor = conn.execute(
+                    f"UPDATE sync_jobs SET status = 'queued', run_after = ?, worker_id = NULL, error = ? WHERE id = ?{owner}",
+                    (job.run_after, error, job_id, *args),
+                )
+            else:
+                job.status, job.finished_at = FAILED, now
+                cursor = conn.execute(
+                    f"UPDATE sync_jobs SET status = 'failed', finished_at = ?, error = ? WHERE id = ?{owner}",
+                    (now, error, job_id, *args),
+                )
+            if cursor.rowcount == 0:
+                return None
+            job.error = error
+            return job
+
+    def requeue_stale(self, timeout_seconds: float) -> int:
+        """
+        Remet en file les jobs running sans heartbeat depuis timeout_seconds (worker arrêté ou mort),
+        ou les marque failed s'ils ont épuisé leurs tentatives. Renvoie le nombre de jobs traités.
+        """
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                failed = conn.execute(
+                    "UPDATE sync_jobs SET status = 'failed', finished_at = ?, error = ? "
+                    "WHERE status = 'running' AND heartbeat_at < ? AND attempts >= max_attempts",
+                    (now, STALE_ERROR, now - timeout_seconds),
+                ).rowcount
+                requeued = conn.execute(
+                    "UPDATE sync_jobs SET status = 'queued', worker_id = NULL, run_after = ? "
+                    "WHERE status = 'running' AND heartbeat_at < ?",
+                    (now, now - timeout_seconds),
+                ).rowcount
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return failed + requeued
+
+    def get(self, job_id: str) -> Optional[SyncJob]:
+        with self._connect() as conn:
+            return self._fetch_one(conn, "SELECT * FROM sync_jobs WHERE id = ?", (job_id,))
+
+    def find_active(self, dedupe_key: str) -> Optional[SyncJob]:
+        with self._connect() as conn:
+            return self._fetch_one(
+                conn, "SELECT * FROM sync_jobs WHERE dedupe_key = ? AND status IN ('queued', 'running')", (dedupe_key,)
+            )
+
+    def list_jobs(self, org_id: str, limit: int = 50) -> list[SyncJob]:
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT * FROM sync_jobs WHERE org_id = ? ORDER BY created_at DESC LIMIT ?", (org_id, limit)
+            ).fetchall()
+        return [SyncJob.from_row(dict(row)) for row in rows]
+
+
+class SupabaseJobStore:
+    """File durable dans la table sync_jobs (plusieurs workers / instances)."""
+
+    def __init__(self, client=None):
+        from app.core.supabase_client import get_supabase_client
+        self.client = client or get_supabase_client()
+
+    def _table(self):
+        return self.client.table("sync_jobs")
+
+    def _one(self, data) -> Optional[SyncJob]:
+        if isinstance(data, list):
+            data = data[0] if data else None
+        return SyncJob.from_row(data) if data else None
+
+    def enqueue(
+        self,
+        kind: str,
+        org_id: str,
+        params: Optional[dict] = None,
+        priority: int = 0,
+        delay: float = 0.0,
+        max_attempts: Optional[int] = None,
+        dedupe: bool = True,
+        dedupe_key: Optional[str] = None,
+    ) -> tuple[SyncJob, bool]:
+        job = _new_job(kind, org_id, params, priority, delay, max_attempts, dedupe, dedupe_key)
+        # enqueue_sync_job insère ou renvoie le job actif de même dedupe_key (index unique partiel)
+        existing = self._one(self.client.rpc("enqueue_sync_job", {"p_job": job.to_dict()}).execute().data)
+        if existing and existing.id != job.id:
+            return existing, False
+        return existing or job, True
+
+    def claim(self, worker_id: str) -> Optional[SyncJob]:
+        params = {"p_worker_id": worker_id, "p_now": time.time(), "p_fair_window": settings.sync_job_fair_window_seconds}
+        return self._one(self.client.rpc("claim_sync_job", params).execute().data)
+
+    def _owned(self, query, worker_id: Optional[str]):
+        return query.eq("worker_id", worker_id) if worker_id is not None else query
+
+    def heartbeat(self, job_id: str, progress: Optional[dict] = None, worker_id: Optional[str] = None) -> None:
+        values: dict[str, Any] = {"heartbeat_at": time.time()}
+        if progress is not None:
+            values["progress"] = json.loads(json.dumps(progress, default=str))
+        self._owned(self._table().update(values).eq("id", job_id), worker_id).execute()
+
+    def complete(self, job_id: str, result: Any = None, worker_id: Optional[str] = None) -> bool:
+        response = self._owned(
+            self._table()
+            .update({"status": SUCCEEDED, "finished_at": time.time(), "result": json.loads(json.dumps(result, default=str))})
+            .eq("id", job_id),
+            worker_id,
+        ).execute()
+        return bool(response.data)
+
+    def fail(self, job_id: str, error: str, worker_id: Optional[str] = None) -> Optional[SyncJob]:
+        job = self.get(job_id)
+        if job is None or (worker_id is not None and job.worker_id != worker_id):
+            return None
+        if job.attempts < job.max_attempts:
+            job.status, job.run_after = QUEUED, time.time() + retry_delay(job.attempts)
+            values = {"status": QUEUED, "run_after": job.run_after, "worker_id": None, "error": error}
+        else:
+            job.status, job.finished_at = FAILED, time.time()
+            values = {"status": FAILED, "finished_at": job.finished_at, "error": error}
+        response = self._owned(self._table().update(values).eq("id", job_id), worker_id).execute()
+        if not response.data:
+            return None
+        job.error = error
+        return job
+
+    def requeue_stale(self, timeout_seconds: float) -> int:
+        now = time.time()
+        stale = (
+            self._table()
+            .select("id, attempts, max_attempts")
+            .eq("status", RUNNING)
+            .lt("heartbeat_at", now - timeout_seconds)
+            .execute()
+            .data
+            or []
+        )
+        exhausted = [row["id"] for row in stale if row["attempts"] >= row["max_attempts"]]
+        retried = [row["id"] for row in stale if row["attempts"] < row["max_attempts"]]
+        handled = 0
+        for ids, values in (
+            (exhausted, {"status": FAILED, "finished_at": now, "error": STALE_ERROR}),
+            (retried, {"status": QUEUED, "worker_id": None, "run_after": now}),
+        ):
+            if ids:
+                # Mêmes gardes que la sélection : un heartbeat arrivé entre-temps garde le job
+                response = (
+                    self._table()
+                    .update(values)
+                    .in_("id", ids)
+                    .eq("status", RUNNING)
+                    .lt("heartbeat_at", now - timeout_seconds)
+                    .execute()
+                )
+                handled += len(response.data or [])
+        return handled
+
+    def get(self, job_id: str) -> Optional[SyncJob]:
+        return self._one(self._table().select("*").eq("id", job_id).limit(1).execute().data)
+
+    def find_active(self, dedupe_key: str) -> Optional[SyncJob]:
+        response = self._table().select("*").eq("dedupe_key", dedupe_key).in_("status", list(ACTIVE_STATUSES)).limit(1).execute()
+        return self._one(response.data)
+
+    def list_jobs(self, org_id: str, limit: int = 50) -> list[SyncJob]:
+        response = self._table().select("*").eq("org_id", org_id).order("created_at", desc=True).limit(limit).execute()
+        return [SyncJob.from_row(row) for row in response.data or []]
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_job_store():
+    """File configurée par SYNC_JOB_STORE (sqlite par défaut, supabase pour plusieurs hôtes)."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = SupabaseJobStore() if settings.sync_job_store == "supabase" else SqliteJobStore()
+        return _store
+
+
+def set_job_store(store) -> None:
+    global _store
+    with _store_lock:
+        _store = store
+
+
+def enqueue_job(
+    kind: str,
+    org_id: str,
+    params: Optional[dict] = None,
+    priority: int = 0,
+    delay: float = 0.0,
+    dedupe_key: Optional[str] = None,
+) -> tuple[SyncJob, bool]:
+    """Empile un job dans la file configurée ; un job identique déjà actif est réutilisé."""
+    job, created = get_job_store().enqueue(kind, org_id, params, priority=priority, delay=delay, dedupe_key=dedupe_key)
+    if created:
+        logger.info(f"[JOB QUEUE] Job {job.kind} empilé pour org_id={org_id} (id={job.id}, priorité={priority})")
+    else:
+        logger.info(f"[JOB QUEUE] Job {kind} déjà {job.status} pour org_id={org_id} (id={job.id}), réutilisé")
+    return job, created
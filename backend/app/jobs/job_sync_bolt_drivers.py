@@ -1,9 +1,19 @@
 from app.core.db import SessionLocal
+from app.core.config import get_settings
+from app.core import logging as app_logging
 from app.bolt_integration.bolt_client import BoltClient
 from app.bolt_integration.services_drivers import sync_drivers
+from app.jobs.leases import LeaseBusy, run_exclusive
 
+settings = get_settings()
+logger = app_logging.get_logger(__name__)
 
-def run():
-    with SessionLocal() as db:
-        sync_drivers(db, BoltClient())
 
+def run(org_id: str | None = None):
+    org_id = org_id or settings.bolt_default_fleet_id or settings.uber_default_org_id or "default_org"
+    # Une seule passe pour toute l'org : le référentiel complet permet de détecter les drivers disparus
+    try:
+        with SessionLocal() as db:
+            run_exclusive(org_id, "bolt_drivers", lambda: sync_drivers(db, BoltClient(), org_id=org_id), join=False)
+    except LeaseBusy as e:
+        logger.info(f"[JOB BOLT DRIVERS] {e}, ignoré")
@@ -1,9 +1,19 @@
 from app.core.db import SessionLocal
+from app.core.config import get_settings
+from app.core import logging as app_logging
 from app.bolt_integration.bolt_client import BoltClient
 from app.bolt_integration.services_vehicles import sync_vehicles
+from app.jobs.leases import LeaseBusy, run_exclusive
 
+settings = get_settings()
+logger = app_logging.get_logger(__name__)
 
-def run():
-    with SessionLocal() as db:
-        sync_vehicles(db, BoltClient())
 
+def run(org_id: str | None = None):
+    org_id = org_id or settings.bolt_default_fleet_id or settings.uber_default_org_id or "default_org"
+    # sync_vehicles répartit lui-même les companies de l'org en parallèle
+    try:
+        with SessionLocal() as db:
+            run_exclusive(org_id, "bolt_vehicles", lambda: sync_vehicles(db, BoltClient(), org_id=org_id), join=False)
+    except LeaseBusy as e:
+        logger.info(f"[JOB BOLT VEHICLES] {e}, ignoré")
@@ -0,0 +1,35 @@
+from datetime import date, timedelta
+
+from app.core.db import SessionLocal
+from app.core import logging as app_logging
+from app.heetch_integration.client_manager import get_heetch_client
+from app.heetch_integration.services_sync_all import sync_drivers_and_earnings
+from app.jobs.leases import LeaseBusy, run_exclusive
+
+logger = app_logging.get_logger(__name__)
+
+
+def run(org_id: str, phone: str):
+    """
+    Synchronise les drivers et les earnings Heetch de la semaine en cours pour une org.
+    En tâche planifiée, aucune connexion interactive (SMS) n'est possible : si la session
+    n'est plus valide, le job est ignoré jusqu'à la prochaine connexion via /heetch/auth.
+    """
+    client = get_heetch_client(org_id)
+    # ensure_authenticated bascule le client sur la session de phone (utilisée ensuite par get_earnings)
+    if not client.ensure_authenticated(phone):
+        logger.warning(f"[JOB HEETCH] Session Heetch expirée pour org_id={org_id}, sync ignorée")
+        return
+    today = date.today()
+    monday = today - timedelta(days=today.weekday())
+
+    def sync():
+        with SessionLocal() as db:
+            # Une seule récupération de la semaine en cours pour les drivers et les earnings
+            sync_drivers_and_earnings(db, client, org_id=org_id, start_date=monday, end_date=today, period="weekly")
+
+    # Même session Heetch que les endpoints /heetch/sync/* : un seul run Heetch à la fois par org
+    try:
+        run_exclusive(org_id, "heetch", sync, join=False)
+    except LeaseBusy as e:
+        logger.info(f"[JOB HEETCH] {e}, ignoré")
@@ -0,0 +1,318 @@
+"""
+Baux (leases) distribués pour que deux synchronisations du même flux d'une même org
+ne tournent jamais en même temps, quel que soit le déclencheur (scheduler, endpoint
+/bolt/sync/*, thread de démarrage) ni le worker uvicorn.
+
+- Bail = ligne sync_leases (clé "org_id:flux", détenteur, expiration) prise atomiquement
+  par la fonction SQL acquire_sync_lease (supabase/sync_leases.sql), renouvelée par un
+  heartbeat tant que le job tourne : un worker mort libère le flux à l'expiration du TTL.
+- Dans un même process, une demande en double rejoint le job en cours (même résultat) ;
+  entre process, elle est court-circuitée (LeaseBusy).
+- serialized() attend son tour au lieu de court-circuiter : recalculs partagés (activité des
+  drivers, rollups) lancés par plusieurs syncs concurrentes d'une même org.
+- SchedulerLeader élit un seul scheduler actif par déploiement avec le même mécanisme.
+
+Sans Supabase configuré (dev, tests), un backend en mémoire garantit l'exclusivité
+dans le process uniquement.
+"""
+import os
+import socket
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator, Optional
+
+from app.core.config import get_settings
+from app.core import logging as app_logging
+
+settings = get_settings()
+logger = app_logging.get_logger(__name__)
+
+# Identifiant de ce process (un par worker uvicorn)
+HOLDER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+SCHEDULER_LEASE_KEY = "deployment:scheduler"
+
+
+def lease_key(org_id: str, stream: str) -> str:
+    return f"{org_id}:{stream}"
+
+
+class LeaseBusy(RuntimeError):
+    """Le flux est déjà synchronisé ailleurs (autre worker / instance)."""
+
+    def __init__(self, key: str, holder: Optional[str]):
+        super().__init__(f"Synchronisation {key} déjà en cours (détenteur: {holder or 'inconnu'})")
+        self.key = key
+        self.holder = holder
+
+    def to_dict(self) -> dict:
+        """Réponse des endpoints de sync court-circuités."""
+        return {"status": "already_running", "message": str(self), "lease": self.key, "holder": self.holder}
+
+
+class LocalLeaseBackend:
+    """Baux en mémoire : exclusivité dans le process uniquement."""
+
+    def __init__(self):
+        self._leases: dict[str, tuple[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, key: str, holder: str, ttl_seconds: int) -> Optional[str]:
+        """Prend ou renouvelle le bail ; retourne le détenteur courant (holder si réussi)."""
+        now = time.monotonic()
+        with self._lock:
+            current = self._leases.get(key)
+            if current is None or current[1] < now or current[0] == holder:
+                self._leases[key] = (holder, now + ttl_seconds)
+                return holder
+            return current[0]
+
+    def release(self, key: str, holder: str) -> None:
+        with self._lock:
+            if key in self._leases and self._leases[key][0] == holder:
+                del self._leases[key]
+
+
+class SupabaseLeaseBackend:
+    """Baux dans la table sync_leases, via les fonctions SQL atomiques (RPC PostgREST)."""
+
+    def __init__(self, client=None):
+        from app.core.supabase_client import get_supabase_client
+        self.client = client or get_supabase_client()
+
+    def acquire(self, key: str, holder: str, ttl_seconds: int) -> Optional[str]:
+        response = self.client.rpc(
+            "acquire_sync_lease", {"p_key": key, "p_holder": holder, "p_ttl_seconds": int(ttl_seconds)}
+        ).execute()
+        return response.data
+
+    def release(self, key: str, holder: str) -> None:
+        self.client.rpc("release_sync_lease", {"p_key": key, "p_holder": holder}).execute()
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_lease_backend():
+    """Backend Supabase si configuré (SYNC_LEASE_BACKEND=supabase), sinon en mémoire."""
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            if settings.sync_lease_backend == "supabase":
+                try:
+                    _backend = SupabaseLeaseBackend()
+                except Exception as e:
+                    logger.warning(f"[LEASE] Supabase indisponible ({e}), baux limités à ce process")
+            if _backend is None:
+                _backend = LocalLeaseBackend()
+        return _backend
+
+
+def set_lease_backend(backend) -> None:
+    global _backend
+    with _backend_lock:
+        _backend = backend
+
+
+class Lease:
+    """Bail détenu, renouvelé en arrière-plan toutes les ttl/3 secondes jusqu'à release()."""
+
+    def __init__(self, key: str, ttl_seconds: int, backend, holder: str = HOLDER_ID):
+        self.key = key
+        self.ttl_seconds = ttl_seconds
+        self.backend = backend
+        self.holder = holder
+        self.lost = False
+        self._stop = threading.Event()
+        self._heartbeat = threading.Thread(target=self._renew_loop, name=f"lease:{key}", daemon=True)
+        self._heartbeat.start()
+
+    def _renew_loop(self) -> None:
+        while not self._stop.wait(max(1.0, self.ttl_seconds / 3)):
+            try:
+                current = self.backend.acquire(self.key, self.holder, self.ttl_seconds)
+            except Exception as e:
+                logger.warning(f"[LEASE] Renouvellement de {self.key} impossible: {e}")
+                continue
+            if current != self.holder:
+                self.lost = True
+                logger.error(f"[LEASE] Bail {self.key} perdu au profit de {current}")
+                return
+
+    def release(self) -> None:
+        self._stop.set()
+        try:
+            self.backend.release(self.key, self.holder)
+        except Exception as e:
+            # Le TTL libérera le flux de toute façon
+            logger.warning(f"[LEASE] Libération de {self.key} impossible: {e}")
+
+
+def acquire_lease(key: str, ttl_seconds: Optional[int] = None, backend=None) -> Lease:
+    """Prend le bail ou lève LeaseBusy si un autre process le détient."""
+    backend = backend or get_lease_backend()
+    ttl_seconds = ttl_seconds or settings.sync_lease_ttl_seconds
+    current = backend.acquire(key, HOLDER_ID, ttl_seconds)
+    if current != HOLDER_ID:
+        raise LeaseBusy(key, current)
+    return Lease(key, ttl_seconds, backend)
+
+
+class _Inflight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+    def wait(self) -> Any:
+        self.done.wait()
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+_inflight: dict[str, _Inflight] = {}
+_inflight_lock = threading.Lock()
+
+
+def run_exclusive(org_id: str, stream: str, fn: Callable[[], Any], join: bool = True, ttl_seconds: Optional[int] = None) -> Any:
+    """
+    Exécute fn() sous le bail (org_id, stream).
+
+    - même flux déjà en cours dans ce process : attend la fin et renvoie son résultat
+      (join=True) ou lève LeaseBusy (join=False) ;
+    - bail détenu par un autre process : lève LeaseBusy.
+    """
+    key = lease_key(org_id, stream)
+    with _inflight_lock:
+        inflight = _inflight.get(key)
+        owner = inflight is None
+        if owner:
+            inflight = _inflight[key] = _Inflight()
+
+    if not owner:
+        if not join:
+            raise LeaseBusy(key, HOLDER_ID)
+        logger.info(f"[LEASE] {key} déjà en cours dans ce process, en attente du résultat")
+        return inflight.wait()
+
+    try:
+        lease = acquire_lease(key, ttl_seconds)
+        try:
+            inflight.result = fn()
+        finally:
+            lease.release()
+        return inflight.result
+    except BaseException as e:
+        inflight.error = e
+        raise
+    finally:
+        with _inflight_lock:
+            _inflight.pop(key, None)
+        inflight.done.set()
+
+
+_local_locks: dict[str, threading.Lock] = {}
+
+
+@contextmanager
+def serialized(org_id: str, stream: str, wait_seconds: float = 600, poll_seconds: float = 1.0) -> Iterator[None]:
+    """
+    Section critique (org_id, stream) exécutée par un seul thread de tous les process à la fois :
+    attend le bail (au plus wait_seconds, puis LeaseBusy) au lieu de le refuser.
+    """
+    key = lease_key(org_id, stream)
+    with _inflight_lock:
+        local_lock = _local_locks.setdefault(key, threading.Lock())
+    # Les threads d'un process partagent HOLDER_ID : le bail seul ne les exclut pas entre eux
+    if not local_lock.acquire(timeout=wait_seconds):
+        raise LeaseBusy(key, HOLDER_ID)
+    try:
+        deadline = time.monotonic() + wait_seconds
+        while True:
+            try:
+                lease = acquire_lease(key)
+                break
+            except LeaseBusy:
+                if time.monotonic() >= deadline:
+                    raise
+                time.sleep(poll_seconds)
+        try:
+            yield
+        finally:
+            lease.release()
+    finally:
+        local_lock.release()
+
+
+def is_running(org_id: str, stream: str) -> bool:
+    with _inflight_lock:
+        return lease_key(org_id, stream) in _inflight
+
+
+class SchedulerLeader:
+    """
+    Élection d'un scheduler unique par déploiement : chaque worker tente périodiquement de
+    prendre (ou renouveler) le bail SCHEDULER_LEASE_KEY ; le détenteur appelle on_elected(),
+    un leader qui perd le bail (blocage, coupure réseau) appelle on_demoted().
+    """
+
+    def __init__(
+        self,
+        on_elected: Callable[[], None],
+        on_demoted: Callable[[], None],
+        ttl_seconds: Optional[int] = None,
+        backend=None,
+        key: str = SCHEDULER_LEASE_KEY,
+    ):
+        self.on_elected = on_elected
+        self.on_demoted = on_demoted
+        self.ttl_seconds = ttl_seconds or settings.scheduler_leader_ttl_seconds
+        self.backend = backend
+        self.key = key
+        self.is_leader = False
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def step(self) -> bool:
+        """Une tentative d'élection / renouvellement ; retourne True si ce process est leader."""
+        backend = self.backend or get_lease_backend()
+        try:
+            current = backend.acquire(self.key, HOLDER_ID, self.ttl_seconds)
+        except Exception as e:
+            # Sans réponse de la DB, un leader ne peut plus garantir qu'il l'est encore
+            logger.warning(f"[SCHEDULER LEADER] Élection impossible: {e}")
+            current = None
+        leader = current == HOLDER_ID
+        if leader and not self.is_leader:
+            logger.info(f"[SCHEDULER LEADER] {HOLDER_ID} élu leader, scheduler actif")
+            self.is_leader = True
+            self.on_elected()
+        elif not leader and self.is_leader:
+            logger.warning(f"[SCHEDULER LEADER] Leadership perdu (détenteur: {current}), scheduler en pause")
+            self.is_leader = False
+            self.on_demoted()
+        return leader
+
+    def start(self) -> None:
+        def loop():
+            while True:
+                self.step()
+                if self._stop.wait(max(1.0, self.ttl_seconds / 3)):
+                    return
+
+        self._thread = threading.Thread(target=loop, name="scheduler_leader", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self.is_leader:
+            self.is_leader = False
+            self.on_demoted()
+            try:
+                (self.backend or get_lease_backend()).release(self.key, HOLDER_ID)
+            except Exception as e:
+                logger.warning(f"[SCHEDULER LEADER] Libération du bail impossible: {e}")
@@ -1,48 +1,138 @@
+import os
+import random
+
+from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
 from apscheduler.schedulers.background import BackgroundScheduler
+from apscheduler.triggers.cron import CronTrigger
 
 from app.jobs import job_sync_drivers, job_sync_metrics, job_sync_orgs, job_sync_payments, job_sync_vehicles
-from app.jobs import job_sync_bolt_drivers, job_sync_bolt_vehicles
-from app.jobs.background_tasks import sync_bolt_heavy_data_async
+from app.jobs.background_tasks import heavy_data_params
+from app.jobs.job_queue import enqueue_job
+from app.jobs.leases import LeaseBusy, run_exclusive
+from app.jobs.tenants import Tenant, list_active_tenants, stagger_delays
 from app.core.config import get_settings
+from app.core import logging as app_logging
 
 settings = get_settings()
+logger = app_logging.get_logger(__name__)
 
 
-def sync_state_logs_incremental():
+def sync_state_logs_incremental(org_id: str | None = None):
     """
     Synchronise rapidement les state logs en mode incrémental (seulement les nouveaux logs).
     Cette fonction est appelée fréquemment pour maintenir les logs à jour.
+    Toutes les companies Bolt de l'org sont synchronisées.
     """
     from app.core.supabase_db import get_supabase_client, SupabaseDB
     from app.bolt_integration.bolt_client import BoltClient
+    from app.bolt_integration.services_orgs import get_company_ids
     from app.bolt_integration.services_state_logs import sync_state_logs
-    from app.core import logging as app_logging
-    
-    logger = app_logging.get_logger(__name__)
-    org_id = settings.uber_default_org_id or "default_org"
-    
+    from app.bolt_integration.services_sync_all import run_for_companies
+
+    org_id = org_id or settings.uber_default_org_id or "default_org"
+
     try:
         logger.info(f"[INCREMENTAL STATE LOGS SYNC] Début synchronisation incrémentale pour org_id={org_id}")
         supabase_client = get_supabase_client()
         db = SupabaseDB(supabase_client)
-        client = BoltClient()
-        
+
         # Mode incrémental : récupère seulement les nouveaux logs depuis le dernier sync
-        sync_state_logs(db, client, org_id=org_id, incremental=True)
-        
+        # Bail partagé avec la sync lourde et les endpoints : ignoré si les state logs de l'org sont déjà en cours
+        run_exclusive(
+            org_id,
+            "bolt_state_logs",
+            lambda: run_for_companies(
+                get_company_ids(db, org_id),
+                lambda cid: sync_state_logs(db, BoltClient(), company_id=cid, org_id=org_id, incremental=True),
+                label="INCREMENTAL STATE LOGS SYNC",
+            ),
+            join=False,
+        )
+
         logger.info(f"[INCREMENTAL STATE LOGS SYNC] Synchronisation incrémentale terminée pour org_id={org_id}")
+    except LeaseBusy as e:
+        logger.info(f"[INCREMENTAL STATE LOGS SYNC] {e}, ignorée")
     except Exception as e:
         logger.error(f"[INCREMENTAL STATE LOGS SYNC] Erreur lors de la synchronisation incrémentale: {str(e)}", exc_info=True)
 
 
+def _tenant_params(kind: str, tenant: Tenant) -> dict | None:
+    """Paramètres du job kind pour ce tenant, ou None si le tenant n'est pas concerné."""
+    if kind == "heetch_weekly":
+        return {"phones": list(tenant.heetch_phone_numbers)} if tenant.has_heetch else None
+    if not tenant.has_bolt:
+        return None
+    # Mêmes paramètres que les demandes de l'API : une sync lourde déjà demandée n'est pas dupliquée
+    return heavy_data_params() if kind == "bolt_heavy_data" else {}
+
+
+def enqueue_tenant_jobs(kind: str, rng: random.Random | None = None) -> int:
+    """
+    Énumère les tenants actifs et empile un job kind par org dans la file durable,
+    avec la priorité de l'org et des départs étalés (SCHEDULER_STAGGER_WINDOW_SECONDS) plus un jitter.
+    Le worker exécute les jobs ; un job identique encore en attente ou en cours n'est pas dupliqué.
+
+    Returns:
+        Nombre de jobs effectivement empilés
+    """
+    from app.core.supabase_db import get_supabase_client, SupabaseDB
+
+    try:
+        tenants = list_active_tenants(SupabaseDB(get_supabase_client()))
+    except Exception as e:
+        logger.error(f"[SCHEDULER] Impossible d'énumérer les tenants pour {kind}: {str(e)}", exc_info=True)
+        return 0
+
+    jobs = [(tenant, _tenant_params(kind, tenant)) for tenant in tenants]
+    jobs = [(tenant, params) for tenant, params in jobs if params is not None]
+    delays = stagger_delays(len(jobs), settings.scheduler_stagger_window_seconds, settings.scheduler_jitter_seconds, rng)
+
+    submitted = 0
+    for (tenant, params), delay in zip(jobs, delays):
+        _, created = enqueue_job(kind, tenant.org_id, params, priority=tenant.priority, delay=delay)
+        submitted += int(created)
+    logger.info(f"[SCHEDULER] {kind}: {submitted}/{len(jobs)} job(s) empilé(s) sur {len(tenants)} tenant(s)")
+    return submitted
+
+
+def _jobstore_url() -> str:
+    if settings.scheduler_jobstore_url:
+        return settings.scheduler_jobstore_url
+    os.makedirs(settings.sync_state_dir, exist_ok=True)
+    return f"sqlite:///{os.path.abspath(os.path.join(settings.sync_state_dir, 'scheduler.sqlite'))}"
+
+
 def create_scheduler() -> BackgroundScheduler:
     """
     Crée le scheduler pour les tâches périodiques.
-    Les données lourdes (orders, state_logs) sont synchronisées une fois par jour en arrière-plan.
+    Chaque déclenchement énumère les orgs actives et empile un job par org dans la file durable
+    (priorités SCHEDULER_ORG_PRIORITIES), avec des départs étalés pour ne pas solliciter Bolt pour
+    tous les tenants à la même minute ; le worker les exécute (SCHEDULER_MAX_CONCURRENT_JOBS jobs à la fois).
+    L'état du scheduler est persisté (SCHEDULER_JOBSTORE_URL) : un déclenchement manqué pendant un arrêt
+    est rattrapé une fois au redémarrage (dans la limite de SCHEDULER_MISFIRE_GRACE_SECONDS).
+    Le scheduler est retourné démarré en pause : resume() lance l'exécution, pause() la suspend.
+    Les données lourdes (orders, state_logs) sont synchronisées une fois par jour.
     Les state logs sont également synchronisés fréquemment en mode incrémental pour maintenir les données à jour.
     """
-    scheduler = BackgroundScheduler(timezone="UTC")
-    
+    scheduler = BackgroundScheduler(
+        timezone="UTC",
+        jobstores={"default": SQLAlchemyJobStore(url=_jobstore_url())},
+        job_defaults={"coalesce": True, "max_instances": 1, "misfire_grace_time": settings.scheduler_misfire_grace_seconds},
+    )
+
+    # Démarré en pause : les jobs persistés sont chargés, l'exécution commence au resume() (leader élu)
+    scheduler.start(paused=True)
+
+    def add(kind: str, **trigger) -> None:
+        # Job déjà persisté : conservé tel quel (son prochain déclenchement, éventuellement manqué,
+        # sera rattrapé) sauf si sa planification a changé
+        cron = CronTrigger(timezone="UTC", **trigger)
+        job = scheduler.get_job(kind)
+        if job is None:
+            scheduler.add_job(enqueue_tenant_jobs, cron, id=kind, args=[kind])
+        elif str(job.trigger) != str(cron):
+            scheduler.reschedule_job(kind, trigger=cron)
+
     # Synchronisations Uber - DÉSACTIVÉES TEMPORAIREMENT
     # Les autorisations Uber ne sont pas encore configurées, désactivation pour éviter les erreurs 400
     # scheduler.add_job(job_sync_orgs.run, "cron", hour=3)
@@ -50,22 +140,20 @@ def create_scheduler() -> BackgroundScheduler:
     # scheduler.add_job(job_sync_vehicles.run, "cron", hour="*/6")
     # scheduler.add_job(job_sync_metrics.run, "cron", hour="*/12")
     # scheduler.add_job(job_sync_payments.run, "cron", minute="*/30")
-    
-    # Synchronisations Bolt légères (drivers, vehicles) - fréquentes
-    scheduler.add_job(job_sync_bolt_drivers.run, "cron", hour="*/6")  # Toutes les 6h
-    scheduler.add_job(job_sync_bolt_vehicles.run, "cron", hour="*/6")  # Toutes les 6h
-    
-    # Synchronisation rapide des state logs en mode incrémental - toutes les heures
+
+    # Synchronisations Bolt légères (drivers, vehicles) - toutes les 6h, par org
+    add("bolt_drivers", hour="*/6")
+    add("bolt_vehicles", hour="*/6")
+
+    # Synchronisation rapide des state logs en mode incrémental - toutes les heures, par org
     # Cela maintient les logs à jour sans surcharger l'API (seulement les nouveaux logs)
-    scheduler.add_job(sync_state_logs_incremental, "cron", minute=0)  # Toutes les heures à :00
-    
-    # Synchronisations Bolt lourdes (orders, state_logs complets) - une fois par jour, en arrière-plan
+    add("bolt_state_logs_incremental", minute=0)
+
+    # Synchronisations Bolt lourdes (orders, state_logs complets) - une fois par jour, par org
     # Exécution à 2h du matin pour éviter la charge
-    def sync_heavy_data():
-        org_id = settings.uber_default_org_id or "default_org"
-        sync_bolt_heavy_data_async(org_id=org_id)
-    
-    scheduler.add_job(sync_heavy_data, "cron", hour=2, minute=0)
-    
-    return scheduler
+    add("bolt_heavy_data", hour=2, minute=0)
+
+    # Earnings/drivers Heetch de la semaine en cours - toutes les 6h, pour les orgs avec une session valide
+    add("heetch_weekly", hour="*/6", minute=30)
 
+    return scheduler
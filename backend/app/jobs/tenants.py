@@ -0,0 +1,100 @@
+"""
+Découverte des tenants (org_id) actifs et de leurs accès Bolt / Heetch.
+Utilisé par le scheduler pour planifier un job par org au lieu de la seule org par défaut.
+"""
+import random
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
+
+from app.core.config import get_settings
+from app.core import logging as app_logging
+from app.core.supabase_db import SupabaseDB
+from app.models.bolt_org import BoltOrganization
+from app.models.heetch_session_cookies import HeetchSessionCookies
+
+settings = get_settings()
+logger = app_logging.get_logger(__name__)
+
+
+@dataclass(frozen=True)
+class Tenant:
+    org_id: str
+    bolt_company_ids: tuple[str, ...] = ()
+    heetch_phone_numbers: tuple[str, ...] = ()
+    priority: int = 0
+
+    @property
+    def has_bolt(self) -> bool:
+        return bool(self.bolt_company_ids)
+
+    @property
+    def has_heetch(self) -> bool:
+        return bool(self.heetch_phone_numbers)
+
+
+def parse_org_priorities(raw: str | None) -> dict[str, int]:
+    """Parse SCHEDULER_ORG_PRIORITIES au format "orgA=2,orgB=1"."""
+    priorities: dict[str, int] = {}
+    for item in (raw or "").split(","):
+        if "=" not in item:
+            continue
+        org_id, value = item.split("=", 1)
+        try:
+            priorities[org_id.strip()] = int(value)
+        except ValueError:
+            logger.warning(f"[TENANTS] Priorité invalide ignorée: {item!r}")
+    return priorities
+
+
+def stagger_delays(count: int, window_seconds: float, jitter_seconds: float, rng: Optional[random.Random] = None) -> list[float]:
+    """
+    Répartit count départs uniformément sur window_seconds, plus un jitter aléatoire
+    de [0, jitter_seconds] pour éviter que tous les tenants frappent l'API à la même seconde.
+    """
+    rng = rng or random
+    if count <= 0:
+        return []
+    step = window_seconds / count if window_seconds > 0 else 0.0
+    return [i * step + (rng.uniform(0, jitter_seconds) if jitter_seconds > 0 else 0.0) for i in range(count)]
+
+
+def list_active_tenants(db: SupabaseDB) -> list[Tenant]:
+    """
+    Énumère les orgs ayant au moins un accès exploitable :
+    - Bolt : company_ids stockés dans bolt_organizations (ou BOLT_DEFAULT_FLEET_ID pour l'org par défaut)
+    - Heetch : cookies de session non invalidés et non expirés
+
+    Les tenants sont triés par priorité décroissante puis par org_id.
+    """
+    bolt: dict[str, set[str]] = {}
+    for org in db.query(BoltOrganization).all():
+        if org.org_id and org.id:
+            bolt.setdefault(org.org_id, set()).add(str(org.id))
+
+    default_org_id = settings.uber_default_org_id or "default_org"
+    if settings.bolt_client_id and settings.bolt_default_fleet_id and default_org_id not in bolt:
+        bolt[default_org_id] = {settings.bolt_default_fleet_id}
+
+    heetch: dict[str, set[str]] = {}
+    now = datetime.utcnow()
+    for session in db.query(HeetchSessionCookies).all():
+        if session.invalid_at is not None or not session.expires_at:
+            continue
+        expires_at = session.expires_at.replace(tzinfo=None) if session.expires_at.tzinfo else session.expires_at
+        if expires_at > now:
+            heetch.setdefault(session.org_id, set()).add(session.phone_number)
+
+    priorities = parse_org_priorities(settings.scheduler_org_priorities)
+    tenants = [
+        Tenant(
+            org_id=org_id,
+            bolt_company_ids=tuple(sorted(bolt.get(org_id, ()))),
+            heetch_phone_numbers=tuple(sorted(heetch.get(org_id, ()))),
+            priority=priorities.get(org_id, 0),
+        )
+        for org_id in set(bolt) | set(heetch)
+    ]
+    tenants.sort(key=lambda t: (-t.priority, t.org_id))
+    logger.info(f"[TENANTS] {len(tenants)} tenant(s) actif(s): {[t.org_id for t in tenants]}")
+    return tenants
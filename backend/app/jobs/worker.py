@@ -0,0 +1,280 @@
+"""
+Worker de synchronisation : exécute hors du process uvicorn les jobs de la file durable
+(app.jobs.job_queue), empilés par l'API et le scheduler.
+
+Chaque kind de job est associé à un handler(org_id, params, report) ; report(progress)
+publie l'avancement du job (visible dans la file) et sert de heartbeat.
+Un job en erreur est relancé avec backoff (SYNC_JOB_MAX_ATTEMPTS) ; un job dont le worker
+est mort (plus de heartbeat depuis SYNC_JOB_STALE_SECONDS) est remis en file.
+"""
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Optional
+
+from app.core.config import get_settings
+from app.core import logging as app_logging
+from app.jobs.job_queue import SyncJob, get_job_store
+from app.jobs.leases import HOLDER_ID
+
+settings = get_settings()
+logger = app_logging.get_logger(__name__)
+
+Report = Callable[[dict], None]
+Handler = Callable[[str, dict, Report], Any]
+
+
+def _bolt_heavy_data(org_id: str, params: dict, report: Report) -> dict:
+    from app.jobs.background_tasks import HEAVY_STREAMS, sync_orders_in_batches, sync_state_logs_in_batches
+
+    sync_fns = {"orders": sync_orders_in_batches, "state_logs": sync_state_logs_in_batches}
+    streams = params.get("streams") or list(HEAVY_STREAMS)
+    results = {}
+    for i, stream in enumerate(streams, 1):
+        # Avancement du flux courant, préfixé de l'étape (flux i/N) pour les jobs multi-flux
+        step = {"step": i, "steps": len(streams)}
+        report({**step, "stream": stream})
+        results[stream] = sync_fns[stream](
+            org_id=org_id,
+            company_id=params.get("company_id"),
+            days_back=params.get("days_back", 30),
+            batch_size_days=7,
+            on_progress=lambda progress: report({**step, **progress}),
+        )
+    return results
+
+
+def _bolt_range(stream: str) -> Handler:
+    """Synchronisation d'une plage explicite (endpoints /bolt/sync/orders et /bolt/sync/state-logs)."""
+
+    def handler(org_id: str, params: dict, report: Report) -> dict:
+        from app.core.db import SessionLocal
+        from app.bolt_integration.bolt_client import BoltClient
+        from app.bolt_integration.services_state_logs import sync_state_logs
+        from app.bolt_integration.services_trips import sync_trips
+        from app.jobs.leases import run_exclusive
+
+        sync_fn = sync_trips if stream == "bolt_orders" else sync_state_logs
+        start, end = datetime.fromisoformat(params["start"]), datetime.fromisoformat(params["end"])
+        with SessionLocal() as db:
+            # LeaseBusy propagée : le job est relancé plus tard plutôt que perdu
+            return run_exclusive(
+                org_id,
+                stream,
+                lambda: sync_fn(db, BoltClient(), company_id=params.get("company_id"), start=start, end=end, org_id=org_id),
+                join=False,
+            )
+
+    return handler
+
+
+def _bolt_state_logs_incremental(org_id: str, params: dict, report: Report) -> None:
+    from app.jobs.scheduler import sync_state_logs_incremental
+    sync_state_logs_incremental(org_id)
+
+
+def _bolt_drivers(org_id: str, params: dict, report: Report) -> None:
+    from app.jobs import job_sync_bolt_drivers
+    job_sync_bolt_drivers.run(org_id)
+
+
+def _bolt_vehicles(org_id: str, params: dict, report: Report) -> None:
+    from app.jobs import job_sync_bolt_vehicles
+    job_sync_bolt_vehicles.run(org_id)
+
+
+def _bolt_orgs(org_id: str, params: dict, report: Report) -> None:
+    from app.core.db import SessionLocal
+    from app.bolt_integration.bolt_client import BoltClient
+    from app.bolt_integration.services_orgs import sync_orgs
+    from app.jobs.leases import LeaseBusy, run_exclusive
+
+    try:
+        with SessionLocal() as db:
+            return run_exclusive(org_id, "bolt_orgs", lambda: sync_orgs(db, BoltClient(), org_id=org_id), join=False)
+    except LeaseBusy as e:
+        logger.info(f"[SYNC WORKER] {e}, ignoré")
+
+
+def _heetch_weekly(org_id: str, params: dict, report: Report) -> None:
+    from app.jobs import job_sync_heetch
+    for phone in params.get("phones", []):
+        job_sync_heetch.run(org_id, phone)
+
+
+def _bolt_backfill(org_id: str, params: dict, report: Report) -> dict:
+    from app.core.supabase_db import SupabaseDB
+    from app.core.supabase_client import get_supabase_client
+    from app.bolt_integration.backfill import BackfillManifest, run_backfill
+
+    manifest = BackfillManifest.load(params["manifest_id"])
+    # LeaseBusy propagée (flux déjà en cours pour l'org) : le job est relancé plus tard, les cellules terminées ne sont pas rejouées
+    return run_backfill(
+        manifest,
+        SupabaseDB(get_supabase_client()),
+        max_workers=params.get("max_workers", 4),
+        retry_failed=params.get("retry_failed", True),
+        on_progress=report,
+    )
+
+
+def _bolt_driver_activity(org_id: str, params: dict, report: Report) -> dict:
+    """Recalcul de l'activité des drivers sur une période (historique antérieur au moteur, changement de règles)."""
+    from app.core.db import SessionLocal
+    from app.analytics.driver_activity import refresh_driver_activity
+
+    with SessionLocal() as db:
+        result = refresh_driver_activity(db, org_id, params["start_ts"], params["end_ts"])
+        db.commit()
+    return result
+
+
+def _analytics_rollups(org_id: str, params: dict, report: Report) -> dict:
+    """Recalcul des rollups daily_analytics / user_analytics sur une période."""
+    from datetime import date
+
+    from app.core.db import SessionLocal
+    from app.analytics.rollups import rebuild_analytics_rollups
+
+    with SessionLocal() as db:
+        result = rebuild_analytics_rollups(db, org_id, date.fromisoformat(params["from"]), date.fromisoformat(params["to"]))
+        db.commit()
+    return result
+
+
+def _analytics_mirror(org_id: str, params: dict, report: Report) -> dict:
+    """Reconstruction du miroir Parquet local sur une période depuis Supabase."""
+    from datetime import date
+
+    from app.core.db import SessionLocal
+    from app.analytics.mirror import get_mirror, rebuild_mirror
+
+    mirror = get_mirror()
+    if mirror is None:
+        raise RuntimeError("Miroir analytique désactivé (ANALYTICS_MIRROR_DIR vide ou duckdb non installé)")
+    with SessionLocal() as db:
+        return rebuild_mirror(db, mirror, org_id, date.fromisoformat(params["from"]), date.fromisoformat(params["to"]))
+
+
+JOB_HANDLERS: dict[str, Handler] = {
+    "bolt_heavy_data": _bolt_heavy_data,
+    "bolt_orders": _bolt_range("bolt_orders"),
+    "bolt_state_logs": _bolt_range("bolt_state_logs"),
+    "bolt_state_logs_incremental": _bolt_state_logs_incremental,
+    "bolt_orgs": _bolt_orgs,
+    "bolt_drivers": _bolt_drivers,
+    "bolt_vehicles": _bolt_vehicles,
+    "bolt_backfill": _bolt_backfill,
+    "bolt_driver_activity": _bolt_driver_activity,
+    "analytics_rollups": _analytics_rollups,
+    "analytics_mirror": _analytics_mirror,
+    "heetch_weekly": _heetch_weekly,
+}
+
+
+class SyncWorker:
+    """
+    Boucle de consommation de la file : concurrency threads réclament chacun un job à la fois ;
+    un thread de maintenance envoie les heartbeats des jobs en cours et remet en file ceux
+    des workers disparus.
+    """
+
+    def __init__(
+        self,
+        store=None,
+        handlers: Optional[dict[str, Handler]] = None,
+        concurrency: Optional[int] = None,
+        poll_seconds: Optional[float] = None,
+        worker_id: str = HOLDER_ID,
+    ):
+        self.store = store or get_job_store()
+        self.handlers = handlers or JOB_HANDLERS
+        self.concurrency = max(1, concurrency or settings.scheduler_max_concurrent_jobs)
+        self.poll_seconds = poll_seconds or settings.sync_worker_poll_seconds
+        self.worker_id = worker_id
+        self._running: dict[str, dict] = {}
+        self._running_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._threads: list[threading.Thread] = []
+
+    def run_one(self) -> Optional[SyncJob]:
+        """Réclame et exécute un job ; retourne None si la file ne contient aucun job prêt."""
+        job = self.store.claim(self.worker_id)
+        if job is not None:
+            self._execute(job)
+        return job
+
+    def _execute(self, job: SyncJob) -> None:
+        handler = self.handlers.get(job.kind)
+        started = time.time()
+        logger.info(f"[SYNC WORKER] Début job {job.kind} org_id={job.org_id} (id={job.id}, tentative {job.attempts}/{job.max_attempts})")
+        with self._running_lock:
+            self._running[job.id] = {}
+
+        def report(progress: dict) -> None:
+            with self._running_lock:
+                self._running[job.id] = dict(progress)
+            self.store.heartbeat(job.id, progress, worker_id=self.worker_id)
+
+        try:
+            if handler is None:
+                raise ValueError(f"Type de job inconnu: {job.kind}")
+            result = handler(job.org_id, job.params, report)
+            if self.store.complete(job.id, result, worker_id=self.worker_id):
+                logger.info(f"[SYNC WORKER] ✓ Job {job.kind} org_id={job.org_id} terminé en {time.time() - started:.1f}s")
+            else:
+                logger.warning(f"[SYNC WORKER] Job {job.kind} org_id={job.org_id} (id={job.id}) repris par un autre worker, résultat ignoré")
+        except Exception as e:
+            failed = self.store.fail(job.id, str(e)[:2000], worker_id=self.worker_id)
+            if failed is None:
+                retry = "job repris par un autre worker, erreur ignorée"
+            elif failed.status == "queued":
+                retry = f"nouvelle tentative dans {failed.run_after - time.time():.0f}s"
+            else:
+                retry = "abandon"
+            logger.error(f"[SYNC WORKER] ✗ Job {job.kind} org_id={job.org_id}: {str(e)} ({retry})", exc_info=True)
+        finally:
+            with self._running_lock:
+                self._running.pop(job.id, None)
+
+    def _consume_loop(self) -> None:
+        while not self._stop.is_set():
+            try:
+                job = self.run_one()
+            except Exception as e:
+                logger.error(f"[SYNC WORKER] Erreur de la file de jobs: {str(e)}", exc_info=True)
+                job = None
+            if job is None:
+                self._stop.wait(self.poll_seconds)
+
+    def _maintenance_loop(self) -> None:
+        interval = max(1.0, settings.sync_job_stale_seconds / 5)
+        while not self._stop.wait(interval):
+            with self._running_lock:
+                running = list(self._running)
+            try:
+                for job_id in running:
+                    self.store.heartbeat(job_id, worker_id=self.worker_id)
+                stale = self.store.requeue_stale(settings.sync_job_stale_seconds)
+                if stale:
+                    logger.warning(f"[SYNC WORKER] {stale} job(s) sans heartbeat remis en file ou en échec")
+            except Exception as e:
+                logger.warning(f"[SYNC WORKER] Maintenance de la file impossible: {e}")
+
+    def start(self) -> None:
+        self._stop.clear()
+        self._threads = [
+            threading.Thread(target=self._consume_loop, name=f"sync_worker_{i}", daemon=True) for i in range(self.concurrency)
+        ]
+        self._threads.append(threading.Thread(target=self._maintenance_loop, name="sync_worker_maintenance", daemon=True))
+        for thread in self._threads:
+            thread.start()
+        logger.info(f"[SYNC WORKER] {self.worker_id} démarré ({self.concurrency} job(s) simultané(s))")
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """Arrête de réclamer des jobs et attend la fin des jobs en cours (au plus timeout secondes)."""
+        self._stop.set()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for thread in self._threads:
+            thread.join(None if deadline is None else max(0.0, deadline - time.monotonic()))
+        self._threads = []
@@ -1,12 +1,18 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from prometheus_fastapi_instrumentator import Instrumentator
 
 from app.api.router_fleet import router as fleet_router
 from app.api.router_bolt import router as bolt_router
 from app.api.router_heetch import router as heetch_router
+from app.api.endpoints.sync_jobs import router as sync_jobs_router
+from app.api.endpoints.analytics import router as analytics_router
 from app.auth.routes_auth import router as auth_router
 from app.core import logging as app_logging
+from app.core.compression import CompressionMiddleware
+from app.core.config import get_settings
+from app.heetch_integration.browser_pool import browser_pool
 # Désactiver la création automatique des tables car on utilise Supabase
 # from app.core.db import engine
 # from app.models import Base
@@ -15,6 +21,7 @@ from app.webhooks.routes_webhooks import router as webhook_router
 
 def create_app() -> FastAPI:
     app_logging.setup_logging()
+    settings = get_settings()
     
     app = FastAPI(
         title="AA Denis Mobilités – Fleet Manager API",
@@ -39,6 +46,8 @@ def create_app() -> FastAPI:
         - **Fleet** : Endpoints pour les données Uber
         - **Bolt** : Endpoints pour les données Bolt
         - **Heetch** : Endpoints pour les données Heetch (scraping)
+        - **Sync** : Suivi des jobs de synchronisation (statut, avancement en direct via SSE)
+        - **Analytics** : Agrégats quotidiens pré-calculés (par org et par driver), mis à jour après chaque sync
         - **Webhooks** : Webhooks pour les notifications
         
         ## Documentation complète
@@ -49,6 +58,16 @@ def create_app() -> FastAPI:
         docs_url="/docs",
         redoc_url="/redoc",
         openapi_url="/openapi.json",
+        # Sérialisation JSON des réponses par orjson (listes volumineuses de commandes / state logs)
+        default_response_class=ORJSONResponse,
+    )
+
+    # Compression (brotli si installé, sinon gzip) des réponses au-delà du seuil ;
+    # ajoutée avant CORS pour s'exécuter à l'intérieur (la dernière ajoutée est la plus externe)
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=settings.response_compression_min_bytes,
+        gzip_level=settings.response_gzip_level,
     )
 
     app.add_middleware(
@@ -57,6 +76,8 @@ def create_app() -> FastAPI:
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
+        # Validateurs des réponses conditionnelles (app/api/http_cache.py) lisibles par le frontend
+        expose_headers=["ETag", "Last-Modified"],
     )
 
     # Instrument Prometheus before app starts (must be before routers)
@@ -66,6 +87,8 @@ def create_app() -> FastAPI:
     app.include_router(fleet_router, prefix="/fleet", tags=["fleet"])
     app.include_router(bolt_router, tags=["bolt"])
     app.include_router(heetch_router, tags=["heetch"])
+    app.include_router(sync_jobs_router, tags=["sync"])
+    app.include_router(analytics_router, tags=["analytics"])
     app.include_router(webhook_router, prefix="/webhooks", tags=["webhooks"])
 
     @app.on_event("startup")
@@ -75,11 +98,7 @@ def create_app() -> FastAPI:
         
         # Synchronisation automatique au démarrage
         from app.core.config import get_settings
-        from app.core.supabase_db import SupabaseDB
-        from app.core.supabase_client import get_supabase_client
-        from app.bolt_integration.services_sync_all import sync_all_bolt_data
         from app.core import logging as app_logging
-        import threading
         
         logger = app_logging.get_logger(__name__)
         settings = get_settings()
@@ -98,55 +117,37 @@ def create_app() -> FastAPI:
         if skip_startup_sync or app_env == "prod" or app_env == "production":
             logger.info("[STARTUP] Sync automatique au démarrage désactivée (mode production)")
         else:
-            def sync_on_startup():
-                try:
-                    # Utiliser org_id par défaut
-                    org_id = settings.uber_default_org_id or "default_org"
-                    logger.info(f"[STARTUP SYNC] Déclenchement sync automatique au démarrage pour org_id={org_id}")
-                    
-                    supabase_client = get_supabase_client()
-                    db = SupabaseDB(supabase_client)
-                    
-                    # Synchroniser uniquement les données légères au démarrage (orgs, drivers, vehicles)
-                    # Les données lourdes (orders, state_logs) sont synchronisées via le scheduler quotidien
-                    from app.bolt_integration.services_orgs import sync_orgs
-                    from app.bolt_integration.services_drivers import sync_drivers
-                    from app.bolt_integration.services_vehicles import sync_vehicles
-                    from app.bolt_integration.bolt_client import BoltClient
-                    from app.models.bolt_driver import BoltDriver
-                    from app.models.bolt_vehicle import BoltVehicle
-                    
-                    client = BoltClient()
-                    
-                    # Sync organizations
-                    sync_orgs(db, client, org_id=org_id)
-                    
-                    # Sync drivers
-                    sync_drivers(db, client, org_id=org_id)
-                    driver_count = db.query(BoltDriver).filter(BoltDriver.org_id == org_id).count()
-                    
-                    # Sync vehicles
-                    sync_vehicles(db, client, org_id=org_id)
-                    vehicle_count = db.query(BoltVehicle).filter(BoltVehicle.org_id == org_id).count()
-                    
-                    logger.info(f"[STARTUP SYNC] Résultats: drivers={driver_count}, vehicles={vehicle_count}")
-                    logger.info(f"[STARTUP SYNC] Sync légère terminée. Orders et state_logs seront synchronisés par le scheduler quotidien.")
-                except Exception as e:
-                    logger.error(f"[STARTUP SYNC] Erreur lors de la sync automatique au démarrage: {str(e)}", exc_info=True)
-            
-            # Lancer la sync en arrière-plan pour ne pas bloquer le démarrage
-            sync_thread = threading.Thread(target=sync_on_startup, daemon=True)
-            sync_thread.start()
-            logger.info("[STARTUP] Synchronisation automatique Bolt démarrée en arrière-plan (données légères uniquement)")
+            try:
+                from app.jobs.job_queue import enqueue_job
+                
+                # Utiliser org_id par défaut
+                org_id = settings.uber_default_org_id or "default_org"
+                # Synchroniser uniquement les données légères au démarrage (orgs, drivers, vehicles), exécutées par le worker
+                # Les données lourdes (orders, state_logs) sont synchronisées via le scheduler quotidien
+                # Les organizations passent en premier : drivers et vehicles en dépendent
+                enqueue_job("bolt_orgs", org_id, priority=1)
+                enqueue_job("bolt_drivers", org_id)
+                enqueue_job("bolt_vehicles", org_id)
+                logger.info(f"[STARTUP] Synchronisation légère Bolt empilée pour org_id={org_id}")
+            except Exception as e:
+                logger.error(f"[STARTUP SYNC] Erreur lors de la sync automatique au démarrage: {str(e)}", exc_info=True)
         
-        # Démarrer le scheduler pour les tâches périodiques
-        try:
-            from app.jobs.scheduler import create_scheduler
-            scheduler = create_scheduler()
-            scheduler.start()
-            logger.info("[STARTUP] Scheduler démarré (sync quotidienne des données lourdes à 2h)")
-        except Exception as e:
-            logger.error(f"[STARTUP] Erreur lors du démarrage du scheduler: {str(e)}", exc_info=True)
+        # Les syncs et le scheduler tournent dans le process worker (python -m app.worker) ;
+        # SYNC_WORKER_EMBEDDED=true les exécute dans l'API (dev sans worker séparé)
+        if settings.sync_worker_embedded:
+            try:
+                from app.worker import start_sync_services
+                app.state.stop_sync_services = start_sync_services()
+                logger.info("[STARTUP] Worker de synchronisation et scheduler démarrés dans l'API")
+            except Exception as e:
+                logger.error(f"[STARTUP] Erreur lors du démarrage du worker embarqué: {str(e)}", exc_info=True)
+
+    @app.on_event("shutdown")
+    def on_shutdown() -> None:
+        stop_sync_services = getattr(app.state, "stop_sync_services", None)
+        if stop_sync_services is not None:
+            stop_sync_services()
+        browser_pool.shutdown()
 
     return app
 
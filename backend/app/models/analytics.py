@@ -0,0 +1,62 @@
+from sqlalchemy import BigInteger, Column, Date, DateTime, Float, Integer, String
+from sqlalchemy.dialects.postgresql import JSONB
+
+from app.models import Base
+
+
+class DailyAnalytics(Base):
+    """
+    Agrégats quotidiens par org (supabase/analytics_and_users.sql), maintenus par les rollups
+    incrémentaux (app/analytics/rollups.py) après chaque sync. Montants en centimes.
+    """
+    __tablename__ = "daily_analytics"
+
+    id = Column(String, primary_key=True, index=True)  # UUID généré par la base ; unicité (org_id, date)
+    org_id = Column(String, nullable=False, index=True)
+    date = Column(Date, nullable=False, index=True)
+    total_drivers = Column(Integer, default=0)
+    connected_drivers = Column(Integer, default=0)  # Au moins une commande sur les 30 derniers jours
+    working_drivers = Column(Integer, default=0)  # Au moins une commande ce jour
+    total_vehicles = Column(Integer, default=0)
+    active_vehicles = Column(Integer, default=0)
+    total_orders = Column(Integer, default=0)
+    completed_orders = Column(Integer, default=0)
+    cancelled_orders = Column(Integer, default=0)
+    total_gross_earnings = Column(BigInteger, default=0)
+    total_net_earnings = Column(BigInteger, default=0)
+    total_commission = Column(BigInteger, default=0)
+    total_tips = Column(BigInteger, default=0)
+    total_distance_km = Column(Float, default=0)
+    total_time_hours = Column(Float, default=0)
+    platform_breakdown = Column(JSONB, nullable=True)  # {"bolt": {"orders": ..., "earnings": ...}, "heetch": {...}}
+    computed_at = Column(DateTime, nullable=True)
+
+
+class UserAnalytics(Base):
+    """
+    Agrégats quotidiens par driver et plateforme, maintenus par les rollups incrémentaux.
+    Montants en centimes ; driver_uuid est l'email du driver pour Heetch.
+    """
+    __tablename__ = "user_analytics"
+
+    id = Column(String, primary_key=True, index=True)  # UUID généré par la base ; unicité (org_id, driver_uuid, date)
+    org_id = Column(String, nullable=False, index=True)
+    driver_uuid = Column(String, nullable=False, index=True)
+    date = Column(Date, nullable=False, index=True)
+    platform = Column(String, nullable=True, index=True)  # bolt, heetch
+    total_orders = Column(Integer, default=0)
+    completed_orders = Column(Integer, default=0)
+    cancelled_orders = Column(Integer, default=0)
+    gross_earnings = Column(BigInteger, default=0)
+    net_earnings = Column(BigInteger, default=0)
+    commission = Column(BigInteger, default=0)
+    tips = Column(BigInteger, default=0)
+    distance_km = Column(Float, default=0)
+    time_hours = Column(Float, default=0)
+    trips_per_hour = Column(Float, default=0)
+    hourly_earning = Column(BigInteger, default=0)
+    income_score = Column(Integer, nullable=True)
+    efficiency_score = Column(Integer, nullable=True)
+    sustainability_score = Column(Integer, nullable=True)
+    overall_score = Column(Integer, nullable=True)
+    computed_at = Column(DateTime, nullable=True)
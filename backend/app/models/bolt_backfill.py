@@ -0,0 +1,18 @@
+from sqlalchemy import BigInteger, Column, Float, String
+
+from app.models import Base
+
+
+class BoltBackfill(Base):
+    """
+    Manifeste d'un backfill Bolt (période et org) ; ses fenêtres sont dans bolt_backfill_cells.
+    Partagé entre l'API (création, suivi) et le worker (exécution).
+    """
+    __tablename__ = "bolt_backfills"
+
+    id = Column(String, primary_key=True, index=True)  # Généré: date de création + suffixe aléatoire
+    org_id = Column(String, nullable=False, index=True)
+    start_ts = Column(BigInteger, nullable=False)
+    end_ts = Column(BigInteger, nullable=False)
+    created_at = Column(Float, nullable=False)  # Timestamp Unix
+    updated_at = Column(Float, nullable=False)
@@ -0,0 +1,26 @@
+from sqlalchemy import BigInteger, Column, Float, Integer, String, Text
+
+from app.models import Base
+
+
+class BoltBackfillCell(Base):
+    """
+    Fenêtre (stream, company, période) d'un backfill Bolt et son avancement :
+    une ligne par cellule, mise à jour par le worker à la fin de chaque cellule.
+    """
+    __tablename__ = "bolt_backfill_cells"
+
+    id = Column(String, primary_key=True, index=True)  # Généré: backfill_id + position
+    backfill_id = Column(String, nullable=False, index=True)
+    org_id = Column(String, nullable=False, index=True)
+    position = Column(Integer, nullable=False)  # Ordre de planification dans le manifeste
+    stream = Column(String, nullable=False)  # orders, state_logs
+    company_id = Column(String, nullable=False)
+    start_ts = Column(BigInteger, nullable=False)
+    end_ts = Column(BigInteger, nullable=False)
+    status = Column(String, nullable=False)  # pending, running, done, failed
+    attempts = Column(Integer, nullable=False, default=0)
+    pages = Column(Integer, nullable=False, default=0)
+    rows = Column(Integer, nullable=False, default=0)
+    duration_seconds = Column(Float, nullable=False, default=0)
+    error = Column(Text, nullable=True)
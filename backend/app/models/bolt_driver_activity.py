@@ -0,0 +1,32 @@
+from sqlalchemy import Column, Date, Float, Integer, String
+
+from app.models import Base
+
+
+class BoltDriverActivityDaily(Base):
+    """
+    Activité quotidienne précalculée des drivers Bolt (temps en ligne, en course, pauses,
+    courses et revenus par heure en ligne), recalculée pour les jours touchés par chaque sync.
+    """
+    __tablename__ = "bolt_driver_activity_daily"
+
+    id = Column(String, primary_key=True, index=True)  # Généré: driver_uuid + jour
+    org_id = Column(String, nullable=False, index=True)
+    driver_uuid = Column(String, nullable=False, index=True)
+    day = Column(Date, nullable=False, index=True)  # Jour local (ANALYTICS_TIMEZONE)
+    # Temps issus des intervalles d'état (secondes)
+    online_seconds = Column(Integer, nullable=False, default=0)  # waiting_orders + has_order + busy
+    busy_seconds = Column(Integer, nullable=False, default=0)  # has_order + busy
+    waiting_seconds = Column(Integer, nullable=False, default=0)  # waiting_orders
+    idle_gap_seconds = Column(Integer, nullable=False, default=0)  # Déconnexions entre deux périodes en ligne
+    idle_gaps = Column(Integer, nullable=False, default=0)
+    # Issus des commandes
+    trips = Column(Integer, nullable=False, default=0)  # Courses terminées
+    on_trip_seconds = Column(Integer, nullable=False, default=0)  # Somme drop_off - pickup
+    gross_earnings = Column(Float, nullable=False, default=0)
+    net_earnings = Column(Float, nullable=False, default=0)
+    distance_km = Column(Float, nullable=False, default=0)
+    # Ratios
+    utilisation = Column(Float, nullable=False, default=0)  # busy / online, en %
+    trips_per_online_hour = Column(Float, nullable=False, default=0)
+    earnings_per_online_hour = Column(Float, nullable=False, default=0)  # Net
@@ -0,0 +1,23 @@
+from sqlalchemy import BigInteger, Boolean, Column, Integer, String
+
+from app.models import Base
+
+
+class BoltStateInterval(Base):
+    """
+    Intervalles d'état des drivers Bolt, compactés à l'ingestion depuis bolt_state_logs :
+    les logs consécutifs de même état (et même véhicule) forment un seul intervalle.
+    """
+    __tablename__ = "bolt_state_intervals"
+
+    id = Column(String, primary_key=True, index=True)  # Généré: driver_uuid + start_ts
+    org_id = Column(String, nullable=False, index=True)
+    driver_uuid = Column(String, nullable=False, index=True)
+    vehicle_uuid = Column(String, nullable=True)
+    state = Column(String, nullable=False, index=True)
+    start_ts = Column(BigInteger, nullable=False, index=True)
+    # Début de l'intervalle suivant, ou dernier log reçu si l'intervalle est ouvert
+    end_ts = Column(BigInteger, nullable=False, index=True)
+    log_count = Column(Integer, nullable=False, default=1)
+    # Dernier intervalle connu du driver : l'état se poursuit au-delà de end_ts
+    is_open = Column(Boolean, nullable=False, default=False)
@@ -0,0 +1,30 @@
+from sqlalchemy import BigInteger, Column, DateTime, Float, Integer, String, Text
+
+from app.models import Base
+
+
+class SyncRun(Base):
+    """
+    Journal des runs de synchronisation (Bolt, Heetch, Uber) : une ligne par run,
+    créée au démarrage (status=running) puis complétée à la fin (success / error).
+    """
+    __tablename__ = "sync_runs"
+
+    id = Column(String, primary_key=True, index=True)  # UUID généré côté backend
+    org_id = Column(String, nullable=False, index=True)
+    provider = Column(String, nullable=False, index=True)  # bolt, heetch, uber
+    stream = Column(String, nullable=False, index=True)  # orders, state_logs, drivers...
+    company_id = Column(String, nullable=True)
+    status = Column(String, nullable=False)  # running, success, error
+    started_at = Column(DateTime, nullable=False, index=True)
+    finished_at = Column(DateTime, nullable=True)
+    duration_seconds = Column(Float, nullable=True)
+    pages = Column(Integer, nullable=False, default=0)
+    rows_fetched = Column(Integer, nullable=False, default=0)
+    rows_written = Column(Integer, nullable=False, default=0)
+    rows_skipped = Column(Integer, nullable=False, default=0)
+    api_calls = Column(Integer, nullable=False, default=0)
+    api_errors = Column(Integer, nullable=False, default=0)
+    api_seconds = Column(Float, nullable=False, default=0)  # Latence cumulée des appels API
+    watermark_ts = Column(BigInteger, nullable=True)  # Données couvertes jusqu'à ce timestamp
+    error = Column(Text, nullable=True)
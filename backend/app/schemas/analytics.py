@@ -0,0 +1,93 @@
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional
+from pydantic import BaseModel
+
+
+class DailyAnalyticsSchema(BaseModel):
+    org_id: str
+    date: date
+    total_drivers: int = 0
+    connected_drivers: int = 0
+    working_drivers: int = 0
+    total_vehicles: int = 0
+    active_vehicles: int = 0
+    total_orders: int = 0
+    completed_orders: int = 0
+    cancelled_orders: int = 0
+    total_gross_earnings: int = 0  # Centimes
+    total_net_earnings: int = 0
+    total_commission: int = 0
+    total_tips: int = 0
+    total_distance_km: float = 0
+    total_time_hours: float = 0
+    platform_breakdown: Optional[Dict[str, Any]] = None
+    computed_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+
+class UserAnalyticsSchema(BaseModel):
+    org_id: str
+    driver_uuid: str
+    date: date
+    platform: Optional[str] = None
+    total_orders: int = 0
+    completed_orders: int = 0
+    cancelled_orders: int = 0
+    gross_earnings: int = 0  # Centimes
+    net_earnings: int = 0
+    commission: int = 0
+    tips: int = 0
+    distance_km: float = 0
+    time_hours: float = 0
+    trips_per_hour: float = 0
+    hourly_earning: int = 0
+    income_score: Optional[int] = None
+    efficiency_score: Optional[int] = None
+    sustainability_score: Optional[int] = None
+    overall_score: Optional[int] = None
+    computed_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+
+class UserAnalyticsSummarySchema(BaseModel):
+    """Totaux d'un driver sur une période (somme des jours, ratios recalculés)."""
+    driver_uuid: str
+    platform: Optional[str] = None
+    days: int
+    total_orders: int
+    completed_orders: int
+    cancelled_orders: int
+    gross_earnings: int
+    net_earnings: int
+    commission: int
+    tips: int
+    distance_km: float
+    time_hours: float
+    trips_per_hour: float
+    hourly_earning: int
+
+
+class LeaderboardEntrySchema(BaseModel):
+    rank: int  # 1 = meilleur ; ex aequo au même rang
+    percentile: float  # Part des drivers avec un score inférieur ou égal, en %
+    driver_uuid: str
+    platform: str
+    income_score: int
+    efficiency_score: int
+    sustainability_score: int
+    overall_score: int
+    trips: int
+    net_earnings: float  # Euros
+    active_days: int
+
+
+class LeaderboardSchema(BaseModel):
+    total: int
+    offset: int
+    limit: int
+    sort: str
+    items: List[LeaderboardEntrySchema]
@@ -0,0 +1,43 @@
+from datetime import date
+from pydantic import BaseModel
+
+
+class BoltDriverActivityDailySchema(BaseModel):
+    id: str
+    org_id: str
+    driver_uuid: str
+    day: date
+    online_seconds: int
+    busy_seconds: int
+    waiting_seconds: int
+    idle_gap_seconds: int
+    idle_gaps: int
+    trips: int
+    on_trip_seconds: int
+    gross_earnings: float
+    net_earnings: float
+    distance_km: float
+    utilisation: float
+    trips_per_online_hour: float
+    earnings_per_online_hour: float
+
+    class Config:
+        from_attributes = True
+
+
+class BoltDriverActivitySummarySchema(BaseModel):
+    """Activité d'un driver agrégée sur une période (somme des jours, ratios recalculés)."""
+    driver_uuid: str
+    days: int
+    online_hours: float
+    busy_hours: float
+    waiting_hours: float
+    idle_gap_hours: float
+    on_trip_hours: float
+    trips: int
+    gross_earnings: float
+    net_earnings: float
+    distance_km: float
+    utilisation: float
+    trips_per_online_hour: float
+    earnings_per_online_hour: float
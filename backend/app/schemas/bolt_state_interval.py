@@ -0,0 +1,17 @@
+from typing import Optional
+from pydantic import BaseModel
+
+
+class BoltStateIntervalSchema(BaseModel):
+    id: str
+    org_id: str
+    driver_uuid: str
+    vehicle_uuid: Optional[str] = None
+    state: str
+    start_ts: int
+    end_ts: int
+    log_count: int
+    is_open: bool
+
+    class Config:
+        from_attributes = True
@@ -0,0 +1,71 @@
+from datetime import date
+
+import pytest
+
+pytest.importorskip("duckdb")
+
+from app.analytics import mirror as mirror_module
+from app.analytics.mirror import AnalyticsMirror, fleet_order_totals, rebuild_mirror
+from app.models.bolt_order import BoltOrder
+
+DAY = 1704103200  # 2024-01-01 10:00 UTC
+
+
+def order(ref, driver_uuid, ts, status="finished", **amounts):
+    return {"order_reference": ref, "org_id": "org", "driver_uuid": driver_uuid, "order_created_timestamp": ts,
+            "order_status": status, **amounts}
+
+
+def test_append_partitions_by_day_and_replaces_by_primary_key(tmp_path):
+    mirror = AnalyticsMirror(str(tmp_path))
+    assert mirror.append(BoltOrder, "org", [
+        order("o1", "d1", DAY, ride_price=20, net_earnings=15, ride_distance=4000),
+        order("o2", "d1", DAY + 86400, status="client_cancelled"),
+        order("o3", "d2", None),  # sans date de création : non partitionnable
+    ]) == {"rows": 2, "partitions": 2, "skipped": 1}
+    # Une sync ultérieure réécrit o1 (statut, montant) et ajoute o4 dans la même partition
+    mirror.append(BoltOrder, "org", [order("o1", "d1", DAY, ride_price=20, net_earnings=18), order("o4", "d2", DAY, ride_price=10, net_earnings=8)])
+
+    # Une page = un fichier par partition touchée, sans réécrire les lignes déjà présentes
+    partitions = tmp_path / "bolt_orders" / "org"
+    assert sorted(path.name for path in partitions.iterdir()) == ["2024-01-01", "2024-01-02"]
+    assert [len(list((partitions / day).iterdir())) for day in ("2024-01-01", "2024-01-02")] == [2, 1]
+    totals = fleet_order_totals(mirror, "org", DAY - 36000, DAY + 2 * 86400)
+    assert [(t["driver_uuid"], t["total_orders"], t["completed_orders"], t["cancelled_orders"], t["net_earnings"]) for t in totals] == [
+        ("d1", 2, 1, 1, 18), ("d2", 1, 1, 0, 8),
+    ]
+    assert fleet_order_totals(mirror, "other", DAY - 36000, DAY + 2 * 86400) == []
+
+
+def test_partition_is_compacted_once_it_has_too_many_parts(tmp_path, monkeypatch):
+    monkeypatch.setattr(mirror_module, "COMPACT_PARTS", 3)
+    mirror = AnalyticsMirror(str(tmp_path))
+    for net in (1, 2, 3, 4):
+        mirror.append(BoltOrder, "org", [order("o1", "d1", DAY, net_earnings=net), order(f"n{net}", "d1", DAY, net_earnings=0)])
+
+    partition = tmp_path / "bolt_orders" / "org" / "2024-01-01"
+    assert len(list(partition.glob("*.parquet"))) == 2  # 3 fichiers fusionnés, puis la 4e page
+    assert mirror.query("SELECT count(*) AS n, sum(net_earnings) AS net FROM bolt_orders") == [{"n": 5, "net": 4}]
+
+
+def test_rebuild_copies_each_table_and_empty_tables_are_queryable(tmp_path):
+    class FakeDB:
+        tables = {
+            "bolt_orders": [order("o1", "d1", DAY)],
+            "bolt_state_logs": [{"id": "d1_1", "org_id": "org", "driver_uuid": "d1", "created": DAY, "state": "busy",
+                                 "active_categories": [{"id": 1}]}],
+            "heetch_earnings": [{"id": "a@b.fr_2024-01-01_weekly", "org_id": "org", "driver_id": "a@b.fr", "date": "2024-01-01",
+                                 "period": "weekly", "net_earnings": 80.5}],
+        }
+
+        def fetch_rows(self, model, filters, page_size=1000, ranges=None):
+            (column, (low, high)), = ranges.items()
+            return [r for r in self.tables[model.__tablename__] if low <= r[column] < high]
+
+    mirror = AnalyticsMirror(str(tmp_path))
+    assert mirror.query("SELECT count(*) AS n FROM heetch_earnings") == [{"n": 0}]
+    assert rebuild_mirror(FakeDB(), mirror, "org", date(2024, 1, 1), date(2024, 1, 2)) == {
+        "bolt_orders": 1, "bolt_state_logs": 1, "heetch_earnings": 1,
+    }
+    assert mirror.query("SELECT active_categories FROM bolt_state_logs") == [{"active_categories": '[{"id": 1}]'}]
+    assert mirror.query("SELECT date, net_earnings FROM heetch_earnings") == [{"date": date(2024, 1, 1), "net_earnings": 80.5}]
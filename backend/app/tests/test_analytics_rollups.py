@@ -0,0 +1,139 @@
+from datetime import date
+from types import SimpleNamespace
+
+from app.analytics import rollups
+from app.analytics.rollups import bolt_order_cells, refresh_analytics_rollups
+from app.api.endpoints.analytics import summarize_user_analytics
+from app.models.bolt_driver import BoltDriver
+from app.models.bolt_order import BoltOrder
+from app.models.bolt_vehicle import BoltVehicle
+from app.models.heetch_driver import HeetchDriver
+from app.models.heetch_earning import HeetchEarning
+
+DAY = 1704103200  # 2024-01-01 10:00 UTC (11:00 à Paris)
+
+
+class FakeDB:
+    def __init__(self, **tables):
+        self.tables = {model.__tablename__: [] for model in (BoltOrder, HeetchEarning, BoltDriver, BoltVehicle, HeetchDriver)}
+        self.tables.update(tables)
+        self.upserts = {}
+
+    def fetch_rows(self, model, filters, page_size=1000, ranges=None):
+        rows = [r for r in self.tables.get(model.__tablename__, []) if all(r.get(k) == v for k, v in filters.items())]
+        for key, (low, high) in (ranges or {}).items():
+            rows = [r for r in rows if (low is None or r[key] >= low) and (high is None or r[key] < high)]
+        return rows
+
+    def bulk_upsert(self, model, rows, chunk_size=500, on_conflict=None):
+        table = {tuple(r[c] for c in on_conflict): r for r in self.tables.setdefault(model.__tablename__, [])}
+        table.update({tuple(r[c] for c in on_conflict): r for r in rows})
+        self.tables[model.__tablename__] = list(table.values())
+        self.upserts.setdefault(model.__tablename__, []).extend(rows)
+        return len(rows)
+
+    def count_rows(self, model, filters):
+        return len(self.fetch_rows(model, filters))
+
+    def delete_rows(self, model, ids):
+        self.tables[model.__tablename__] = [r for r in self.tables[model.__tablename__] if r.get("id") not in ids]
+        return len(ids)
+
+
+def order(ref, driver_uuid, ts, status="finished", plate="AA-123-BB", **prices):
+    return {"order_reference": ref, "org_id": "org", "driver_uuid": driver_uuid, "order_created_timestamp": ts,
+            "order_status": status, "vehicle_license_plate": plate, "ride_distance": 4000, **prices}
+
+
+def test_only_touched_cells_are_recomputed():
+    db = FakeDB(
+        bolt_orders=[
+            order("o1", "d1", DAY, ride_price=20, net_earnings=15, tip=1, commission=5,
+                  order_pickup_timestamp=DAY, order_drop_off_timestamp=DAY + 1800),
+            order("o2", "d1", DAY + 3600, status="client_cancelled", plate=None, net_earnings=0),
+            order("o3", "d2", DAY + 7200, plate="CC-456-DD", ride_price=10, net_earnings=8),
+            order("o4", "d1", DAY + 86400, ride_price=99, net_earnings=99),  # autre jour, non touché
+        ],
+        heetch_earnings=[{"org_id": "org", "driver_id": "a@b.fr", "date": "2024-01-01", "period": "weekly",
+                          "gross_earnings": 100, "net_earnings": 80, "terminated_rides": 6, "cancelled_rides": 1,
+                          "cash_commission_fees": 5, "card_commission_fees": 10}],
+        bolt_drivers=[{"org_id": "org", "id": "d1"}, {"org_id": "org", "id": "d2"}],
+        heetch_drivers=[{"org_id": "org", "id": "a@b.fr"}],
+        bolt_vehicles=[{"org_id": "org", "id": "v1"}],
+        # Commande d'un driver sur les 30 derniers jours : compté comme connecté
+        user_analytics=[{"org_id": "org", "driver_uuid": "d3", "date": "2023-12-20", "platform": "bolt", "total_orders": 2,
+                         "completed_orders": 2, "cancelled_orders": 0, "gross_earnings": 0, "net_earnings": 0,
+                         "commission": 0, "tips": 0, "distance_km": 0, "time_hours": 0}],
+    )
+
+    cells = bolt_order_cells([{"driver_uuid": "d1", "order_created_timestamp": DAY}, {"driver_uuid": "d2", "order_created_timestamp": DAY}])
+    cells.add(("heetch", "a@b.fr", date(2024, 1, 1)))
+    assert refresh_analytics_rollups(db, "org", cells) == {"cells": 3, "user_rows": 3, "deleted": 0, "scores": 3, "days": 1}
+
+    users = {(r["driver_uuid"], r["date"]): r for r in db.upserts["user_analytics"]}
+    assert set(users) == {("d1", "2024-01-01"), ("d2", "2024-01-01"), ("a@b.fr", "2024-01-01")}
+    d1 = users[("d1", "2024-01-01")]
+    assert (d1["total_orders"], d1["completed_orders"], d1["cancelled_orders"]) == (2, 1, 1)
+    assert (d1["gross_earnings"], d1["net_earnings"], d1["commission"], d1["tips"], d1["distance_km"]) == (2000, 1500, 500, 100, 8)
+    assert (d1["time_hours"], d1["trips_per_hour"], d1["hourly_earning"]) == (0.5, 4, 3000)
+    # 15 € nets sur 2 commandes dont 1 annulée, 1 jour actif
+    assert (d1["income_score"], d1["efficiency_score"], d1["sustainability_score"], d1["overall_score"]) == (50, 80, 2, 44)
+    heetch = users[("a@b.fr", "2024-01-01")]
+    assert (heetch["platform"], heetch["total_orders"], heetch["net_earnings"], heetch["commission"]) == ("heetch", 7, 8000, 1500)
+
+    daily = db.upserts["daily_analytics"][0]
+    assert (daily["date"], daily["total_orders"], daily["total_net_earnings"]) == ("2024-01-01", 10, 1500 + 800 + 8000)
+    assert (daily["total_drivers"], daily["working_drivers"], daily["connected_drivers"]) == (3, 3, 4)
+    assert (daily["total_vehicles"], daily["active_vehicles"]) == (1, 2)
+    assert daily["platform_breakdown"] == {"bolt": {"orders": 3, "earnings": 2300}, "heetch": {"orders": 7, "earnings": 8000}}
+
+
+def test_cells_and_scores_count_completed_orders_alike():
+    from app.analytics.scoring import order_features
+
+    orders = [order(ref, "d1", DAY + i * 60, status=status)
+              for i, (ref, status) in enumerate([("o1", "finished"), ("o2", "completed"), ("o3", "client_cancelled")])]
+
+    row = rollups._bolt_user_row("org", "d1", date(2024, 1, 1), orders)
+    _, features = order_features(orders)
+    assert row["completed_orders"] == features["completed"][0] == 1
+
+
+def test_cells_without_source_rows_are_deleted():
+    def user_row(row_id, driver_uuid, day, platform="bolt"):
+        return {"id": row_id, "org_id": "org", "driver_uuid": driver_uuid, "date": day, "platform": platform, "total_orders": 1,
+                "completed_orders": 1, "cancelled_orders": 0, "gross_earnings": 100, "net_earnings": 100,
+                "commission": 0, "tips": 0, "distance_km": 0, "time_hours": 0}
+
+    db = FakeDB(
+        bolt_orders=[order("o1", "d1", DAY, ride_price=20, net_earnings=15)],
+        user_analytics=[
+            user_row("u1", "d1", "2024-01-01"),
+            user_row("u2", "d2", "2024-01-01"),  # commande réattribuée à d1 : cellule à supprimer
+            user_row("u3", "a@b.fr", "2024-01-01", platform="heetch"),  # plateforme non touchée : gardée
+            user_row("u4", "d2", "2023-12-31"),  # jour non touché : gardée
+        ],
+    )
+
+    result = refresh_analytics_rollups(db, "org", bolt_order_cells([{"driver_uuid": "d1", "order_created_timestamp": DAY}]))
+
+    assert (result["cells"], result["deleted"]) == (2, 1)
+    assert sorted((r["driver_uuid"], r["date"]) for r in db.tables["user_analytics"]) == [
+        ("a@b.fr", "2024-01-01"), ("d1", "2024-01-01"), ("d2", "2023-12-31"),
+    ]
+    daily = db.upserts["daily_analytics"][0]
+    assert daily["platform_breakdown"] == {"bolt": {"orders": 1, "earnings": 1500}, "heetch": {"orders": 1, "earnings": 100}}
+
+
+def test_day_runs_and_summary():
+    assert rollups._day_runs([date(2024, 1, 1), date(2024, 1, 2), date(2024, 1, 5)]) == [
+        (date(2024, 1, 1), date(2024, 1, 2)), (date(2024, 1, 5), date(2024, 1, 5)),
+    ]
+    rows = [
+        SimpleNamespace(driver_uuid="d1", platform="bolt", total_orders=4, completed_orders=4, cancelled_orders=0,
+                        gross_earnings=4000, net_earnings=3000, commission=1000, tips=0, distance_km=10, time_hours=1),
+        SimpleNamespace(driver_uuid="d1", platform="bolt", total_orders=2, completed_orders=1, cancelled_orders=1,
+                        gross_earnings=1000, net_earnings=1000, commission=0, tips=0, distance_km=5, time_hours=1),
+    ]
+    summary = summarize_user_analytics(rows)[0]
+    assert (summary["days"], summary["total_orders"], summary["trips_per_hour"], summary["hourly_earning"]) == (2, 6, 3, 2000)
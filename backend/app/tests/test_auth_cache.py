@@ -0,0 +1,116 @@
+import time
+
+import pytest
+from fastapi import HTTPException
+
+from app.api import deps
+from app.bolt_integration import services_orgs
+from app.core.auth_cache import TOKEN_CACHE_REQUESTS, OrgContextCache, VerifiedTokenCache, org_context_cache, token_cache
+from app.core.security import create_access_token
+from app.models.bolt_org import BoltOrganization
+
+
+class CountingDecode:
+    def __init__(self, payload):
+        self.payload = payload
+        self.calls = 0
+
+    def __call__(self, token):
+        self.calls += 1
+        return self.payload
+
+
+class FakeQuery:
+    def __init__(self, db):
+        self.db = db
+
+    def filter(self, *_):
+        return self
+
+    def all(self):
+        self.db.reads += 1
+        return self.db.rows
+
+
+class FakeDB:
+    def __init__(self, rows):
+        self.rows = rows
+        self.reads = 0
+
+    def query(self, _model):
+        return FakeQuery(self)
+
+
+def _hits():
+    return TOKEN_CACHE_REQUESTS.labels("hit")._value.get()
+
+
+def test_cached_token_skips_decode(monkeypatch):
+    token_cache.clear()
+    decode = CountingDecode({"sub": "a@b.fr", "org_id": "orgA", "exp": time.time() + 60})
+    monkeypatch.setattr(deps, "decode_token", decode)
+    hits = _hits()
+
+    first = deps.get_current_user("tok")
+    first["org_id"] = "modifié"
+    second = deps.get_current_user("tok")
+
+    assert decode.calls == 1
+    assert second == {"email": "a@b.fr", "org_id": "orgA"}
+    assert _hits() == hits + 1
+    token_cache.clear()
+
+
+def test_invalid_tokens_are_not_cached(monkeypatch):
+    token_cache.clear()
+    decode = CountingDecode({"org_id": "orgA", "exp": time.time() + 60})
+    monkeypatch.setattr(deps, "decode_token", decode)
+    for _ in range(2):
+        with pytest.raises(HTTPException):
+            deps.get_current_user("tok")
+    assert decode.calls == 2
+
+
+def test_real_token_is_cached_until_exp():
+    token_cache.clear()
+    token = create_access_token({"sub": "a@b.fr", "org_id": "orgA"})
+    assert deps.get_current_user(token) == {"email": "a@b.fr", "org_id": "orgA"}
+    assert token_cache.get(token) is not None
+    assert token_cache.get(token, now=time.time() + 2 * 3600) is None
+    assert token_cache.get(token) is None
+    token_cache.clear()
+
+
+def test_lru_eviction_and_tokens_without_exp():
+    cache = VerifiedTokenCache(max_size=2)
+    exp = time.time() + 60
+    cache.put("a", {"email": "a"}, exp)
+    cache.put("b", {"email": "b"}, exp)
+    assert cache.get("a") == {"email": "a"}  # "b" devient le moins récemment utilisé
+    cache.put("c", {"email": "c"}, exp)
+    cache.put("d", {"email": "d"}, None)
+    assert cache.get("b") is None
+    assert cache.get("d") is None
+    assert cache.get("a") and cache.get("c")
+
+
+def test_company_ids_cached_per_org_and_invalidated():
+    org_context_cache.invalidate()
+    db = FakeDB([BoltOrganization(id="22", org_id="orgX")])
+    assert services_orgs.get_company_ids(db, "orgX") == ["22"]
+    db.rows = [BoltOrganization(id="22", org_id="orgX"), BoltOrganization(id="11", org_id="orgX")]
+    assert services_orgs.get_company_ids(db, "orgX") == ["22"]
+    assert db.reads == 1
+
+    org_context_cache.invalidate("orgX")
+    assert services_orgs.get_company_ids(db, "orgX") == ["11", "22"]
+    assert db.reads == 2
+    org_context_cache.invalidate()
+
+
+def test_org_context_expires_after_ttl():
+    cache = OrgContextCache(ttl_seconds=0)
+    loads = []
+    cache.get_or_load("orgA", "k", lambda: loads.append(1))
+    cache.get_or_load("orgA", "k", lambda: loads.append(1))
+    assert len(loads) == 2
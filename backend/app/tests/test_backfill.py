@@ -0,0 +1,140 @@
+import calendar
+import threading
+
+import pytest
+
+from app.bolt_integration import backfill
+from app.bolt_integration.backfill import BackfillCell, BackfillManifest, BackfillStore, run_backfill
+from app.bolt_integration.window_planner import DensityStore
+from app.jobs import leases
+from app.jobs.leases import LeaseBusy, LocalLeaseBackend, lease_key
+
+
+class FakeDB:
+    """Tables bolt_backfills / bolt_backfill_cells en mémoire (partagées entre instances, comme la base)."""
+
+    def __init__(self):
+        self.tables = {}
+        self.upserts = []
+
+    def __call__(self):
+        return self
+
+    def bulk_upsert(self, model, rows, **_):
+        self.upserts.append((model.__tablename__, len(rows)))
+        table = self.tables.setdefault(model.__tablename__, {})
+        for row in rows:
+            table[row["id"]] = dict(row)
+        return len(rows)
+
+    def fetch_rows(self, model, filters, **_):
+        rows = self.tables.get(model.__tablename__, {}).values()
+        return [dict(row) for row in rows if all(row[key] == value for key, value in filters.items())]
+
+    def commit(self):
+        pass
+
+
+@pytest.fixture
+def backfill_db(tmp_path, monkeypatch):
+    db = FakeDB()
+    monkeypatch.setattr(backfill, "backfill_store", BackfillStore(db_factory=db))
+    monkeypatch.setattr(backfill, "density_store", DensityStore(tmp_path / "density.json"))
+    monkeypatch.setattr(backfill, "BoltClient", lambda: object())
+    monkeypatch.setattr(leases, "_backend", LocalLeaseBackend())
+    return db
+
+
+def _manifest(cells: int) -> BackfillManifest:
+    manifest = BackfillManifest(id="test", org_id="org", start_ts=0, end_ts=cells * 86400)
+    manifest.cells = [
+        BackfillCell(stream="orders", company_id="1", start_ts=i * 86400, end_ts=(i + 1) * 86400, position=i)
+        for i in range(cells)
+    ]
+    return manifest
+
+
+def test_backfill_runs_cells_in_parallel_and_persists(backfill_db, monkeypatch):
+    barrier = threading.Barrier(3, timeout=5)
+
+    def fake_sync(**kwargs):
+        barrier.wait()  # Bloque tant que 3 cellules ne tournent pas simultanément
+        return {"pages": 1, "fetched": 10}
+
+    monkeypatch.setitem(backfill.BACKFILL_STREAMS, "orders", fake_sync)
+    progress = run_backfill(_manifest(3), db=None, max_workers=3)
+
+    assert progress["done"] == 3 and progress["rows"] == 30
+    reloaded = BackfillManifest.load("test")
+    assert all(cell.status == "done" for cell in reloaded.cells)
+
+
+def test_resume_retries_only_failed_cells(backfill_db, monkeypatch):
+    calls = []
+    fail_once = {86400}
+
+    def flaky_sync(start, **kwargs):
+        start_ts = calendar.timegm(start.utctimetuple())
+        calls.append(start_ts)
+        if start_ts in fail_once:
+            fail_once.discard(start_ts)
+            raise RuntimeError("Bolt API error: boom")
+        return {"pages": 1, "fetched": 5}
+
+    monkeypatch.setitem(backfill.BACKFILL_STREAMS, "orders", flaky_sync)
+    first = run_backfill(_manifest(3), db=None, max_workers=2)
+    assert first["done"] == 2 and first["failed"] == 1
+
+    calls.clear()
+    resumed = run_backfill(BackfillManifest.load("test"), db=None, max_workers=2)
+    assert calls == [86400]
+    assert resumed["done"] == 3 and resumed["failed"] == 0
+
+
+def test_failed_cells_are_kept_without_retry(backfill_db, monkeypatch):
+    manifest = _manifest(2)
+    manifest.cells[0].status = "done"
+    manifest.cells[1].status = "failed"
+    calls = []
+    monkeypatch.setitem(backfill.BACKFILL_STREAMS, "orders", lambda **kwargs: calls.append(1))
+
+    progress = run_backfill(manifest, db=None, retry_failed=False)
+
+    assert calls == []
+    assert progress["failed"] == 1 and progress["done"] == 1
+
+
+def test_manifest_is_shared_through_the_database(backfill_db, monkeypatch):
+    monkeypatch.setitem(backfill.BACKFILL_STREAMS, "orders", lambda **kwargs: {"pages": 2, "fetched": 7})
+    _manifest(2).save()
+
+    # Le worker recharge le manifeste créé par l'API, l'API relit l'avancement écrit par le worker
+    run_backfill(BackfillManifest.load("test"), db=None, max_workers=1)
+    [listed] = BackfillManifest.list_for_org("org")
+
+    assert listed.progress()["done"] == 2 and listed.progress()["rows"] == 14
+    assert [cell.position for cell in listed.cells] == [0, 1]
+    # Une cellule terminée n'écrit qu'elle-même
+    assert backfill_db.upserts[-1] == ("bolt_backfill_cells", 1)
+    with pytest.raises(LookupError):
+        BackfillManifest.load("missing")
+
+
+def test_cells_wait_for_the_stream_lease(backfill_db, monkeypatch):
+    calls = []
+    monkeypatch.setitem(backfill.BACKFILL_STREAMS, "orders", lambda **kwargs: calls.append("orders") or {"pages": 1, "fetched": 1})
+    monkeypatch.setitem(backfill.BACKFILL_STREAMS, "state_logs", lambda **kwargs: calls.append("state_logs") or {"pages": 1, "fetched": 1})
+    manifest = _manifest(2)
+    manifest.cells[1].stream = "state_logs"
+    # Sync lourde des state logs en cours dans un autre process
+    leases.get_lease_backend().acquire(lease_key("org", "bolt_state_logs"), "other-process", 60)
+
+    with pytest.raises(LeaseBusy):
+        run_backfill(manifest, db=None)
+
+    assert calls == ["orders"]
+    assert [cell.status for cell in BackfillManifest.load("test").cells] == ["done", "pending"]
+
+    leases.get_lease_backend().release(lease_key("org", "bolt_state_logs"), "other-process")
+    assert run_backfill(BackfillManifest.load("test"), db=None)["done"] == 2
+    assert calls == ["orders", "state_logs"]
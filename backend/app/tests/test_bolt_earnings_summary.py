@@ -0,0 +1,54 @@
+from datetime import datetime, timezone
+
+from app.api.endpoints.bolt_driver_earnings import get_bolt_earnings_summary
+from app.models.bolt_driver import BoltDriver
+from app.models.bolt_order import BoltOrder
+
+DAY = 1704103200  # 2024-01-01 10:00 UTC
+
+
+class FakeDB:
+    def __init__(self, orders, drivers):
+        self.tables = {BoltOrder.__tablename__: orders, BoltDriver.__tablename__: drivers}
+        self.calls = []
+
+    def fetch_rows(self, model, filters, page_size=1000, ranges=None, columns=None):
+        self.calls.append(model.__tablename__)
+        rows = [r for r in self.tables[model.__tablename__] if all(r.get(k) == v for k, v in filters.items())]
+        for key, (low, high) in (ranges or {}).items():
+            rows = [r for r in rows if low <= r[key] < high]
+        return [{c: r.get(c) for c in columns} if columns else r for r in rows]
+
+
+def order(driver_uuid, ts, status="finished", **amounts):
+    return {"org_id": "org", "driver_uuid": driver_uuid, "driver_name": None, "order_created_timestamp": ts,
+            "order_status": status, **amounts}
+
+
+def test_summary_covers_every_driver_in_one_pass():
+    db = FakeDB(
+        orders=[
+            order("d1", DAY, ride_price=20, net_earnings=15, commission=5, tip=2, ride_distance=4000),
+            order("d1", DAY + 60, status="client_cancelled", cancellation_fee=5, net_earnings=4),
+            order("d2", DAY, ride_price=10, net_earnings=8),
+            order("d2", DAY + 40 * 86400, ride_price=99, net_earnings=99),  # hors période
+            {**order("d3", DAY, net_earnings=50), "org_id": "other"},
+        ],
+        drivers=[
+            {"org_id": "org", "id": "d1", "first_name": "Ana", "last_name": "B"},
+            {"org_id": "org", "id": "d2", "first_name": None, "last_name": None},
+            {"org_id": "org", "id": "d4", "first_name": "Sans", "last_name": "Course"},
+        ],
+    )
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    end = datetime(2024, 1, 31, tzinfo=timezone.utc)
+    summaries = get_bolt_earnings_summary(current_user={"org_id": "org"}, db=db, start=start, end=end)
+
+    assert db.calls == ["bolt_orders", "bolt_drivers"]
+    assert [s.driver_uuid for s in summaries] == ["d1", "d2", "d4"]
+    d1 = summaries[0]
+    assert (d1.driver_name, d1.total_orders, d1.completed_orders, d1.cancelled_orders) == ("Ana B", 2, 1, 1)
+    assert (d1.total_net_earnings, d1.total_commission, d1.total_tip, d1.total_cancellation_fee) == (19, 5, 2, 5)
+    assert (d1.total_distance, d1.average_order_value, d1.average_net_earnings_per_order) == (4000, 10, 9.5)
+    assert (summaries[1].driver_name, summaries[1].total_net_earnings) == (None, 8)
+    assert (summaries[2].driver_name, summaries[2].total_orders, summaries[2].average_order_value) == ("Sans Course", 0, 0)
@@ -0,0 +1,96 @@
+import threading
+import time
+
+from app.bolt_integration import services_orgs, services_sync_all
+from app.bolt_integration.services_sync_all import _aggregate_status, run_for_companies
+from app.core.rate_limit import RateLimiter
+from app.models.bolt_org import BoltOrganization
+
+
+class FakeQuery:
+    def __init__(self, data):
+        self.data = data
+
+    def filter(self, *_):
+        return self
+
+    def all(self):
+        return self.data
+
+
+class FakeDB:
+    def __init__(self, payload):
+        self.payload = payload
+
+    def query(self, _model):
+        return FakeQuery(self.payload)
+
+
+def test_get_company_ids_returns_all_companies_of_org():
+    db = FakeDB([BoltOrganization(id="22", org_id="orgA"), BoltOrganization(id="11", org_id="orgA")])
+    assert services_orgs.get_company_ids(db, "orgA") == ["11", "22"]
+    assert services_orgs.get_company_ids(db, "orgA", company_id="33") == ["33"]
+
+
+def test_run_for_companies_runs_in_parallel_and_collects_errors():
+    running = []
+    peak = []
+    lock = threading.Lock()
+
+    def work(cid):
+        with lock:
+            running.append(cid)
+            peak.append(len(running))
+        time.sleep(0.05)
+        with lock:
+            running.remove(cid)
+        if cid == "bad":
+            raise RuntimeError("boom")
+        return cid.upper()
+
+    results = run_for_companies(["a", "b", "c", "bad"], work, max_workers=2)
+    assert max(peak) == 2
+    assert results["a"] == {"status": "success", "result": "A", "error": None}
+    assert results["bad"]["status"] == "error"
+    assert results["bad"]["error"] == "boom"
+
+
+def test_aggregate_status():
+    assert _aggregate_status(["success", "success"]) == "success"
+    assert _aggregate_status(["success", "error"]) == "partial"
+    assert _aggregate_status(["error"]) == "error"
+
+
+def test_rate_limiter_limits_throughput():
+    limiter = RateLimiter(rate_per_second=50, burst=1)
+    started = time.monotonic()
+    for _ in range(6):
+        limiter.acquire()
+    assert time.monotonic() - started >= 0.09
+
+
+def test_sync_all_syncs_drivers_once_for_the_whole_org(monkeypatch):
+    calls = []
+    monkeypatch.setattr(services_sync_all, "BoltClient", lambda: object())
+    monkeypatch.setattr(services_sync_all, "sync_orgs", lambda *args, **kwargs: None)
+    monkeypatch.setattr(services_sync_all, "get_company_ids", lambda db, org_id, company_id=None: ["1", "2"])
+    monkeypatch.setattr(services_sync_all, "sync_drivers", lambda db, client, company_id=None, org_id=None: calls.append(("drivers", company_id)))
+    for name in ("sync_vehicles", "sync_trips", "sync_state_logs"):
+        monkeypatch.setattr(services_sync_all, name, lambda *args, company_id=None, **kwargs: calls.append(("other", company_id)))
+
+    class CountDB:
+        def query(self, model):
+            return self
+
+        def filter(self, *_):
+            return self
+
+        def count(self):
+            return 0
+
+    results = services_sync_all.sync_all_bolt_data(CountDB(), "org")
+
+    # Un seul passage drivers sans company_id (référentiel complet : départs détectés)
+    assert [call for call in calls if call[0] == "drivers"] == [("drivers", None)]
+    assert results["drivers"]["status"] == "success"
+    assert sorted(call for call in calls if call[0] == "other") == [("other", "1")] * 3 + [("other", "2")] * 3
@@ -0,0 +1,131 @@
+from app.heetch_integration.browser_pool import BrowserPool, should_block
+
+
+class FakePage:
+    def __init__(self, context):
+        self.context = context
+
+    async def close(self):
+        self.context.pages.remove(self)
+
+
+class FakeContext:
+    def __init__(self, options):
+        self.options = options
+        self.pages = []
+        self.cookies = []
+        self.routes = []
+        self.closed = False
+
+    async def route(self, pattern, handler):
+        self.routes.append(pattern)
+
+    async def add_cookies(self, cookies):
+        self.cookies.extend(cookies)
+
+    async def new_page(self):
+        page = FakePage(self)
+        self.pages.append(page)
+        return page
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeBrowser:
+    def __init__(self):
+        self.contexts = []
+        self.closed = False
+
+    def is_connected(self):
+        return not self.closed
+
+    async def new_context(self, **options):
+        context = FakeContext(options)
+        self.contexts.append(context)
+        return context
+
+    async def close(self):
+        self.closed = True
+
+
+def make_pool(**kwargs):
+    launched = []
+
+    async def launcher():
+        launched.append(FakeBrowser())
+        return launched[-1]
+
+    return BrowserPool(launcher=launcher, **kwargs), launched
+
+
+def test_should_block_assets_and_analytics_but_not_captcha():
+    assert should_block("https://driver.heetch.com/logo.png", "image")
+    assert should_block("https://fonts.gstatic.com/roboto.woff2", "font")
+    assert should_block("https://www.google-analytics.com/collect", "xhr")
+    assert not should_block("https://www.google.com/recaptcha/api2/payload?id=1", "image")
+    assert not should_block("https://auth.heetch.com/", "document")
+
+
+def test_contexts_are_reused_per_session_on_one_browser():
+    pool, launched = make_pool(max_contexts=4, idle_seconds=900)
+    try:
+        first = pool.run(pool.acquire_context, "orgA:+33600000000", [{"name": "sid", "value": "1"}])
+        pool.run(first.new_page)
+        again = pool.run(pool.acquire_context, "orgA:+33600000000")
+        other = pool.run(pool.acquire_context, "orgB:+33600000000")
+    finally:
+        pool.shutdown()
+
+    assert again is first and other is not first
+    assert len(launched) == 1
+    assert first.pages == []  # page de la connexion précédente fermée
+    assert first.cookies == [{"name": "sid", "value": "1"}]
+    assert first.routes == ["**/*"]
+    assert first.closed and other.closed and launched[0].closed
+
+
+def test_least_recently_used_context_is_closed_when_pool_is_full():
+    pool, _ = make_pool(max_contexts=2, idle_seconds=900)
+    try:
+        a = pool.run(pool.acquire_context, "a")
+        b = pool.run(pool.acquire_context, "b")
+        pool.run(pool.release, "b")
+        pool.run(pool.acquire_context, "a")
+        pool.run(pool.release, "a")
+        pool.run(pool.acquire_context, "c")
+        assert b.closed and not a.closed
+    finally:
+        pool.shutdown()
+
+
+def test_idle_contexts_and_browser_are_evicted():
+    pool, launched = make_pool(max_contexts=2, idle_seconds=60)
+    try:
+        context = pool.run(pool.acquire_context, "a")
+        pool.run(pool.release, "a")
+        assert pool.run(pool.evict_idle) == 0
+        assert pool.run(pool.evict_idle, now=10**9) == 1
+        assert context.closed and launched[0].closed
+
+        pool.run(pool.acquire_context, "a")
+        assert len(launched) == 2
+    finally:
+        pool.shutdown()
+
+
+def test_contexts_in_use_are_never_evicted():
+    pool, launched = make_pool(max_contexts=1, idle_seconds=60)
+    try:
+        login = pool.run(pool.acquire_context, "a")  # connexion en cours (entre start_login et complete_login)
+        other = pool.run(pool.acquire_context, "b")
+        assert not login.closed and not other.closed
+
+        assert pool.run(pool.evict_idle, now=10**9) == 0
+        assert not login.closed and not launched[0].closed
+
+        pool.run(pool.release, "a")
+        assert pool.run(pool.evict_idle, now=10**9) == 1
+        assert login.closed and not other.closed
+    finally:
+        pool.shutdown()
@@ -0,0 +1,77 @@
+import json
+
+import pytest
+from fastapi import FastAPI, Response
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from fastapi.testclient import TestClient
+
+from app.api.responses import trusted_response
+from app.core import compression
+from app.core.compression import CompressionMiddleware, negotiate_encoding
+from app.schemas.bolt_order import BoltOrderSchema
+
+
+def make_client():
+    app = FastAPI(default_response_class=ORJSONResponse)
+    app.add_middleware(CompressionMiddleware, minimum_size=100)
+
+    @app.get("/big")
+    def big():
+        return [{"id": i, "state": "waiting_orders"} for i in range(200)]
+
+    @app.get("/small")
+    def small():
+        return {"ok": True}
+
+    @app.get("/stream")
+    def stream():
+        return StreamingResponse(iter([b"a" * 500, b"b" * 500]), media_type="application/x-ndjson")
+
+    @app.get("/events")
+    def events():
+        return StreamingResponse(iter([b"event: progress\ndata: {}\n\n" * 10]), media_type="text/event-stream")
+
+    return TestClient(app)
+
+
+def test_large_and_streamed_responses_are_gzipped(monkeypatch):
+    monkeypatch.setattr(compression, "brotli", None)
+    client = make_client()
+
+    response = client.get("/big", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip" and response.headers["vary"] == "Accept-Encoding"
+    assert int(response.headers["content-length"]) < 1000
+    assert response.json()[199] == {"id": 199, "state": "waiting_orders"}
+
+    streamed = client.get("/stream", headers={"Accept-Encoding": "gzip"})
+    assert streamed.headers["content-encoding"] == "gzip" and streamed.content == b"a" * 500 + b"b" * 500
+
+    assert "content-encoding" not in client.get("/small", headers={"Accept-Encoding": "gzip"}).headers
+    assert "content-encoding" not in client.get("/events", headers={"Accept-Encoding": "gzip"}).headers
+    assert "content-encoding" not in client.get("/big", headers={"Accept-Encoding": "identity"}).headers
+
+
+def test_encoding_negotiation(monkeypatch):
+    monkeypatch.setattr(compression, "brotli", None)
+    assert negotiate_encoding("gzip, deflate, br") == "gzip"
+    assert negotiate_encoding("gzip;q=0, deflate") is None
+    monkeypatch.setattr(compression, "brotli", object())
+    assert negotiate_encoding("gzip, deflate, br") == "br"
+
+
+def test_trusted_response_projects_rows_on_schema():
+    response = Response()
+    response.headers["ETag"] = 'W/"v1"'
+    rows = [{"order_reference": "o1", "org_id": "org", "ride_price": 12.5, "order_stops": [{"lat": 1}], "extra": "x"}]
+    trusted = trusted_response(rows, BoltOrderSchema, response)
+    body = trusted.body.decode()
+    assert trusted.headers["etag"] == 'W/"v1"'
+    assert '"extra"' not in body and '"ride_price":12.5' in body and '"currency":"EUR"' in body and '"tip":0' in body
+    assert list(BoltOrderSchema.model_fields) == list(json.loads(body)[0])
+
+
+def test_brotli_when_installed():
+    pytest.importorskip("brotli")
+    response = make_client().get("/stream", headers={"Accept-Encoding": "br, gzip"})
+    # httpx décode br lorsque le module brotli est installé
+    assert response.headers["content-encoding"] == "br" and response.content == b"a" * 500 + b"b" * 500
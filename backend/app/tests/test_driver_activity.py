@@ -0,0 +1,107 @@
+import contextlib
+from datetime import date
+from types import SimpleNamespace
+from zoneinfo import ZoneInfo
+
+from app.analytics import driver_activity
+from app.analytics.driver_activity import compute_driver_activity, day_bounds
+from app.api.endpoints.bolt_driver_activity import summarize_activity
+
+UTC = ZoneInfo("UTC")
+DAY = 1704067200  # 2024-01-01 00:00 UTC
+H = 3600
+
+
+def interval(driver_uuid, state, start, end):
+    return {"driver_uuid": driver_uuid, "state": state, "start_ts": DAY + int(start * H), "end_ts": DAY + int(end * H)}
+
+
+def test_activity_per_driver_and_day():
+    intervals = [
+        interval("d1", "waiting_orders", 8, 9),
+        interval("d1", "has_order", 9, 9.5),
+        interval("d1", "inactive", 9.5, 10),  # pause entre deux périodes en ligne
+        interval("d1", "waiting_orders", 10, 10.5),
+        interval("d1", "waiting_orders", 23.5, 24.5),  # à cheval sur minuit
+        interval("d2", "busy", 12, 14),
+    ]
+    orders = [{
+        "driver_uuid": "d1", "order_status": "finished", "order_created_timestamp": DAY + 9 * H,
+        "order_finished_timestamp": DAY + int(9.4 * H), "order_pickup_timestamp": DAY + int(9.1 * H),
+        "order_drop_off_timestamp": DAY + int(9.4 * H), "ride_price": 20, "net_earnings": 15, "tip": 2,
+        "cancellation_fee": 0, "ride_distance": 5000,
+    }, {
+        "driver_uuid": "d2", "order_status": "client_cancelled", "order_created_timestamp": DAY + 13 * H,
+        "ride_price": 0, "net_earnings": 0, "tip": 0, "cancellation_fee": 5,
+    }]
+
+    rows = {row["id"]: row for row in compute_driver_activity("org", intervals, orders, date(2024, 1, 1), date(2024, 1, 2), UTC)}
+    assert set(rows) == {"d1_2024-01-01", "d1_2024-01-02", "d2_2024-01-01"}
+
+    d1 = rows["d1_2024-01-01"]
+    assert (d1["online_seconds"], d1["busy_seconds"], d1["waiting_seconds"]) == (2.5 * H, 0.5 * H, 2 * H)
+    assert (d1["idle_gaps"], d1["idle_gap_seconds"]) == (1, 0.5 * H)
+    assert (d1["trips"], d1["gross_earnings"], d1["net_earnings"], d1["distance_km"]) == (1, 22, 17, 5)
+    assert d1["on_trip_seconds"] == int(0.3 * H)
+    assert d1["utilisation"] == 20 and d1["trips_per_online_hour"] == 0.4 and d1["earnings_per_online_hour"] == 6.8
+    assert rows["d1_2024-01-02"]["online_seconds"] == 0.5 * H
+
+    d2 = rows["d2_2024-01-01"]
+    assert (d2["busy_seconds"], d2["trips"], d2["net_earnings"], d2["utilisation"]) == (2 * H, 0, 5, 100)
+
+
+def test_day_bounds_follow_dst():
+    bounds = day_bounds(date(2024, 3, 30), date(2024, 3, 31), ZoneInfo("Europe/Paris"))
+    # Passage à l'heure d'été le 31 mars : journée de 23 heures
+    assert list(bounds[1:] - bounds[:-1]) == [24 * H, 23 * H]
+
+
+def test_summary_recomputes_ratios_from_totals():
+    days = [
+        SimpleNamespace(driver_uuid="d1", online_seconds=2 * H, busy_seconds=H, waiting_seconds=H, idle_gap_seconds=0,
+                        on_trip_seconds=H, trips=2, gross_earnings=30, net_earnings=20, distance_km=10),
+        SimpleNamespace(driver_uuid="d1", online_seconds=2 * H, busy_seconds=0, waiting_seconds=2 * H, idle_gap_seconds=0,
+                        on_trip_seconds=0, trips=0, gross_earnings=0, net_earnings=0, distance_km=0),
+    ]
+    summary = summarize_activity(days)[0]
+    assert (summary["days"], summary["online_hours"], summary["utilisation"]) == (2, 4, 25)
+    assert (summary["trips_per_online_hour"], summary["earnings_per_online_hour"]) == (0.5, 5)
+
+
+class FakeDB:
+    def __init__(self, tables):
+        self.tables = tables
+
+    def fetch_rows(self, model, filters, ranges=None, in_filters=None, **_):
+        rows = [r for r in self.tables.get(model.__tablename__, {}).values() if all(r[k] == v for k, v in filters.items())]
+        for key, values in (in_filters or {}).items():
+            rows = [r for r in rows if r[key] in values]
+        for key, (low, high) in (ranges or {}).items():
+            rows = [r for r in rows if (low is None or r[key] >= low) and (high is None or r[key] < high)]
+        return rows
+
+    def bulk_upsert(self, model, rows, **_):
+        self.tables.setdefault(model.__tablename__, {}).update({row["id"]: dict(row) for row in rows})
+        return len(rows)
+
+    def delete_rows(self, model, ids, **_):
+        for row_id in ids:
+            self.tables[model.__tablename__].pop(row_id)
+        return len(ids)
+
+
+def test_refresh_only_touches_given_drivers(monkeypatch):
+    monkeypatch.setattr(driver_activity.settings, "analytics_timezone", "UTC")
+    monkeypatch.setattr(driver_activity, "serialized", lambda *args: contextlib.nullcontext())
+    d1_interval = {"id": "i1", "org_id": "org", **interval("d1", "busy", 8, 9)}
+    other_company = {"id": "d2_2024-01-01", "org_id": "org", "driver_uuid": "d2", "day": "2024-01-01", "online_seconds": H}
+    stale = {"id": "d1_2024-01-02", "org_id": "org", "driver_uuid": "d1", "day": "2024-01-02", "online_seconds": H}
+    db = FakeDB({
+        "bolt_state_intervals": {"i1": d1_interval},
+        "bolt_driver_activity_daily": {row["id"]: row for row in (other_company, stale)},
+    })
+
+    result = driver_activity.refresh_driver_activity(db, "org", DAY, DAY + 36 * H, driver_uuids=["d1"])
+
+    assert (result["drivers"], result["days"], result["rows"]) == (1, 2, 1)
+    assert set(db.tables["bolt_driver_activity_daily"]) == {"d1_2024-01-01", "d2_2024-01-01"}
@@ -0,0 +1,96 @@
+import gzip
+import json
+import re
+
+import pytest
+from fastapi import HTTPException
+
+from app.core import exports
+from app.core.exports import encode_rows, export_columns, gzip_chunks
+from app.core.supabase_db import SupabaseDB
+from app.models.bolt_state_log import BoltStateLog
+
+
+class FakeQuery:
+    """Sous-ensemble du query builder postgrest (eq, gte, lt, gt, or_ keyset, order, limit)."""
+
+    def __init__(self, table):
+        self.table, self.rows, self.orders, self.size = table, list(table.rows), [], None
+
+    def select(self, columns):
+        self.table.selects.append(columns)
+        return self
+
+    def eq(self, column, value):
+        self.rows = [r for r in self.rows if r[column] == value]
+        return self
+
+    def gte(self, column, value):
+        self.rows = [r for r in self.rows if r[column] >= value]
+        return self
+
+    def lt(self, column, value):
+        self.rows = [r for r in self.rows if r[column] < value]
+        return self
+
+    def gt(self, column, value):
+        self.rows = [r for r in self.rows if r[column] > value]
+        return self
+
+    def or_(self, expression):
+        column, value, _, _, key_column, key = re.fullmatch(r'(\w+)\.gt\.(\d+),and\((\w+)\.eq\.(\d+),(\w+)\.gt\."(.*)"\)', expression).groups()
+        self.rows = [r for r in self.rows if (r[column], r[key_column]) > (int(value), key)]
+        return self
+
+    def order(self, column):
+        self.orders.append(column)
+        return self
+
+    def limit(self, size):
+        self.size = size
+        return self
+
+    def execute(self):
+        self.table.pages += 1
+        rows = sorted(self.rows, key=lambda r: tuple(r[c] for c in self.orders))
+        return type("Response", (), {"data": rows[:self.size]})
+
+
+class FakeTable:
+    def __init__(self, rows):
+        self.rows, self.pages, self.selects = rows, 0, []
+
+    def select(self, columns):
+        return FakeQuery(self).select(columns)
+
+
+def test_iter_rows_pages_with_keyset_cursor():
+    rows = [{"id": f"d{i % 3}_{i // 2}", "org_id": "org", "created": 100 + i // 2, "state": "busy"} for i in range(7)]
+    table = FakeTable(rows + [{"id": "x", "org_id": "other", "created": 101, "state": "busy"}])
+    db = SupabaseDB(client=type("Client", (), {"table": lambda self, name: table})())
+
+    exported = list(db.iter_rows(BoltStateLog, {"org_id": "org"}, columns=["state"], order_column="created", page_size=3))
+
+    assert exported == [{"state": "busy"}] * 7
+    assert table.pages == 3 and table.selects[0] == "state,created,id"
+
+
+def test_encode_rows_batches_and_formats(monkeypatch):
+    monkeypatch.setattr(exports, "EXPORT_BATCH_ROWS", 2)
+    rows = [{"id": "a", "active_categories": ["eco"], "lat": 1.5}, {"id": "b,c", "active_categories": None, "lat": None}, {"id": "d"}]
+
+    chunks = list(encode_rows(iter(rows), "ndjson", ["id", "lat"]))
+    assert len(chunks) == 2
+    assert [json.loads(line) for line in b"".join(chunks).splitlines()][1] == {"id": "b,c", "lat": None}
+
+    csv_text = b"".join(encode_rows(iter(rows), "csv", ["id", "active_categories"])).decode()
+    assert csv_text.splitlines() == ["id,active_categories", 'a,"[""eco""]"', '"b,c",', "d,"]
+    assert gzip.decompress(b"".join(gzip_chunks(iter([b"x" * 10, b"y"])))) == b"x" * 10 + b"y"
+
+
+def test_export_columns_are_validated():
+    assert export_columns(BoltStateLog, " created,state ") == ["created", "state"]
+    assert "active_categories" in export_columns(BoltStateLog, None)
+    with pytest.raises(HTTPException) as error:
+        export_columns(BoltStateLog, "created,password")
+    assert error.value.status_code == 400
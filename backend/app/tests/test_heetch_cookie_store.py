@@ -0,0 +1,123 @@
+import time
+from datetime import datetime, timedelta
+
+from app.heetch_integration.cookie_store import HeetchCookieStore
+from app.models.heetch_session_cookies import HeetchSessionCookies
+
+
+class FakeQuery:
+    def __init__(self, db):
+        self.db = db
+
+    def filter(self, *_):
+        return self
+
+    def first(self):
+        self.db.reads += 1
+        return self.db.row
+
+
+class FakeDB:
+    def __init__(self, row=None):
+        self.row = row
+        self.reads = 0
+        self.writes = []
+
+    def __call__(self):
+        return self
+
+    def query(self, _model):
+        return FakeQuery(self)
+
+    def bulk_upsert(self, model, rows, on_conflict=None, **_):
+        [values] = rows
+        self.writes.append(("upsert", values))
+        self.row = HeetchSessionCookies(**{**values, "expires_at": datetime.fromisoformat(values["expires_at"])})
+
+    def update_rows(self, model, values, filters):
+        row = self.row
+        if row is None or any(getattr(row, column) != value for column, value in filters.items()):
+            return 0
+        self.writes.append(("update", values))
+        for column, value in values.items():
+            setattr(row, column, value)
+        return 1
+
+    def commit(self):
+        pass
+
+
+COOKIES = [{"name": "heetch_auth_token", "value": "t", "domain": ".heetch.com"}]
+
+
+def stored_row(cookies=COOKIES, expires_in=timedelta(hours=1)):
+    return HeetchSessionCookies(org_id="org", phone_number="+33600000000", cookies=cookies, expires_at=datetime.now() + expires_in)
+
+
+def test_cookies_are_read_from_db_once():
+    db = FakeDB(stored_row(cookies='{"cookies": [{"name": "sid", "value": "s"}]}'))
+    store = HeetchCookieStore(db_factory=db, ttl_seconds=300)
+
+    first = store.get("org", "+33600000000")
+    second = store.get("org", "+33600000000")
+
+    assert first.cookies == [{"name": "sid", "value": "s"}]
+    assert second is first
+    assert db.reads == 1
+
+
+def test_save_writes_only_on_change():
+    db = FakeDB()
+    store = HeetchCookieStore(db_factory=db, ttl_seconds=300)
+    expires_at = time.time() + 3600
+
+    assert store.save("org", "+33600000000", COOKIES, expires_at)
+    assert not store.save("org", "+33600000000", list(COOKIES), expires_at + 60)
+    assert store.save("org", "+33600000000", COOKIES + [{"name": "sid", "value": "s"}], expires_at)
+    assert len(db.writes) == 2
+    assert store.get("org", "+33600000000").cookies[-1]["name"] == "sid"
+    assert db.reads == 1
+
+
+def test_invalidate_marks_memory_and_db_once():
+    db = FakeDB(stored_row())
+    store = HeetchCookieStore(db_factory=db, ttl_seconds=300)
+    assert store.get("org", "+33600000000") is not None
+
+    store.invalidate("org", "+33600000000")
+    store.invalidate("org", "+33600000000")
+
+    assert store.get("org", "+33600000000") is None
+    assert db.writes == [("update", {"invalid_at": db.row.invalid_at})] and db.row.invalid_at is not None
+    assert db.reads == 1
+
+
+def test_missing_session_is_reread_after_ttl():
+    db = FakeDB()
+    store = HeetchCookieStore(db_factory=db, ttl_seconds=0)
+    assert store.get("org", "+33600000000") is None
+    db.row = stored_row()
+    assert store.get("org", "+33600000000").cookies == COOKIES
+    assert db.reads == 2
+
+
+def test_expired_cookies_are_marked_invalid():
+    db = FakeDB(stored_row(expires_in=timedelta(hours=-1)))
+    store = HeetchCookieStore(db_factory=db, ttl_seconds=300)
+    assert store.get("org", "+33600000000") is None
+    assert db.row.invalid_at is not None
+
+
+def test_stale_process_does_not_invalidate_newer_login():
+    db = FakeDB(stored_row())
+    worker = HeetchCookieStore(db_factory=db, ttl_seconds=300)
+    api = HeetchCookieStore(db_factory=db, ttl_seconds=300)
+    assert worker.get("org", "+33600000000").cookies == COOKIES
+
+    # Nouvelle connexion via l'API pendant que le worker garde les anciens cookies
+    fresh = [{"name": "heetch_auth_token", "value": "new", "domain": ".heetch.com"}]
+    assert api.save("org", "+33600000000", fresh, time.time() + 3600)
+    worker.invalidate("org", "+33600000000")
+
+    assert (db.row.cookies, db.row.invalid_at) == (fresh, None)
+    assert [kind for kind, _ in db.writes] == ["upsert"]
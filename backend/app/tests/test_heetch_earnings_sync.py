@@ -0,0 +1,137 @@
+import functools
+import threading
+import time
+from datetime import date, timedelta
+from types import SimpleNamespace
+
+import httpx
+
+from app.heetch_integration import heetch_client, services_earnings
+from app.heetch_integration.heetch_client import HeetchClient
+from app.heetch_integration.services_sync_all import sync_drivers_and_earnings
+
+
+class FakeDB:
+    def __init__(self):
+        self.upserts = []
+        self.commits = 0
+
+    def bulk_upsert(self, model, rows, **_):
+        self.upserts.append((model.__tablename__, rows))
+        return len(rows)
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        pass
+
+
+class FakeClient:
+    def __init__(self, failing=()):
+        self.failing = set(failing)
+        self.running = 0
+        self.peak = 0
+        self.lock = threading.Lock()
+
+    def get_earnings(self, date_param, period="weekly"):
+        with self.lock:
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+        time.sleep(0.05)
+        with self.lock:
+            self.running -= 1
+        if date_param in self.failing:
+            raise RuntimeError("boom")
+        return {
+            "currency": "EUR",
+            "summary": {"weekly": {"start_date": f"{date_param.isoformat()}T00:00:00+01:00", "end_date": "2024-01-07T23:59:59+01:00"}},
+            "drivers": [
+                {"email": "a@b.fr", "earnings": {"net_earnings": 80.5, "terminated_rides": "4", "debt": None}},
+                {"email": None, "earnings": {}},
+            ],
+        }
+
+
+def test_period_dates():
+    assert services_earnings.period_dates(date(2024, 1, 1), date(2024, 1, 15), "weekly") == [
+        date(2024, 1, 1), date(2024, 1, 8), date(2024, 1, 15),
+    ]
+    assert services_earnings.period_dates(date(2024, 11, 15), date(2025, 1, 1), "monthly") == [
+        date(2024, 11, 15), date(2024, 12, 1), date(2025, 1, 1),
+    ]
+
+
+def test_sync_earnings_fetches_periods_concurrently_and_upserts_per_period(monkeypatch):
+    monkeypatch.setattr(services_earnings, "mirror_rows", lambda *args: None)
+    cells = []
+    monkeypatch.setattr(services_earnings, "refresh_analytics_rollups", lambda db, org_id, touched: cells.extend(touched) or {})
+    db = FakeDB()
+    client = FakeClient(failing={date(2024, 1, 15)})
+
+    result = services_earnings.sync_earnings(db, client, org_id="org", start_date=date(2024, 1, 1), end_date=date(2024, 1, 28))
+
+    assert client.peak > 1
+    assert (result["pages"], result["fetched"], result["saved"], result["skipped"]) == (3, 6, 3, 3)
+    assert len(db.upserts) == 3
+    row = next(rows[0] for _, rows in db.upserts if rows[0]["date"] == "2024-01-08")
+    assert row["id"] == "a@b.fr_2024-01-08_weekly"
+    assert (row["net_earnings"], row["gross_earnings"], row["terminated_rides"], row["debt"]) == (80.5, 0, 4, None)
+    assert sorted(cells) == [("heetch", "a@b.fr", date(2024, 1, day)) for day in (1, 8, 22)]
+
+
+def test_get_earnings_reuses_session_client_with_cookie_jar(monkeypatch):
+    seen = []
+
+    def handler(request):
+        seen.append(request.headers.get("cookie"))
+        return httpx.Response(200, json={"drivers": []})
+
+    monkeypatch.setattr(heetch_client.httpx, "Client", functools.partial(httpx.Client, transport=httpx.MockTransport(handler)))
+    client = HeetchClient(org_id="org")
+    client._cookies = [
+        {"name": "heetch_auth_token", "value": "t", "domain": ".heetch.com"},
+        {"name": "sid", "value": "s", "domain": "auth.heetch.com"},
+    ]
+    client._cookies_expires_at = time.time() + 60
+
+    client.get_earnings(date(2024, 1, 1))
+    session = client._http
+    client.get_earnings(date(2024, 1, 8))
+
+    assert client._http is session
+    assert seen == ["heetch_auth_token=t; sid=s"] * 2
+
+
+def test_combined_sync_fetches_each_period_once(monkeypatch):
+    monkeypatch.setattr(services_earnings, "mirror_rows", lambda *args: None)
+    monkeypatch.setattr(services_earnings, "refresh_analytics_rollups", lambda *args: {})
+    calls = []
+    client = FakeClient()
+    fetch = client.get_earnings
+    client.get_earnings = lambda date_param, period="weekly": calls.append((date_param, period)) or fetch(date_param, period)
+    db = FakeDB()
+    today = date.today()
+    monday = today - timedelta(days=today.weekday())
+
+    result = sync_drivers_and_earnings(db, client, org_id="org", start_date=monday, end_date=today)
+
+    assert calls == [(monday, "weekly")]
+    assert (result["earnings"]["saved"], result["drivers"]["saved"]) == (1, 1)
+    # Drivers écrits avant les earnings (et donc avant le recalcul des rollups)
+    assert [table for table, _ in db.upserts] == ["heetch_drivers", "heetch_earnings"]
+    drivers = [rows for table, rows in db.upserts if table == "heetch_drivers"]
+    assert drivers == [[{"id": "a@b.fr", "org_id": "org", "first_name": "", "last_name": "", "email": "a@b.fr", "image_url": None, "active": True}]]
+
+
+def test_ensure_authenticated_switches_to_phone_session(monkeypatch):
+    sessions = {"+331": [{"name": "sid", "value": "one"}], "+332": [{"name": "sid", "value": "two"}]}
+    monkeypatch.setattr(
+        heetch_client.cookie_store, "get",
+        lambda org_id, phone: SimpleNamespace(cookies=sessions[phone], expires_at=time.time() + 60),
+    )
+    client = HeetchClient(org_id="org")
+
+    assert client.ensure_authenticated("+331")
+    assert client.ensure_authenticated("+332")
+    assert (client._phone_number, client._cookies) == ("+332", sessions["+332"])
@@ -0,0 +1,140 @@
+from datetime import datetime, timedelta
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api import http_cache
+from app.api.deps import get_current_user
+from app.api.endpoints import bolt_vehicles
+from app.api.http_cache import SyncVersions
+from app.core.db import get_db
+
+
+class FakeDB:
+    queries = 0
+
+    def query(self, model):
+        FakeDB.queries += 1
+        return self
+
+    def filter(self, *args):
+        return self
+
+    def all(self):
+        return []
+
+
+def make_client(monkeypatch, runs):
+    monkeypatch.setattr(http_cache, "sync_versions", SyncVersions(loader=lambda org_id: runs, ttl_seconds=0))
+    app = FastAPI()
+    app.include_router(bolt_vehicles.router)
+    app.dependency_overrides[get_current_user] = lambda: {"email": "a@b.fr", "org_id": "org"}
+    app.dependency_overrides[get_db] = FakeDB
+    return TestClient(app)
+
+
+def run(run_id, status="success", started=None, finished=None, stream="vehicles"):
+    return {"id": run_id, "provider": "bolt", "stream": stream, "status": status,
+            "started_at": (started or datetime(2024, 1, 1, 10)).isoformat(), "finished_at": finished and finished.isoformat()}
+
+
+def test_not_modified_without_querying_the_table(monkeypatch):
+    runs = [run("r2", finished=datetime(2024, 1, 1, 10, 5)), run("r1", finished=datetime(2024, 1, 1, 9)), run("o", stream="orders")]
+    client = make_client(monkeypatch, runs)
+    FakeDB.queries = 0
+
+    first = client.get("/bolt/vehicles")
+    assert first.status_code == 200 and FakeDB.queries == 1
+    etag = first.headers["etag"]
+    assert first.headers["last-modified"] == "Mon, 01 Jan 2024 10:05:00 GMT"
+    assert first.headers["cache-control"] == "private, no-cache"
+
+    cached = client.get("/bolt/vehicles", headers={"If-None-Match": etag})
+    assert cached.status_code == 304 and cached.content == b"" and cached.headers["etag"] == etag
+    assert FakeDB.queries == 1
+    assert client.get("/bolt/vehicles", headers={"If-Modified-Since": first.headers["last-modified"]}).status_code == 304
+
+    # Nouveau run terminé : nouvel ETag, réponse complète
+    runs.insert(0, run("r3", started=datetime(2024, 1, 1, 11), finished=datetime(2024, 1, 1, 11, 1)))
+    fresh = client.get("/bolt/vehicles", headers={"If-None-Match": etag})
+    assert fresh.status_code == 200 and fresh.headers["etag"] != etag and FakeDB.queries == 2
+
+
+def test_no_validator_while_a_sync_is_running(monkeypatch):
+    client = make_client(monkeypatch, [run("r2", status="running", started=datetime.utcnow() - timedelta(seconds=30))])
+    response = client.get("/bolt/vehicles", headers={"If-None-Match": "*"})
+    assert response.status_code == 200 and "etag" not in response.headers
+
+    # Run "running" abandonné (process tué) : ignoré passé le délai de péremption
+    client = make_client(monkeypatch, [run("r2", status="running", started=datetime.utcnow() - timedelta(days=1))])
+    assert "etag" in client.get("/bolt/vehicles").headers
+
+
+def test_earlier_run_still_running_blocks_the_validator():
+    now = datetime.utcnow()
+    runs = [
+        run("company-a", status="running", started=now - timedelta(minutes=5)),
+        run("company-b", started=now - timedelta(minutes=1), finished=now - timedelta(seconds=30)),
+    ]
+    versions = SyncVersions(loader=lambda org_id: runs, ttl_seconds=0)
+    # Run commencé avant le dernier run terminé, toujours en train d'écrire
+    assert versions.version("org", ("bolt_vehicles",)) is None
+
+    runs[0] = run("company-a", started=now - timedelta(minutes=5), finished=now)
+    token, last_modified = versions.version("org", ("bolt_vehicles",))
+    # Terminé en dernier : c'est lui qui donne le jeton, qui change donc
+    assert "company-a" in token and last_modified == now
+
+
+def test_latest_runs_are_read_per_stream(monkeypatch):
+    from app.core import supabase_db
+
+    queries = []
+
+    class Query:
+        def __init__(self):
+            self.filters = {}
+
+        @property
+        def not_(self):
+            return self
+
+        def select(self, columns):
+            return self
+
+        def eq(self, column, value):
+            self.filters[column] = value
+            return self
+
+        def is_(self, column, value):
+            return self
+
+        def order(self, column, desc=False):
+            self.filters["order"] = column
+            return self
+
+        def limit(self, count):
+            self.filters["limit"] = count
+            return self
+
+        def execute(self):
+            queries.append(self.filters)
+            if self.filters.get("status") == "running":
+                data = [run("live", status="running", stream="orders")]
+            else:
+                data = [run(f"{self.filters['stream']}-last", stream=self.filters["stream"])]
+            return type("Response", (), {"data": data})()
+
+    class FakeSupabaseDB:
+        client = type("Client", (), {"table": staticmethod(lambda name: Query())})()
+
+    monkeypatch.setattr(supabase_db, "SupabaseDB", FakeSupabaseDB)
+
+    latest = SyncVersions(ttl_seconds=0).latest_runs("org")
+
+    # Runs en cours de l'org, puis une requête limit 1 par flux sur la date de fin
+    assert queries[0] == {"org_id": "org", "status": "running"}
+    assert sorted((q["provider"], q["stream"], q["order"], q["limit"]) for q in queries[1:]) == [
+        (provider, stream, "finished_at", 1) for provider, stream in http_cache.TRACKED_STREAMS
+    ]
+    assert [r["id"] for r in latest[("bolt", "orders")]] == ["live", "orders-last"]
@@ -0,0 +1,191 @@
+import time
+
+import pytest
+
+from app.jobs import job_queue
+from app.jobs.job_queue import FAILED, QUEUED, RUNNING, SUCCEEDED, SqliteJobStore
+from app.jobs.worker import SyncWorker
+
+
+@pytest.fixture
+def store(tmp_path):
+    return SqliteJobStore(str(tmp_path / "jobs.sqlite"))
+
+
+def test_enqueue_deduplicates_active_jobs(store):
+    job, created = store.enqueue("bolt_orders", "org", {"start": "2024-01-01"})
+    again, created_again = store.enqueue("bolt_orders", "org", {"start": "2024-01-01"})
+    assert created and not created_again and again.id == job.id
+
+    # Paramètres différents ou autre org : nouveau job
+    assert store.enqueue("bolt_orders", "org", {"start": "2024-02-01"})[1]
+    assert store.enqueue("bolt_orders", "org2", {"start": "2024-01-01"})[1]
+
+    # Une fois terminé, le même job peut être réempilé
+    store.claim("w")
+    store.complete(job.id, {"saved": 1})
+    assert store.get(job.id).status == SUCCEEDED
+    assert store.enqueue("bolt_orders", "org", {"start": "2024-01-01"})[1]
+
+
+def test_claim_by_priority_then_idle_orgs(store):
+    busy, _ = store.enqueue("bolt_drivers", "busy_org")
+    store.claim("w")  # busy_org a maintenant un job en cours
+    second_busy, _ = store.enqueue("bolt_vehicles", "busy_org")
+    idle, _ = store.enqueue("bolt_vehicles", "idle_org")
+    urgent, _ = store.enqueue("bolt_orders", "vip_org", priority=2)
+    delayed, _ = store.enqueue("bolt_orders", "late_org", priority=5, delay=60)
+
+    assert store.claim("w").id == urgent.id
+    assert store.claim("w").id == idle.id
+    assert store.claim("w").id == second_busy.id
+    assert store.claim("w") is None  # le job différé n'est pas encore prêt
+    assert store.get(busy.id).status == RUNNING
+
+
+def test_priority_org_does_not_starve_the_others(store):
+    vip = [store.enqueue("bolt_orders", "vip_org", {"window": i}, priority=1)[0] for i in range(4)]
+    small, _ = store.enqueue("bolt_orders", "small_org")
+
+    claimed = [store.claim("w").id for _ in range(5)]
+
+    # Priorité 1 : deux fois plus de créneaux, mais small_org passe dès le deuxième
+    assert claimed[:3] == [vip[0].id, small.id, vip[1].id]
+    assert sorted(claimed) == sorted([job.id for job in vip] + [small.id])
+
+
+def test_failed_job_retries_with_backoff_then_fails(store, monkeypatch):
+    monkeypatch.setattr(job_queue.settings, "sync_job_retry_base_seconds", 10)
+    job, _ = store.enqueue("bolt_orders", "org", max_attempts=2)
+
+    store.claim("w")
+    retried = store.fail(job.id, "Bolt API error: 503")
+    assert retried.status == QUEUED and retried.run_after >= time.time() + 9
+    assert store.claim("w") is None  # backoff en cours
+
+    with store._connect() as conn:
+        conn.execute("UPDATE sync_jobs SET run_after = 0 WHERE id = ?", (job.id,))
+    assert store.claim("w").attempts == 2
+    failed = store.fail(job.id, "Bolt API error: 503")
+    assert failed.status == FAILED and store.get(job.id).error == "Bolt API error: 503"
+
+
+def test_stale_running_job_is_requeued(store):
+    job, _ = store.enqueue("bolt_heavy_data", "org")
+    store.claim("dead-worker")
+    with store._connect() as conn:
+        conn.execute("UPDATE sync_jobs SET heartbeat_at = ? WHERE id = ?", (time.time() - 3600, job.id))
+
+    assert store.requeue_stale(600) == 1
+    reclaimed = store.claim("w2")
+    assert reclaimed.id == job.id and reclaimed.worker_id == "w2"
+
+
+def test_stale_job_without_attempts_left_is_failed(store):
+    job, _ = store.enqueue("bolt_heavy_data", "org", max_attempts=1)
+    store.claim("dead-worker")
+    with store._connect() as conn:
+        conn.execute("UPDATE sync_jobs SET heartbeat_at = ? WHERE id = ?", (time.time() - 3600, job.id))
+
+    assert store.requeue_stale(600) == 1
+    failed = store.get(job.id)
+    assert failed.status == FAILED and failed.finished_at is not None and "heartbeat" in failed.error
+    assert store.claim("w2") is None
+
+
+def test_worker_runs_handler_and_records_result(store):
+    calls = []
+
+    def handler(org_id, params, report):
+        report({"done": 1, "total": 2})
+        calls.append((org_id, params))
+        return {"saved": 42}
+
+    def broken(org_id, params, report):
+        raise RuntimeError("boom")
+
+    worker = SyncWorker(store=store, handlers={"ok": handler, "ko": broken}, worker_id="w")
+    ok, _ = store.enqueue("ok", "org", {"days_back": 7})
+    ko, _ = store.enqueue("ko", "org", max_attempts=1)
+
+    assert worker.run_one().id == ok.id
+    assert worker.run_one().id == ko.id
+    assert worker.run_one() is None
+
+    done = store.get(ok.id)
+    assert calls == [("org", {"days_back": 7})]
+    assert done.status == SUCCEEDED and done.result == {"saved": 42} and done.progress == {"done": 1, "total": 2}
+    assert store.get(ko.id).status == FAILED and "boom" in store.get(ko.id).error
+
+
+def test_batch_progress_reports_windows_rate_and_eta():
+    from app.jobs.background_tasks import BatchProgress
+
+    reports = []
+    progress = BatchProgress("orders", reports.append)
+    progress.add_windows(4)
+    progress.window_done("42 2024-01-01 -> 2024-01-08", pages=3, rows=2500)
+
+    last = reports[-1]
+    assert (last["windows_done"], last["windows_total"], last["pages"], last["rows"]) == (1, 4, 3, 2500)
+    assert last["rows_per_second"] > 0 and last["eta_seconds"] is not None
+
+
+def test_async_heavy_sync_returns_existing_job(store, monkeypatch):
+    from app.jobs.background_tasks import sync_bolt_heavy_data_async
+
+    monkeypatch.setattr(job_queue, "_store", store)
+    job, created = sync_bolt_heavy_data_async("org", days_back=90, streams=("orders",))
+    again, created_again = sync_bolt_heavy_data_async("org", days_back=90, streams=("orders",))
+
+    assert created and not created_again and again.id == job.id
+    assert job.params == {"company_id": None, "days_back": 90, "streams": ["orders"]}
+    # Autre période : autre job
+    assert sync_bolt_heavy_data_async("org", days_back=7, streams=("orders",))[1]
+
+
+def test_job_events_stream_progress_then_result(store, monkeypatch):
+    import asyncio
+
+    from fastapi import HTTPException
+
+    from app.api.endpoints import sync_jobs
+
+    monkeypatch.setattr(job_queue, "_store", store)
+    monkeypatch.setattr(sync_jobs, "EVENTS_POLL_SECONDS", 0.01)
+    job, _ = store.enqueue("bolt_heavy_data", "org")
+    store.claim("w")
+    store.heartbeat(job.id, {"windows_done": 1, "windows_total": 2})
+
+    async def collect():
+        response = await sync_jobs.stream_sync_job(job.id, {"org_id": "org"})
+        events = []
+        async for chunk in response.body_iterator:
+            events.append(chunk)
+            if len(events) == 1:
+                store.complete(job.id, {"orders": {"status": "success"}})
+        return events
+
+    progress, result = asyncio.run(collect())
+    assert progress.startswith("event: progress") and '"windows_done": 1' in progress
+    assert result.startswith("event: result") and '"succeeded"' in result
+
+    # Job d'une autre org : introuvable
+    with pytest.raises(HTTPException):
+        sync_jobs.get_sync_job(job.id, {"org_id": "other"})
+
+
+def test_stalled_worker_cannot_overwrite_reclaimed_job(store):
+    job, _ = store.enqueue("bolt_orders", "org", max_attempts=2)
+    store.claim("stalled")
+    with store._connect() as conn:
+        conn.execute("UPDATE sync_jobs SET heartbeat_at = 0 WHERE id = ?", (job.id,))
+    store.requeue_stale(600)
+    store.claim("w2")
+
+    assert not store.complete(job.id, {"stale": True}, worker_id="stalled")
+    assert store.fail(job.id, "timeout", worker_id="stalled") is None
+    assert store.get(job.id).status == RUNNING
+
+    assert store.complete(job.id, {"saved": 1}, worker_id="w2")
+    assert store.get(job.id).result == {"saved": 1}
@@ -0,0 +1,106 @@
+import threading
+import time
+
+import pytest
+
+from app.jobs import leases
+from app.jobs.leases import LeaseBusy, LocalLeaseBackend, SchedulerLeader, lease_key, run_exclusive
+
+
+@pytest.fixture
+def backend(monkeypatch):
+    backend = LocalLeaseBackend()
+    monkeypatch.setattr(leases, "_backend", backend)
+    return backend
+
+
+def test_duplicate_request_joins_running_job(backend):
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def slow_sync():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return {"saved": 42}
+
+    results = []
+    first = threading.Thread(target=lambda: results.append(run_exclusive("org", "bolt_drivers", slow_sync)))
+    first.start()
+    started.wait(5)
+    second = threading.Thread(target=lambda: results.append(run_exclusive("org", "bolt_drivers", slow_sync)))
+    second.start()
+
+    # Sans jonction, la demande en double est court-circuitée
+    with pytest.raises(LeaseBusy):
+        run_exclusive("org", "bolt_drivers", slow_sync, join=False)
+
+    time.sleep(0.2)  # laisse la 2e demande se mettre en attente du run en cours
+    release.set()
+    first.join(5)
+    second.join(5)
+    assert results == [{"saved": 42}, {"saved": 42}] and len(calls) == 1
+    # Bail libéré à la fin du run
+    assert backend.acquire(lease_key("org", "bolt_drivers"), "other", 60) == "other"
+
+
+def test_lease_held_by_other_process_short_circuits(backend):
+    backend.acquire(lease_key("org", "bolt_orders"), "other-worker", 60)
+
+    with pytest.raises(LeaseBusy) as excinfo:
+        run_exclusive("org", "bolt_orders", lambda: "never")
+    assert excinfo.value.holder == "other-worker"
+    assert excinfo.value.to_dict()["status"] == "already_running"
+
+    # Autre flux ou autre org : pas bloqué
+    assert run_exclusive("org", "bolt_state_logs", lambda: "ok") == "ok"
+    assert run_exclusive("org2", "bolt_orders", lambda: "ok") == "ok"
+
+
+def test_expired_lease_can_be_taken_over(backend):
+    backend.acquire(lease_key("org", "bolt_orders"), "dead-worker", 0)
+    time.sleep(0.01)
+    assert run_exclusive("org", "bolt_orders", lambda: "ok") == "ok"
+
+
+def test_single_scheduler_leader(backend):
+    events = []
+    leader = SchedulerLeader(lambda: events.append("elected"), lambda: events.append("demoted"), ttl_seconds=60)
+    backend.acquire(leases.SCHEDULER_LEASE_KEY, "other-worker", 60)
+
+    assert leader.step() is False and events == []
+
+    backend.release(leases.SCHEDULER_LEASE_KEY, "other-worker")
+    assert leader.step() is True and leader.step() is True
+    assert events == ["elected"]
+
+    # Bail repris par un autre worker (ex: ce process est resté bloqué au-delà du TTL)
+    backend._leases[leases.SCHEDULER_LEASE_KEY] = ("other-worker", time.monotonic() + 60)
+    assert leader.step() is False
+    assert events == ["elected", "demoted"]
+
+
+def test_serialized_waits_for_threads_and_other_processes(backend):
+    backend.acquire(lease_key("org", "driver_activity"), "other-process", 60)
+    order = []
+
+    def section(name):
+        with leases.serialized("org", "driver_activity", wait_seconds=5, poll_seconds=0.05):
+            order.append(f"{name}:in")
+            time.sleep(0.05)
+            order.append(f"{name}:out")
+
+    threads = [threading.Thread(target=section, args=(name,)) for name in ("a", "b")]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.2)
+    assert order == []  # bail détenu par un autre process : attente
+    backend.release(lease_key("org", "driver_activity"), "other-process")
+    for thread in threads:
+        thread.join(5)
+
+    assert [entry.split(":")[1] for entry in order] == ["in", "out", "in", "out"]
+    backend.acquire(lease_key("org", "driver_activity"), "other-process", 60)
+    with pytest.raises(LeaseBusy):
+        with leases.serialized("org", "driver_activity", wait_seconds=0.1, poll_seconds=0.05):
+            pass
@@ -0,0 +1,71 @@
+from app.bolt_integration.row_mapping import (
+    FieldSpec,
+    MISSING,
+    build_driver_row,
+    build_order_row,
+    build_rows,
+    build_state_log_row,
+    build_vehicle_row,
+    compile_mapping,
+)
+from app.core.supabase_db import SupabaseDB
+from app.models.bolt_driver import BoltDriver
+from app.models.bolt_order import BoltOrder
+from app.models.bolt_state_log import BoltStateLog
+from app.models.bolt_vehicle import BoltVehicle
+
+ORDER = {
+    "order_reference": "ref-1",
+    "driver_uuid": "d1",
+    "order_created_timestamp": 1700000000,
+    "ride_distance": None,
+    "order_price": {"ride_price": 12.5, "tip": None, "currency": ""},
+    "category_info": {"name": "Bolt", "seats": 4},
+    "order_stops": [],
+}
+
+
+def _orm_row(model, row):
+    # Même dict que l'ancien chemin ORM -> _instance_to_dict
+    return SupabaseDB(client=object())._instance_to_dict(model(**row))
+
+
+def test_order_row_matches_model_and_legacy_defaults():
+    row = build_order_row(ORDER, {"org_id": "org", "company_id": "42", "company_name": "Fleet"})
+
+    assert row == _orm_row(BoltOrder, row)
+    assert row["company_id"] == 42
+    assert row["ride_price"] == 12.5
+    assert row["tip"] == 0 and row["commission"] == 0
+    assert row["ride_distance"] == 0
+    assert row["currency"] == "EUR"
+    assert row["is_scheduled"] is False
+    assert row["category_seats"] == 4 and row["category_vehicle_type"] is None
+    assert row["order_stops"] is None
+
+
+def test_order_without_reference_is_skipped():
+    rows = build_rows(build_order_row, [{"driver_uuid": "d1"}, ORDER], {"org_id": "org", "company_id": 1})
+    assert [r["order_reference"] for r in rows] == ["ref-1"]
+
+
+def test_state_log_driver_vehicle_rows():
+    log = build_state_log_row({"driver_uuid": "d1", "created": 10, "state": "busy", "active_categories": []}, {"org_id": "org"})
+    assert log["id"] == "d1_10" and log["active_categories"] is None
+    assert log == _orm_row(BoltStateLog, log)
+
+    driver = build_driver_row({"id": "d2", "state": "inactive"}, {"org_id": "org"})
+    assert driver["id"] == "d2" and driver["active"] is False and driver["first_name"] == ""
+    assert driver == _orm_row(BoltDriver, driver)
+    assert build_driver_row({"state": "active"}, {"org_id": "org"}) is None
+
+    vehicle = build_vehicle_row({"uuid": "v1", "model": "Prius"}, {"org_id": "org"})
+    assert vehicle["provider_vehicle_id"] == "v1" and vehicle["plate"] == ""
+    assert vehicle == _orm_row(BoltVehicle, vehicle)
+
+
+def test_missing_default_keeps_explicit_none():
+    build = compile_mapping("sample", [FieldSpec("name", "a.b", default="x", default_when=MISSING)])
+    assert build({"a": {}}, {}) == {"name": "x"}
+    assert build({"a": {"b": None}}, {}) == {"name": None}
+    assert build({}, {}) == {"name": "x"}
@@ -0,0 +1,51 @@
+import numpy as np
+
+from app.analytics.scoring import cell_features, competition_ranks, order_features, percentile_ranks, score_drivers
+from app.api.endpoints.analytics import build_leaderboard
+from zoneinfo import ZoneInfo
+
+DAY = 1704103200  # 2024-01-01 10:00 UTC
+
+
+def test_scores_match_performance_calculator():
+    orders = [
+        {"driver_uuid": "d1", "order_status": "finished", "order_created_timestamp": DAY, "net_earnings": 18,
+         "order_pickup_timestamp": DAY, "order_drop_off_timestamp": DAY + 1800},
+        {"driver_uuid": "d1", "order_status": "finished", "order_created_timestamp": DAY + 86400, "net_earnings": 12,
+         "order_pickup_timestamp": DAY + 86400, "order_drop_off_timestamp": DAY + 86400 + 1800},
+        {"driver_uuid": "d2", "order_status": "driver_cancelled", "order_created_timestamp": DAY, "net_earnings": 0},
+    ]
+    drivers, features = order_features(orders, ZoneInfo("UTC"))
+    assert drivers == ["d1", "d2"]
+    scores = score_drivers(**features)
+    # d1 : 15 €/course, 2 courses/h, 0 annulation, 2 jours actifs -> revenu 100, efficacité 100, durabilité 73
+    assert [int(scores[f][0]) for f in ("income_score", "efficiency_score", "sustainability_score", "overall_score")] == [100, 100, 73, 92]
+    # d2 : annulation seule -> pénalité plafonnée à 0, 1 jour actif
+    assert [int(scores[f][1]) for f in ("income_score", "efficiency_score", "sustainability_score", "overall_score")] == [0, 0, 2, 0]
+
+
+def test_driver_without_trips_scores_zero():
+    scores = score_drivers(np.array([0.0]), np.array([0.0]), np.array([0.0]), np.array([0.0]), np.array([0.0]))
+    assert all(int(values[0]) == 0 for values in scores.values())
+
+
+def test_ranks_with_ties():
+    scores = np.array([90, 70, 90, 50])
+    assert list(competition_ranks(scores)) == [1, 3, 1, 4]
+    assert list(percentile_ranks(scores)) == [100, 50, 100, 25]
+
+
+def test_leaderboard_pages_cells_by_score():
+    def cell(driver_uuid, net, orders, completed):
+        return {"driver_uuid": driver_uuid, "platform": "bolt", "total_orders": orders, "completed_orders": completed,
+                "net_earnings": net, "time_hours": orders / 2}
+
+    rows = [cell("d1", 3000, 2, 2), cell("d1", 1500, 1, 1), cell("d2", 1000, 2, 1), cell("d3", 1500, 1, 1)]
+    keys, features = cell_features(rows)
+    assert keys == [("d1", "bolt"), ("d2", "bolt"), ("d3", "bolt")]
+    assert list(features["net_earnings"]) == [45, 10, 15] and list(features["active_days"]) == [2, 1, 1]
+
+    board = build_leaderboard(rows, "overall_score", offset=0, limit=2)
+    assert board["total"] == 3 and [item["driver_uuid"] for item in board["items"]] == ["d1", "d3"]
+    assert board["items"][0]["rank"] == 1 and board["items"][0]["percentile"] == 100
+    assert build_leaderboard(rows, "income_score", offset=2, limit=2)["items"][0]["driver_uuid"] == "d2"
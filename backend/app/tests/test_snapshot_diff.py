@@ -0,0 +1,132 @@
+import threading
+
+from app.bolt_integration import services_drivers, services_vehicles
+from app.bolt_integration.pagination import fetch_all_pages
+from app.bolt_integration.snapshot_diff import SnapshotCache, diff_snapshot
+
+
+class FakeDB:
+    def __init__(self, stored):
+        self.stored = {row["id"]: row for row in stored}
+        self.upserts = []
+        self.fetches = 0
+
+    def fetch_rows(self, model_class, filters):
+        self.fetches += 1
+        return [dict(row) for row in self.stored.values() if row["org_id"] == filters["org_id"]]
+
+    def bulk_upsert(self, model_class, rows):
+        self.upserts.append(rows)
+        for row in rows:
+            self.stored[row["id"]] = dict(row)
+        return len(rows)
+
+    def commit(self):
+        return None
+
+    def rollback(self):
+        return None
+
+
+class FakeClient:
+    def __init__(self, items, page_size, items_key="drivers"):
+        self.items = items
+        self.page_size = page_size
+        self.items_key = items_key
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def post(self, path, payload):
+        with self._lock:
+            self.calls.append(payload["company_id"] if "company_id" in payload else None)
+        page = self.items[payload["offset"]:payload["offset"] + payload["limit"]]
+        return {"code": 0, "data": {self.items_key: page}}
+
+
+def _driver(i, state="active", first_name="A"):
+    return {"driver_uuid": f"d{i}", "first_name": first_name, "last_name": "B", "state": state}
+
+
+def _stored(i, active=True, first_name="A"):
+    return {"id": f"d{i}", "org_id": "org", "first_name": first_name, "last_name": "B", "email": None, "phone": None, "active": active}
+
+
+def test_diff_snapshot_classifies_rows():
+    stored = {"a": {"id": "a", "v": 1}, "b": {"id": "b", "v": 1}, "c": {"id": "c", "v": 1}}
+    diff = diff_snapshot([{"id": "a", "v": 1}, {"id": "b", "v": 2}, {"id": "d", "v": 1}], stored)
+
+    assert [r["id"] for r in diff.inserts] == ["d"]
+    assert [r["id"] for r in diff.updates] == ["b"]
+    assert diff.unchanged == 1
+    assert [r["id"] for r in diff.missing] == ["c"]
+
+
+def test_fetch_all_pages_stops_on_partial_page():
+    client = FakeClient([_driver(i) for i in range(5)], page_size=2)
+    items, requests = fetch_all_pages(client, "/x", {}, "drivers", 2, prefetch=1)
+    assert len(items) == 5 and requests == 3
+
+
+def test_fetch_all_pages_prefetches_in_order():
+    client = FakeClient([_driver(i) for i in range(9)], page_size=2)
+    items, requests = fetch_all_pages(client, "/x", {}, "drivers", 2, prefetch=3)
+    # 1 page seule, puis un lot de 3 pages pleines, puis un lot dont la 1re page est incomplète
+    assert [d["driver_uuid"] for d in items] == [f"d{i}" for i in range(9)]
+    assert requests == 7
+
+
+def test_sync_drivers_writes_only_changes_and_flags_departures(monkeypatch):
+    monkeypatch.setattr(services_drivers, "snapshot_cache", SnapshotCache())
+    monkeypatch.setattr(services_drivers, "get_company_ids", lambda db, org_id: ["1"])
+    db = FakeDB([_stored(1), _stored(2, first_name="Old"), _stored(3)])
+    client = FakeClient([_driver(1), _driver(2), _driver(4)], page_size=1000)
+
+    summary = services_drivers.sync_drivers(db, client, org_id="org")
+
+    assert summary == {"fetched": 3, "inserted": 1, "updated": 1, "unchanged": 1, "deactivated": 1, "requests": 1}
+    assert sorted(row["id"] for row in db.upserts[0]) == ["d2", "d3", "d4"]
+    assert db.stored["d3"]["active"] is False
+
+    # Deuxième passage : flotte stable, aucune écriture et snapshot servi depuis le cache
+    summary = services_drivers.sync_drivers(db, client, org_id="org")
+    assert summary["inserted"] == summary["updated"] == summary["deactivated"] == 0
+    assert db.upserts[1] == [] and db.fetches == 1
+
+
+def test_partial_roster_does_not_deactivate(monkeypatch):
+    monkeypatch.setattr(services_drivers, "snapshot_cache", SnapshotCache())
+    monkeypatch.setattr(services_drivers, "get_company_ids", lambda db, org_id: ["1", "2"])
+    db = FakeDB([_stored(1), _stored(3)])
+
+    summary = services_drivers.sync_drivers(db, FakeClient([_driver(1)], 1000), company_id="1", org_id="org")
+
+    assert summary["deactivated"] == 0
+    assert db.stored["d3"]["active"] is True
+
+
+def test_sync_vehicles_paginates_all_companies_and_keeps_org(monkeypatch):
+    monkeypatch.setattr(services_vehicles, "snapshot_cache", SnapshotCache())
+    monkeypatch.setattr(services_vehicles, "get_company_ids", lambda db, org_id: ["1", "2"])
+    vehicles = [{"uuid": f"v{i}", "reg_number": f"AA-{i}", "model": "Prius"} for i in range(250)]
+    stored = [{"id": "v0", "org_id": "tenant", "provider_vehicle_id": "v0", "plate": "AA-0", "model": "Prius"}]
+    db = FakeDB(stored)
+    client = FakeClient(vehicles, page_size=100, items_key="vehicles")
+
+    summary = services_vehicles.sync_vehicles(db, client, org_id="tenant")
+
+    # 250 véhicules = 3 pages par company ; les deux companies renvoient le même parc ici
+    assert summary["fetched"] == 500 and summary["inserted"] == 249 and summary["unchanged"] == 1
+    assert sorted(set(client.calls)) == [1, 2]
+    assert {row["org_id"] for row in db.upserts[0]} == {"tenant"}
+
+
+def test_snapshot_is_reloaded_after_its_ttl():
+    from app.models.bolt_driver import BoltDriver
+
+    cache = SnapshotCache(max_age_seconds=0)
+    db = FakeDB([_stored(1)])
+    cache.load(db, BoltDriver, "org")
+    # Écriture faite par un autre process (API ou worker) : visible au chargement suivant
+    db.stored["d1"]["first_name"] = "Other"
+    assert cache.load(db, BoltDriver, "org")["d1"]["first_name"] == "Other"
+    assert db.fetches == 2
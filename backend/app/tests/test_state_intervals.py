@@ -0,0 +1,154 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from app.bolt_integration import state_intervals
+from app.bolt_integration.state_intervals import compact_state_logs, fold_state_logs, touched_ranges
+from app.jobs import leases
+from app.jobs.leases import LocalLeaseBackend
+from app.models.bolt_state_interval import BoltStateInterval
+from app.models.bolt_state_log import BoltStateLog
+
+
+@pytest.fixture(autouse=True)
+def local_leases(monkeypatch):
+    monkeypatch.setattr(leases, "_backend", LocalLeaseBackend())
+
+
+class FakeQuery:
+    def __init__(self, rows):
+        self.rows = list(rows)
+
+    def filter(self, *criteria):
+        for criterion in criteria:
+            key, value = criterion.left.key, criterion.right.value
+            self.rows = [row for row in self.rows if criterion.operator(row[key], value)]
+        return self
+
+    def order_by(self, column):
+        desc = hasattr(column, "modifier")
+        key = column.element.key if desc else column.key
+        self.rows.sort(key=lambda row: row[key], reverse=desc)
+        return self
+
+    def first(self):
+        return SimpleNamespace(**self.rows[0]) if self.rows else None
+
+
+class FakeDB:
+    def __init__(self, logs=()):
+        self.tables = {BoltStateLog.__tablename__: {}, BoltStateInterval.__tablename__: {}}
+        self.add_logs(logs)
+
+    def add_logs(self, logs):
+        for created, state in logs:
+            row = {"id": f"d1_{created}", "org_id": "org", "driver_uuid": "d1", "vehicle_uuid": "v1", "created": created, "state": state}
+            self.tables[BoltStateLog.__tablename__][row["id"]] = row
+        return [{"driver_uuid": "d1", "created": created} for created, _ in logs]
+
+    def query(self, model):
+        return FakeQuery(self.tables[model.__tablename__].values())
+
+    def fetch_rows(self, model, filters, page_size=1000, ranges=None):
+        rows = [r for r in self.tables[model.__tablename__].values() if all(r[k] == v for k, v in filters.items())]
+        for key, (low, high) in (ranges or {}).items():
+            rows = [r for r in rows if (low is None or r[key] >= low) and (high is None or r[key] < high)]
+        return rows
+
+    def bulk_upsert(self, model, rows, chunk_size=500):
+        self.tables[model.__tablename__].update({row["id"]: dict(row) for row in rows})
+        return len(rows)
+
+    def delete_rows(self, model, ids, chunk_size=200):
+        for row_id in ids:
+            self.tables[model.__tablename__].pop(row_id)
+        return len(ids)
+
+    def commit(self):
+        return None
+
+    def timeline(self):
+        rows = sorted(self.tables[BoltStateInterval.__tablename__].values(), key=lambda row: row["start_ts"])
+        return [(row["state"], row["start_ts"], row["end_ts"], row["log_count"], row["is_open"]) for row in rows]
+
+
+def test_fold_merges_consecutive_states():
+    logs = [
+        {"created": 30, "state": "busy", "vehicle_uuid": "v1"},
+        {"created": 10, "state": "waiting_orders", "vehicle_uuid": "v1"},
+        {"created": 20, "state": "waiting_orders", "vehicle_uuid": "v1"},
+        {"created": 40, "state": "busy", "vehicle_uuid": "v2"},
+    ]
+    intervals = fold_state_logs("org", "d1", logs)
+    assert [(i["state"], i["start_ts"], i["end_ts"], i["log_count"], i["is_open"]) for i in intervals] == [
+        ("waiting_orders", 10, 30, 2, False),
+        ("busy", 30, 40, 1, False),  # changement de véhicule : nouvel intervalle
+        ("busy", 40, 40, 1, True),
+    ]
+    assert touched_ranges([{"driver_uuid": "d1", "created": 30}, {"driver_uuid": "d1", "created": 10}]) == {"d1": (10, 30)}
+
+
+def test_late_arrival_splits_interval_and_is_idempotent():
+    db = FakeDB()
+    compact_state_logs(db, "org", touched_ranges(db.add_logs([(10, "waiting_orders"), (20, "waiting_orders"), (30, "busy"), (40, "inactive")])))
+    assert db.timeline() == [("waiting_orders", 10, 30, 2, False), ("busy", 30, 40, 1, False), ("inactive", 40, 40, 1, True)]
+
+    # Log en retard au milieu de l'intervalle waiting_orders
+    late = touched_ranges(db.add_logs([(15, "has_order")]))
+    compact_state_logs(db, "org", late)
+    expected = [
+        ("waiting_orders", 10, 15, 1, False),
+        ("has_order", 15, 20, 1, False),
+        ("waiting_orders", 20, 30, 1, False),
+        ("busy", 30, 40, 1, False),
+        ("inactive", 40, 40, 1, True),
+    ]
+    assert db.timeline() == expected
+
+    # Sync relancée sur les mêmes logs : aucun changement
+    compact_state_logs(db, "org", late)
+    assert db.timeline() == expected
+
+
+def test_late_arrival_merges_with_following_interval():
+    db = FakeDB()
+    compact_state_logs(db, "org", touched_ranges(db.add_logs([(10, "waiting_orders"), (20, "busy"), (30, "busy")])))
+    # Le driver était en fait déjà busy à 15 : fusion avec l'intervalle busy suivant
+    compact_state_logs(db, "org", touched_ranges(db.add_logs([(15, "busy")])))
+    assert db.timeline() == [("waiting_orders", 10, 15, 1, False), ("busy", 15, 30, 3, True)]
+
+
+def test_overlapping_compactions_are_serialized(monkeypatch):
+    db = FakeDB()
+    compact_state_logs(db, "org", touched_ranges(db.add_logs([(10, "waiting_orders"), (20, "busy"), (40, "inactive")])))
+    running, peak = [0], [0]
+    compact_driver = state_intervals._compact_driver
+
+    def slow_compact_driver(*args):
+        running[0] += 1
+        peak[0] = max(peak[0], running[0])
+        time.sleep(0.05)  # lectures faites : l'autre fenêtre écrirait entre la lecture et la suppression
+        try:
+            return compact_driver(*args)
+        finally:
+            running[0] -= 1
+
+    monkeypatch.setattr(state_intervals, "_compact_driver", slow_compact_driver)
+    # Deux fenêtres qui se chevauchent, chacune avec un log en retard
+    windows = [touched_ranges(db.add_logs([(15, "has_order")])), touched_ranges(db.add_logs([(30, "busy"), (35, "has_order")]))]
+    threads = [threading.Thread(target=compact_state_logs, args=(db, "org", window)) for window in windows]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert peak[0] == 1
+    assert db.timeline() == [
+        ("waiting_orders", 10, 15, 1, False),
+        ("has_order", 15, 20, 1, False),
+        ("busy", 20, 35, 2, False),
+        ("has_order", 35, 40, 1, False),
+        ("inactive", 40, 40, 1, True),
+    ]
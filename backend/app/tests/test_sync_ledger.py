@@ -0,0 +1,75 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from prometheus_client import REGISTRY
+
+from app.core import sync_ledger
+from app.core.sync_ledger import bind_context, timed_api_call, tracked_sync
+
+
+class FakeLedgerDB:
+    def __init__(self):
+        self.rows = []
+
+    def bulk_upsert(self, model_class, rows):
+        self.rows.extend(dict(row) for row in rows)
+        return len(rows)
+
+
+@pytest.fixture
+def ledger_db(monkeypatch):
+    db = FakeLedgerDB()
+    monkeypatch.setattr(sync_ledger.ledger_writer, "_db", db)
+    monkeypatch.setattr(sync_ledger.ledger_writer, "_disabled", False)
+    return db
+
+
+def test_tracked_sync_writes_ledger_and_metrics(ledger_db):
+    def api_call():
+        with timed_api_call("test_ok"):
+            pass
+
+    @tracked_sync("test_ok", "orders")
+    def fake_sync(db, client, company_id=None, org_id=None):
+        # Deux appels API, dont un depuis un thread du pool (contexte propagé)
+        api_call()
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            pool.submit(bind_context(api_call)).result()
+        return {"pages": 3, "fetched": 2500, "saved": 2400, "skipped": 100, "end_ts": 1_700_000_000}
+
+    fake_sync(None, None, company_id="42", org_id="org")
+
+    started, finished = ledger_db.rows
+    assert started["status"] == "running" and started["id"] == finished["id"]
+    assert finished["status"] == "success" and finished["company_id"] == "42"
+    assert (finished["pages"], finished["rows_fetched"], finished["rows_written"], finished["rows_skipped"]) == (3, 2500, 2400, 100)
+    assert finished["api_calls"] == 2 and finished["watermark_ts"] == 1_700_000_000
+
+    labels = {"provider": "test_ok", "stream": "orders"}
+    assert REGISTRY.get_sample_value("sync_runs_total", {**labels, "status": "success"}) == 1
+    assert REGISTRY.get_sample_value("sync_rows_total", {**labels, "kind": "written"}) == 2400
+    assert REGISTRY.get_sample_value("sync_freshness_lag_seconds", {**labels, "org_id": "org"}) > 0
+
+
+def test_tracked_sync_records_errors_and_reraises(ledger_db):
+    @tracked_sync("test_ko", "drivers")
+    def failing_sync(db, client, org_id=None):
+        with timed_api_call("test_ko") as call:
+            call.error = True
+        raise RuntimeError("Bolt API error: boom")
+
+    with pytest.raises(RuntimeError):
+        failing_sync(None, None, org_id="org")
+
+    finished = ledger_db.rows[-1]
+    assert finished["status"] == "error" and "boom" in finished["error"]
+    assert finished["api_errors"] == 1
+    assert REGISTRY.get_sample_value("sync_runs_total", {"provider": "test_ko", "stream": "drivers", "status": "error"}) == 1
+    assert REGISTRY.get_sample_value("sync_runs_in_progress", {"provider": "test_ko", "stream": "drivers"}) == 0
+
+
+def test_freshness_watermark_never_moves_back():
+    collector = sync_ledger._FreshnessCollector()
+    collector.update("bolt", "orders", "org", 1000)
+    collector.update("bolt", "orders", "org", 500)  # fenêtre de backfill plus ancienne
+    assert collector.lag("bolt", "orders", "org", now=1600) == 600
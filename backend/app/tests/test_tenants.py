@@ -0,0 +1,14 @@
+import random
+
+from app.jobs.tenants import parse_org_priorities, stagger_delays
+
+
+def test_stagger_delays_spread_over_window():
+    delays = stagger_delays(4, window_seconds=400, jitter_seconds=10, rng=random.Random(1))
+    assert len(delays) == 4
+    for i, delay in enumerate(delays):
+        assert i * 100 <= delay <= i * 100 + 10
+
+
+def test_parse_org_priorities():
+    assert parse_org_priorities("orgA=2, orgB=1,bad,orgC=x") == {"orgA": 2, "orgB": 1}
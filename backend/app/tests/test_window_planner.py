@@ -0,0 +1,74 @@
+from app.bolt_integration.window_planner import (
+    DAY_SECONDS,
+    MAX_LOOKBACK_SECONDS,
+    MAX_WINDOW_SECONDS,
+    PAGE_SIZE,
+    DensityStore,
+    plan_windows,
+)
+
+NOW = 1_700_000_000
+DAY0 = NOW - NOW % DAY_SECONDS - 60 * DAY_SECONDS
+
+
+def _assert_contiguous(windows, start, end):
+    assert windows[0].start_ts == start
+    assert windows[-1].end_ts == end
+    for previous, current in zip(windows, windows[1:]):
+        assert previous.end_ts == current.start_ts
+
+
+def test_sparse_days_are_merged_but_stay_under_31_days():
+    start, end = DAY0, DAY0 + 60 * DAY_SECONDS
+    windows = plan_windows(start, end, {}, target_pages=5, default_rows_per_day=10, now=NOW)
+
+    _assert_contiguous(windows, start, end)
+    assert len(windows) == 2
+    assert all(w.end_ts - w.start_ts <= MAX_WINDOW_SECONDS for w in windows)
+
+
+def test_dense_day_is_split_into_sub_day_windows():
+    start, end = DAY0, DAY0 + 3 * DAY_SECONDS
+    densities = {DAY0 + DAY_SECONDS: 12 * PAGE_SIZE}
+    windows = plan_windows(start, end, densities, target_pages=5, default_rows_per_day=100, now=NOW)
+
+    _assert_contiguous(windows, start, end)
+    dense = [w for w in windows if DAY0 + DAY_SECONDS <= w.start_ts < DAY0 + 2 * DAY_SECONDS]
+    assert len(dense) == 3
+    assert all(w.estimated_pages <= 5 for w in windows)
+
+
+def test_start_is_clamped_to_16_months():
+    start = NOW - MAX_LOOKBACK_SECONDS - 10 * DAY_SECONDS
+    windows = plan_windows(start, NOW, {}, target_pages=5, default_rows_per_day=0, now=NOW)
+
+    assert windows[0].start_ts == NOW - MAX_LOOKBACK_SECONDS
+    assert windows[-1].end_ts == NOW
+
+
+def test_probe_bisects_full_pages_only():
+    start, end = DAY0, DAY0 + 8 * DAY_SECONDS
+    calls = []
+
+    def probe(span_start, span_end):
+        calls.append((span_start, span_end))
+        # Seul le 1er jour est dense (3000 lignes), les autres presque vides
+        rows = min(3000, PAGE_SIZE) if span_start == DAY0 else 10
+        return rows, rows >= PAGE_SIZE
+
+    windows = plan_windows(start, end, {}, target_pages=1, probe=probe, now=NOW)
+
+    _assert_contiguous(windows, start, end)
+    # 1 sonde sur 8 jours, puis bissections uniquement du côté plein : 8 -> 4 -> 2 -> 1
+    assert len(calls) == 7
+    assert windows[-1].start_ts == DAY0 + DAY_SECONDS
+
+
+def test_density_store_roundtrip(tmp_path):
+    path = tmp_path / "density.json"
+    store = DensityStore(path)
+    store.record("org", "42", "orders", DAY0, DAY0 + 2 * DAY_SECONDS, 500)
+
+    reloaded = DensityStore(path)
+    assert reloaded.rows_per_day("org", "42", "orders") == {DAY0: 250.0, DAY0 + DAY_SECONDS: 250.0}
+    assert reloaded.rows_per_day("org", "42", "state_logs") == {}
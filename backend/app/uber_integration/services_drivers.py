@@ -1,13 +1,15 @@
 from sqlalchemy.orm import Session
 
 from app.core.config import get_settings
+from app.core.sync_ledger import tracked_sync
 from app.models.driver import UberDriver
 from app.uber_integration.uber_client import UberClient
 
 settings = get_settings()
 
 
-def sync_drivers(db: Session, client: UberClient) -> None:
+@tracked_sync("uber", "drivers")
+def sync_drivers(db: Session, client: UberClient) -> dict:
     data = client.get("/v1/drivers")
     drivers = data.get("data", [])
     for driver in drivers:
@@ -21,4 +23,4 @@ def sync_drivers(db: Session, client: UberClient) -> None:
             )
         )
     db.commit()
-
+    return {"pages": 1, "fetched": len(drivers), "saved": len(drivers)}
@@ -2,13 +2,15 @@ from datetime import date
 from sqlalchemy.orm import Session
 
 from app.core.config import get_settings
+from app.core.sync_ledger import tracked_sync
 from app.models.driver_metrics import DriverDailyMetrics
 from app.uber_integration.uber_client import UberClient
 
 settings = get_settings()
 
 
-def sync_metrics(db: Session, client: UberClient, start: date, end: date) -> None:
+@tracked_sync("uber", "metrics")
+def sync_metrics(db: Session, client: UberClient, start: date, end: date) -> dict:
     data = client.get("/v1/metrics", params={"start": start.isoformat(), "end": end.isoformat()})
     metrics = data.get("data", [])
     for row in metrics:
@@ -26,4 +28,4 @@ def sync_metrics(db: Session, client: UberClient, start: date, end: date) -> Non
             )
         )
     db.commit()
-
+    return {"pages": 1, "fetched": len(metrics), "saved": len(metrics)}
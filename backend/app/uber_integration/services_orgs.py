@@ -1,17 +1,19 @@
 from sqlalchemy.orm import Session
 
 from app.core.config import get_settings
+from app.core.sync_ledger import tracked_sync
 from app.models.org import UberOrganization
 from app.uber_integration.uber_client import UberClient
 
 settings = get_settings()
 
 
-def sync_organizations(db: Session, client: UberClient) -> None:
+@tracked_sync("uber", "orgs")
+def sync_organizations(db: Session, client: UberClient) -> dict:
     data = client.get("/v1/organizations")
     orgs = data.get("data", [])
     for org in orgs:
         org_id = org.get("org_id") or settings.uber_default_org_id or "default_org"
         db.merge(UberOrganization(id=org["id"], org_id=org_id, name=org.get("name", "")))
     db.commit()
-
+    return {"pages": 1, "fetched": len(orgs), "saved": len(orgs)}
@@ -2,13 +2,15 @@ from datetime import datetime
 from sqlalchemy.orm import Session
 
 from app.core.config import get_settings
+from app.core.sync_ledger import tracked_sync
 from app.models.driver_payments import DriverPayment
 from app.uber_integration.uber_client import UberClient
 
 settings = get_settings()
 
 
-def sync_payments(db: Session, client: UberClient, since: datetime) -> None:
+@tracked_sync("uber", "payments")
+def sync_payments(db: Session, client: UberClient, since: datetime) -> dict:
     data = client.get("/v1/payments", params={"since": since.isoformat()})
     payments = data.get("data", [])
     for p in payments:
@@ -25,4 +27,4 @@ def sync_payments(db: Session, client: UberClient, since: datetime) -> None:
             )
         )
     db.commit()
-
+    return {"pages": 1, "fetched": len(payments), "saved": len(payments)}
@@ -1,13 +1,15 @@
 from sqlalchemy.orm import Session
 
 from app.core.config import get_settings
+from app.core.sync_ledger import tracked_sync
 from app.models.vehicle import UberVehicle
 from app.uber_integration.uber_client import UberClient
 
 settings = get_settings()
 
 
-def sync_vehicles(db: Session, client: UberClient) -> None:
+@tracked_sync("uber", "vehicles")
+def sync_vehicles(db: Session, client: UberClient) -> dict:
     data = client.get("/v1/vehicles")
     vehicles = data.get("data", [])
     for veh in vehicles:
@@ -21,4 +23,4 @@ def sync_vehicles(db: Session, client: UberClient) -> None:
             )
         )
     db.commit()
-
+    return {"pages": 1, "fetched": len(vehicles), "saved": len(vehicles)}
@@ -4,6 +4,7 @@ from typing import Any, Dict, Optional
 import httpx
 
 from app.core.config import get_settings
+from app.core.sync_ledger import timed_api_call
 from app.uber_integration.uber_scopes import SUPPLIER_SCOPES
 
 settings = get_settings()
@@ -36,12 +37,14 @@ class UberClient:
         return {"Authorization": f"Bearer {self._get_token()}"}
 
     def get(self, path: str, params: Optional[dict[str, Any]] = None) -> dict[str, Any]:
-        response = self._client.get(path, headers=self._headers(), params=params)
-        response.raise_for_status()
+        with timed_api_call("uber"):
+            response = self._client.get(path, headers=self._headers(), params=params)
+            response.raise_for_status()
         return response.json()
 
     def post(self, path: str, payload: dict[str, Any]) -> dict[str, Any]:
-        response = self._client.post(path, headers=self._headers(), json=payload)
-        response.raise_for_status()
+        with timed_api_call("uber"):
+            response = self._client.post(path, headers=self._headers(), json=payload)
+            response.raise_for_status()
         return response.json()
 
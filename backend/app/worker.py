@@ -0,0 +1,82 @@
+"""
+Process worker de synchronisation : python -m app.worker
+
+Exécute les jobs de la file durable (empilés par l'API et le scheduler) et le scheduler
+des tâches périodiques, hors du process uvicorn. Les métriques Prometheus des syncs
+(sync_*) sont exposées sur SYNC_WORKER_METRICS_PORT.
+
+Plusieurs workers peuvent tourner en parallèle (file Supabase) : un seul exécute le
+scheduler (leader élu), tous consomment la file.
+"""
+import signal
+import threading
+from typing import Callable
+
+from prometheus_client import start_http_server
+
+from app.core.config import get_settings
+from app.core import logging as app_logging
+
+settings = get_settings()
+logger = app_logging.get_logger(__name__)
+
+
+def start_scheduler() -> Callable[[], None]:
+    """
+    Démarre le scheduler persistant ; avec SCHEDULER_LEADER_ELECTION, seul le leader élu
+    l'exécute. Retourne la fonction d'arrêt.
+    """
+    from app.jobs.scheduler import create_scheduler
+    from app.jobs.leases import SchedulerLeader
+
+    scheduler = create_scheduler()
+    if not settings.scheduler_leader_election:
+        scheduler.resume()
+        logger.info("[SYNC WORKER] Scheduler démarré (sync quotidienne des données lourdes à 2h)")
+        return scheduler.shutdown
+
+    leader = SchedulerLeader(on_elected=scheduler.resume, on_demoted=scheduler.pause)
+    leader.start()
+    logger.info("[SYNC WORKER] Scheduler créé, exécution si ce process est élu leader")
+
+    def stop() -> None:
+        # Libérer le leadership tout de suite plutôt qu'à l'expiration du bail
+        leader.stop()
+        scheduler.shutdown(wait=False)
+
+    return stop
+
+
+def start_sync_services() -> Callable[[], None]:
+    """Démarre le worker de la file et le scheduler ; retourne la fonction d'arrêt."""
+    from app.jobs.worker import SyncWorker
+
+    worker = SyncWorker()
+    worker.start()
+    stop_scheduler = start_scheduler()
+
+    def stop() -> None:
+        stop_scheduler()
+        # Les jobs interrompus au-delà de ce délai sont remis en file (heartbeat expiré)
+        worker.stop(timeout=30)
+
+    return stop
+
+
+def main() -> None:
+    app_logging.setup_logging()
+    start_http_server(settings.sync_worker_metrics_port)
+    logger.info(f"[SYNC WORKER] Métriques Prometheus sur le port {settings.sync_worker_metrics_port}")
+
+    stopped = threading.Event()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(sig, lambda *_: stopped.set())
+
+    stop = start_sync_services()
+    stopped.wait()
+    logger.info("[SYNC WORKER] Arrêt demandé, fin des jobs en cours")
+    stop()
+
+
+if __name__ == "__main__":
+    main()
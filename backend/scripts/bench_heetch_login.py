@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Benchmark de la préparation d'une connexion Heetch : temps jusqu'à une page d'auth chargée.
+
+- avant : un Chromium neuf par connexion (async_playwright().start() -> launch -> new_context),
+  connexions exécutées l'une après l'autre comme sur l'ancien executor à un seul worker ;
+- après : browser_pool (Chromium gardé chaud, contexte réutilisé par org, images / polices /
+  analytics bloqués), connexions des différentes orgs lancées en parallèle.
+
+Nécessite Chromium (playwright install chromium) et un accès réseau à auth.heetch.com.
+Aucun numéro n'est saisi : seule la partie navigateur de start_login est mesurée.
+
+Usage:
+    python scripts/bench_heetch_login.py [--orgs 4] [--rounds 3]
+"""
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from pathlib import Path
+
+# Ajouter le répertoire app au path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from playwright.async_api import async_playwright
+
+from app.heetch_integration.browser_pool import USER_AGENT, BrowserPool
+
+AUTH_URL = "https://auth.heetch.com/?client_id=driver-portal&redirect_uri=https://driver.heetch.com/api/callback?requestURL=/dashboard"
+
+
+async def cold_login() -> float:
+    started = time.perf_counter()
+    playwright = await async_playwright().start()
+    browser = await playwright.chromium.launch(headless=True)
+    context = await browser.new_context(user_agent=USER_AGENT)
+    page = await context.new_page()
+    await page.goto(AUTH_URL, wait_until="domcontentloaded")
+    elapsed = time.perf_counter() - started
+    await browser.close()
+    await playwright.stop()
+    return elapsed
+
+
+async def pooled_login(pool: BrowserPool, key: str) -> float:
+    started = time.perf_counter()
+    context = await pool.acquire_context(key)
+    page = await context.new_page()
+    await page.goto(AUTH_URL, wait_until="domcontentloaded")
+    elapsed = time.perf_counter() - started
+    await page.close()
+    await pool.release(key)
+    return elapsed
+
+
+async def run_rounds(orgs: int, rounds: int, pool: BrowserPool) -> dict[str, list[float]]:
+    before, after = [], []
+    for _ in range(rounds):
+        round_started = time.perf_counter()
+        for _ in range(orgs):
+            await cold_login()
+        before.append(time.perf_counter() - round_started)
+
+        round_started = time.perf_counter()
+        await asyncio.gather(*(pooled_login(pool, f"org{i}:bench") for i in range(orgs)))
+        after.append(time.perf_counter() - round_started)
+    return {"avant": before, "après": after}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark des connexions Heetch : Chromium neuf vs pool de navigateurs")
+    parser.add_argument("--orgs", type=int, default=4, help="Connexions simultanées (une par org, défaut: 4)")
+    parser.add_argument("--rounds", type=int, default=3, help="Nombre de tours mesurés (défaut: 3)")
+    args = parser.parse_args()
+
+    async def launch_headless():
+        pool._playwright = await async_playwright().start()
+        return await pool._playwright.chromium.launch(headless=True)
+
+    pool = BrowserPool(max_contexts=args.orgs, idle_seconds=3600, launcher=launch_headless)
+    try:
+        results = pool.run(run_rounds, args.orgs, args.rounds, pool, timeout=3600)
+    finally:
+        pool.shutdown()
+
+    print(f"{args.orgs} connexion(s) par tour, {args.rounds} tour(s) (le 1er tour du pool inclut le lancement de Chromium)")
+    print(f"{'chemin':<8} {'1er tour (s)':>13} {'médiane (s)':>12}")
+    for name, durations in results.items():
+        print(f"{name:<8} {durations[0]:>13.2f} {statistics.median(durations):>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Benchmark d'une réponse de state logs volumineuse : latence (p50 / p99) et octets transférés.
+
+- avant : response_model (validation pydantic de chaque ligne) + JSONResponse (json stdlib), sans compression ;
+- après : trusted_response (projection sur le schéma + orjson) + CompressionMiddleware (gzip).
+
+Les requêtes passent par l'application ASGI en process (TestClient) : seuls l'encodage,
+la validation et la compression sont mesurés, pas le réseau ni PostgREST.
+
+Usage:
+    python scripts/bench_responses.py [--rows 20000] [--requests 50]
+"""
+import argparse
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+# Ajouter le répertoire app au path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse, ORJSONResponse
+from fastapi.testclient import TestClient
+
+from app.api.responses import trusted_response
+from app.core.compression import CompressionMiddleware
+from app.schemas.bolt_state_log import BoltStateLogSchema
+
+
+def fake_state_log_rows(count: int) -> list[dict]:
+    """Lignes telles que renvoyées par PostgREST pour bolt_state_logs."""
+    rng = random.Random(7)
+    rows = []
+    for i in range(count):
+        driver_uuid = f"driver-{rng.randint(1, 200):04d}-5f3c-4a8e-9d1b-2c7e8f6a0b3d"
+        created = 1700000000 + i * 30
+        rows.append({
+            "id": f"{driver_uuid}_{created}",
+            "org_id": "default_org",
+            "driver_uuid": driver_uuid,
+            "vehicle_uuid": f"vehicle-{rng.randint(1, 150):04d}",
+            "created": created,
+            "state": rng.choice(["waiting_orders", "has_order", "inactive"]),
+            "lat": round(48.85 + rng.uniform(-0.1, 0.1), 6),
+            "lng": round(2.35 + rng.uniform(-0.1, 0.1), 6),
+            "active_categories": {"bolt": True, "comfort": rng.choice([True, False])},
+        })
+    return rows
+
+
+def build_apps(rows: list[dict]) -> dict[str, FastAPI]:
+    before = FastAPI(default_response_class=JSONResponse)
+
+    @before.get("/bolt/state-logs", response_model=list[BoltStateLogSchema])
+    def before_endpoint():
+        return rows
+
+    after = FastAPI(default_response_class=ORJSONResponse)
+    after.add_middleware(CompressionMiddleware)
+
+    @after.get("/bolt/state-logs", response_model=list[BoltStateLogSchema])
+    def after_endpoint():
+        return trusted_response(rows, BoltStateLogSchema)
+
+    return {"avant": before, "après": after}
+
+
+def measure(app: FastAPI, requests: int) -> tuple[list[float], int, int]:
+    """Latences (ms), octets transférés et octets JSON décodés."""
+    client = TestClient(app)
+    headers = {"Accept-Encoding": "gzip"}
+    client.get("/bolt/state-logs", headers=headers)  # Préchauffage
+    latencies = []
+    for _ in range(requests):
+        started = time.perf_counter()
+        response = client.get("/bolt/state-logs", headers=headers)
+        latencies.append((time.perf_counter() - started) * 1000)
+    return latencies, int(response.headers["content-length"]), len(response.content)
+
+
+def percentile(values: list[float], q: float) -> float:
+    return statistics.quantiles(values, n=100, method="inclusive")[q - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark encodage JSON et compression d'une liste de state logs")
+    parser.add_argument("--rows", type=int, default=20000, help="Nombre de state logs (défaut: 20000)")
+    parser.add_argument("--requests", type=int, default=50, help="Nombre de requêtes mesurées (défaut: 50)")
+    args = parser.parse_args()
+
+    rows = fake_state_log_rows(args.rows)
+    print(f"{args.rows} state logs, {args.requests} requêtes")
+    print(f"{'chemin':<8} {'p50 (ms)':>10} {'p99 (ms)':>10} {'octets transférés':>18} {'JSON (octets)':>14}")
+    for name, app in build_apps(rows).items():
+        latencies, wire_bytes, json_bytes = measure(app, args.requests)
+        print(f"{name:<8} {percentile(latencies, 50):>10.1f} {percentile(latencies, 99):>10.1f} {wire_bytes:>18,} {json_bytes:>14,}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Benchmark de construction des lignes bolt_orders / bolt_state_logs :
+ancien chemin (instance ORM + SupabaseDB._instance_to_dict) vs mapping compilé (row_mapping).
+
+Usage:
+    python scripts/bench_row_mapping.py [--rows 20000] [--repeat 3]
+"""
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+# Ajouter le répertoire app au path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.bolt_integration.row_mapping import build_order_row, build_state_log_row
+from app.core.supabase_db import SupabaseDB
+from app.models.bolt_order import BoltOrder
+from app.models.bolt_state_log import BoltStateLog
+
+
+def fake_orders(count: int) -> list[dict]:
+    rng = random.Random(42)
+    orders = []
+    for i in range(count):
+        orders.append({
+            "order_reference": f"ref-{i}",
+            "driver_uuid": f"driver-{rng.randint(1, 200)}",
+            "partner_uuid": "partner",
+            "driver_name": "Jean Dupont",
+            "driver_phone": "+33600000000",
+            "payment_method": rng.choice(["cash", "card"]),
+            "payment_confirmed_timestamp": 1700000000 + i,
+            "order_created_timestamp": 1700000000 + i,
+            "order_status": rng.choice(["finished", "client_cancelled"]),
+            "vehicle_model": "Toyota Prius",
+            "vehicle_license_plate": "AA-123-BB",
+            "pickup_address": "1 rue de Rivoli, Paris",
+            "ride_distance": rng.choice([None, rng.uniform(1000, 20000)]),
+            "order_accepted_timestamp": 1700000010 + i,
+            "order_pickup_timestamp": 1700000300 + i,
+            "order_drop_off_timestamp": 1700001500 + i,
+            "order_finished_timestamp": 1700001500 + i,
+            "order_price": {
+                "ride_price": rng.uniform(8, 60),
+                "booking_fee": 1.0,
+                "toll_fee": None,
+                "cancellation_fee": None,
+                "tip": rng.choice([None, 2.0]),
+                "net_earnings": rng.uniform(6, 45),
+                "cash_discount": None,
+                "in_app_discount": 0,
+                "commission": rng.uniform(1, 15),
+                "currency": "EUR",
+            },
+            "is_scheduled": False,
+            "category_info": {"name": "Bolt", "seats": 4, "vehicle_type": "car"},
+            "order_stops": [{"lat": 48.85, "lng": 2.35}],
+        })
+    return orders
+
+
+def fake_state_logs(count: int) -> list[dict]:
+    rng = random.Random(7)
+    return [
+        {
+            "driver_uuid": f"driver-{rng.randint(1, 200)}",
+            "vehicle_uuid": "vehicle",
+            "created": 1700000000 + i,
+            "state": rng.choice(["waiting_orders", "has_order", "inactive"]),
+            "lat": 48.85,
+            "lng": 2.35,
+            "active_categories": [{"id": 1}],
+        }
+        for i in range(count)
+    ]
+
+
+def legacy_order_rows(db: SupabaseDB, orders: list[dict], org_id: str, company_id: str) -> list[dict]:
+    """Reproduction de l'ancien chemin de sync_trips : BoltOrder(...) puis _instance_to_dict."""
+    rows = []
+    for order in orders:
+        order_price = order.get("order_price", {})
+        category_info = order.get("category_info", {})
+        order_stops = order.get("order_stops", [])
+        bolt_order = BoltOrder(
+            order_reference=order.get("order_reference"),
+            org_id=org_id,
+            company_id=int(company_id),
+            company_name=None,
+            driver_uuid=order.get("driver_uuid"),
+            partner_uuid=order.get("partner_uuid"),
+            driver_name=order.get("driver_name"),
+            driver_phone=order.get("driver_phone"),
+            payment_method=order.get("payment_method"),
+            payment_confirmed_timestamp=order.get("payment_confirmed_timestamp"),
+            order_created_timestamp=order.get("order_created_timestamp"),
+            order_status=order.get("order_status"),
+            driver_cancelled_reason=order.get("driver_cancelled_reason"),
+            vehicle_model=order.get("vehicle_model"),
+            vehicle_license_plate=order.get("vehicle_license_plate"),
+            price_review_reason=order.get("price_review_reason"),
+            pickup_address=order.get("pickup_address"),
+            ride_distance=order.get("ride_distance") or 0,
+            order_accepted_timestamp=order.get("order_accepted_timestamp"),
+            order_pickup_timestamp=order.get("order_pickup_timestamp"),
+            order_drop_off_timestamp=order.get("order_drop_off_timestamp"),
+            order_finished_timestamp=order.get("order_finished_timestamp"),
+            ride_price=order_price.get("ride_price") if order_price.get("ride_price") is not None else 0,
+            booking_fee=order_price.get("booking_fee") if order_price.get("booking_fee") is not None else 0,
+            toll_fee=order_price.get("toll_fee") if order_price.get("toll_fee") is not None else 0,
+            cancellation_fee=order_price.get("cancellation_fee") if order_price.get("cancellation_fee") is not None else 0,
+            tip=order_price.get("tip") if order_price.get("tip") is not None else 0,
+            net_earnings=order_price.get("net_earnings") if order_price.get("net_earnings") is not None else 0,
+            cash_discount=order_price.get("cash_discount") if order_price.get("cash_discount") is not None else 0,
+            in_app_discount=order_price.get("in_app_discount") if order_price.get("in_app_discount") is not None else 0,
+            commission=order_price.get("commission") if order_price.get("commission") is not None else 0,
+            currency=order_price.get("currency") or "EUR",
+            is_scheduled=order.get("is_scheduled", False),
+            category_name=category_info.get("name"),
+            category_seats=category_info.get("seats"),
+            category_vehicle_type=category_info.get("vehicle_type"),
+            order_stops=order_stops if order_stops else None,
+        )
+        rows.append(db._instance_to_dict(bolt_order))
+    return rows
+
+
+def legacy_state_log_rows(db: SupabaseDB, logs: list[dict], org_id: str) -> list[dict]:
+    """Reproduction de l'ancien chemin de sync_state_logs."""
+    rows = []
+    for log in logs:
+        active_categories = log.get("active_categories")
+        bolt_state_log = BoltStateLog(
+            id=f"{log.get('driver_uuid')}_{log.get('created')}",
+            org_id=org_id,
+            driver_uuid=log.get("driver_uuid"),
+            vehicle_uuid=log.get("vehicle_uuid"),
+            created=log.get("created"),
+            state=log.get("state"),
+            lat=log.get("lat"),
+            lng=log.get("lng"),
+            active_categories=active_categories if active_categories else None,
+        )
+        rows.append(db._instance_to_dict(bolt_state_log))
+    return rows
+
+
+def best_rate(fn, rows: int, repeat: int) -> float:
+    """Meilleur débit (lignes/s) sur repeat exécutions."""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return rows / best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark ORM vs mapping compilé pour les lignes Bolt")
+    parser.add_argument("--rows", type=int, default=20000, help="Nombre de lignes par stream (défaut: 20000)")
+    parser.add_argument("--repeat", type=int, default=3, help="Nombre de répétitions (défaut: 3)")
+    args = parser.parse_args()
+
+    db = SupabaseDB(client=object())  # Aucun appel réseau : seule la construction des lignes est mesurée
+    orders = fake_orders(args.rows)
+    logs = fake_state_logs(args.rows)
+    ctx = {"org_id": "org", "company_id": "42", "company_name": None}
+
+    # Vérifier que les deux chemins produisent exactement les mêmes lignes
+    assert legacy_order_rows(db, orders[:500], "org", "42") == [build_order_row(o, ctx) for o in orders[:500]]
+    assert legacy_state_log_rows(db, logs[:500], "org") == [build_state_log_row(log, ctx) for log in logs[:500]]
+
+    benches = (
+        ("orders", lambda: legacy_order_rows(db, orders, "org", "42"), lambda: [build_order_row(o, ctx) for o in orders]),
+        ("state_logs", lambda: legacy_state_log_rows(db, logs, "org"), lambda: [build_state_log_row(log, ctx) for log in logs]),
+    )
+    print(f"{'stream':<12} {'ORM (lignes/s)':>16} {'compilé (lignes/s)':>20} {'gain':>8}")
+    for name, legacy, compiled in benches:
+        legacy_rate = best_rate(legacy, args.rows, args.repeat)
+        compiled_rate = best_rate(compiled, args.rows, args.repeat)
+        print(f"{name:<12} {legacy_rate:>16,.0f} {compiled_rate:>20,.0f} {compiled_rate / legacy_rate:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
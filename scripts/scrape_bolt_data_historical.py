@@ -1,15 +1,21 @@
 #!/usr/bin/env python3
 """
-Script pour scraper les données Bolt sur une période historique (6 mois ou 31 jours).
-Récupère les données par fenêtres de 7 jours pour tous les chauffeurs.
+Script pour scraper les données Bolt sur une période historique (6 mois par défaut, 16 mois max).
+
+Utilise le moteur de backfill (app.bolt_integration.backfill) : un manifeste persistant
+fenêtres × streams (orders, state logs) est créé, puis exécuté par un pool borné de workers.
+Les fenêtres sont adaptatives (jours creux fusionnés, jours chargés découpés d'après les densités
+observées ou mesurées par sonde avec --probe). Après un crash, --resume reprend là où le run
+s'est arrêté et ne rejoue que les cellules non terminées ou en échec.
 
 Usage:
-    python scripts/scrape_bolt_data_historical.py [--max-days 180] [--org-id ORG_ID] [--company-id COMPANY_ID]
+    python scripts/scrape_bolt_data_historical.py [--max-days 180] [--org-id ORG_ID] [--company-id COMPANY_ID] [--workers 4] [--probe]
+    python scripts/scrape_bolt_data_historical.py --resume MANIFEST_ID
+    python scripts/scrape_bolt_data_historical.py --list [--org-id ORG_ID]
 """
 
 import argparse
 import sys
-import time
 from datetime import datetime, timedelta
 from pathlib import Path
 
@@ -28,11 +34,10 @@ else:
 
 from app.core.config import get_settings
 from app.core.db import get_db
+from app.bolt_integration.backfill import BackfillManifest, create_backfill, run_backfill
 from app.bolt_integration.bolt_client import BoltClient
-from app.bolt_integration.services_state_logs import sync_state_logs
-from app.bolt_integration.services_trips import sync_trips
+from app.bolt_integration.services_orgs import get_company_ids
 from app.models.bolt_driver import BoltDriver
-from app.models.bolt_org import BoltOrganization
 from app.core import logging as app_logging
 
 logger = app_logging.get_logger(__name__)
@@ -46,92 +51,30 @@ def get_all_drivers(db, org_id: str) -> list[BoltDriver]:
     return drivers
 
 
-def scrape_data_period(
-    db,
-    client: BoltClient,
-    start_date: datetime,
-    end_date: datetime,
-    company_id: str,
-    org_id: str,
-    window_days: int = 7,
-) -> dict:
-    """
-    Scrape les données de tous les chauffeurs sur une période donnée, par fenêtres de 7 jours.
-    Les services Bolt récupèrent toutes les données de l'organisation, pas par chauffeur individuel.
-    
-    Returns:
-        dict avec les statistiques de scraping
-    """
-    stats = {
-        "state_logs_windows": 0,
-        "orders_windows": 0,
-        "errors": [],
-    }
-    
-    current_start = start_date
-    window_delta = timedelta(days=window_days)
-    
-    logger.info(f"Scraping données de {start_date.date()} à {end_date.date()}")
-    
-    while current_start < end_date:
-        # Calculer la fin de la fenêtre (7 jours ou jusqu'à end_date)
-        current_end = min(current_start + window_delta, end_date)
-        
-        try:
-            logger.info(f"  Fenêtre: {current_start.date()} -> {current_end.date()}")
-            
-            # Scraper les state logs pour cette fenêtre (pour tous les chauffeurs)
-            try:
-                sync_state_logs(
-                    db=db,
-                    client=client,
-                    company_id=company_id,
-                    start=current_start,
-                    end=current_end,
-                    org_id=org_id,
-                    incremental=False,  # Mode non-incrémental pour forcer la sync de cette période
-                )
-                stats["state_logs_windows"] += 1
-                logger.info(f"    ✓ State logs synchronisés pour {current_start.date()} -> {current_end.date()}")
-            except Exception as e:
-                error_msg = f"Erreur state logs {current_start.date()} -> {current_end.date()}: {str(e)}"
-                logger.error(f"    ✗ {error_msg}")
-                stats["errors"].append(error_msg)
-            
-            # Scraper les orders pour cette fenêtre (pour tous les chauffeurs)
-            try:
-                sync_trips(
-                    db=db,
-                    client=client,
-                    company_id=company_id,
-                    start=current_start,
-                    end=current_end,
-                    org_id=org_id,
-                    incremental=False,  # Mode non-incrémental
-                )
-                stats["orders_windows"] += 1
-                logger.info(f"    ✓ Orders synchronisés pour {current_start.date()} -> {current_end.date()}")
-            except Exception as e:
-                error_msg = f"Erreur orders {current_start.date()} -> {current_end.date()}: {str(e)}"
-                logger.error(f"    ✗ {error_msg}")
-                stats["errors"].append(error_msg)
-            
-            # Petite pause pour éviter de surcharger l'API
-            time.sleep(0.5)
-            
-        except Exception as e:
-            error_msg = f"Erreur générale {current_start.date()} -> {current_end.date()}: {str(e)}"
-            logger.error(f"    ✗ {error_msg}")
-            stats["errors"].append(error_msg)
-        
-        # Passer à la fenêtre suivante
-        current_start = current_end
-    
-    return stats
+def format_duration(seconds: float | None) -> str:
+    if seconds is None:
+        return "?"
+    minutes, secs = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}h{minutes:02d}m{secs:02d}s" if hours else f"{minutes}m{secs:02d}s"
+
+
+def print_progress(progress: dict) -> None:
+    """Affiche une barre de progression sur une ligne (cellules, lignes, ETA)."""
+    width = 30
+    filled = int(width * progress["percent"] / 100)
+    bar = "█" * filled + "·" * (width - filled)
+    print(
+        f"\r[{bar}] {progress['done']}/{progress['total']} ({progress['percent']}%) "
+        f"| échecs: {progress['failed']} | lignes: {progress['rows']} "
+        f"| écoulé: {format_duration(progress['elapsed_seconds'])} | ETA: {format_duration(progress['eta_seconds'])}",
+        end="",
+        flush=True,
+    )
 
 
 def main():
-    parser = argparse.ArgumentParser(description="Scrape les données Bolt historiques")
+    parser = argparse.ArgumentParser(description="Scrape les données Bolt historiques (backfill parallèle et reprenable)")
     parser.add_argument(
         "--max-days",
         type=int,
@@ -148,35 +91,68 @@ def main():
         "--company-id",
         type=str,
         default=None,
-        help="Company ID Bolt (défaut: depuis la DB ou settings)",
+        help="Company ID Bolt (défaut: toutes les companies de l'org en DB, sinon settings)",
+    )
+    parser.add_argument(
+        "--streams",
+        nargs="+",
+        default=["orders", "state_logs"],
+        choices=["orders", "state_logs"],
+        help="Streams à backfiller (défaut: orders state_logs)",
     )
     parser.add_argument(
         "--window-days",
         type=int,
         default=7,
-        help="Taille de la fenêtre en jours (défaut: 7)",
+        help="Taille de fenêtre supposée pour les jours jamais observés (défaut: 7)",
+    )
+    parser.add_argument(
+        "--target-pages",
+        type=int,
+        default=None,
+        help="Nombre de pages visé par fenêtre (défaut: BOLT_WINDOW_TARGET_PAGES)",
     )
     parser.add_argument(
-        "--try-31-days",
+        "--probe",
         action="store_true",
-        help="Essayer aussi avec 31 jours si 6 mois échoue (défaut: True)",
+        help="Mesurer par requête sonde la densité des jours jamais observés avant de planifier",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=4,
+        help="Nombre de fenêtres traitées en parallèle (défaut: 4)",
     )
     parser.add_argument(
-        "--no-try-31-days",
-        dest="try_31_days",
+        "--resume",
+        metavar="MANIFEST_ID",
+        default=None,
+        help="Reprendre un backfill existant (seules les cellules non terminées sont rejouées)",
+    )
+    parser.add_argument(
+        "--no-retry-failed",
+        dest="retry_failed",
         action="store_false",
-        help="Ne pas essayer avec 31 jours si 6 mois échoue",
+        help="Lors d'une reprise, ne pas rejouer les cellules en échec",
+    )
+    parser.add_argument(
+        "--list",
+        action="store_true",
+        help="Lister les backfills existants de l'org et quitter",
     )
     
     args = parser.parse_args()
     
-    # Par défaut, essayer avec 31 jours si --no-try-31-days n'a pas été utilisé
-    # Avec action="store_true" et action="store_false", si aucune option n'est spécifiée,
-    # try_31_days sera False. On le met à True par défaut sauf si --no-try-31-days est présent.
-    if '--no-try-31-days' not in sys.argv:
-        args.try_31_days = True
+    # Déterminer org_id
+    org_id = args.org_id or settings.bolt_default_fleet_id or settings.uber_default_org_id or "default_org"
+    
+    if args.list:
+        for manifest in BackfillManifest.list_for_org(org_id):
+            progress = manifest.progress()
+            print(f"{manifest.id}  {progress['done']}/{progress['total']} terminées, {progress['failed']} en échec, maj {progress['updated_at']}")
+        return
     
-    # Initialiser la DB et le client Bolt
+    # Initialiser la DB
     # Utiliser get_db() qui fonctionne avec ou sans Supabase selon la configuration
     try:
         db = next(get_db())
@@ -199,105 +175,76 @@ def main():
         else:
             raise
     
-    client = BoltClient()
-    
-    # Déterminer org_id
-    org_id = args.org_id or settings.bolt_default_fleet_id or settings.uber_default_org_id
-    if not org_id:
-        logger.error("org_id est requis. Utilisez --org-id ou configurez BOLT_DEFAULT_FLEET_ID")
-        sys.exit(1)
-    
-    # Déterminer company_id
-    company_id = args.company_id
-    if not company_id:
-        # Essayer de récupérer depuis la DB
-        bolt_org = db.query(BoltOrganization).filter(BoltOrganization.org_id == org_id).first()
-        if bolt_org:
-            company_id = bolt_org.id
-            logger.info(f"Utilisation du company_id depuis la DB: {company_id}")
-        else:
-            # Fallback sur les settings
-            company_id = settings.bolt_default_fleet_id
-    
-    if not company_id:
-        logger.error("company_id est requis. Utilisez --company-id ou configurez BOLT_DEFAULT_FLEET_ID")
-        sys.exit(1)
-    
-    # Calculer les dates
-    end_date = datetime.utcnow()
-    start_date_6months = end_date - timedelta(days=args.max_days)
-    start_date_31days = end_date - timedelta(days=31)
-    
-    logger.info("=" * 80)
-    logger.info("SCRAPING DES DONNÉES BOLT HISTORIQUES")
-    logger.info("=" * 80)
-    logger.info(f"Org ID: {org_id}")
-    logger.info(f"Company ID: {company_id}")
-    logger.info(f"Période: {start_date_6months.date()} -> {end_date.date()} ({args.max_days} jours)")
-    logger.info(f"Fenêtre: {args.window_days} jours")
-    logger.info("=" * 80)
-    
-    # Vérifier qu'il y a des chauffeurs (optionnel, juste pour info)
-    drivers = get_all_drivers(db, org_id)
-    logger.info(f"Nombre de chauffeurs dans l'organisation: {len(drivers)}")
-    
-    # Essayer d'abord avec 6 mois (ou max-days)
-    logger.info(f"\nTentative avec {args.max_days} jours...")
-    try:
-        stats = scrape_data_period(
-            db=db,
-            client=client,
-            start_date=start_date_6months,
-            end_date=end_date,
-            company_id=company_id,
-            org_id=org_id,
-            window_days=args.window_days,
-        )
+    if args.resume:
+        try:
+            manifest = BackfillManifest.load(args.resume)
+        except FileNotFoundError as e:
+            logger.error(str(e))
+            sys.exit(1)
+        org_id = manifest.org_id
+        logger.info(f"Reprise du backfill {manifest.id} (org_id={org_id})")
+    else:
+        company_ids = get_company_ids(db, org_id, args.company_id)
+        if not company_ids:
+            logger.error("company_id est requis. Utilisez --company-id ou configurez BOLT_DEFAULT_FLEET_ID")
+            sys.exit(1)
         
-        logger.info("\n" + "=" * 80)
-        logger.info("SCRAPING TERMINÉ")
-        logger.info("=" * 80)
-        logger.info(f"Fenêtres state logs traitées: {stats['state_logs_windows']}")
-        logger.info(f"Fenêtres orders traitées: {stats['orders_windows']}")
-        logger.info(f"Total erreurs: {len(stats['errors'])}")
+        end_date = datetime.utcnow()
+        start_date = end_date - timedelta(days=args.max_days)
         
-        if stats["errors"]:
-            logger.warning("\nErreurs rencontrées:")
-            for error in stats["errors"][:10]:  # Afficher les 10 premières
-                logger.warning(f"  - {error}")
-            if len(stats["errors"]) > 10:
-                logger.warning(f"  ... et {len(stats['errors']) - 10} autres erreurs")
+        logger.info("=" * 80)
+        logger.info("SCRAPING DES DONNÉES BOLT HISTORIQUES")
+        logger.info("=" * 80)
+        logger.info(f"Org ID: {org_id}")
+        logger.info(f"Company IDs: {', '.join(company_ids)}")
+        logger.info(f"Période: {start_date.date()} -> {end_date.date()} ({args.max_days} jours)")
+        logger.info(f"Fenêtres: adaptatives, ~{args.target_pages or settings.bolt_window_target_pages} page(s) par fenêtre")
+        logger.info(f"Workers: {args.workers}")
+        logger.info("=" * 80)
         
-    except Exception as e:
-        logger.error(f"Erreur lors du scraping: {e}", exc_info=True)
+        # Vérifier qu'il y a des chauffeurs (optionnel, juste pour info)
+        drivers = get_all_drivers(db, org_id)
+        logger.info(f"Nombre de chauffeurs dans l'organisation: {len(drivers)}")
         
-        # Si demandé, essayer avec 31 jours
-        if args.try_31_days:
-            logger.info(f"\nTentative avec 31 jours...")
-            try:
-                stats = scrape_data_period(
-                    db=db,
-                    client=client,
-                    start_date=start_date_31days,
-                    end_date=end_date,
-                    company_id=company_id,
-                    org_id=org_id,
-                    window_days=args.window_days,
-                )
-                
-                logger.info("\n" + "=" * 80)
-                logger.info("SCRAPING TERMINÉ (31 jours)")
-                logger.info("=" * 80)
-                logger.info(f"Fenêtres state logs traitées: {stats['state_logs_windows']}")
-                logger.info(f"Fenêtres orders traitées: {stats['orders_windows']}")
-                logger.info(f"Total erreurs: {len(stats['errors'])}")
-            except Exception as e2:
-                logger.error(f"Erreur lors du scraping 31 jours: {e2}", exc_info=True)
-                sys.exit(1)
-        else:
-            sys.exit(1)
+        manifest = create_backfill(
+            org_id,
+            company_ids,
+            start_date,
+            end_date,
+            streams=tuple(args.streams),
+            target_pages=args.target_pages,
+            default_window_days=args.window_days,
+            probe_client=BoltClient() if args.probe else None,
+        )
+        logger.info(f"Manifeste: {manifest.path} (reprise: --resume {manifest.id})")
+    
+    progress = run_backfill(
+        manifest,
+        db,
+        max_workers=args.workers,
+        retry_failed=args.retry_failed,
+        on_progress=print_progress,
+    )
+    print()
+    
+    logger.info("\n" + "=" * 80)
+    logger.info("SCRAPING TERMINÉ")
+    logger.info("=" * 80)
+    logger.info(f"Cellules terminées: {progress['done']}/{progress['total']}")
+    logger.info(f"Pages Bolt récupérées: {progress['pages']}")
+    logger.info(f"Lignes récupérées: {progress['rows']}")
+    logger.info(f"Durée: {format_duration(progress['elapsed_seconds'])}")
+    
+    failed = [cell for cell in manifest.cells if cell.status == "failed"]
+    if failed:
+        logger.warning(f"\n{len(failed)} cellule(s) en échec:")
+        for cell in failed[:10]:  # Afficher les 10 premières
+            logger.warning(f"  - {cell.label}: {cell.error}")
+        if len(failed) > 10:
+            logger.warning(f"  ... et {len(failed) - 10} autres erreurs")
+        logger.warning(f"Relancer avec --resume {manifest.id} pour rejouer uniquement ces cellules")
+        sys.exit(1)
 
 
 if __name__ == "__main__":
     main()
-
@@ -0,0 +1,9 @@
+-- Rollups incrémentaux de daily_analytics / user_analytics (app/analytics/rollups.py).
+-- À exécuter après supabase/analytics_and_users.sql. Les upserts du backend s'appuient sur
+-- les contraintes d'unicité (org_id, date) et (org_id, driver_uuid, date).
+
+-- Plateforme de la ligne user_analytics (bolt, heetch ; driver_uuid = email pour Heetch)
+ALTER TABLE user_analytics ADD COLUMN IF NOT EXISTS platform TEXT DEFAULT 'bolt';
+CREATE INDEX IF NOT EXISTS ix_user_analytics_org_platform_date ON user_analytics(org_id, platform, date);
+
+COMMENT ON COLUMN user_analytics.platform IS 'Plateforme de la cellule (bolt, heetch) ; maintenu par les rollups après chaque sync';
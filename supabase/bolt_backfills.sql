@@ -0,0 +1,37 @@
+-- Backfills Bolt (POST /bolt/sync/backfill) : manifeste et avancement de chaque fenêtre.
+-- Créés par l'API, exécutés par le worker (conteneurs distincts) : l'état doit être en base.
+
+CREATE TABLE IF NOT EXISTS bolt_backfills (
+    id TEXT PRIMARY KEY, -- Généré: date de création + suffixe aléatoire
+    org_id TEXT NOT NULL,
+    start_ts BIGINT NOT NULL,
+    end_ts BIGINT NOT NULL,
+    created_at DOUBLE PRECISION NOT NULL,
+    updated_at DOUBLE PRECISION NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_bolt_backfills_org ON bolt_backfills(org_id, created_at DESC);
+
+CREATE TABLE IF NOT EXISTS bolt_backfill_cells (
+    id TEXT PRIMARY KEY, -- Généré: backfill_id + position
+    backfill_id TEXT NOT NULL REFERENCES bolt_backfills(id) ON DELETE CASCADE,
+    org_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    stream TEXT NOT NULL,
+    company_id TEXT NOT NULL,
+    start_ts BIGINT NOT NULL,
+    end_ts BIGINT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    pages INTEGER NOT NULL DEFAULT 0,
+    rows INTEGER NOT NULL DEFAULT 0,
+    duration_seconds DOUBLE PRECISION NOT NULL DEFAULT 0,
+    error TEXT
+);
+
+-- Cellules d'un backfill (reprise, détail) et de tous les backfills d'une org (liste)
+CREATE INDEX IF NOT EXISTS idx_bolt_backfill_cells_backfill ON bolt_backfill_cells(backfill_id, position);
+CREATE INDEX IF NOT EXISTS idx_bolt_backfill_cells_org ON bolt_backfill_cells(org_id);
+
+COMMENT ON TABLE bolt_backfills IS 'Manifestes des backfills Bolt (partagés entre API et worker)';
+COMMENT ON TABLE bolt_backfill_cells IS 'Fenêtres des backfills Bolt et leur avancement (une ligne par cellule)';
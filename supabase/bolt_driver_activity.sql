@@ -0,0 +1,27 @@
+-- Activité quotidienne précalculée des drivers Bolt (moteur app/analytics/driver_activity.py),
+-- recalculée pour les jours touchés par chaque sync des state logs et des commandes.
+
+CREATE TABLE IF NOT EXISTS bolt_driver_activity_daily (
+    id TEXT PRIMARY KEY, -- Généré: driver_uuid + jour
+    org_id TEXT NOT NULL,
+    driver_uuid TEXT NOT NULL,
+    day DATE NOT NULL, -- Jour local (ANALYTICS_TIMEZONE)
+    online_seconds INTEGER NOT NULL DEFAULT 0,
+    busy_seconds INTEGER NOT NULL DEFAULT 0,
+    waiting_seconds INTEGER NOT NULL DEFAULT 0,
+    idle_gap_seconds INTEGER NOT NULL DEFAULT 0,
+    idle_gaps INTEGER NOT NULL DEFAULT 0,
+    trips INTEGER NOT NULL DEFAULT 0,
+    on_trip_seconds INTEGER NOT NULL DEFAULT 0,
+    gross_earnings DOUBLE PRECISION NOT NULL DEFAULT 0,
+    net_earnings DOUBLE PRECISION NOT NULL DEFAULT 0,
+    distance_km DOUBLE PRECISION NOT NULL DEFAULT 0,
+    utilisation DOUBLE PRECISION NOT NULL DEFAULT 0,
+    trips_per_online_hour DOUBLE PRECISION NOT NULL DEFAULT 0,
+    earnings_per_online_hour DOUBLE PRECISION NOT NULL DEFAULT 0
+);
+
+CREATE INDEX IF NOT EXISTS idx_bolt_driver_activity_org_day ON bolt_driver_activity_daily(org_id, day);
+CREATE INDEX IF NOT EXISTS idx_bolt_driver_activity_driver_day ON bolt_driver_activity_daily(org_id, driver_uuid, day);
+
+COMMENT ON TABLE bolt_driver_activity_daily IS 'Activité quotidienne des drivers Bolt (temps en ligne, utilisation, courses et revenus par heure)';
@@ -0,0 +1,22 @@
+-- Intervalles d'état des drivers Bolt, compactés à l'ingestion depuis bolt_state_logs
+-- (logs consécutifs de même état et même véhicule fusionnés en un intervalle [start_ts, end_ts]).
+
+CREATE TABLE IF NOT EXISTS bolt_state_intervals (
+    id TEXT PRIMARY KEY, -- Généré: driver_uuid + start_ts
+    org_id TEXT NOT NULL,
+    driver_uuid TEXT NOT NULL,
+    vehicle_uuid TEXT,
+    state TEXT NOT NULL,
+    start_ts BIGINT NOT NULL,
+    end_ts BIGINT NOT NULL,
+    log_count INTEGER NOT NULL DEFAULT 1,
+    is_open BOOLEAN NOT NULL DEFAULT FALSE
+);
+
+-- Frise d'un driver et recherche de l'intervalle contenant un timestamp
+CREATE INDEX IF NOT EXISTS idx_bolt_state_intervals_driver ON bolt_state_intervals(org_id, driver_uuid, start_ts);
+-- Intervalles d'une org chevauchant une période
+CREATE INDEX IF NOT EXISTS idx_bolt_state_intervals_org_period ON bolt_state_intervals(org_id, start_ts, end_ts);
+
+COMMENT ON TABLE bolt_state_intervals IS 'Intervalles d''état des drivers Bolt (compaction de bolt_state_logs à l''ingestion)';
+COMMENT ON COLUMN bolt_state_intervals.end_ts IS 'Début de l''intervalle suivant, ou dernier log reçu si is_open';
@@ -0,0 +1,83 @@
+-- File de jobs de synchronisation (SYNC_JOB_STORE=supabase) : empilés par l'API et le scheduler,
+-- exécutés par les workers (python -m app.worker). Les horodatages sont des epochs (secondes).
+
+CREATE TABLE IF NOT EXISTS sync_jobs (
+    id VARCHAR(64) PRIMARY KEY,
+    kind VARCHAR(64) NOT NULL,
+    org_id VARCHAR(255) NOT NULL,
+    params JSONB NOT NULL DEFAULT '{}',
+    priority INTEGER NOT NULL DEFAULT 0,
+    status VARCHAR(16) NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT 3,
+    run_after DOUBLE PRECISION NOT NULL,
+    dedupe_key VARCHAR(255),
+    created_at DOUBLE PRECISION NOT NULL,
+    started_at DOUBLE PRECISION,
+    finished_at DOUBLE PRECISION,
+    heartbeat_at DOUBLE PRECISION,
+    worker_id VARCHAR(255),
+    progress JSONB NOT NULL DEFAULT '{}',
+    result JSONB,
+    error TEXT
+);
+
+CREATE INDEX IF NOT EXISTS idx_sync_jobs_ready ON sync_jobs(status, run_after);
+CREATE INDEX IF NOT EXISTS idx_sync_jobs_org ON sync_jobs(org_id, created_at DESC);
+-- Jobs démarrés récemment par org (partage équitable de claim_sync_job)
+CREATE INDEX IF NOT EXISTS idx_sync_jobs_org_started ON sync_jobs(org_id, started_at);
+-- Un seul job actif par clé de déduplication
+CREATE UNIQUE INDEX IF NOT EXISTS idx_sync_jobs_dedupe ON sync_jobs(dedupe_key) WHERE status IN ('queued', 'running');
+
+-- Empile un job ; si un job actif de même dedupe_key existe, le retourne à la place.
+CREATE OR REPLACE FUNCTION enqueue_sync_job(p_job JSONB)
+RETURNS SETOF sync_jobs
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    RETURN QUERY
+    INSERT INTO sync_jobs
+    SELECT * FROM jsonb_populate_record(NULL::sync_jobs, p_job)
+    ON CONFLICT (dedupe_key) WHERE status IN ('queued', 'running') DO NOTHING
+    RETURNING *;
+    IF NOT FOUND THEN
+        RETURN QUERY
+        SELECT * FROM sync_jobs
+        WHERE dedupe_key = p_job->>'dedupe_key' AND status IN ('queued', 'running')
+        LIMIT 1;
+    END IF;
+END;
+$$;
+
+-- Réclame le prochain job prêt par partage équitable pondéré entre orgs : plus petit temps virtuel
+-- (jobs de l'org démarrés depuis p_fair_window secondes, divisés par 1 + priorité du job), puis
+-- priorité décroissante, puis ancienneté. Une org prioritaire reçoit plus de créneaux sans affamer
+-- les autres. SKIP LOCKED : deux workers ne réclament jamais le même job.
+DROP FUNCTION IF EXISTS claim_sync_job(TEXT, DOUBLE PRECISION);
+CREATE OR REPLACE FUNCTION claim_sync_job(p_worker_id TEXT, p_now DOUBLE PRECISION, p_fair_window DOUBLE PRECISION DEFAULT 3600)
+RETURNS SETOF sync_jobs
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    RETURN QUERY
+    UPDATE sync_jobs AS j
+    SET status = 'running',
+        attempts = j.attempts + 1,
+        worker_id = p_worker_id,
+        started_at = p_now,
+        heartbeat_at = p_now,
+        error = NULL
+    WHERE j.id = (
+        SELECT c.id FROM sync_jobs c
+        WHERE c.status = 'queued' AND c.run_after <= p_now
+        ORDER BY (SELECT count(*) FROM sync_jobs s WHERE s.org_id = c.org_id AND s.started_at >= p_now - p_fair_window)::DOUBLE PRECISION
+                     / (1 + GREATEST(c.priority, 0)),
+                 c.priority DESC, c.run_after, c.created_at
+        LIMIT 1
+        FOR UPDATE OF c SKIP LOCKED
+    )
+    RETURNING j.*;
+END;
+$$;
+
+COMMENT ON TABLE sync_jobs IS 'File durable des jobs de synchronisation (priorités, relances avec backoff, heartbeats)';
@@ -0,0 +1,42 @@
+-- Baux (leases) de synchronisation : une ligne par flux en cours, clé "org_id:flux"
+-- (ex: "org_123:bolt_state_logs"), plus "deployment:scheduler" pour l'élection du scheduler.
+-- Un bail expiré (worker mort) peut être repris par n'importe quel détenteur.
+
+CREATE TABLE IF NOT EXISTS sync_leases (
+    key VARCHAR(255) PRIMARY KEY,
+    holder VARCHAR(255) NOT NULL,
+    acquired_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+    expires_at TIMESTAMP WITH TIME ZONE NOT NULL
+);
+
+-- Prend ou renouvelle un bail de manière atomique.
+-- Retourne le détenteur courant : p_holder si le bail est obtenu, l'autre détenteur sinon.
+CREATE OR REPLACE FUNCTION acquire_sync_lease(p_key TEXT, p_holder TEXT, p_ttl_seconds INTEGER)
+RETURNS TEXT
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    current_holder TEXT;
+BEGIN
+    INSERT INTO sync_leases AS l (key, holder, acquired_at, expires_at)
+    VALUES (p_key, p_holder, NOW(), NOW() + make_interval(secs => p_ttl_seconds))
+    ON CONFLICT (key) DO UPDATE
+        SET holder = EXCLUDED.holder,
+            acquired_at = CASE WHEN l.holder = EXCLUDED.holder THEN l.acquired_at ELSE NOW() END,
+            expires_at = EXCLUDED.expires_at
+        WHERE l.expires_at < NOW() OR l.holder = EXCLUDED.holder;
+
+    SELECT holder INTO current_holder FROM sync_leases WHERE key = p_key;
+    RETURN current_holder;
+END;
+$$;
+
+-- Libère un bail, uniquement s'il appartient encore à p_holder
+CREATE OR REPLACE FUNCTION release_sync_lease(p_key TEXT, p_holder TEXT)
+RETURNS VOID
+LANGUAGE sql
+AS $$
+    DELETE FROM sync_leases WHERE key = p_key AND holder = p_holder;
+$$;
+
+COMMENT ON TABLE sync_leases IS 'Baux de synchronisation par (org, flux) et élection du scheduler, renouvelés par heartbeat';
@@ -0,0 +1,34 @@
+-- Journal des runs de synchronisation (Bolt, Heetch, Uber)
+-- Une ligne par run : créée au démarrage (status = running), complétée à la fin (success / error)
+
+CREATE TABLE IF NOT EXISTS sync_runs (
+    id VARCHAR(64) PRIMARY KEY,
+    org_id VARCHAR(255) NOT NULL,
+    provider VARCHAR(32) NOT NULL,
+    stream VARCHAR(64) NOT NULL,
+    company_id VARCHAR(64),
+    status VARCHAR(16) NOT NULL,
+    started_at TIMESTAMP NOT NULL,
+    finished_at TIMESTAMP,
+    duration_seconds DOUBLE PRECISION,
+    pages INTEGER NOT NULL DEFAULT 0,
+    rows_fetched INTEGER NOT NULL DEFAULT 0,
+    rows_written INTEGER NOT NULL DEFAULT 0,
+    rows_skipped INTEGER NOT NULL DEFAULT 0,
+    api_calls INTEGER NOT NULL DEFAULT 0,
+    api_errors INTEGER NOT NULL DEFAULT 0,
+    api_seconds DOUBLE PRECISION NOT NULL DEFAULT 0,
+    watermark_ts BIGINT,
+    error TEXT
+);
+
+-- Derniers runs d'une org / d'un flux
+CREATE INDEX IF NOT EXISTS idx_sync_runs_org_started ON sync_runs(org_id, started_at DESC);
+CREATE INDEX IF NOT EXISTS idx_sync_runs_stream_started ON sync_runs(provider, stream, started_at DESC);
+-- Dernier run d'un flux pour une org (validateurs HTTP, app/api/http_cache.py)
+CREATE INDEX IF NOT EXISTS idx_sync_runs_org_stream_finished ON sync_runs(org_id, provider, stream, finished_at DESC);
+-- Runs bloqués (status = running depuis longtemps)
+CREATE INDEX IF NOT EXISTS idx_sync_runs_running ON sync_runs(status) WHERE status = 'running';
+
+COMMENT ON TABLE sync_runs IS 'Journal des synchronisations : durée, pages, lignes récupérées / écrites / ignorées, latence API et erreurs';
+COMMENT ON COLUMN sync_runs.watermark_ts IS 'Timestamp (epoch) jusqu''auquel les données du flux sont à jour après ce run';